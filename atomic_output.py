@@ -0,0 +1,153 @@
+"""
+Crash-safe publishing of generated files.
+
+Every artifact is written to a temporary file in the target's directory,
+flushed and fsync'ed, then renamed over the target (an atomic replace on
+POSIX and Windows) and the directory entry is fsync'ed. Readers such as
+the frontend copy step or catalog_server.py therefore see either the old
+file or the new one, never a truncated mix, even if the crawler crashes
+or the machine loses power mid-write.
+
+manifest.json is written last and records the sha256 and size of every
+file published in the run, so consumers can check that the set of files
+they read belongs together. It holds no timestamp, so a run that publishes
+the same files writes the same manifest and the nightly job has nothing
+to commit:
+
+    python atomic_output.py generated/manifest.json
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import secrets
+import sys
+from contextlib import contextmanager
+
+
+MANIFEST_FORMAT_VERSION = 1
+
+
+def fsync_directory(directory):
+    """Persist a rename by fsync'ing the directory (a no-op where unsupported)."""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def atomic_open(path, mode='w', **kwargs):
+    """
+    Open a temporary file that replaces path only if the block completes.
+
+    Args:
+        path: Final file path
+        mode: 'w' or 'wb' (plus any other open() keyword arguments)
+
+    Yields:
+        file: The temporary file; on an exception it is removed and path is untouched
+    """
+    if mode not in ('w', 'wb'):
+        raise ValueError(f"atomic_open only supports 'w' and 'wb', not {mode!r}")
+    directory = os.path.dirname(os.path.abspath(path))
+    temp_path = os.path.join(
+        directory, f".{os.path.basename(path)}.{os.getpid()}.{secrets.token_hex(4)}.tmp"
+    )
+    # 'x' rather than tempfile.mkstemp so the file gets the usual umask
+    # permissions instead of 0600
+    f = open(temp_path, mode.replace('w', 'x'), **kwargs)
+    try:
+        with f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+    fsync_directory(directory)
+
+
+def file_digest(path):
+    """Return (sha256 hex digest, size in bytes) of a file."""
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
+
+
+def write_manifest(paths, manifest_path):
+    """
+    Atomically write a manifest of content hashes for the published files.
+
+    Args:
+        paths: Files published in this run (missing files are skipped)
+        manifest_path: Where to write the manifest; entries are relative to its directory
+
+    Returns:
+        dict: The manifest
+    """
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    files = {}
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        sha256, size = file_digest(path)
+        relative = os.path.relpath(os.path.abspath(path), base_dir).replace(os.sep, '/')
+        files[relative] = {'sha256': sha256, 'bytes': size}
+    manifest = {
+        'format_version': MANIFEST_FORMAT_VERSION,
+        'files': dict(sorted(files.items()))
+    }
+    with atomic_open(manifest_path) as f:
+        json.dump(manifest, f, indent=4)
+    return manifest
+
+
+def verify_manifest(manifest_path):
+    """
+    Check files against a manifest.
+
+    Returns:
+        list: Relative paths that are missing or whose content does not match
+    """
+    with open(manifest_path, 'r') as f:
+        manifest = json.load(f)
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    mismatched = []
+    for relative, expected in manifest.get('files', {}).items():
+        path = os.path.join(base_dir, relative)
+        if not os.path.exists(path) or file_digest(path) != (expected['sha256'], expected['bytes']):
+            mismatched.append(relative)
+    return mismatched
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify generated files against their manifest")
+    parser.add_argument('manifest', nargs='?', default='generated/manifest.json')
+    args = parser.parse_args()
+
+    mismatched = verify_manifest(args.manifest)
+    for relative in mismatched:
+        print(f"Mismatch: {relative}")
+    if mismatched:
+        sys.exit(1)
+    print("All files match the manifest")
+
+
+if __name__ == "__main__":
+    main()
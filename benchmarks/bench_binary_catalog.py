@@ -0,0 +1,109 @@
+"""
+Benchmark the binary catalog against community_workspaces.json.
+
+Writes a synthetic catalog in both formats, then compares:
+
+- open time: json.load of the whole file vs. mapping the binary file
+- first lookup: open plus one workspace lookup, what a one-off consumer pays
+- lookup latency by workspace id, by repo and by category once open; the
+  JSON side first builds dict indexes, as catalog_server.py does
+
+Usage:
+    python benchmarks/bench_binary_catalog.py --workspaces 100000 --lookups 10000
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT_DIR)
+
+from benchmarks.synthetic import CATEGORIES, write_catalog
+from binary_catalog import BinaryCatalog, write_binary_catalog
+from catalog_utils import iter_workspaces, workspace_id
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def load_json(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def index_json(catalog):
+    """The dict indexes a JSON consumer builds before it can look anything up."""
+    by_id, by_category = {}, {}
+    for repo, _, ws_name, ws_data in iter_workspaces(catalog):
+        by_id[workspace_id(repo, ws_name)] = ws_data
+        for category in ws_data.get('categories', []):
+            by_category.setdefault(category.lower(), []).append(ws_data)
+    return by_id, by_category
+
+
+def per_lookup(function, keys):
+    start = time.perf_counter()
+    for key in keys:
+        function(key)
+    return (time.perf_counter() - start) / len(keys)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the binary catalog against the JSON catalog")
+    parser.add_argument('--workspaces', type=int, default=100000)
+    parser.add_argument('--lookups', type=int, default=10000)
+    parser.add_argument('--keep', help="Directory to keep the generated files in")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        directory = args.keep or tmpdir
+        json_path = os.path.join(directory, 'community_workspaces.json')
+        binary_path = os.path.join(directory, 'community_workspaces.bin')
+        catalog = write_catalog(json_path, args.workspaces)
+        _, encode_seconds = timed(write_binary_catalog, catalog, binary_path)
+
+        rng = random.Random(0)
+        ids = [workspace_id(repo, ws_name) for repo, _, ws_name, _ in iter_workspaces(catalog)]
+        id_keys = [rng.choice(ids) for _ in range(args.lookups)]
+        repo_keys = [rng.choice(list(catalog)) for _ in range(args.lookups)]
+        category_keys = [rng.choice(CATEGORIES) for _ in range(min(args.lookups, 1000))]
+        del catalog
+
+        loaded, json_open = timed(load_json, json_path)
+        (by_id, by_category), json_index = timed(index_json, loaded)
+        binary, binary_open = timed(BinaryCatalog, binary_path)
+        try:
+            _, binary_first = timed(binary.get, id_keys[0])
+            results = {
+                'id': (per_lookup(by_id.get, id_keys), per_lookup(binary.get, id_keys)),
+                'id (indexed fields only)': (
+                    per_lookup(by_id.get, id_keys),
+                    per_lookup(lambda ws_id: binary.record(binary.find(ws_id)), id_keys)
+                ),
+                'repo': (per_lookup(loaded.get, repo_keys), per_lookup(binary.repo, repo_keys)),
+                'category': (per_lookup(lambda c: by_category.get(c.lower(), []), category_keys),
+                             per_lookup(binary.by_category, category_keys)),
+            }
+        finally:
+            binary.close()
+
+        print(f"{args.workspaces} workspaces")
+        print(f"file size:      JSON {os.path.getsize(json_path) / 1e6:8.1f} MB   "
+              f"binary {os.path.getsize(binary_path) / 1e6:8.1f} MB  (encoded in {encode_seconds:.2f} s)")
+        print(f"open:           JSON {json_open * 1e3:8.1f} ms   binary {binary_open * 1e3:8.3f} ms")
+        print(f"first lookup:   JSON {(json_open + json_index) * 1e3:8.1f} ms   "
+              f"binary {(binary_open + binary_first) * 1e3:8.3f} ms  (JSON: load + index)")
+        for name, (json_seconds, binary_seconds) in results.items():
+            print(f"lookup by {name + ':':<26} JSON {json_seconds * 1e6:8.2f} us   binary {binary_seconds * 1e6:8.2f} us")
+
+
+if __name__ == "__main__":
+    main()
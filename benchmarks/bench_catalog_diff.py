@@ -0,0 +1,65 @@
+"""
+Benchmark compute_diff/apply_diff scaling on synthetic catalogs.
+
+Each run mutates ~1% of workspaces, drops a few repos and adds a few, so
+the timings should grow linearly with catalog size.
+
+Usage:
+    python benchmarks/bench_catalog_diff.py --sizes 10000 50000 100000
+"""
+
+import argparse
+import copy
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.synthetic import make_catalog
+from catalog_diff import apply_diff, compute_diff
+
+
+def mutate(catalog, rng):
+    new = copy.deepcopy(catalog)
+    repos = list(new)
+    for repo in rng.sample(repos, max(1, len(repos) // 100)):
+        del new[repo]
+    for repo in rng.sample(list(new), max(1, len(new) // 20)):
+        workspace = new[repo]['workspaces'][0]
+        for ws_data in workspace.values():
+            ws_data['description'] += ' updated'
+            if isinstance(ws_data['compatibility'][0], dict) and len(ws_data['compatibility']) > 1:
+                ws_data['compatibility'].pop()
+    for index in range(max(1, len(repos) // 100)):
+        new[f"newuser{index}/kasm-registry"] = copy.deepcopy(catalog[repos[index]])
+    return new
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark catalog diffing")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 50000, 100000])
+    args = parser.parse_args()
+
+    print(f"{'workspaces':>12} {'diff (s)':>10} {'apply (s)':>10} {'changes.json (KB)':>18} {'catalog (KB)':>14}")
+    for size in args.sizes:
+        old = make_catalog(size)
+        new = mutate(old, random.Random(size))
+
+        start = time.perf_counter()
+        diff = compute_diff(old, new)
+        diff_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        apply_diff(old, diff)
+        apply_time = time.perf_counter() - start
+
+        diff_kb = len(json.dumps(diff)) / 1024
+        catalog_kb = len(json.dumps(new)) / 1024
+        print(f"{size:>12} {diff_time:>10.3f} {apply_time:>10.3f} {diff_kb:>18.1f} {catalog_kb:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Benchmark the compiled image policy against a linear scan of the same rules.
+
+Generates org-level block rules, registry allow rules and glob patterns for
+known-malicious images (some anchored to a registry or org, some starting
+with a wildcard), and image references spread over the Docker Hub aliases a
+workspace may use. The linear scan checks every rule for every image, as
+should_skip_image used to do with its prefix list; it is timed on a sample
+and extrapolated, and its decisions are checked against the compiled policy.
+
+Usage:
+    python benchmarks/bench_image_policy.py --rules 10000 --images 100000
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT_DIR)
+
+from benchmarks.synthetic import _suffix
+from image_policy import (ALLOW, BLOCK, GLOB_CHARS, ImagePolicy, PolicyRule, canonical_reference,
+                          canonical_registry)
+
+DOCKER_HUB_ALIASES = ['', 'docker.io', 'https://index.docker.io/v1/', 'registry-1.docker.io']
+OTHER_REGISTRIES = ['ghcr.io', 'quay.io', 'registry.gitlab.com']
+WORDS = ['desktop', 'editor', 'browser', 'miner', 'studio', 'player', 'xmrig', 'terminal']
+
+
+def make_rules(rng, num_rules):
+    """Roughly 80% org blocks, 10% registry allows, 8% anchored globs, 2% leading-wildcard globs."""
+    rules = []
+    for index in range(num_rules):
+        kind = rng.random()
+        if kind < 0.8:
+            rules.append(PolicyRule(BLOCK, f"org{_suffix(index)}/", 'bench'))
+        elif kind < 0.9:
+            rules.append(PolicyRule(ALLOW, f"registry{_suffix(index)}.example.com/", 'bench'))
+        elif kind < 0.98:
+            registry = rng.choice(OTHER_REGISTRIES)
+            rules.append(PolicyRule(BLOCK, f"{registry}/team{_suffix(index)}/*{rng.choice(WORDS)}*", 'bench'))
+        else:
+            rules.append(PolicyRule(BLOCK, f"*/{rng.choice(WORDS)}-{_suffix(index)}:*", 'bench'))
+    return rules
+
+
+def make_images(rng, num_images, num_rules):
+    """Return [(image, docker_registry)] with a share of them hitting rules."""
+    images = []
+    for _ in range(num_images):
+        org = f"{rng.choice(['org', 'team', 'user'])}{_suffix(rng.randrange(num_rules * 2))}"
+        name = f"{rng.choice(WORDS)}-{_suffix(rng.randrange(num_rules))}:{rng.randrange(1, 20)}.0"
+        if rng.random() < 0.6:
+            images.append((f"{org}/{name}", rng.choice(DOCKER_HUB_ALIASES)))
+        else:
+            registry = rng.choice(OTHER_REGISTRIES + [f"registry{_suffix(rng.randrange(num_rules))}.example.com"])
+            images.append((f"{registry}/{org}/{name}", None))
+    return images
+
+
+class LinearPolicy:
+    """The same rules and precedence, checked one by one for every image."""
+
+    def __init__(self, rules, default=ALLOW):
+        self.default = default
+        self.prefixes = []
+        self.globs = []
+        for rule in rules:
+            pattern = canonical_reference(rule.pattern, is_rule=True)
+            if any(char in pattern for char in GLOB_CHARS):
+                regex = ''.join('.*' if c == '*' else '.' if c == '?' else re.escape(c) for c in pattern)
+                self.globs.append((rule, re.compile(regex, re.DOTALL)))
+            else:
+                self.prefixes.append((rule, pattern))
+
+    def blocked(self, reference):
+        for rule, glob in self.globs:
+            if rule.action == BLOCK and glob.fullmatch(reference):
+                return True
+        best = None
+        for rule, prefix in self.prefixes:
+            if reference.startswith(prefix) and (
+                    best is None or len(prefix) > len(best[1]) or (len(prefix) == len(best[1]) and rule.action == ALLOW)):
+                best = (rule, prefix)
+        if best:
+            return best[0].action == BLOCK
+        if any(rule.action == ALLOW and glob.fullmatch(reference) for rule, glob in self.globs):
+            return False
+        return self.default == BLOCK
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the compiled image policy")
+    parser.add_argument('--rules', type=int, default=10000)
+    parser.add_argument('--images', type=int, default=100000)
+    parser.add_argument('--linear-sample', type=int, default=2000,
+                        help="Images the linear scan is timed on (it is extrapolated to --images)")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    rules = make_rules(rng, args.rules)
+    images = make_images(rng, args.images, args.rules)
+
+    start = time.perf_counter()
+    policy = ImagePolicy(rules)
+    compile_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    registries = {}
+    decisions = []
+    for image, docker_registry in images:
+        # As check_image_pullability does: the registry is resolved once per workspace
+        registry = registries.get(docker_registry)
+        if registry is None:
+            registry = registries[docker_registry] = canonical_registry(docker_registry)
+        decisions.append(policy.evaluate(image, registry))
+    compiled_seconds = time.perf_counter() - start
+    blocked = sum(decision.blocked for decision in decisions)
+
+    linear = LinearPolicy(rules)
+    sample = range(0, args.images, max(1, args.images // args.linear_sample))
+    start = time.perf_counter()
+    linear_blocked = [linear.blocked(decisions[index].reference) for index in sample]
+    linear_seconds = (time.perf_counter() - start) * args.images / len(sample)
+    mismatches = sum(linear_blocked[position] != decisions[index].blocked for position, index in enumerate(sample))
+
+    print(f"{args.rules} rules x {args.images} images ({blocked} blocked)")
+    print(f"compile:            {compile_seconds:8.3f} s")
+    print(f"compiled policy:    {compiled_seconds:8.3f} s  ({compiled_seconds / args.images * 1e6:.1f} us/image)")
+    print(f"linear scan (est.): {linear_seconds:8.3f} s  ({linear_seconds / args.images * 1e6:.1f} us/image, "
+          f"timed on {len(sample)} images)")
+    print(f"speedup:            {linear_seconds / compiled_seconds:8.1f}x")
+    print(f"decision mismatches on the sample: {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
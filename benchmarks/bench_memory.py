@@ -0,0 +1,112 @@
+"""
+Benchmark peak memory of a crawl holding N workspaces, with plain dicts (as
+json.loads returns them, the previous behaviour) vs. compact records.
+
+Each measurement runs in a fresh process that pushes synthetic workspace.json
+files through the crawler's per-workspace path (prevalidate_workspace,
+check_image_pullability with probes stubbed out, filter_original_workspace_json),
+keeps the results in a catalog as crawl_repos does, then serializes it.
+Profanity checks are stubbed out too: they dominate the run time, not memory.
+
+Usage:
+    GH_PAT=dummy python benchmarks/bench_memory.py --workspaces 10000 100000
+"""
+
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT_DIR)
+
+MODES = ('dict', 'compact')
+WORKSPACES_PER_REPO = 5
+
+
+def peak_rss_mb():
+    # ru_maxrss is in KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def measure(mode, num_workspaces):
+    """Crawl num_workspaces synthetic workspaces in this process and return its stats."""
+    os.chdir(ROOT_DIR)  # search_github loads profanity_whitelist.json from the cwd
+    os.environ.setdefault('GH_PAT', 'benchmark')
+    from contextlib import redirect_stdout
+
+    import search_github
+    from benchmarks.synthetic import make_workspace
+    from compact_records import RepoStats, compact, to_builtin
+
+    search_github.skopeo_inspect = lambda image, docker_registry=None: True
+    search_github.check_profanity_in_workspace = lambda workspace_json, workspace_name: False
+    baseline = peak_rss_mb()
+
+    rng = random.Random(0)
+    catalog = {}
+    repo_stats = {}
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        for index in range(num_workspaces):
+            repo = f"user{index // WORKSPACES_PER_REPO}/kasm-registry"
+            workspace = make_workspace(rng, index)
+            folder = workspace['friendly_name'].replace(' ', '')
+            raw = json.dumps(workspace, indent=2).encode('utf-8')
+            status, ws_name, ws_data, original = search_github.prevalidate_workspace(folder, raw)
+            if status != 'ok':
+                continue
+            pullable = search_github.check_image_pullability(ws_data)
+            filtered = search_github.filter_original_workspace_json(original, pullable)
+            if repo not in catalog:
+                stars, last_commit = index % 500, '2025-01-01T00:00:00Z'
+                if mode == 'compact':
+                    repo = sys.intern(repo)
+                    repo_stats[repo] = RepoStats(stars, last_commit)
+                else:
+                    repo_stats[repo] = {'stars': stars, 'last_commit': last_commit}
+                catalog[repo] = {'github_pages': f"https://{repo.split('/')[0]}.github.io/kasm-registry/",
+                                 'stars': stars, 'last_commit': last_commit, 'workspaces': []}
+            catalog[repo]['workspaces'].append({ws_name: compact(filtered) if mode == 'compact' else filtered})
+        crawled = peak_rss_mb()
+        json.dump(catalog, devnull, indent=4, default=to_builtin)
+    elapsed = time.perf_counter() - start
+    return {'baseline_mb': baseline, 'crawled_mb': crawled, 'peak_mb': peak_rss_mb(), 'seconds': elapsed}
+
+
+def run_child(mode, num_workspaces):
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--child', mode, str(num_workspaces)],
+        check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark peak memory of the in-memory catalog")
+    parser.add_argument('--workspaces', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--child', nargs=2, metavar=('MODE', 'WORKSPACES'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.child[0], int(args.child[1]))))
+        return
+
+    print(f"{'workspaces':>10} {'mode':>8} {'peak RSS MB':>12} {'catalog MB':>11} {'seconds':>8} {'vs dict':>8}")
+    for num_workspaces in args.workspaces:
+        results = {mode: run_child(mode, num_workspaces) for mode in MODES}
+        dict_catalog = results['dict']['crawled_mb'] - results['dict']['baseline_mb']
+        for mode in MODES:
+            result = results[mode]
+            catalog_mb = result['crawled_mb'] - result['baseline_mb']
+            print(f"{num_workspaces:>10} {mode:>8} {result['peak_mb']:>12.1f} {catalog_mb:>11.1f} "
+                  f"{result['seconds']:>8.2f} {catalog_mb / dict_catalog:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
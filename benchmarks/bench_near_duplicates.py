@@ -0,0 +1,64 @@
+"""
+Benchmark near-duplicate detection on synthetic catalogs with injected forks.
+
+About 5% of workspaces are copied into new repos with a slightly edited
+description (as forks do); the benchmark reports run time and how many of
+those injected copies were grouped with their original.
+
+Usage:
+    python benchmarks/bench_near_duplicates.py --sizes 10000 50000 100000
+"""
+
+import argparse
+import copy
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.synthetic import WORDS, make_catalog
+from catalog_utils import iter_workspaces, workspace_id
+from near_duplicates import find_near_duplicates
+
+
+def inject_forks(catalog, ratio, rng):
+    """Copy a fraction of workspaces into fork repos; return {fork_id: original_id}."""
+    workspaces = list(iter_workspaces(catalog))
+    expected = {}
+    for index, (repo, _, ws_name, ws_data) in enumerate(rng.sample(workspaces, int(len(workspaces) * ratio))):
+        fork = copy.deepcopy(ws_data)
+        fork['description'] += f" {rng.choice(WORDS)}"
+        fork_repo = f"fork{index}/kasm-registry"
+        catalog[fork_repo] = {'stars': 0, 'last_commit': '2026-01-01T00:00:00Z', 'workspaces': [{ws_name: fork}]}
+        expected[workspace_id(fork_repo, ws_name)] = workspace_id(repo, ws_name)
+    return expected
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark near-duplicate detection")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 50000, 100000])
+    parser.add_argument('--forks', type=float, default=0.05, help="Fraction of workspaces forked")
+    parser.add_argument('--threshold', type=float, default=0.8)
+    args = parser.parse_args()
+
+    print(f"{'workspaces':>12} {'seconds':>9} {'workspaces/s':>13} {'groups':>8} {'fork recall':>12} {'flagged':>8}")
+    for size in args.sizes:
+        catalog = make_catalog(size)
+        expected = inject_forks(catalog, args.forks, random.Random(size))
+        total = sum(1 for _ in iter_workspaces(catalog))
+
+        start = time.perf_counter()
+        result = find_near_duplicates(catalog, threshold=args.threshold)
+        elapsed = time.perf_counter() - start
+
+        duplicate_of = result['duplicate_of']
+        found = sum(1 for fork, original in expected.items()
+                    if duplicate_of.get(fork, fork) == duplicate_of.get(original, original))
+        print(f"{total:>12} {elapsed:>9.2f} {total / elapsed:>13.0f} {len(result['groups']):>8} "
+              f"{found / len(expected):>11.1%} {len(duplicate_of):>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Benchmark workspace.json schema validation on a synthetic corpus of valid
+and malformed files, and count the image probes it saves.
+
+Usage:
+    GH_PAT=dummy python benchmarks/bench_schema_validation.py --workspaces 50000 --malformed 0.2
+"""
+
+import argparse
+import copy
+import json
+import os
+import random
+import sys
+import time
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT_DIR)
+os.chdir(ROOT_DIR)  # search_github loads profanity_whitelist.json from the cwd
+os.environ.setdefault('GH_PAT', 'benchmark')
+
+import search_github
+from benchmarks.synthetic import make_workspace
+
+
+def corrupt(rng, workspace):
+    """Return a copy of workspace with one realistic defect."""
+    workspace = copy.deepcopy(workspace)
+    defect = rng.randrange(7)
+    if defect == 0:
+        del workspace['friendly_name']
+    elif defect == 1:
+        workspace['categories'] = 'Browser, Development'
+    elif defect == 2:
+        # A late bad entry: without up-front validation, earlier images are probed first
+        workspace['compatibility'] = list(workspace['compatibility']) + [None]
+    elif defect == 3:
+        workspace['docker_registry'] = 'ftp://registry.example.com'
+    elif defect == 4:
+        workspace['image_src'] = 'javascript:alert(1)'
+    elif defect == 5:
+        workspace['description'] = 'x' * (search_github.MAX_TEXT_LENGTH + 1)
+    else:
+        workspace['compatibility'] = {'1.16.x': workspace['friendly_name']}
+    return workspace
+
+
+def make_corpus(num_workspaces, malformed_ratio, seed=0):
+    rng = random.Random(seed)
+    corpus = []
+    for index in range(num_workspaces):
+        workspace = make_workspace(rng, index)
+        if rng.random() < malformed_ratio:
+            workspace = corrupt(rng, workspace)
+        corpus.append(workspace)
+    return corpus
+
+
+def probes_saved(workspace):
+    """Images check_image_pullability would have probed before hitting the defect."""
+    compatibility = workspace.get('compatibility')
+    if not isinstance(compatibility, list):
+        return 0
+    return sum(1 for entry in compatibility if isinstance(entry, (dict, str)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark workspace.json schema validation")
+    parser.add_argument('--workspaces', type=int, default=50000)
+    parser.add_argument('--malformed', type=float, default=0.2, help="Fraction of malformed files")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.workspaces, args.malformed)
+    raw_corpus = [json.dumps(workspace).encode('utf-8') for workspace in corpus]
+
+    best_parse = best_validate = float('inf')
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        parsed = [json.loads(raw) for raw in raw_corpus]
+        best_parse = min(best_parse, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        errors = [search_github.validate_workspace_schema(workspace) for workspace in parsed]
+        best_validate = min(best_validate, time.perf_counter() - start)
+
+    rejected = [workspace for workspace, error in zip(corpus, errors) if error]
+    print(f"{len(corpus)} synthetic workspace.json files, {len(rejected)} rejected")
+    print(f"json.loads:       {best_parse:8.3f}s  {len(corpus) / best_parse:>10.0f} files/s")
+    print(f"schema validate:  {best_validate:8.3f}s  {len(corpus) / best_validate:>10.0f} files/s "
+          f"({best_validate / best_parse:.2f}x the cost of parsing)")
+    print(f"Image probes avoided for rejected files: {sum(probes_saved(w) for w in rejected)}")
+
+
+if __name__ == "__main__":
+    main()
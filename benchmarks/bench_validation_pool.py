@@ -0,0 +1,114 @@
+"""
+Benchmark the validation process pool the way the crawler uses it.
+
+crawl_repos runs over synthetic repos sized like the real catalog (most
+repos publish one workspace, a few publish dozens). Fetching a repo's
+workspace.json files is replaced by a sleep of --fetch-latency per request
+(the Pages listing or contents walk) and image probes are answered at once,
+so the timings show what validation costs the crawl:
+
+- in-proc: VALIDATION_WORKERS=0, every repo validated in the crawler process
+- blocking: the pool, but each repo waits for its own validation before the
+  next repo is fetched (how the pool was first used)
+- N workers: the crawl as it runs, up to N repos validating while the next
+  ones are fetched
+
+Usage:
+    GH_PAT=dummy python benchmarks/bench_validation_pool.py --repos 165 --workers 1 2 4
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from unittest.mock import patch
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT_DIR)
+os.chdir(ROOT_DIR)  # search_github loads profanity_whitelist.json from the cwd
+os.environ.setdefault('GH_PAT', 'benchmark')
+
+from contextlib import redirect_stdout
+
+import search_github
+from benchmarks.synthetic import make_workspace_files
+from compact_records import to_builtin
+
+# (workspaces per repo, share of repos): median 1, about 94% fit one 16-file batch
+REPO_SIZES = ((1, 0.6), (3, 0.2), (10, 0.14), (40, 0.06))
+
+
+def make_repos(num_repos, seed=0):
+    """Return {repo_full_name: [(folder_name, workspace.json bytes)]}."""
+    rng = random.Random(seed)
+    sizes = rng.choices([size for size, _ in REPO_SIZES], [share for _, share in REPO_SIZES], k=num_repos)
+    files = make_workspace_files(sum(sizes), seed=seed)
+    repos = {}
+    for index, size in enumerate(sizes):
+        repos[f"owner{index}/kasm-registry"], files = files[:size], files[size:]
+    return repos
+
+
+def run(repos, workers, fetch_latency, blocking=False):
+    search_github.disable_validation_pool()
+    search_github.VALIDATION_WORKERS = workers
+    if workers:
+        # Start workers outside the timed region
+        search_github.get_validation_pool().submit(int).result()
+
+    def fetch_repo_workspaces(repo, pages_url=None):
+        # Pages listing plus the contents API listing of workspaces/
+        time.sleep(2 * fetch_latency)
+        return repos[repo]
+
+    start_crawl_repo = search_github.start_crawl_repo
+
+    def start_and_wait(repo):
+        repo_entry = start_crawl_repo(repo)()
+        return lambda: repo_entry
+
+    with patch.object(search_github, 'fetch_repo_workspaces', fetch_repo_workspaces), \
+            patch.object(search_github, 'get_github_pages_url', lambda repo: f"https://{repo}.example/"), \
+            patch.object(search_github, 'skopeo_inspect', return_value=True), \
+            patch.object(search_github, 'start_crawl_repo', start_and_wait if blocking else start_crawl_repo), \
+            open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        start = time.perf_counter()
+        catalog = search_github.crawl_repos(list(repos))
+        elapsed = time.perf_counter() - start
+    search_github.disable_validation_pool()
+    return json.dumps(catalog, default=to_builtin), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the validation process pool in the crawl loop")
+    parser.add_argument('--repos', type=int, default=165)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, os.cpu_count() or 1])
+    parser.add_argument('--fetch-latency', type=float, default=0.05, help="Seconds per GitHub request")
+    parser.add_argument('--batch-size', type=int, default=search_github.VALIDATION_BATCH_SIZE)
+    args = parser.parse_args()
+
+    search_github.VALIDATION_BATCH_SIZE = args.batch_size
+    repos = make_repos(args.repos)
+    sizes = sorted(len(files) for files in repos.values())
+    print(f"{len(repos)} repos, {sum(sizes)} workspaces (median {sizes[len(sizes) // 2]} per repo), "
+          f"{args.fetch_latency * 1000:.0f} ms per request, {os.cpu_count()} CPUs")
+    print(f"{'mode':>10} {'seconds':>9} {'speedup':>8}")
+
+    runs = [('in-proc', 0, False)] + [('blocking', max(args.workers), True)]
+    runs += [(f"{workers} workers", workers, False) for workers in args.workers]
+    baseline = None
+    expected = None
+    for label, workers, blocking in runs:
+        catalog, elapsed = run(repos, workers, args.fetch_latency, blocking)
+        if expected is None:
+            expected = catalog
+        elif catalog != expected:
+            raise SystemExit(f"The {label} crawl published a different catalog than the in-process crawl")
+        baseline = baseline or elapsed
+        print(f"{label:>10} {elapsed:>9.2f} {baseline / elapsed:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
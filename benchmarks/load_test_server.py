@@ -0,0 +1,156 @@
+"""
+Load test for catalog_server.py on a synthetic catalog.
+
+Starts the server in a subprocess on a synthetic catalog (100k workspaces by
+default), hammers it with a mix of filtered/paginated queries from several
+client threads using keep-alive connections, and reports requests/sec and
+latency percentiles.
+
+Usage:
+    python benchmarks/load_test_server.py --workspaces 100000 --duration 10 --concurrency 8
+"""
+
+import argparse
+import http.client
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlencode
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.synthetic import ARCHITECTURES, CATEGORIES, VERSIONS, WORDS, write_catalog
+
+
+def build_queries(rng, count=500):
+    """Return a fixed mix of request paths."""
+    queries = []
+    for _ in range(count):
+        params = {}
+        roll = rng.random()
+        if roll < 0.3:
+            params['category'] = rng.choice(CATEGORIES)
+        elif roll < 0.5:
+            params['version'] = rng.choice(VERSIONS)
+        elif roll < 0.6:
+            params['arch'] = rng.choice(ARCHITECTURES)
+        elif roll < 0.85:
+            params['q'] = rng.choice(WORDS)
+        else:
+            params['category'] = rng.choice(CATEGORIES)
+            params['version'] = rng.choice(VERSIONS)
+            params['q'] = rng.choice(WORDS)
+        params['page'] = rng.randint(1, 5)
+        queries.append('/workspaces?' + urlencode(params))
+    return queries
+
+
+def wait_for_server(port, timeout=300):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+            conn.request('GET', '/health')
+            if conn.getresponse().status == 200:
+                conn.close()
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("catalog server did not start in time")
+
+
+def client_worker(port, queries, deadline, latencies, statuses, seed, conditional):
+    rng = random.Random(seed)
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    etags = {}
+    while time.monotonic() < deadline:
+        path = rng.choice(queries)
+        headers = {}
+        if conditional and path in etags:
+            headers['If-None-Match'] = etags[path]
+        start = time.perf_counter()
+        conn.request('GET', path, headers=headers)
+        response = conn.getresponse()
+        response.read()
+        latencies.append(time.perf_counter() - start)
+        statuses[response.status] = statuses.get(response.status, 0) + 1
+        etag = response.getheader('ETag')
+        if etag:
+            etags[path] = etag
+    conn.close()
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the catalog query server")
+    parser.add_argument('--workspaces', type=int, default=100000)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--port', type=int, default=18080)
+    parser.add_argument('--conditional', action='store_true',
+                        help="Send If-None-Match with previously seen ETags")
+    args = parser.parse_args()
+
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    with tempfile.TemporaryDirectory() as tmpdir:
+        catalog_path = os.path.join(tmpdir, 'community_workspaces.json')
+        print(f"Generating synthetic catalog with {args.workspaces} workspaces...")
+        write_catalog(catalog_path, args.workspaces)
+        print(f"Catalog size: {os.path.getsize(catalog_path) / 1e6:.1f} MB")
+
+        start = time.perf_counter()
+        server = subprocess.Popen(
+            [sys.executable, os.path.join(root, 'catalog_server.py'),
+             '--file', catalog_path, '--port', str(args.port)],
+            stdout=subprocess.DEVNULL
+        )
+        try:
+            wait_for_server(args.port)
+            print(f"Server ready in {time.perf_counter() - start:.2f}s")
+
+            queries = build_queries(random.Random(0))
+            latencies = []
+            statuses = {}
+            deadline = time.monotonic() + args.duration
+            threads = [
+                threading.Thread(
+                    target=client_worker,
+                    args=(args.port, queries, deadline, latencies, statuses, seed, args.conditional)
+                )
+                for seed in range(args.concurrency)
+            ]
+            bench_start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - bench_start
+        finally:
+            server.terminate()
+            server.wait()
+
+    latencies.sort()
+    print("\n" + "=" * 60)
+    print("LOAD TEST SUMMARY")
+    print("=" * 60)
+    print(f"Workspaces: {args.workspaces}, clients: {args.concurrency}, duration: {elapsed:.1f}s")
+    print(f"Requests: {len(latencies)} ({statuses})")
+    print(f"Requests/sec: {len(latencies) / elapsed:.1f}")
+    print(f"Latency p50: {percentile(latencies, 50) * 1000:.2f} ms")
+    print(f"Latency p95: {percentile(latencies, 95) * 1000:.2f} ms")
+    print(f"Latency p99: {percentile(latencies, 99) * 1000:.2f} ms")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
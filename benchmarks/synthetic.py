@@ -0,0 +1,115 @@
+"""
+Deterministic synthetic catalogs for benchmarks.
+
+Generated workspaces mimic the shapes found in generated/community_workspaces.json:
+a mix of old format (top level 'name' + list of version strings) and new format
+(list of {version, image, uncompressed_size_mb}) workspace.json files.
+"""
+
+import json
+import random
+
+CATEGORIES = [
+    "Browser", "Development", "Productivity", "Games", "Multimedia",
+    "Office", "Security", "Communication", "Graphics", "Education"
+]
+VERSIONS = ["1.14.x", "1.15.x", "1.16.x", "1.17.x", "1.18.x"]
+ARCHITECTURES = ["amd64", "arm64"]
+REGISTRIES = [
+    "https://index.docker.io/v1/", "ghcr.io", "quay.io", "registry.gitlab.com", "docker.io"
+]
+WORDS = [
+    "desktop", "editor", "browser", "studio", "player", "office", "terminal", "viewer",
+    "manager", "client", "server", "notes", "paint", "music", "video", "chat", "mail",
+    "sandbox", "toolkit", "workbench", "lab", "console", "tracker", "monitor", "slicer"
+]
+
+
+def _suffix(index):
+    # Letters rather than digits: digit runs like "455" trip the profanity
+    # filter's leetspeak matching
+    letters = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(ord('a') + remainder) + letters
+    return letters
+
+
+def make_workspace(rng, index):
+    """Return one synthetic workspace.json dict."""
+    title = f"{rng.choice(WORDS).title()} {rng.choice(WORDS).title()} {_suffix(index).title()}"
+    slug = title.lower().replace(' ', '-')
+    versions = sorted(rng.sample(VERSIONS, rng.randint(1, 3)))
+    workspace = {
+        "friendly_name": title,
+        "description": " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 20))),
+        "image_src": f"{slug}.png",
+        "docker_registry": rng.choice(REGISTRIES),
+        "categories": rng.sample(CATEGORIES, rng.randint(1, 3)),
+        "architecture": rng.sample(ARCHITECTURES, rng.randint(1, 2)),
+        "run_config": {"hostname": slug},
+        "exec_config": {"go": {"cmd": f"bash -c '/dockerstartup/custom_startup.sh --go {slug}'"}},
+    }
+    org = f"org{index % 997}"
+    if index % 3 == 0:
+        workspace["name"] = f"{org}/{slug}:latest"
+        workspace["uncompressed_size_mb"] = rng.randint(500, 6000)
+        workspace["compatibility"] = versions
+    else:
+        workspace["compatibility"] = [
+            {
+                "version": version,
+                "image": f"{org}/{slug}:{version.replace('.x', '')}",
+                "uncompressed_size_mb": rng.randint(500, 6000),
+            }
+            for version in versions
+        ]
+    return workspace
+
+
+def make_catalog(num_workspaces, workspaces_per_repo=5, seed=0):
+    """
+    Build a synthetic community_workspaces.json dict.
+
+    Args:
+        num_workspaces: Total number of workspaces to generate
+        workspaces_per_repo: Workspaces grouped under each synthetic repo
+        seed: Random seed, the same seed always yields the same catalog
+
+    Returns:
+        dict: Catalog in the same layout as generated/community_workspaces.json
+    """
+    rng = random.Random(seed)
+    catalog = {}
+    for index in range(num_workspaces):
+        repo_index = index // workspaces_per_repo
+        repo = f"user{repo_index}/kasm-registry"
+        if repo not in catalog:
+            catalog[repo] = {
+                "github_pages": f"https://user{repo_index}.github.io/kasm-registry/",
+                "stars": rng.randint(0, 500),
+                "last_commit": f"20{rng.randint(20, 26)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T00:00:00Z",
+                "workspaces": [],
+            }
+        workspace = make_workspace(rng, index)
+        catalog[repo]["workspaces"].append({workspace["friendly_name"].replace(' ', ''): workspace})
+    return catalog
+
+
+def make_workspace_files(num_workspaces, seed=0):
+    """Return [(folder_name, workspace.json bytes)] as fetched from GitHub."""
+    rng = random.Random(seed)
+    files = []
+    for index in range(num_workspaces):
+        workspace = make_workspace(rng, index)
+        files.append((workspace["friendly_name"].replace(' ', ''), json.dumps(workspace, indent=2).encode('utf-8')))
+    return files
+
+
+def write_catalog(path, num_workspaces, seed=0):
+    """Write a synthetic catalog to path and return it."""
+    catalog = make_catalog(num_workspaces, seed=seed)
+    with open(path, 'w') as f:
+        json.dump(catalog, f)
+    return catalog
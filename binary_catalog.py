@@ -0,0 +1,437 @@
+"""
+Compact binary catalog with memory-mapped random access.
+
+community_workspaces.json has to be parsed in full to read one workspace.
+The generator also writes generated/community_workspaces.bin, which a
+reader memory-maps and looks up by workspace id, repo or category, only
+decoding what it touches. Integers are little-endian (record fields are
+uint32); a string is an index into the string table, NONE for a missing
+value.
+
+    header      MAGIC, FORMAT_VERSION, then the count and byte offset of
+                every section below
+    strings     offsets (count + 1 entries) into one UTF-8 blob; every
+                distinct string is stored once
+    repos       fixed-width REPO records in catalog order
+    workspaces  fixed-width WORKSPACE records in catalog order, each with
+                its compatibility entries, categories and architectures as
+                ranges of the arrays below
+    documents   offsets (count + 1 entries) into the compressed rest of each
+                workspace.json: compact JSON in which the fields held in the
+                record (see LIFTED) are null placeholders, deflated on its
+                own against a shared preset dictionary so a lookup inflates
+                only its own workspace
+    dictionary  the preset dictionary, sampled from the documents
+    compat      fixed-width COMPAT records (version, image, uncompressed size)
+    lists       string indexes for the categories and architectures
+    id hash     open-addressing table of (crc32 of the id, workspace position)
+    repo hash   the same for repo names and repo positions
+    categories  (lowercase category, postings range) sorted by category,
+                and the postings: workspace positions in catalog order
+
+    python binary_catalog.py generated/community_workspaces.bin owner/repo/Workspace
+"""
+
+import argparse
+import json
+import mmap
+import struct
+import sys
+import zlib
+from array import array
+from collections.abc import Mapping
+
+from atomic_output import atomic_open
+from catalog_utils import iter_compatibility, iter_workspaces, workspace_id
+from compact_records import to_builtin
+
+
+MAGIC = b'KCAT'
+FORMAT_VERSION = 1
+NONE = 0xFFFFFFFF
+
+SECTIONS = ('string_offsets', 'string_data', 'repos', 'workspaces', 'document_offsets', 'document_data',
+            'dictionary', 'compat', 'lists', 'id_hash', 'repo_hash', 'categories', 'postings')
+# magic, version, then (count, offset) for each section
+HEADER = struct.Struct('<4sI' + 'IQ' * len(SECTIONS))
+# name, github_pages, stars, last_commit, first workspace, workspace count
+REPO = struct.Struct('<6I')
+# id, repo, name, friendly_name, description, image_src, docker_registry, document
+# (position, NONE if the workspace.json is not an object), compat first/count, categories first/count, architectures first/count, lifted
+WORKSPACE = struct.Struct('<15I')
+# workspace.json fields kept in the record instead of the document, by bit of
+# the lifted mask: strings, then lists of strings
+LIFTED = ('friendly_name', 'description', 'image_src', 'docker_registry', 'categories', 'architecture')
+# version, image, uncompressed_size_mb
+COMPAT = struct.Struct('<3I')
+# lowercase category, first posting, posting count
+CATEGORY = struct.Struct('<3I')
+# crc32 of the key, position (NONE for an empty bucket)
+BUCKET = struct.Struct('<2I')
+U32 = struct.Struct('<I')
+# zlib keeps the last 32 KiB of a preset dictionary
+DICTIONARY_SIZE = 32768
+DICTIONARY_SAMPLES = 256
+
+
+def _uint(value):
+    return value if isinstance(value, int) and not isinstance(value, bool) and 0 <= value < NONE else NONE
+
+
+def _string_list(value):
+    return [item for item in value if isinstance(item, str)] if isinstance(value, list) else []
+
+
+def _liftable(field, value):
+    if field in ('categories', 'architecture'):
+        return isinstance(value, list) and all(isinstance(item, str) for item in value)
+    return isinstance(value, str)
+
+
+def _hash_table(keys):
+    """Pack (crc32, position) buckets for keys, with linear probing in a table at most half full."""
+    size = 1
+    while size < 2 * len(keys):
+        size *= 2
+    buckets = [(0, NONE)] * size
+    for position, key in enumerate(keys):
+        crc = zlib.crc32(key.encode('utf-8'))
+        slot = crc & (size - 1)
+        while buckets[slot][1] != NONE:
+            slot = (slot + 1) & (size - 1)
+        buckets[slot] = (crc, position)
+    return size, b''.join(BUCKET.pack(*bucket) for bucket in buckets)
+
+
+def _dictionary(documents):
+    """Sample documents evenly across the catalog into a preset dictionary."""
+    step = max(1, len(documents) // DICTIONARY_SAMPLES)
+    return b''.join(documents[::step])[-DICTIONARY_SIZE:]
+
+
+def _deflate(documents, dictionary):
+    # Raw deflate: the dictionary is in the file, so zlib's header and checksum are not needed
+    base = zlib.compressobj(9, zlib.DEFLATED, -15, 9, zlib.Z_DEFAULT_STRATEGY, dictionary)
+    for document in documents:
+        compressor = base.copy()
+        yield compressor.compress(document) + compressor.flush()
+
+
+class _StringTable:
+    def __init__(self):
+        self.index = {}
+        self.strings = []
+
+    def add(self, value):
+        if not isinstance(value, str):
+            return NONE
+        position = self.index.get(value)
+        if position is None:
+            position = self.index[value] = len(self.strings)
+            self.strings.append(value)
+        return position
+
+
+def encode_catalog(catalog):
+    """
+    Encode a catalog in the binary format.
+
+    Args:
+        catalog: community_workspaces.json content
+
+    Returns:
+        bytes: The binary catalog
+    """
+    strings = _StringTable()
+    repos, workspaces, documents, compat, lists = [], [], [], [], []
+    ids, categories = [], {}
+    repo_names = {}
+
+    for repo, repo_entry, ws_name, ws_data in iter_workspaces(catalog):
+        if repo not in repo_names:
+            repo_names[repo] = len(repos)
+            repos.append([strings.add(repo), strings.add(repo_entry.get('github_pages')),
+                          _uint(repo_entry.get('stars', 0)), strings.add(repo_entry.get('last_commit')),
+                          len(workspaces), 0])
+        repos[repo_names[repo]][5] += 1
+
+        position = len(workspaces)
+        ws_id = workspace_id(repo, ws_name)
+        ids.append(ws_id)
+        compat_first = len(compat)
+        for version, image, size in iter_compatibility(ws_data):
+            compat.append((strings.add(version), strings.add(image), _uint(size)))
+        ranges = []
+        for field in ('categories', 'architecture'):
+            values = _string_list(ws_data.get(field))
+            ranges += [len(lists), len(values)]
+            lists.extend(strings.add(value) for value in values)
+            if field == 'categories':
+                for category in dict.fromkeys(value.lower() for value in values):
+                    categories.setdefault(category, []).append(position)
+        lifted, document = 0, NONE
+        if isinstance(ws_data, Mapping):
+            rest = dict(ws_data)
+            for bit, field in enumerate(LIFTED):
+                if _liftable(field, rest.get(field)):
+                    lifted |= 1 << bit
+                    rest[field] = None
+            document = len(documents)
+            documents.append(json.dumps(rest, separators=(',', ':'), default=to_builtin).encode('utf-8'))
+        workspaces.append((strings.add(ws_id), repo_names[repo], strings.add(ws_name),
+                           strings.add(ws_data.get('friendly_name')), strings.add(ws_data.get('description')),
+                           strings.add(ws_data.get('image_src')), strings.add(ws_data.get('docker_registry')),
+                           document, compat_first, len(compat) - compat_first, *ranges, lifted))
+
+    category_rows, postings = [], []
+    for category in sorted(categories):
+        category_rows.append((strings.add(category), len(postings), len(categories[category])))
+        postings.extend(categories[category])
+
+    encoded = [value.encode('utf-8') for value in strings.strings]
+    offsets = [0]
+    for value in encoded:
+        offsets.append(offsets[-1] + len(value))
+    dictionary = _dictionary(documents)
+    deflated = list(_deflate(documents, dictionary))
+    document_offsets = [0]
+    for document in deflated:
+        document_offsets.append(document_offsets[-1] + len(document))
+    id_buckets, id_hash = _hash_table(ids)
+    repo_buckets, repo_hash = _hash_table(list(repo_names))
+    sections = {
+        'string_offsets': (len(offsets), struct.pack(f'<{len(offsets)}I', *offsets)),
+        'string_data': (len(encoded), b''.join(encoded)),
+        'repos': (len(repos), b''.join(REPO.pack(*row) for row in repos)),
+        'workspaces': (len(workspaces), b''.join(WORKSPACE.pack(*row) for row in workspaces)),
+        'document_offsets': (len(document_offsets), struct.pack(f'<{len(document_offsets)}I', *document_offsets)),
+        'document_data': (len(deflated), b''.join(deflated)),
+        'dictionary': (len(dictionary), dictionary),
+        'compat': (len(compat), b''.join(COMPAT.pack(*row) for row in compat)),
+        'lists': (len(lists), struct.pack(f'<{len(lists)}I', *lists)),
+        'id_hash': (id_buckets, id_hash),
+        'repo_hash': (repo_buckets, repo_hash),
+        'categories': (len(category_rows), b''.join(CATEGORY.pack(*row) for row in category_rows)),
+        'postings': (len(postings), struct.pack(f'<{len(postings)}I', *postings)),
+    }
+
+    header_fields = [MAGIC, FORMAT_VERSION]
+    body = []
+    offset = HEADER.size
+    for name in SECTIONS:
+        count, data = sections[name]
+        # Keep every section 4-byte aligned
+        padding = -offset % 4
+        body.append(b'\0' * padding)
+        offset += padding
+        header_fields += [count, offset]
+        body.append(data)
+        offset += len(data)
+    return HEADER.pack(*header_fields) + b''.join(body)
+
+
+def write_binary_catalog(catalog, path):
+    """Atomically write catalog to path in the binary format; returns the size in bytes."""
+    data = encode_catalog(catalog)
+    with atomic_open(path, 'wb') as f:
+        f.write(data)
+    return len(data)
+
+
+class BinaryCatalog:
+    """
+    Memory-mapped reader for a binary catalog.
+
+    Opening reads only the header; lookups decode just the records and
+    strings they touch. Use as a context manager, or call close().
+
+    Args:
+        path: Path to a file written by write_binary_catalog
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if len(self._mm) < HEADER.size:
+                raise ValueError(f"{path}: too short to be a binary catalog")
+            magic, version, *sections = HEADER.unpack_from(self._mm, 0)
+            if magic != MAGIC:
+                raise ValueError(f"{path}: not a binary catalog")
+            if version != FORMAT_VERSION:
+                raise ValueError(f"{path}: format version {version}, expected {FORMAT_VERSION}")
+        except ValueError:
+            self._mm.close()
+            raise
+        self._count = {name: sections[2 * index] for index, name in enumerate(SECTIONS)}
+        self._offset = {name: sections[2 * index + 1] for index, name in enumerate(SECTIONS)}
+        base = self._offset['dictionary']
+        self._inflater = zlib.decompressobj(-15, self._mm[base:base + self._count['dictionary']])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._mm.close()
+
+    def __len__(self):
+        return self._count['workspaces']
+
+    def _u32(self, section, position):
+        return U32.unpack_from(self._mm, self._offset[section] + 4 * position)[0]
+
+    def _bytes(self, index):
+        start, end = struct.unpack_from('<II', self._mm, self._offset['string_offsets'] + 4 * index)
+        base = self._offset['string_data']
+        return self._mm[base + start:base + end]
+
+    def string(self, index):
+        """Return string number index, or None for NONE."""
+        return None if index == NONE else self._bytes(index).decode('utf-8')
+
+    def _strings(self, first, count):
+        return [self.string(self._u32('lists', first + i)) for i in range(count)]
+
+    def _workspace_row(self, position):
+        return WORKSPACE.unpack_from(self._mm, self._offset['workspaces'] + WORKSPACE.size * position)
+
+    def _repo_row(self, position):
+        return REPO.unpack_from(self._mm, self._offset['repos'] + REPO.size * position)
+
+    def _probe(self, section, key, key_at):
+        key = key.encode('utf-8')
+        crc = zlib.crc32(key)
+        mask = self._count[section] - 1
+        base = self._offset[section]
+        slot = crc & mask
+        while True:
+            stored, position = BUCKET.unpack_from(self._mm, base + BUCKET.size * slot)
+            if position == NONE:
+                return None
+            if stored == crc and self._bytes(key_at(position)) == key:
+                return position
+            slot = (slot + 1) & mask
+
+    def find(self, ws_id):
+        """Return the position of workspace ws_id ("owner/repo/Workspace"), or None."""
+        return self._probe('id_hash', ws_id, lambda position: self._workspace_row(position)[0])
+
+    def record(self, position):
+        """
+        Return a workspace's indexed fields without parsing its workspace.json.
+
+        Returns:
+            dict: id, repo, name, friendly_name, description, image_src, docker_registry,
+            categories, architecture and compatibility ([{version, image, uncompressed_size_mb}])
+        """
+        row = self._workspace_row(position)
+        compat = []
+        for index in range(row[8], row[8] + row[9]):
+            version, image, size = COMPAT.unpack_from(self._mm, self._offset['compat'] + COMPAT.size * index)
+            compat.append({'version': self.string(version), 'image': self.string(image),
+                           'uncompressed_size_mb': None if size == NONE else size})
+        return {
+            'id': self.string(row[0]),
+            'repo': self.string(self._repo_row(row[1])[0]),
+            'name': self.string(row[2]),
+            'friendly_name': self.string(row[3]),
+            'description': self.string(row[4]),
+            'image_src': self.string(row[5]),
+            'docker_registry': self.string(row[6]),
+            'categories': self._strings(row[10], row[11]),
+            'architecture': self._strings(row[12], row[13]),
+            'compatibility': compat
+        }
+
+    def workspace_json(self, position):
+        """Return a workspace's workspace.json as published in community_workspaces.json."""
+        row = self._workspace_row(position)
+        if row[7] == NONE:
+            return None
+        start, end = struct.unpack_from('<II', self._mm, self._offset['document_offsets'] + 4 * row[7])
+        base = self._offset['document_data']
+        workspace = json.loads(self._inflater.copy().decompress(self._mm[base + start:base + end]))
+        for bit, field in enumerate(LIFTED[:4]):
+            if row[14] & (1 << bit):
+                workspace[field] = self.string(row[3 + bit])
+        for bit, field in enumerate(LIFTED[4:], 4):
+            if row[14] & (1 << bit):
+                workspace[field] = self._strings(row[2 * bit + 2], row[2 * bit + 3])
+        return workspace
+
+    def get(self, ws_id):
+        """Return workspace ws_id's workspace.json, or None if it is not in the catalog."""
+        position = self.find(ws_id)
+        return None if position is None else self.workspace_json(position)
+
+    def repo(self, name):
+        """
+        Look up a repo by full name.
+
+        Returns:
+            dict: github_pages, stars, last_commit and workspace_positions, or None
+        """
+        position = self._probe('repo_hash', name, lambda position: self._repo_row(position)[0])
+        if position is None:
+            return None
+        _, github_pages, stars, last_commit, first, count = self._repo_row(position)
+        return {'github_pages': self.string(github_pages), 'stars': None if stars == NONE else stars,
+                'last_commit': self.string(last_commit), 'workspace_positions': range(first, first + count)}
+
+    def by_category(self, category):
+        """Return the positions of the workspaces in category (case-insensitive), in catalog order, as an array."""
+        key = category.lower()
+        low, high = 0, self._count['categories']
+        while low < high:
+            middle = (low + high) // 2
+            name, _, _ = CATEGORY.unpack_from(self._mm, self._offset['categories'] + CATEGORY.size * middle)
+            if self.string(name) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low == self._count['categories']:
+            return []
+        name, first, count = CATEGORY.unpack_from(self._mm, self._offset['categories'] + CATEGORY.size * low)
+        if self.string(name) != key:
+            return []
+        base = self._offset['postings'] + 4 * first
+        positions = array('I', self._mm[base:base + 4 * count])
+        if sys.byteorder == 'big':
+            positions.byteswap()
+        return positions
+
+    def categories(self):
+        """Return {lowercase category: workspace count}."""
+        result = {}
+        for index in range(self._count['categories']):
+            name, _, count = CATEGORY.unpack_from(self._mm, self._offset['categories'] + CATEGORY.size * index)
+            result[self.string(name)] = count
+        return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Look up workspaces in a binary catalog")
+    parser.add_argument('path', help="community_workspaces.bin")
+    parser.add_argument('ids', nargs='*', help="Workspace ids (owner/repo/Workspace) to print")
+    parser.add_argument('--category', help="List the ids of the workspaces in a category")
+    args = parser.parse_args()
+
+    with BinaryCatalog(args.path) as catalog:
+        if not args.ids and not args.category:
+            print(f"{len(catalog)} workspaces; categories: {catalog.categories()}")
+        for ws_id in args.ids:
+            workspace = catalog.get(ws_id)
+            if workspace is None:
+                print(f"{ws_id}: not found", file=sys.stderr)
+                continue
+            print(json.dumps(workspace, indent=4))
+        if args.category:
+            for position in catalog.by_category(args.category):
+                print(catalog.record(position)['id'])
+
+
+if __name__ == '__main__':
+    main()
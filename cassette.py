@@ -0,0 +1,171 @@
+"""
+Record/replay cassettes for offline crawls.
+
+In record mode every GitHub API response made through make_request and
+every image probe result from skopeo_inspect is captured, with the time
+it took, into a gzip-compressed JSON-lines cassette. In replay mode the
+same calls are answered from the cassette, either with the originally
+observed latency or with none, so a real nightly crawl can be profiled,
+debugged and compared against optimized code without network access.
+"""
+
+import base64
+import gzip
+import json
+import time
+from collections import deque
+from urllib.parse import urlencode
+
+from requests.structures import CaseInsensitiveDict
+
+from atomic_output import atomic_open
+
+
+CASSETTE_FORMAT_VERSION = 1
+LATENCY_MODES = ('zero', 'original')
+
+# Response headers worth keeping for replay (rate limits, caching)
+RECORDED_HEADERS = (
+    'content-length', 'content-type', 'etag', 'last-modified', 'link',
+    'x-ratelimit-limit', 'x-ratelimit-remaining', 'x-ratelimit-reset',
+    'x-ratelimit-used', 'x-ratelimit-resource'
+)
+
+
+class CassetteMiss(KeyError):
+    """Raised in replay mode when a call was never recorded."""
+
+
+class CassetteResponse:
+    """The subset of requests.Response used by the crawler, rebuilt from a cassette."""
+
+    def __init__(self, url, status_code, headers, content):
+        self.url = url
+        self.status_code = status_code
+        self.headers = CaseInsensitiveDict(headers)
+        self.content = content
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8', errors='replace')
+
+    def json(self):
+        return json.loads(self.content)
+
+
+def request_key(url, params=None):
+    """Return the lookup key for a GET request."""
+    if not params:
+        return url
+    return f"{url}?{urlencode(sorted(params.items()))}"
+
+
+class Cassette:
+    """
+    A recording of one crawl's GitHub responses and image probe results.
+
+    Args:
+        path: Cassette file path (gzip-compressed JSON lines)
+        mode: 'record' or 'replay'
+        latency: In replay mode, 'zero' answers immediately and 'original'
+                 sleeps for the recorded duration of each call
+    """
+
+    def __init__(self, path, mode, latency='zero'):
+        if mode not in ('record', 'replay'):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        if latency not in LATENCY_MODES:
+            raise ValueError(f"Unknown replay latency: {latency}")
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self.entries = []
+        self._http = {}
+        self._probes = {}
+        if mode == 'replay':
+            self._load()
+
+    @property
+    def recording(self):
+        return self.mode == 'record'
+
+    @property
+    def replaying(self):
+        return self.mode == 'replay'
+
+    def _load(self):
+        with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+            header = json.loads(f.readline())
+            if header.get('format_version') != CASSETTE_FORMAT_VERSION:
+                raise ValueError(f"Unsupported cassette format: {header.get('format_version')}")
+            for line in f:
+                entry = json.loads(line)
+                index = self._http if entry['type'] == 'http' else self._probes
+                index.setdefault(entry['key'], deque()).append(entry)
+
+    @staticmethod
+    def _next(index, key):
+        entries = index.get(key)
+        if not entries:
+            raise CassetteMiss(key)
+        # Repeated identical calls replay in recorded order; the last
+        # recording answers any calls beyond that
+        return entries.popleft() if len(entries) > 1 else entries[0]
+
+    def _wait(self, entry):
+        if self.latency == 'original':
+            time.sleep(entry.get('elapsed', 0))
+
+    def record_http(self, url, params, response, elapsed):
+        headers = {
+            name: response.headers[name] for name in RECORDED_HEADERS if name in response.headers
+        }
+        self.entries.append({
+            'type': 'http',
+            'key': request_key(url, params),
+            'status': response.status_code,
+            'headers': headers,
+            'body': base64.b64encode(response.content).decode('ascii'),
+            'elapsed': round(elapsed, 4)
+        })
+
+    def replay_http(self, url, params=None):
+        entry = self._next(self._http, request_key(url, params))
+        self._wait(entry)
+        return CassetteResponse(url, entry['status'], dict(entry['headers']),
+                                base64.b64decode(entry['body']))
+
+    def record_probe(self, key, result, elapsed, stats=None):
+        """
+        Record an image probe result.
+
+        Args:
+            key: The skopeo_inspect cache key
+            result: JSON-serializable probe result
+            elapsed: Seconds the probe took
+            stats: Optional STATS counter increments caused by the probe
+        """
+        self.entries.append({
+            'type': 'probe',
+            'key': key,
+            'result': result,
+            'stats': stats or {},
+            'elapsed': round(elapsed, 4)
+        })
+
+    def replay_probe(self, key):
+        """Return (result, stats) for a recorded image probe."""
+        entry = self._next(self._probes, key)
+        self._wait(entry)
+        return entry['result'], entry.get('stats', {})
+
+    def save(self):
+        """Write the recording to disk (no-op in replay mode)."""
+        if not self.recording:
+            return
+        with atomic_open(self.path, 'wb') as raw, gzip.open(raw, 'wt', encoding='utf-8') as f:
+            f.write(json.dumps({'format_version': CASSETTE_FORMAT_VERSION,
+                                'created': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())}) + '\n')
+            for entry in self.entries:
+                f.write(json.dumps(entry) + '\n')
+        print(f"Cassette with {len(self.entries)} entries saved to {self.path}")
@@ -0,0 +1,189 @@
+"""
+Structural diff between two community_workspaces.json catalogs.
+
+The diff is computed in one pass over each catalog using per-workspace
+content hashes, and is written as a small changes.json delta that
+consumers can apply to the previous catalog instead of refetching the
+whole file:
+
+    new_catalog = apply_diff(old_catalog, changes)
+"""
+
+from catalog_utils import content_hash, iter_compatibility, workspace_id
+
+
+DIFF_FORMAT_VERSION = 1
+REPO_FIELDS = ('github_pages', 'stars', 'last_commit')
+
+
+def _index_catalog(catalog):
+    """Return {workspace_id: (repo, ws_name, hash, ws_data)} in one pass."""
+    index = {}
+    for repo, repo_entry in catalog.items():
+        for workspace in repo_entry.get('workspaces', []):
+            for ws_name, ws_data in workspace.items():
+                index[workspace_id(repo, ws_name)] = (repo, ws_name, content_hash(ws_data), ws_data)
+    return index
+
+
+def _repo_summary(repo_entry):
+    summary = {field: repo_entry.get(field) for field in REPO_FIELDS}
+    summary['workspaces'] = [
+        ws_name for workspace in repo_entry.get('workspaces', []) for ws_name in workspace
+    ]
+    return summary
+
+
+def _compat_keys(ws_data):
+    return {(version, image) for version, image, _ in iter_compatibility(ws_data)}
+
+
+def compute_diff(old_catalog, new_catalog, unpullable_entries=None):
+    """
+    Compute the structural diff from old_catalog to new_catalog.
+
+    A compatibility entry that is no longer published is "unpullable" only
+    if the crawler still found it upstream and dropped it because its image
+    did not pull; every other dropped entry is reported as removed.
+
+    Args:
+        old_catalog: Previous community_workspaces.json content (dict)
+        new_catalog: Current community_workspaces.json content (dict)
+        unpullable_entries: {workspace_id: [(version, image)]} of entries the
+            crawler dropped this run because their image was not pullable
+
+    Returns:
+        dict: changes.json content with added/removed/modified repos and
+        workspaces, compatibility entries that became unpullable or were
+        removed, and enough ordering information for apply_diff to rebuild
+        new_catalog
+    """
+    old_index = _index_catalog(old_catalog)
+    new_index = _index_catalog(new_catalog)
+    unpullable_entries = unpullable_entries or {}
+
+    added_workspaces = {}
+    modified_workspaces = {}
+    unpullable = []
+    removed_compatibility = []
+
+    def classify_dropped(ws_id, entries, report_removed=True):
+        not_pullable = {tuple(entry) for entry in unpullable_entries.get(ws_id, ())}
+        for version, image in entries:
+            entry = {'workspace': ws_id, 'version': version, 'image': image}
+            if (version, image) in not_pullable:
+                unpullable.append(entry)
+            elif report_removed:
+                removed_compatibility.append(entry)
+
+    for ws_id, (repo, ws_name, new_hash, ws_data) in new_index.items():
+        old = old_index.get(ws_id)
+        if old is None:
+            added_workspaces[ws_id] = ws_data
+        elif old[2] != new_hash:
+            modified_workspaces[ws_id] = ws_data
+            classify_dropped(ws_id, sorted(_compat_keys(old[3]) - _compat_keys(ws_data), key=str))
+
+    removed_workspaces = []
+    for ws_id, (repo, ws_name, _, ws_data) in old_index.items():
+        if ws_id in new_index:
+            continue
+        removed_workspaces.append(ws_id)
+        # The entries of a workspace whose whole repo vanished are covered by
+        # the removed repo, unless they vanished because none of them pulled
+        classify_dropped(ws_id, [(version, image) for version, image, _ in iter_compatibility(ws_data)],
+                         report_removed=repo in new_catalog)
+
+    added_repos = {}
+    modified_repos = {}
+    for repo, repo_entry in new_catalog.items():
+        summary = _repo_summary(repo_entry)
+        if repo not in old_catalog:
+            added_repos[repo] = summary
+        elif summary != _repo_summary(old_catalog[repo]):
+            modified_repos[repo] = summary
+    removed_repos = [repo for repo in old_catalog if repo not in new_catalog]
+
+    return {
+        'format_version': DIFF_FORMAT_VERSION,
+        'from_hash': content_hash(old_catalog),
+        'to_hash': content_hash(new_catalog),
+        'repo_order': list(new_catalog.keys()),
+        'repos': {
+            'added': added_repos,
+            'removed': removed_repos,
+            'modified': modified_repos
+        },
+        'workspaces': {
+            'added': added_workspaces,
+            'removed': removed_workspaces,
+            'modified': modified_workspaces
+        },
+        'unpullable_compatibility': unpullable,
+        'removed_compatibility': removed_compatibility,
+        'summary': {
+            'repos_added': len(added_repos),
+            'repos_removed': len(removed_repos),
+            'repos_modified': len(modified_repos),
+            'workspaces_added': len(added_workspaces),
+            'workspaces_removed': len(removed_workspaces),
+            'workspaces_modified': len(modified_workspaces),
+            'compatibility_entries_unpullable': len(unpullable),
+            'compatibility_entries_removed': len(removed_compatibility)
+        }
+    }
+
+
+def has_changes(diff):
+    """Return True if the diff changes the catalog at all."""
+    return diff['from_hash'] != diff['to_hash']
+
+
+def apply_diff(old_catalog, diff):
+    """
+    Apply a changes.json delta to the previous catalog.
+
+    Args:
+        old_catalog: The catalog the diff was computed against
+        diff: The changes.json content
+
+    Returns:
+        dict: The new catalog
+
+    Raises:
+        ValueError: If old_catalog is not the catalog the diff was computed from
+    """
+    if content_hash(old_catalog) != diff['from_hash']:
+        raise ValueError("changes.json does not apply to this catalog (from_hash mismatch)")
+
+    old_index = _index_catalog(old_catalog)
+    changed_workspaces = dict(diff['workspaces']['added'])
+    changed_workspaces.update(diff['workspaces']['modified'])
+    changed_repos = dict(diff['repos']['added'])
+    changed_repos.update(diff['repos']['modified'])
+
+    new_catalog = {}
+    for repo in diff['repo_order']:
+        summary = changed_repos.get(repo)
+        if summary is None:
+            new_catalog[repo] = old_catalog[repo]
+            if any(workspace_id(repo, ws_name) in changed_workspaces
+                   for workspace in old_catalog[repo].get('workspaces', []) for ws_name in workspace):
+                summary = _repo_summary(old_catalog[repo])
+            else:
+                continue
+
+        workspaces = []
+        for ws_name in summary['workspaces']:
+            ws_id = workspace_id(repo, ws_name)
+            ws_data = changed_workspaces.get(ws_id)
+            if ws_data is None:
+                ws_data = old_index[ws_id][3]
+            workspaces.append({ws_name: ws_data})
+        entry = {field: summary[field] for field in REPO_FIELDS}
+        entry['workspaces'] = workspaces
+        new_catalog[repo] = entry
+
+    if content_hash(new_catalog) != diff['to_hash']:
+        raise ValueError("Applying changes.json did not reproduce the expected catalog (to_hash mismatch)")
+    return new_catalog
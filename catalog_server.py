@@ -0,0 +1,297 @@
+"""
+Read-only HTTP query API over generated/community_workspaces.json.
+
+The catalog is loaded once into in-memory indexes (category, compatibility
+version, architecture and free-text tokens). Queries are filtered and
+paginated against those indexes, responses carry an ETag derived from the
+catalog content hash, and the file is reloaded when its mtime or size
+changes and the content hash differs.
+
+Endpoints:
+    GET /workspaces?category=&version=&arch=&q=&page=&per_page=
+    GET /workspace?id=owner/repo/Workspace
+    GET /categories
+    GET /health
+
+Usage:
+    python catalog_server.py --file generated/community_workspaces.json --port 8080
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from catalog_utils import iter_compatibility, iter_workspaces, workspace_id
+
+
+DEFAULT_PER_PAGE = 20
+MAX_PER_PAGE = 100
+RELOAD_CHECK_INTERVAL = 1.0
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    """Split text into lowercase alphanumeric search tokens."""
+    if not text or not isinstance(text, str):
+        return []
+    return TOKEN_RE.findall(text.lower())
+
+
+class CatalogSnapshot:
+    """Immutable, fully indexed view of one version of the catalog file."""
+
+    def __init__(self, catalog, digest):
+        self.digest = digest
+        self.records = []
+        self.by_id = {}
+        self.by_category = {}
+        self.by_version = {}
+        self.by_arch = {}
+        self.by_token = {}
+
+        for position, (repo, repo_entry, ws_name, ws_data) in enumerate(iter_workspaces(catalog)):
+            ws_id = workspace_id(repo, ws_name)
+            self.records.append({
+                'id': ws_id,
+                'repo': repo,
+                'name': ws_name,
+                'github_pages': repo_entry.get('github_pages'),
+                'stars': repo_entry.get('stars', 0),
+                'last_commit': repo_entry.get('last_commit'),
+                'workspace': ws_data
+            })
+            self.by_id[ws_id] = position
+
+            categories = ws_data.get('categories', [])
+            if isinstance(categories, list):
+                for category in categories:
+                    self._add(self.by_category, str(category).lower(), position)
+
+            for version, _, _ in iter_compatibility(ws_data):
+                if version:
+                    self._add(self.by_version, str(version), position)
+
+            architectures = ws_data.get('architecture', [])
+            if isinstance(architectures, list):
+                for arch in architectures:
+                    self._add(self.by_arch, str(arch).lower(), position)
+
+            text = ' '.join(
+                value for value in (
+                    repo, ws_name, ws_data.get('friendly_name'), ws_data.get('description')
+                ) if isinstance(value, str)
+            )
+            for token in set(tokenize(text)):
+                self._add(self.by_token, token, position)
+
+        self.category_counts = {
+            category: len(positions) for category, positions in sorted(self.by_category.items())
+        }
+
+    @staticmethod
+    def _add(index, key, position):
+        positions = index.get(key)
+        if positions is None:
+            index[key] = [position]
+        elif positions[-1] != position:
+            positions.append(position)
+
+    def query(self, category=None, version=None, arch=None, text=None):
+        """
+        Return matching record positions in catalog order.
+
+        Every filter is an index lookup; the candidate lists are intersected
+        starting from the smallest one.
+        """
+        candidates = []
+        if category:
+            candidates.append(self.by_category.get(category.lower(), []))
+        if version:
+            candidates.append(self.by_version.get(version, []))
+        if arch:
+            candidates.append(self.by_arch.get(arch.lower(), []))
+        for token in set(tokenize(text)):
+            candidates.append(self.by_token.get(token, []))
+
+        if not candidates:
+            return range(len(self.records))
+
+        candidates.sort(key=len)
+        if len(candidates) == 1:
+            return candidates[0]
+        result = set(candidates[0])
+        for positions in candidates[1:]:
+            result.intersection_update(positions)
+            if not result:
+                return []
+        return sorted(result)
+
+
+class CatalogIndex:
+    """Loads the catalog file and swaps in a new snapshot when it changes."""
+
+    def __init__(self, path, reload_interval=RELOAD_CHECK_INTERVAL):
+        self.path = path
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._last_check = 0.0
+        self._stat_key = None
+        self.snapshot = None
+        self.reloads = 0
+        self.load()
+
+    def load(self):
+        """Read the file and rebuild the snapshot if the content hash changed."""
+        stat = os.stat(self.path)
+        with open(self.path, 'rb') as f:
+            raw = f.read()
+        digest = hashlib.sha256(raw).hexdigest()
+        stat_key = (stat.st_mtime_ns, stat.st_size)
+        if self.snapshot is not None and self.snapshot.digest == digest:
+            self._stat_key = stat_key
+            return False
+        snapshot = CatalogSnapshot(json.loads(raw), digest)
+        # Only remember the file once it parsed, so a corrupt or half-written one is retried
+        self.snapshot, self._stat_key = snapshot, stat_key
+        self.reloads += 1
+        print(f"Loaded {len(self.snapshot.records)} workspaces from {self.path} ({digest[:12]})")
+        return True
+
+    def current(self):
+        """Return the current snapshot, reloading first if the file changed."""
+        now = time.monotonic()
+        if now - self._last_check >= self.reload_interval and self._lock.acquire(blocking=False):
+            try:
+                self._last_check = now
+                stat = os.stat(self.path)
+                if (stat.st_mtime_ns, stat.st_size) != self._stat_key:
+                    self.load()
+            except (OSError, ValueError) as e:
+                # Keep serving the previous snapshot if the file is missing or mid-write
+                print(f"Catalog reload failed, serving previous version: {e}")
+            finally:
+                self._lock.release()
+        return self.snapshot
+
+
+def _first(params, name, default=None):
+    values = params.get(name)
+    return values[0] if values else default
+
+
+def _int_param(params, name, default, minimum, maximum):
+    try:
+        value = int(_first(params, name, default))
+    except (TypeError, ValueError):
+        value = default
+    return max(minimum, min(value, maximum))
+
+
+def make_handler(index):
+    """Build a request handler class bound to a CatalogIndex."""
+
+    class CatalogRequestHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        server_version = 'KasmCatalog/1.0'
+        disable_nagle_algorithm = True
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            parsed = urlparse(self.path)
+            params = parse_qs(parsed.query)
+            snapshot = index.current()
+
+            if parsed.path == '/health':
+                return self._send_json(200, {'status': 'ok', 'workspaces': len(snapshot.records)})
+            if parsed.path == '/categories':
+                return self._send_cached(snapshot, parsed.query, lambda: snapshot.category_counts)
+            if parsed.path == '/workspace':
+                position = snapshot.by_id.get(_first(params, 'id', ''))
+                if position is None:
+                    return self._send_json(404, {'error': 'workspace not found'})
+                return self._send_cached(snapshot, parsed.query, lambda: snapshot.records[position])
+            if parsed.path == '/workspaces':
+                return self._send_cached(snapshot, parsed.query, lambda: self._page(snapshot, params))
+            return self._send_json(404, {'error': 'not found'})
+
+        def _page(self, snapshot, params):
+            page = _int_param(params, 'page', 1, 1, 10 ** 9)
+            per_page = _int_param(params, 'per_page', DEFAULT_PER_PAGE, 1, MAX_PER_PAGE)
+            positions = snapshot.query(
+                category=_first(params, 'category'),
+                version=_first(params, 'version'),
+                arch=_first(params, 'arch'),
+                text=_first(params, 'q')
+            )
+            start = (page - 1) * per_page
+            return {
+                'total': len(positions),
+                'page': page,
+                'per_page': per_page,
+                'items': [snapshot.records[p] for p in positions[start:start + per_page]]
+            }
+
+        def _send_cached(self, snapshot, query, build):
+            query_hash = hashlib.sha1(f"{self.path.split('?')[0]}?{query}".encode('utf-8')).hexdigest()
+            etag = f'"{snapshot.digest[:16]}-{query_hash[:16]}"'
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self._send_json(200, build(), etag=etag)
+
+        def _send_json(self, status, payload, etag=None):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            if etag:
+                self.send_header('ETag', etag)
+                self.send_header('Cache-Control', 'no-cache')
+            self.end_headers()
+            self.wfile.write(body)
+
+    return CatalogRequestHandler
+
+
+def make_server(path, host='127.0.0.1', port=8080, reload_interval=RELOAD_CHECK_INTERVAL):
+    """Create (but do not start) a ThreadingHTTPServer serving the catalog at path."""
+    index = CatalogIndex(path, reload_interval=reload_interval)
+    server = ThreadingHTTPServer((host, port), make_handler(index))
+    server.daemon_threads = True
+    server.catalog_index = index
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve read-only queries over the generated catalog")
+    parser.add_argument('--file', default='generated/community_workspaces.json')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--reload-interval', type=float, default=RELOAD_CHECK_INTERVAL,
+                        help="Seconds between checks for a changed catalog file")
+    args = parser.parse_args()
+
+    server = make_server(args.file, args.host, args.port, args.reload_interval)
+    print(f"Serving catalog on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,375 @@
+"""
+Optional SQLite store for the crawled catalog.
+
+The crawler upserts every parsed repo into the store as it goes, and the
+store can export community_workspaces.json in a single streaming pass.
+Having the catalog in SQLite lets us answer ad-hoc questions with indexed
+queries instead of loading the whole JSON file, e.g.:
+
+    python catalog_store.py generated/catalog.db --image martynvandijke/kasm-cura:latest
+    python catalog_store.py generated/catalog.db --stale-days 90
+"""
+
+import argparse
+import json
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+from atomic_output import atomic_open
+from catalog_utils import content_hash, iter_compatibility
+from compact_records import to_builtin
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS repos (
+    full_name TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    github_pages TEXT,
+    stars INTEGER,
+    last_commit TEXT,
+    content_hash TEXT NOT NULL,
+    first_seen TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    run_id INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS workspaces (
+    id INTEGER PRIMARY KEY,
+    repo TEXT NOT NULL REFERENCES repos(full_name) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    friendly_name TEXT,
+    docker_registry TEXT,
+    data TEXT NOT NULL,
+    UNIQUE (repo, name)
+);
+CREATE TABLE IF NOT EXISTS workspace_categories (
+    workspace_id INTEGER NOT NULL REFERENCES workspaces(id) ON DELETE CASCADE,
+    category TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS compatibility (
+    workspace_id INTEGER NOT NULL REFERENCES workspaces(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    version TEXT,
+    image TEXT,
+    uncompressed_size_mb INTEGER
+);
+CREATE TABLE IF NOT EXISTS images (
+    name TEXT PRIMARY KEY,
+    registry TEXT,
+    digest TEXT
+);
+CREATE TABLE IF NOT EXISTS probe_results (
+    image_key TEXT PRIMARY KEY,
+    pullable INTEGER NOT NULL,
+    checked_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_repos_position ON repos(position);
+CREATE INDEX IF NOT EXISTS idx_repos_last_commit ON repos(last_commit);
+CREATE INDEX IF NOT EXISTS idx_workspaces_repo ON workspaces(repo, position);
+CREATE INDEX IF NOT EXISTS idx_categories_category ON workspace_categories(category COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_categories_workspace ON workspace_categories(workspace_id);
+CREATE INDEX IF NOT EXISTS idx_compatibility_version ON compatibility(version);
+CREATE INDEX IF NOT EXISTS idx_compatibility_image ON compatibility(image);
+CREATE INDEX IF NOT EXISTS idx_compatibility_workspace ON compatibility(workspace_id, position);
+CREATE INDEX IF NOT EXISTS idx_images_registry ON images(registry);
+CREATE INDEX IF NOT EXISTS idx_images_digest ON images(digest);
+"""
+
+DOCKER_HUB_REGISTRY = 'docker.io'
+
+
+def _utc_now():
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def image_registry(image, docker_registry=None):
+    """
+    Work out which registry hosts an image.
+
+    An explicit host in the image reference (first path component containing
+    '.' or ':' or equal to 'localhost') wins over the workspace docker_registry.
+    """
+    if not image:
+        return None
+    first, _, rest = image.partition('/')
+    if rest and ('.' in first or ':' in first or first == 'localhost'):
+        return first
+    if docker_registry:
+        registry = docker_registry.replace('https://', '').replace('http://', '').strip('/')
+        return registry.split('/')[0] or DOCKER_HUB_REGISTRY
+    return DOCKER_HUB_REGISTRY
+
+
+class CatalogStore:
+    """SQLite-backed catalog with incremental upserts and streaming export."""
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('PRAGMA foreign_keys = ON')
+        self.conn.execute('PRAGMA journal_mode = WAL')
+        self.conn.executescript(SCHEMA)
+        self.run_id = self._next_run_id()
+
+    def _next_run_id(self):
+        row = self.conn.execute('SELECT MAX(run_id) FROM repos').fetchone()
+        return (row[0] or 0) + 1
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+    def upsert_repo(self, full_name, repo_entry, position):
+        """
+        Insert or update a repo and its workspaces.
+
+        Workspaces are only rewritten when the repo content hash changed, so
+        an unchanged repo costs a single row update.
+
+        Args:
+            full_name: Repo full name (owner/repo)
+            repo_entry: The repo entry as written to community_workspaces.json
+            position: Search result order, used to keep export order stable
+
+        Returns:
+            bool: True if the repo content changed, False otherwise
+        """
+        now = _utc_now()
+        digest = content_hash(repo_entry)
+        row = self.conn.execute(
+            'SELECT content_hash FROM repos WHERE full_name = ?', (full_name,)
+        ).fetchone()
+
+        with self.conn:
+            if row and row[0] == digest:
+                self.conn.execute(
+                    'UPDATE repos SET position = ?, run_id = ? WHERE full_name = ?',
+                    (position, self.run_id, full_name)
+                )
+                return False
+
+            if row:
+                self.conn.execute(
+                    'UPDATE repos SET position = ?, github_pages = ?, stars = ?, last_commit = ?, '
+                    'content_hash = ?, updated_at = ?, run_id = ? WHERE full_name = ?',
+                    (position, repo_entry.get('github_pages'), repo_entry.get('stars'),
+                     repo_entry.get('last_commit'), digest, now, self.run_id, full_name)
+                )
+                self.conn.execute('DELETE FROM workspaces WHERE repo = ?', (full_name,))
+            else:
+                self.conn.execute(
+                    'INSERT INTO repos (full_name, position, github_pages, stars, last_commit, '
+                    'content_hash, first_seen, updated_at, run_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    (full_name, position, repo_entry.get('github_pages'), repo_entry.get('stars'),
+                     repo_entry.get('last_commit'), digest, now, now, self.run_id)
+                )
+
+            for ws_position, workspace in enumerate(repo_entry.get('workspaces', [])):
+                for ws_name, ws_data in workspace.items():
+                    self._insert_workspace(full_name, ws_position, ws_name, ws_data)
+        return True
+
+    def _insert_workspace(self, repo, position, ws_name, ws_data):
+        docker_registry = ws_data.get('docker_registry')
+        cursor = self.conn.execute(
+            'INSERT INTO workspaces (repo, position, name, friendly_name, docker_registry, data) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            (repo, position, ws_name, ws_data.get('friendly_name'), docker_registry,
+             json.dumps(ws_data, default=to_builtin))
+        )
+        ws_id = cursor.lastrowid
+
+        categories = ws_data.get('categories', [])
+        if isinstance(categories, list):
+            self.conn.executemany(
+                'INSERT INTO workspace_categories (workspace_id, category) VALUES (?, ?)',
+                [(ws_id, str(category)) for category in categories]
+            )
+
+        for compat_position, (version, image, size) in enumerate(iter_compatibility(ws_data)):
+            self.conn.execute(
+                'INSERT INTO compatibility (workspace_id, position, version, image, uncompressed_size_mb) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (ws_id, compat_position, version, image, size if isinstance(size, int) else None)
+            )
+            if image:
+                self.conn.execute(
+                    'INSERT INTO images (name, registry) VALUES (?, ?) '
+                    'ON CONFLICT(name) DO UPDATE SET registry = excluded.registry',
+                    (image, image_registry(image, docker_registry))
+                )
+
+    def record_probe_results(self, results):
+        """
+        Upsert image probe results.
+
+        Args:
+            results: dict of image cache key -> bool pullable (INSPECTED_IMAGES)
+        """
+        now = _utc_now()
+        with self.conn:
+            self.conn.executemany(
+                'INSERT INTO probe_results (image_key, pullable, checked_at) VALUES (?, ?, ?) '
+                'ON CONFLICT(image_key) DO UPDATE SET pullable = excluded.pullable, '
+                'checked_at = excluded.checked_at',
+                [(key, int(bool(pullable)), now) for key, pullable in results.items()]
+            )
+
+    def load_probe_results(self):
+        """Return {image cache key: bool pullable} recorded by earlier runs."""
+        rows = self.conn.execute('SELECT image_key, pullable FROM probe_results')
+        return {key: bool(pullable) for key, pullable in rows}
+
+    def set_image_digests(self, digests):
+        """
+        Record the manifest digest images resolved to when they were probed.
+
+        Args:
+            digests: dict of image name (as in compatibility entries) -> "sha256:..."
+        """
+        with self.conn:
+            self.conn.executemany('UPDATE images SET digest = ? WHERE name = ?',
+                                  [(digest, image) for image, digest in digests.items()])
+
+    def prune_missing_repos(self):
+        """
+        Delete repos that were not upserted during the current run.
+
+        Their workspaces and compatibility entries go with them; images no
+        remaining compatibility entry references are deleted too.
+
+        Returns:
+            int: Number of repos deleted
+        """
+        with self.conn:
+            cursor = self.conn.execute('DELETE FROM repos WHERE run_id != ?', (self.run_id,))
+            self.conn.execute(
+                'DELETE FROM images WHERE name NOT IN '
+                '(SELECT image FROM compatibility WHERE image IS NOT NULL)'
+            )
+        return cursor.rowcount
+
+    def iter_repo_entries(self):
+        """Yield (full_name, repo_entry) in search order, one repo at a time."""
+        repos = self.conn.execute(
+            'SELECT full_name, github_pages, stars, last_commit FROM repos ORDER BY position, full_name'
+        )
+        for full_name, github_pages, stars, last_commit in repos:
+            workspaces = [
+                {name: json.loads(data)}
+                for name, data in self.conn.execute(
+                    'SELECT name, data FROM workspaces WHERE repo = ? ORDER BY position',
+                    (full_name,)
+                )
+            ]
+            yield full_name, {
+                'github_pages': github_pages,
+                'stars': stars,
+                'last_commit': last_commit,
+                'workspaces': workspaces
+            }
+
+    def export_json(self, filename):
+        """
+        Stream the catalog to filename in the same layout as json.dump(..., indent=4).
+
+        Only one repo is held in memory at a time.
+        """
+        with atomic_open(filename) as f:
+            f.write('{')
+            first = True
+            for full_name, repo_entry in self.iter_repo_entries():
+                f.write('\n    ' if first else ',\n    ')
+                first = False
+                f.write(json.dumps(full_name))
+                f.write(': ')
+                f.write(json.dumps(repo_entry, indent=4).replace('\n', '\n    '))
+            f.write('}' if first else '\n}')
+        print(f"Catalog exported to {filename}")
+
+    def workspaces_using_image(self, image):
+        """Return [(repo, workspace_name, version)] for workspaces referencing image."""
+        return self.conn.execute(
+            'SELECT w.repo, w.name, c.version FROM compatibility c '
+            'JOIN workspaces w ON w.id = c.workspace_id WHERE c.image = ? '
+            'ORDER BY w.repo, w.position, c.position',
+            (image,)
+        ).fetchall()
+
+    def workspaces_in_category(self, category):
+        """Return [(repo, workspace_name)] for a category (case-insensitive)."""
+        return self.conn.execute(
+            'SELECT w.repo, w.name FROM workspace_categories wc '
+            'JOIN workspaces w ON w.id = wc.workspace_id '
+            'WHERE wc.category = ? COLLATE NOCASE ORDER BY w.repo, w.position',
+            (category,)
+        ).fetchall()
+
+    def workspaces_for_version(self, version):
+        """Return [(repo, workspace_name, image)] compatible with a Kasm version."""
+        return self.conn.execute(
+            'SELECT w.repo, w.name, c.image FROM compatibility c '
+            'JOIN workspaces w ON w.id = c.workspace_id WHERE c.version = ? '
+            'ORDER BY w.repo, w.position, c.position',
+            (version,)
+        ).fetchall()
+
+    def images_in_registry(self, registry):
+        return [row[0] for row in self.conn.execute(
+            'SELECT name FROM images WHERE registry = ? ORDER BY name', (registry,)
+        )]
+
+    def images_with_digest(self, digest):
+        """Return the image names that resolved to a manifest digest, e.g. one image under several tags."""
+        return [row[0] for row in self.conn.execute(
+            'SELECT name FROM images WHERE digest = ? ORDER BY name', (digest,)
+        )]
+
+    def repos_unchanged_since(self, days, now=None):
+        """Return [(repo, last_commit)] for repos with no push in the last `days` days."""
+        now = now or datetime.now(timezone.utc)
+        cutoff = (now - timedelta(days=days)).strftime('%Y-%m-%dT%H:%M:%SZ')
+        return self.conn.execute(
+            "SELECT full_name, last_commit FROM repos WHERE last_commit < ? "
+            "AND last_commit != 'Unknown' ORDER BY last_commit",
+            (cutoff,)
+        ).fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the SQLite catalog store")
+    parser.add_argument('db', help="Path to the catalog database")
+    parser.add_argument('--image', help="List workspaces using this image")
+    parser.add_argument('--category', help="List workspaces in this category")
+    parser.add_argument('--version', help="List workspaces compatible with this Kasm version")
+    parser.add_argument('--registry', help="List images hosted on this registry")
+    parser.add_argument('--digest', help="List images whose manifest has this digest")
+    parser.add_argument('--stale-days', type=int, help="List repos unchanged for this many days")
+    args = parser.parse_args()
+
+    store = CatalogStore(args.db)
+    try:
+        if args.image:
+            for row in store.workspaces_using_image(args.image):
+                print(*row, sep='\t')
+        if args.category:
+            for row in store.workspaces_in_category(args.category):
+                print(*row, sep='\t')
+        if args.version:
+            for row in store.workspaces_for_version(args.version):
+                print(*row, sep='\t')
+        if args.registry:
+            for name in store.images_in_registry(args.registry):
+                print(name)
+        if args.digest:
+            for name in store.images_with_digest(args.digest):
+                print(name)
+        if args.stale_days is not None:
+            for row in store.repos_unchanged_since(args.stale_days):
+                print(*row, sep='\t')
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Helpers for walking the generated community_workspaces.json catalog.
+
+The catalog is a dict keyed by repo full name. Each repo entry holds
+'github_pages', 'stars', 'last_commit' and a 'workspaces' list of
+single-key dicts ({folder_name: workspace_json}) in original format.
+"""
+
+import hashlib
+import json
+from collections.abc import Mapping
+
+from compact_records import to_builtin
+
+
+# List version -> workspace.json formats a Kasm registry publishes in
+# <version>/list.json on its Pages site. Registries built from the template
+# list every workspace there in its original format: 'old' (version strings
+# plus a top level 'name') or 'new' ({version, image, uncompressed_size_mb}
+# entries); Kasm servers read both. The crawler's Pages fast path reads this
+# list and the registry export writes it, so both rely on this mapping.
+REGISTRY_LIST_VERSION = '1.0'
+REGISTRY_LIST_FORMATS = {REGISTRY_LIST_VERSION: ('old', 'new')}
+
+
+def registry_list_path(version=REGISTRY_LIST_VERSION):
+    """Return the path of a registry list relative to the registry root ("1.0/list.json")."""
+    return f"{version}/list.json"
+
+
+def workspace_format(ws_data):
+    """Return 'old' (version strings) or 'new' (version/image objects) for a workspace.json."""
+    compatibility = ws_data.get('compatibility') or []
+    return 'new' if compatibility and isinstance(compatibility[0], Mapping) else 'old'
+
+
+def workspace_id(repo_full_name, workspace_name):
+    """Return the stable catalog id for a workspace ("owner/repo/Workspace")."""
+    return f"{repo_full_name}/{workspace_name}"
+
+
+def iter_workspaces(catalog):
+    """
+    Yield every workspace in catalog order.
+
+    Args:
+        catalog: The community_workspaces.json content as a dict
+
+    Yields:
+        tuple: (repo_full_name, repo_entry, workspace_name, workspace_json)
+    """
+    for repo_full_name, repo_entry in catalog.items():
+        for workspace in repo_entry.get('workspaces', []):
+            for ws_name, ws_data in workspace.items():
+                yield repo_full_name, repo_entry, ws_name, ws_data
+
+
+def iter_compatibility(workspace_json):
+    """
+    Yield (version, image, uncompressed_size_mb) for each compatibility entry.
+
+    Handles both the old format (list of version strings plus a top level
+    'name') and the new format (list of {version, image, uncompressed_size_mb}).
+    """
+    compatibility = workspace_json.get('compatibility', [])
+    if not isinstance(compatibility, list):
+        return
+    for entry in compatibility:
+        if isinstance(entry, str):
+            yield entry, workspace_json.get('name'), workspace_json.get('uncompressed_size_mb')
+        elif isinstance(entry, Mapping):
+            yield entry.get('version'), entry.get('image'), entry.get('uncompressed_size_mb')
+
+
+def content_hash(value):
+    """Return a sha256 hex digest of the canonical JSON encoding of value."""
+    encoded = json.dumps(value, sort_keys=True, separators=(',', ':'), default=to_builtin).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
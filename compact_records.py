@@ -0,0 +1,151 @@
+"""
+Compact in-memory representation of crawled workspaces.
+
+A crawl keeps every published workspace in memory until the catalog is
+written, and json.loads gives each of them its own dicts and its own copies
+of keys like 'friendly_name' and of values like '1.16.x' or 'Productivity'.
+Across tens of thousands of workspaces that is mostly repetition.
+
+CompactRecord is a read-only Mapping with __slots__ that stores only a tuple
+of values; the keys live in a layout shared by every record with the same
+keys in the same order (the same idea as CPython's split-table dicts).
+Keys and the values of fields that repeat across the catalog are interned.
+Records keep the original key order, so they serialize to exactly the JSON
+they were built from (pass `default=to_builtin` to json.dump / json.dumps).
+
+    python benchmarks/bench_memory.py
+"""
+
+import sys
+from collections.abc import Mapping
+
+
+# Fields whose string values (or list items) repeat across the catalog
+INTERNED_FIELDS = frozenset({
+    'version', 'categories', 'architecture', 'docker_registry', 'image_type',
+    'cpu_allocation_method', 'available_tags',
+})
+
+_LAYOUTS = {}
+
+
+class RecordLayout:
+    """Key order and key -> position index shared by records with the same keys."""
+
+    __slots__ = ('keys', 'index')
+
+    def __init__(self, keys):
+        self.keys = keys
+        self.index = {key: position for position, key in enumerate(keys)}
+
+
+def layout_for(keys):
+    """Return the shared layout for a tuple of keys, creating it on first use."""
+    layout = _LAYOUTS.get(keys)
+    if layout is None:
+        keys = tuple(sys.intern(key) for key in keys)
+        layout = _LAYOUTS[keys] = RecordLayout(keys)
+    return layout
+
+
+class CompactRecord(Mapping):
+    """
+    Read-only, order-preserving mapping backed by a shared layout and a values tuple.
+
+    Args:
+        items: Iterable of (key, value) pairs with string keys
+    """
+
+    __slots__ = ('_layout', '_values')
+
+    def __init__(self, items=()):
+        items = tuple(items)
+        keys, values = zip(*items) if items else ((), ())
+        self._layout = layout_for(keys)
+        self._values = values
+
+    def __getitem__(self, key):
+        return self._values[self._layout.index[key]]
+
+    def get(self, key, default=None):
+        position = self._layout.index.get(key)
+        return default if position is None else self._values[position]
+
+    def __contains__(self, key):
+        return key in self._layout.index
+
+    def __iter__(self):
+        return iter(self._layout.keys)
+
+    def __len__(self):
+        return len(self._values)
+
+    def __eq__(self, other):
+        if isinstance(other, CompactRecord) and other._layout is self._layout:
+            return other._values == self._values
+        return Mapping.__eq__(self, other)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"CompactRecord({self.to_dict()!r})"
+
+    def __reduce__(self):
+        # Rebuilt through the constructor so unpickled records share layouts again
+        return (CompactRecord, (tuple(zip(self._layout.keys, self._values)),))
+
+    def copy(self):
+        """Return a plain, mutable dict (like dict.copy() on the original)."""
+        return self.to_dict()
+
+    def to_dict(self):
+        return dict(zip(self._layout.keys, self._values))
+
+
+def compact(value, field=None):
+    """
+    Recursively convert JSON data to CompactRecords with interned strings.
+
+    Args:
+        value: A value as returned by json.loads
+        field: Key the value was found under, used to decide what to intern
+
+    Returns:
+        The same data with dicts replaced by CompactRecords
+    """
+    if isinstance(value, Mapping):
+        return CompactRecord(tuple((key, compact(item, key)) for key, item in value.items()))
+    if isinstance(value, list):
+        return [compact(item, field) for item in value]
+    if isinstance(value, str) and field in INTERNED_FIELDS:
+        return sys.intern(value)
+    return value
+
+
+def compact_catalog(catalog):
+    """Replace every workspace in a community_workspaces.json dict with a CompactRecord, in place."""
+    for repo_entry in catalog.values():
+        workspaces = repo_entry.get('workspaces', [])
+        for position, workspace in enumerate(workspaces):
+            workspaces[position] = {ws_name: compact(ws_data) for ws_name, ws_data in workspace.items()}
+    return catalog
+
+
+def to_builtin(value):
+    """json `default` hook: serialize CompactRecords as the dicts they were built from."""
+    if isinstance(value, CompactRecord):
+        return value.to_dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class RepoStats:
+    """Search-result metadata kept per repo (REPO_STATS)."""
+
+    __slots__ = ('stars', 'last_commit')
+
+    def __init__(self, stars=0, last_commit='Unknown'):
+        self.stars = stars
+        self.last_commit = last_commit
+
+    def __repr__(self):
+        return f"RepoStats(stars={self.stars!r}, last_commit={self.last_commit!r})"
@@ -0,0 +1,285 @@
+"""
+Workspace icon fetching, validation and thumbnail generation.
+
+Every workspace has an image_src (e.g. "cura.png") relative to its repo's
+GitHub Pages site. This stage fetches each distinct icon once, concurrently,
+with an on-disk cache revalidated by ETag / Last-Modified. It checks that
+the bytes really are an image and renders a small fixed-size WebP thumbnail
+with a content-hashed name, so the explorer can load a few KB from our own
+origin instead of full-size images from many third-party hosts.
+
+Thumbnail rendering needs Pillow (`pip install Pillow`); without it icons
+are still fetched and validated but no thumbnails are written.
+"""
+
+import hashlib
+import io
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+import requests
+
+from atomic_output import atomic_open
+from catalog_utils import iter_workspaces, workspace_id
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional
+    Image = None
+
+
+THUMBNAIL_SIZE = 64
+MAX_ICON_BYTES = 5 * 1024 * 1024
+FETCH_WORKERS = 16
+FETCH_TIMEOUT = 15
+
+# Tried in order until one returns a valid image
+ICON_URL_TEMPLATES = [
+    "{github_pages}{image_src}",
+    "https://raw.githubusercontent.com/{repo}/HEAD/workspaces/{workspace}/{image_src}",
+]
+
+IMAGE_SIGNATURES = (
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'\xff\xd8\xff', 'jpeg'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+    (b'\x00\x00\x01\x00', 'ico'),
+)
+
+
+def sniff_image_type(data):
+    """Return the image type from magic bytes, or None if data is not a supported image."""
+    if not data:
+        return None
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'webp'
+    for signature, image_type in IMAGE_SIGNATURES:
+        if data.startswith(signature):
+            return image_type
+    return None
+
+
+def icon_urls(repo, repo_entry, ws_name, ws_data):
+    """Return candidate URLs for a workspace's icon, or [] if it has none."""
+    image_src = ws_data.get('image_src')
+    if not image_src or not isinstance(image_src, str):
+        return []
+    if image_src.startswith(('http://', 'https://')):
+        return [image_src]
+    github_pages = repo_entry.get('github_pages') or ''
+    if github_pages and not github_pages.endswith('/'):
+        github_pages += '/'
+    urls = []
+    for template in ICON_URL_TEMPLATES:
+        if '{github_pages}' in template and not github_pages:
+            continue
+        url = template.format(github_pages=github_pages, repo=repo, workspace=ws_name,
+                              image_src=image_src.lstrip('/'))
+        urls.append(url)
+    return urls
+
+
+class IconCache:
+    """On-disk cache of fetched icons keyed by URL, with HTTP validators."""
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.index_path = os.path.join(cache_dir, 'index.json')
+        os.makedirs(cache_dir, exist_ok=True)
+        try:
+            with open(self.index_path, 'r') as f:
+                self.index = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            self.index = {}
+
+    def _blob_path(self, digest):
+        return os.path.join(self.cache_dir, digest)
+
+    def get(self, url):
+        """Return (entry, bytes) for a cached URL, or (None, None)."""
+        entry = self.index.get(url)
+        if not entry:
+            return None, None
+        try:
+            with open(self._blob_path(entry['sha256']), 'rb') as f:
+                return entry, f.read()
+        except OSError:
+            return None, None
+
+    def put(self, url, data, etag=None, last_modified=None):
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(digest)
+        if not os.path.exists(path):
+            with atomic_open(path, 'wb') as f:
+                f.write(data)
+        self.index[url] = {'sha256': digest, 'etag': etag, 'last_modified': last_modified}
+
+    def save(self):
+        with atomic_open(self.index_path) as f:
+            json.dump(self.index, f, indent=4, sort_keys=True)
+
+
+def fetch_icon(url, cache, session=None, request=None):
+    """
+    Fetch one icon, revalidating a cached copy with conditional headers.
+
+    Args:
+        url: Icon URL
+        cache: IconCache
+        session: Optional requests-compatible session (for tests)
+        request: Optional callable(url, headers) -> response with the body already
+                 read, at most MAX_ICON_BYTES + 1 bytes of it (the crawler's
+                 cassette-aware make_request); used instead of session
+
+    Returns:
+        tuple: (bytes or None, 'fetched' | 'cached' | 'error')
+    """
+    session = session or requests
+    entry, cached = cache.get(url)
+    headers = {'User-Agent': 'kasm-community-images-explorer'}
+    if entry:
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+    try:
+        # No GitHub token here: these are third-party hosts
+        if request is not None:
+            response = request(url, headers)
+        else:
+            response = session.get(url, headers=headers, timeout=FETCH_TIMEOUT, stream=True)
+        if response.status_code == 304 and cached is not None:
+            return cached, 'cached'
+        if response.status_code != 200:
+            return None, 'error'
+        length = response.headers.get('Content-Length') or ''
+        if length.isdigit() and int(length) > MAX_ICON_BYTES:
+            print(f"Icon too large, skipping: {url}")
+            return None, 'error'
+        chunks = []
+        size = 0
+        body = [response.content] if request is not None else response.iter_content(chunk_size=64 * 1024)
+        for chunk in body:
+            size += len(chunk)
+            if size > MAX_ICON_BYTES:
+                print(f"Icon too large, skipping: {url}")
+                return None, 'error'
+            chunks.append(chunk)
+        data = b''.join(chunks)
+    except requests.RequestException as e:
+        print(f"Error fetching icon {url}: {e}")
+        return (cached, 'cached') if cached is not None else (None, 'error')
+    cache.put(url, data, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+    return data, 'fetched'
+
+
+def render_thumbnail(data, size=THUMBNAIL_SIZE):
+    """
+    Render image bytes as a size x size WebP thumbnail (aspect preserved, padded).
+
+    Returns:
+        bytes or None: WebP bytes, or None if Pillow is missing or the image is unreadable
+    """
+    if Image is None:
+        return None
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image.load()
+            image = image.convert('RGBA')
+            image.thumbnail((size, size), Image.LANCZOS)
+            canvas = Image.new('RGBA', (size, size), (0, 0, 0, 0))
+            canvas.paste(image, ((size - image.width) // 2, (size - image.height) // 2))
+            out = io.BytesIO()
+            canvas.save(out, format='WEBP', quality=80, method=6)
+            return out.getvalue()
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        print(f"Could not render thumbnail: {e}")
+        return None
+
+
+def build_thumbnails(catalog, out_dir='generated/thumbnails', cache_dir='generated/.icon_cache',
+                     workers=FETCH_WORKERS, session=None, request=None):
+    """
+    Fetch, validate and thumbnail every workspace icon in the catalog.
+
+    Args:
+        catalog: community_workspaces.json content
+        out_dir: Directory for content-hashed <sha256>.webp thumbnails
+        cache_dir: Directory for the fetched icon cache
+        workers: Concurrent downloads
+        session: Optional requests-compatible session (for tests)
+        request: Optional request callable, see fetch_icon
+
+    Returns:
+        tuple: ({workspace_id: "thumbnails/<hash>.webp"}, stats dict)
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    cache = IconCache(cache_dir)
+    stats = {'icons_fetched': 0, 'icons_cached': 0, 'icons_unavailable': 0,
+             'icons_missing': 0, 'thumbnails_written': 0}
+
+    workspace_urls = {
+        workspace_id(repo, ws_name): icon_urls(repo, repo_entry, ws_name, ws_data)
+        for repo, repo_entry, ws_name, ws_data in iter_workspaces(catalog)
+    }
+
+    # Fallback URLs are only fetched for workspaces whose first choice failed
+    results = {}
+
+    def fetch(url):
+        return url, fetch_icon(url, cache, session, request)
+
+    primary = list(dict.fromkeys(urls[0] for urls in workspace_urls.values() if urls))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results.update(executor.map(fetch, primary))
+        fallback = list(dict.fromkeys(
+            url for urls in workspace_urls.values() if urls
+            and not sniff_image_type(results[urls[0]][0]) for url in urls[1:]
+        ))
+        results.update(executor.map(fetch, fallback))
+    cache.save()
+
+    for data, outcome in results.values():
+        if outcome == 'fetched':
+            stats['icons_fetched'] += 1
+        elif outcome == 'cached':
+            stats['icons_cached'] += 1
+
+    thumbnails = {}
+    rendered = {}
+    for ws_id, urls in workspace_urls.items():
+        data = next(
+            (results[url][0] for url in urls if url in results and sniff_image_type(results[url][0])),
+            None
+        )
+        if data is None:
+            # No image_src at all, or nothing fetched was a real image
+            stats['icons_unavailable' if urls else 'icons_missing'] += 1
+            continue
+        source_digest = hashlib.sha256(data).hexdigest()
+        if source_digest not in rendered:
+            thumbnail = render_thumbnail(data)
+            name = None
+            if thumbnail:
+                name = f"{hashlib.sha256(thumbnail).hexdigest()[:16]}.webp"
+                path = os.path.join(out_dir, name)
+                if not os.path.exists(path):
+                    with atomic_open(path, 'wb') as f:
+                        f.write(thumbnail)
+                    stats['thumbnails_written'] += 1
+            rendered[source_digest] = name
+        if rendered[source_digest]:
+            thumbnails[ws_id] = f"{os.path.basename(out_dir.rstrip('/'))}/{rendered[source_digest]}"
+
+    if Image is None:
+        print("Pillow is not installed; icons were validated but no thumbnails were rendered")
+        return thumbnails, stats
+
+    # Drop thumbnails no workspace points at any more
+    in_use = {path.rsplit('/', 1)[-1] for path in thumbnails.values()}
+    for name in os.listdir(out_dir):
+        if name.endswith('.webp') and name not in in_use:
+            os.remove(os.path.join(out_dir, name))
+
+    return thumbnails, stats
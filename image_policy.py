@@ -0,0 +1,303 @@
+"""
+Compiled block/allow policy for workspace images.
+
+Rules are written like image references, e.g. "kasmweb/" (block a Docker Hub
+org), "ghcr.io/" (a whole registry) or "*/xmrig*" (a glob: * and ? are
+wildcards). A rule without a registry host means Docker Hub; a glob that
+starts with a wildcard matches images on any registry.
+
+Images and rules are first reduced to one canonical form, so the Docker Hub
+aliases a workspace may use ("https://index.docker.io/v1/", "docker.io",
+"registry-1.docker.io", no registry at all) all compare equal. The rules are
+then compiled once into a character trie keyed on their literal prefix:
+prefix rules sit on the node where they end, and globs on the node where
+their first wildcard starts, with every glob on a node combined into a
+single regular expression. Checking an image walks its reference through
+the trie once, whatever the number of rules. Globs that start with a
+wildcard go into a second trie keyed on their first literal run, which is
+walked from every position of the reference, so only the globs whose
+literal text occurs in it are tried.
+
+Precedence, most important first:
+
+1. a matching block glob (known-bad patterns always win)
+2. the longest matching prefix rule (allow wins a tie)
+3. a matching allow glob
+4. the policy's default action
+
+    python benchmarks/bench_image_policy.py
+"""
+
+import json
+import re
+from collections import namedtuple
+
+
+ALLOW = 'allow'
+BLOCK = 'block'
+ACTIONS = (ALLOW, BLOCK)
+
+DOCKER_HUB = 'docker.io'
+DOCKER_HUB_HOSTS = frozenset({
+    'docker.io', 'index.docker.io', 'registry-1.docker.io', 'registry.hub.docker.com', 'hub.docker.com'
+})
+GLOB_CHARS = ('*', '?')
+
+PolicyRule = namedtuple('PolicyRule', 'action pattern source')
+PolicyDecision = namedtuple('PolicyDecision', 'blocked rule reference')
+
+
+def _is_host(component):
+    return '.' in component or ':' in component or component == 'localhost'
+
+
+def canonical_registry(docker_registry):
+    """
+    Reduce a workspace's docker_registry to the prefix its images are looked up under.
+
+    Scheme and slashes are stripped, Docker Hub aliases (including the /v1/ API
+    path) become "docker.io", and a value without a host (e.g. "kasmweb") is read
+    as a Docker Hub namespace.
+
+    Args:
+        docker_registry: The workspace's docker_registry, or None
+
+    Returns:
+        str: e.g. "docker.io", "ghcr.io", "docker.io/kasmweb"
+    """
+    registry = (docker_registry or '').strip()
+    registry = registry.replace('https://', '').replace('http://', '').strip('/')
+    if not registry:
+        return DOCKER_HUB
+    host, _, path = registry.partition('/')
+    if not _is_host(host):
+        return f"{DOCKER_HUB}/{registry}"
+    host = host.lower()
+    if host in DOCKER_HUB_HOSTS:
+        if path.split('/')[0] in ('v1', 'v2'):
+            path = path.partition('/')[2]
+        host = DOCKER_HUB
+    return f"{host}/{path}" if path else host
+
+
+def canonical_reference(image, registry=DOCKER_HUB, is_rule=False):
+    """
+    Return the canonical "registry/path[:tag]" form of an image (or of a rule).
+
+    Args:
+        image: Image reference as written in workspace.json
+        registry: canonical_registry() of the workspace's docker_registry
+        is_rule: True for a rule, where a first component like "ghcr.io" is a host
+                 even without a path after it, and a leading wildcard is kept as is
+
+    Returns:
+        str: The canonical reference
+    """
+    image = image.strip()
+    if is_rule and image.startswith(GLOB_CHARS):
+        return image
+    host, _, path = image.partition('/')
+    if (path or is_rule) and _is_host(host):
+        canonical = canonical_registry(image)
+        # Keep a rule's trailing slash: "ghcr.io/org/" must not match "ghcr.io/org-two/"
+        return f"{canonical}/" if image.endswith('/') and not canonical.endswith('/') else canonical
+    registry_host, _, registry_path = registry.partition('/')
+    if registry_path and image.startswith(f"{registry_path}/"):
+        # "kasmweb/chrome" under docker_registry "kasmweb": not prefixed twice
+        registry = registry_host
+    return f"{registry}/{image}"
+
+
+def candidate_references(image, registry=DOCKER_HUB):
+    """
+    Return the canonical references an image may be pulled as.
+
+    The crawler probes the bare image name first, which resolves to Docker
+    Hub, and only then prefixes it with the workspace's docker_registry, so
+    an image without a host can end up pulled from either.
+
+    Args:
+        image: Image reference as written in workspace.json
+        registry: canonical_registry() of the workspace's docker_registry
+
+    Returns:
+        list: The registry-qualified reference, then the Docker Hub one if it differs
+    """
+    references = [canonical_reference(image, registry)]
+    if registry != DOCKER_HUB:
+        bare = canonical_reference(image)
+        if bare != references[0]:
+            references.append(bare)
+    return references
+
+
+def _glob_to_regex(glob):
+    return ''.join('.*' if char == '*' else '.' if char == '?' else re.escape(char) for char in glob)
+
+
+class _TrieNode:
+    __slots__ = ('children', 'rule', 'globs', 'glob_rules')
+
+    def __init__(self):
+        self.children = {}
+        self.rule = None        # prefix rule ending here
+        self.globs = None       # compiled globs whose literal prefix ends here
+        self.glob_rules = []
+
+
+class ImagePolicy:
+    """
+    Block/allow rules compiled for fast image checks.
+
+    Args:
+        rules: Iterable of PolicyRule
+        default: Action for images no rule matches
+    """
+
+    def __init__(self, rules=(), default=ALLOW):
+        if default not in ACTIONS:
+            raise ValueError(f"Unknown default action {default!r}, expected one of {ACTIONS}")
+        self.default = default
+        self.rules = []
+        self._root = _TrieNode()
+        self._floating = _TrieNode()
+        for rule in rules:
+            self.add(rule)
+        self.compile()
+
+    def add(self, rule):
+        """Add a rule; call compile() before checking images."""
+        if rule.action not in ACTIONS:
+            raise ValueError(f"Unknown action {rule.action!r} for rule {rule.pattern!r} ({rule.source})")
+        if not isinstance(rule.pattern, str) or not rule.pattern.strip():
+            raise ValueError(f"Empty pattern for rule ({rule.source})")
+        pattern = canonical_reference(rule.pattern, is_rule=True)
+        floating = pattern.startswith(GLOB_CHARS)
+        literal = pattern.lstrip(''.join(GLOB_CHARS)) if floating else pattern
+        wildcard = min((literal.index(char) for char in GLOB_CHARS if char in literal), default=None)
+        if wildcard is not None:
+            literal = literal[:wildcard]
+
+        node = self._floating if floating else self._root
+        for char in literal:
+            node = node.children.setdefault(char, _TrieNode())
+        if floating:
+            # Matched against the whole reference once its literal run is found in it
+            node.glob_rules.append((rule, pattern))
+        elif wildcard is None:
+            # For duplicate prefixes, allow wins as it does for a tie in length
+            if node.rule is None or rule.action == ALLOW:
+                node.rule = rule
+        else:
+            node.glob_rules.append((rule, pattern[wildcard:]))
+        self.rules.append(rule)
+
+    def compile(self):
+        """Combine the globs on each trie node into one expression, block rules first."""
+        stack = [self._root, self._floating]
+        while stack:
+            node = stack.pop()
+            stack.extend(node.children.values())
+            if not node.glob_rules:
+                node.globs = None
+                continue
+            ordered = sorted(node.glob_rules, key=lambda item: item[0].action != BLOCK)
+            combined = '|'.join(f"(?P<g{index}>{_glob_to_regex(glob)})" for index, (_, glob) in enumerate(ordered))
+            node.globs = (re.compile(combined, re.DOTALL), [rule for rule, _ in ordered])
+
+    def check(self, reference):
+        """
+        Decide on a canonical reference (see canonical_reference()).
+
+        Returns:
+            PolicyDecision: blocked flag, the deciding PolicyRule (None for the default) and the reference
+        """
+        node = self._root
+        prefix_rule = None
+        glob_nodes = []
+        for depth, char in enumerate(reference, 1):
+            node = node.children.get(char)
+            if node is None:
+                break
+            if node.rule is not None:
+                prefix_rule = node.rule
+            if node.globs is not None:
+                glob_nodes.append((node, depth))
+
+        floating = self._floating
+        if floating.globs is not None:
+            glob_nodes.append((floating, 0))
+        if floating.children:
+            found = set()
+            for start in range(len(reference)):
+                node = floating
+                for char in reference[start:]:
+                    node = node.children.get(char)
+                    if node is None:
+                        break
+                    if node.globs is not None and node not in found:
+                        found.add(node)
+                        glob_nodes.append((node, 0))
+
+        allow_glob = None
+        for node, depth in glob_nodes:
+            pattern, glob_rules = node.globs
+            match = pattern.fullmatch(reference, depth)
+            if match:
+                rule = glob_rules[int(match.lastgroup[1:])]
+                if rule.action == BLOCK:
+                    return PolicyDecision(True, rule, reference)
+                allow_glob = allow_glob or rule
+        rule = prefix_rule or allow_glob
+        if rule is None:
+            return PolicyDecision(self.default == BLOCK, None, reference)
+        return PolicyDecision(rule.action == BLOCK, rule, reference)
+
+    def evaluate(self, image, registry=DOCKER_HUB):
+        """
+        Decide on an image as written in workspace.json.
+
+        Every candidate_references() form is checked: a rule blocking any of
+        them blocks the image. Otherwise the registry-qualified form decides.
+
+        Args:
+            image: Image reference
+            registry: canonical_registry() of the workspace's docker_registry,
+                      computed once per workspace
+
+        Returns:
+            PolicyDecision
+        """
+        decision = None
+        for reference in candidate_references(image, registry):
+            candidate = self.check(reference)
+            if candidate.blocked and candidate.rule is not None:
+                return candidate
+            decision = decision or candidate
+        return decision
+
+
+def load_policy_file(path):
+    """
+    Read rules from a JSON policy file.
+
+    The file looks like {"default": "allow", "rules": [{"block": "docker.io/badorg/"},
+    {"allow": "docker.io/badorg/good-image"}, {"block": "*/xmrig*"}]}.
+
+    Args:
+        path: Path to the policy file
+
+    Returns:
+        tuple: (list of PolicyRule, default action)
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        document = json.load(f)
+    if not isinstance(document, dict) or not isinstance(document.get('rules', []), list):
+        raise ValueError(f"{path}: expected an object with a 'rules' list")
+    rules = []
+    for index, entry in enumerate(document.get('rules', [])):
+        if not isinstance(entry, dict) or len(entry) != 1:
+            raise ValueError(f"{path}: rule {index} must be {{\"block\": pattern}} or {{\"allow\": pattern}}")
+        (action, pattern), = entry.items()
+        rules.append(PolicyRule(action, pattern, f"{path}#{index}"))
+    return rules, document.get('default', ALLOW)
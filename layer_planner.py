@@ -0,0 +1,241 @@
+"""
+Layer-sharing analysis and pre-pull planning for catalog images.
+
+The pullability probe (`skopeo inspect --raw`) already returns each image's
+manifest, which lists its layers by digest and compressed size. Agents
+only download a layer once, so workspaces built on the same base image
+share most of their bytes. From the layers of every published image this
+module works out:
+
+- per workspace, the bytes only it needs and the bytes it shares with
+  other workspaces
+- the layers shared most widely, and by which workspaces
+- an order in which to pre-pull the images: each step pulls the image
+  with the fewest bytes not already on disk, so base layers are fetched
+  early and as many workspaces as possible are ready for each byte pulled
+
+Multi-arch images publish an index rather than layers; the manifest for
+PLATFORM is looked up in it and fetched.
+"""
+
+import heapq
+import json
+from collections import defaultdict
+
+
+PLATFORM = ('linux', 'amd64')
+# Shared layers listed in the plan, the ones saving the most bytes first
+SHARED_LAYERS_LIMIT = 100
+
+IMAGE_MANIFEST_TYPES = (
+    'application/vnd.docker.distribution.manifest.v2+json',
+    'application/vnd.oci.image.manifest.v1+json',
+)
+INDEX_TYPES = (
+    'application/vnd.docker.distribution.manifest.list.v2+json',
+    'application/vnd.oci.image.index.v1+json',
+)
+
+
+def parse_manifest(raw):
+    """
+    Read the layers or platform entries from a raw manifest.
+
+    Args:
+        raw: Manifest JSON text (`skopeo inspect --raw` output)
+
+    Returns:
+        tuple: ('layers', [(digest, size)]) for an image manifest,
+        ('index', [(digest, (os, architecture))]) for a manifest list / OCI index,
+        or None for anything else (e.g. schema 1 manifests, which carry no sizes)
+    """
+    try:
+        manifest = json.loads(raw)
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(manifest, dict) or manifest.get('schemaVersion') != 2:
+        return None
+    media_type = manifest.get('mediaType')
+    if media_type in INDEX_TYPES or (media_type is None and 'manifests' in manifest):
+        entries = []
+        for entry in manifest.get('manifests') or []:
+            if not isinstance(entry, dict) or not isinstance(entry.get('digest'), str):
+                continue
+            platform = entry.get('platform') if isinstance(entry.get('platform'), dict) else {}
+            entries.append((entry['digest'], (platform.get('os'), platform.get('architecture'))))
+        return 'index', entries
+    if media_type in IMAGE_MANIFEST_TYPES or (media_type is None and 'layers' in manifest):
+        layers = []
+        for layer in manifest.get('layers') or []:
+            if not isinstance(layer, dict) or not isinstance(layer.get('digest'), str):
+                return None
+            size = layer.get('size')
+            layers.append((layer['digest'], size if isinstance(size, int) and size >= 0 else 0))
+        return 'layers', layers
+    return None
+
+
+def digest_reference(reference, digest):
+    """Return reference pinned to digest ("host/org/app:1" -> "host/org/app@sha256:...")."""
+    repository = reference.split('@', 1)[0]
+    name_start = repository.rfind('/') + 1
+    tag = repository.find(':', name_start)
+    if tag != -1:
+        repository = repository[:tag]
+    return f"{repository}@{digest}"
+
+
+def manifest_layers(reference, raw, fetch_manifest, platform=PLATFORM):
+    """
+    Return an image's layers from its probed manifest.
+
+    Args:
+        reference: The reference that was probed
+        raw: Its raw manifest
+        fetch_manifest: Callable(reference) -> raw manifest or None, used to
+                        fetch the platform manifest of a multi-arch image
+        platform: (os, architecture) to plan for
+
+    Returns:
+        list: [(digest, size)], or None if the layers could not be determined
+    """
+    parsed = parse_manifest(raw)
+    if parsed and parsed[0] == 'index':
+        digest = next((digest for digest, entry_platform in parsed[1] if entry_platform == platform), None)
+        if digest is None:
+            return None
+        parsed = parse_manifest(fetch_manifest(digest_reference(reference, digest)))
+    if parsed and parsed[0] == 'layers':
+        return parsed[1]
+    return None
+
+
+def pull_order(image_layers, image_workspaces):
+    """
+    Order images so each step downloads the fewest bytes not already pulled.
+
+    Bytes still to download only shrink as layers are pulled, so a heap with
+    an entry pushed on every decrease finds the next image without rescanning.
+    Ties go to the image used by more workspaces.
+
+    Args:
+        image_layers: {image: {digest: size}}
+        image_workspaces: {image: [workspace ids]}
+
+    Returns:
+        list: [(image, new_bytes)] in pull order
+    """
+    remaining = {image: sum(layers.values()) for image, layers in image_layers.items()}
+    users = defaultdict(list)
+    for image, layers in image_layers.items():
+        for digest in layers:
+            users[digest].append(image)
+
+    heap = [(new_bytes, -len(image_workspaces[image]), image) for image, new_bytes in remaining.items()]
+    heapq.heapify(heap)
+    pulled_layers = set()
+    order = []
+    while heap:
+        new_bytes, _, image = heapq.heappop(heap)
+        if image not in remaining or new_bytes != remaining[image]:
+            continue  # Already pulled, or superseded by a smaller entry
+        del remaining[image]
+        order.append((image, new_bytes))
+        for digest, size in image_layers[image].items():
+            if digest in pulled_layers:
+                continue
+            pulled_layers.add(digest)
+            for other in users[digest]:
+                if other in remaining:
+                    remaining[other] -= size
+                    heapq.heappush(heap, (remaining[other], -len(image_workspaces[other]), other))
+    return order
+
+
+def build_prepull_plan(workspace_images, image_layers, platform=PLATFORM):
+    """
+    Build generated/prepull_plan.json.
+
+    Args:
+        workspace_images: List of (repo_full_name, workspace_name, [image keys])
+        image_layers: {image key: [(digest, size)]} for the images whose layers are known
+        platform: (os, architecture) the layers were read for
+
+    Returns:
+        dict: Pull order with per-step new and reused bytes, per-workspace unique
+        and shared bytes, the most widely shared layers and totals
+    """
+    image_workspaces = defaultdict(list)
+    workspace_layers = {}
+    missing = set()
+    for repo_full_name, ws_name, images in workspace_images:
+        workspace = f"{repo_full_name}/{ws_name}"
+        layers = workspace_layers.setdefault(workspace, {})
+        for image in images:
+            if image not in image_layers:
+                missing.add(image)
+                continue
+            if workspace not in image_workspaces[image]:
+                image_workspaces[image].append(workspace)
+            layers.update(image_layers[image])
+
+    planned = {image: dict(image_layers[image]) for image in image_workspaces}
+    layer_workspaces = defaultdict(list)
+    layer_sizes = {}
+    for workspace, layers in workspace_layers.items():
+        for digest, size in layers.items():
+            layer_workspaces[digest].append(workspace)
+            layer_sizes[digest] = size
+
+    steps = []
+    pulled = 0
+    for image, new_bytes in pull_order(planned, image_workspaces):
+        image_bytes = sum(planned[image].values())
+        pulled += new_bytes
+        steps.append({
+            'image': image,
+            'workspaces': image_workspaces[image],
+            'layers': len(planned[image]),
+            'bytes': image_bytes,
+            'new_bytes': new_bytes,
+            'reused_bytes': image_bytes - new_bytes,
+            'cumulative_bytes': pulled
+        })
+
+    workspaces = {}
+    for repo_full_name, ws_name, images in workspace_images:
+        workspace = f"{repo_full_name}/{ws_name}"
+        layers = workspace_layers[workspace]
+        shared = sum(size for digest, size in layers.items() if len(layer_workspaces[digest]) > 1)
+        workspaces.setdefault(repo_full_name, {})[ws_name] = {
+            'images': list(images),
+            'missing_images': [image for image in images if image not in image_layers],
+            'total_bytes': sum(layers.values()),
+            'unique_bytes': sum(layers.values()) - shared,
+            'shared_bytes': shared
+        }
+
+    shared_layers = sorted(
+        (digest for digest, users in layer_workspaces.items() if len(users) > 1),
+        key=lambda digest: (-layer_sizes[digest] * (len(layer_workspaces[digest]) - 1), digest)
+    )
+    naive_bytes = sum(sum(layers.values()) for layers in planned.values())
+    return {
+        'platform': '/'.join(platform),
+        'summary': {
+            'images': len(steps),
+            'images_without_layers': len(missing),
+            'layers': len(layer_sizes),
+            'shared_layers': len(shared_layers),
+            'bytes_to_pull': pulled,
+            'bytes_without_sharing': naive_bytes,
+            'bytes_saved_by_sharing': naive_bytes - pulled
+        },
+        'steps': steps,
+        'workspaces': workspaces,
+        'shared_layers': [
+            {'digest': digest, 'size': layer_sizes[digest], 'workspaces': sorted(layer_workspaces[digest])}
+            for digest in shared_layers[:SHARED_LAYERS_LIMIT]
+        ],
+        'images_without_layers': sorted(missing)
+    }
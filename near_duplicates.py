@@ -0,0 +1,218 @@
+"""
+Near-duplicate workspace detection with MinHash and locality-sensitive hashing.
+
+Forks with a tweaked description, or the same image republished under
+another repo, show up as separate workspaces. Each workspace is reduced to
+a set of tokens (words and word pairs from its name and description, its
+categories and its image references) and summarised by a MinHash
+signature, so the Jaccard similarity of two workspaces can be estimated
+from their signatures alone.
+
+Signatures use one-permutation hashing: each token is hashed once, the
+hash picks a bin and the minimum per bin is kept, with empty bins filled
+by rotation densification. Signatures are cut into bands of bins picked
+by a fixed shuffle and workspaces sharing any band land in the same
+bucket; only pairs within a bucket are compared, so grouping is roughly
+linear in the number of workspaces instead of pairwise.
+"""
+
+import argparse
+import hashlib
+import json
+import operator
+import random
+import re
+
+from catalog_utils import iter_compatibility, iter_workspaces, workspace_id
+
+
+DEFAULT_THRESHOLD = 0.8
+DEFAULT_NUM_PERM = 128
+DEFAULT_BANDS = 16
+
+HASH_MAX = (1 << 64) - 1
+WORD_RE = re.compile(r'[a-z0-9]+')
+
+
+def workspace_tokens(ws_data):
+    """Return the token set compared between workspaces."""
+    text = f"{ws_data.get('friendly_name', '')} {ws_data.get('description', '')}".lower()
+    words = WORD_RE.findall(text)
+    tokens = set(words)
+    tokens.update(f"{first} {second}" for first, second in zip(words, words[1:]))
+    tokens.update(f"cat:{category}".lower() for category in ws_data.get('categories', [])
+                  if isinstance(category, str))
+    for _, image, _ in iter_compatibility(ws_data):
+        if image:
+            tokens.add(f"img:{image}")
+            # The same image republished with different tags is still the same image
+            tokens.add(f"repo:{image.rsplit(':', 1)[0]}")
+    return tokens
+
+
+class MinHasher:
+    """
+    One-permutation MinHash with rotation densification.
+
+    Args:
+        num_perm: Signature length (number of bins)
+    """
+
+    def __init__(self, num_perm=DEFAULT_NUM_PERM):
+        self.num_perm = num_perm
+        # Offset added per bin skipped while densifying, so borrowed values
+        # never collide with a bin's own values
+        self.rotation = HASH_MAX // num_perm + 1
+        self._hashes = {}
+
+    def _hash(self, token):
+        value = self._hashes.get(token)
+        if value is None:
+            digest = hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest()
+            value = self._hashes[token] = int.from_bytes(digest, 'big')
+        return value
+
+    def signature(self, tokens):
+        """Return the MinHash signature of a token set, or None if it is empty."""
+        if not tokens:
+            return None
+        num_perm = self.num_perm
+        bins = [None] * num_perm
+        for token in tokens:
+            value = self._hash(token)
+            index = value % num_perm
+            value //= num_perm
+            current = bins[index]
+            if current is None or value < current:
+                bins[index] = value
+        # Densify: an empty bin takes the next non-empty bin's value (circularly)
+        filled = [index for index, value in enumerate(bins) if value is not None]
+        if len(filled) < num_perm:
+            next_filled = filled[0] + num_perm
+            for index in range(num_perm - 1, -1, -1):
+                if bins[index] is not None:
+                    next_filled = index
+                    continue
+                distance = next_filled - index
+                bins[index] = bins[next_filled % num_perm] + distance * self.rotation
+        return tuple(bins)
+
+
+def estimate_similarity(first, second):
+    """Estimated Jaccard similarity of two signatures."""
+    return sum(map(operator.eq, first, second)) / len(first)
+
+
+def find_near_duplicates(catalog, threshold=DEFAULT_THRESHOLD, num_perm=DEFAULT_NUM_PERM, bands=DEFAULT_BANDS):
+    """
+    Group near-identical workspaces and pick a canonical one per group.
+
+    The canonical workspace is the one from the repo with the most stars,
+    then the first in catalog order.
+
+    Args:
+        catalog: community_workspaces.json content
+        threshold: Minimum estimated Jaccard similarity for two workspaces to be grouped
+        num_perm: MinHash signature length
+        bands: LSH bands; num_perm must be divisible by bands
+
+    Returns:
+        dict: {'threshold', 'num_perm', 'bands',
+               'groups': {canonical_id: [duplicate ids]},
+               'duplicate_of': {duplicate_id: canonical_id}}
+    """
+    if num_perm % bands:
+        raise ValueError(f"num_perm ({num_perm}) must be divisible by bands ({bands})")
+    rows = num_perm // bands
+    # Bands take bins in a fixed shuffled order, not contiguous runs: a densified bin
+    # copies its neighbour, so adjacent bins often hold one token's hash. Contiguous
+    # bands let workspaces sharing a single token collide in huge buckets, and strided
+    # ones miss forks whose one added token changed a long run of bins.
+    order = random.Random(0).sample(range(num_perm), num_perm)
+    band_keys = [operator.itemgetter(*order[start:start + rows]) for start in range(0, num_perm, rows)]
+    hasher = MinHasher(num_perm)
+
+    ids = []
+    rank = {}
+    signatures = []
+    for position, (repo, repo_entry, ws_name, ws_data) in enumerate(iter_workspaces(catalog)):
+        signature = hasher.signature(workspace_tokens(ws_data))
+        if signature is None:
+            continue
+        ws_id = workspace_id(repo, ws_name)
+        ids.append(ws_id)
+        rank[ws_id] = (-(repo_entry.get('stars') or 0), position)
+        signatures.append(signature)
+
+    parent = list(range(len(ids)))
+
+    def find(index):
+        while parent[index] != index:
+            parent[index] = parent[parent[index]]
+            index = parent[index]
+        return index
+
+    # Pairs already found dissimilar; they often share more than one band
+    rejected = set()
+    for band_key in band_keys:
+        buckets = {}
+        for index, signature in enumerate(signatures):
+            buckets.setdefault(band_key(signature), []).append(index)
+        for members in buckets.values():
+            if len(members) < 2:
+                continue
+            # Every pair: members can match each other without matching the first one.
+            # Pairs already grouped are skipped, so a bucket of m identical workspaces
+            # still costs m - 1 comparisons (plus a find() per remaining pair)
+            for position, first in enumerate(members):
+                for other in members[position + 1:]:
+                    root_first, root_other = find(first), find(other)
+                    if root_first == root_other or (first, other) in rejected:
+                        continue
+                    if estimate_similarity(signatures[first], signatures[other]) >= threshold:
+                        parent[root_other] = root_first
+                    else:
+                        rejected.add((first, other))
+
+    components = {}
+    for index in range(len(ids)):
+        components.setdefault(find(index), []).append(ids[index])
+
+    groups = {}
+    duplicate_of = {}
+    for members in components.values():
+        if len(members) < 2:
+            continue
+        members.sort(key=rank.__getitem__)
+        canonical = members[0]
+        groups[canonical] = members[1:]
+        for member in members[1:]:
+            duplicate_of[member] = canonical
+
+    return {
+        'threshold': threshold,
+        'num_perm': num_perm,
+        'bands': bands,
+        'groups': dict(sorted(groups.items())),
+        'duplicate_of': dict(sorted(duplicate_of.items())),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find near-duplicate workspaces in a catalog")
+    parser.add_argument('--file', default='generated/community_workspaces.json', help="Catalog JSON file")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args()
+
+    with open(args.file, 'r') as f:
+        catalog = json.load(f)
+    result = find_near_duplicates(catalog, threshold=args.threshold)
+    for canonical, duplicates in result['groups'].items():
+        print(canonical)
+        for duplicate in duplicates:
+            print(f"    {duplicate}")
+    print(f"{len(result['duplicate_of'])} near-duplicate workspaces in {len(result['groups'])} groups")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+"""
+On-demand per-phase profiling for the crawler.
+
+With --profile, the crawler profiles each of its phases on its own:
+
+    search      GitHub repository search
+    parse       walking a repo: Pages site, contents API or published listing
+    validate    JSON parsing, schema validation, normalization, profanity checks
+    probe       image policy and pullability probes (skopeo or a replayed cassette)
+    output      writing the catalog and every other generated file
+
+Phases nest (validate and probe run inside parse); time spent in a nested
+phase is counted only there. Two modes:
+
+- deterministic: one cProfile profiler per phase, switched as phases are
+  entered and left. Exact call counts, but every call pays for tracing.
+- sampling: a background thread samples the crawler thread's stack every
+  SAMPLING_INTERVAL seconds. Low overhead and exact stacks, but times are
+  estimates (samples x interval), functions that run for less than an
+  interval may not show up, and call counts are sample counts.
+
+Each phase is written as <phase>.pstats (readable with pstats, snakeviz,
+gprof2dot...) and <phase>.collapsed, one "frame;frame;... microseconds"
+line per stack, the input of flamegraph.pl or speedscope. cProfile only
+records caller/callee pairs, so deterministic stacks are rebuilt by
+splitting each function's time over its callers in proportion; sampled
+stacks are as observed.
+
+    python phase_profiler.py generated/profiles/probe.pstats --top 20
+"""
+
+import argparse
+import cProfile
+import marshal
+import os
+import pstats
+import sys
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+from atomic_output import atomic_open
+
+
+PHASES = ('search', 'parse', 'validate', 'probe', 'output')
+MODES = ('deterministic', 'sampling')
+SAMPLING_INTERVAL = 0.005
+# Deterministic stacks below this share of the phase's time are left out of the collapsed file
+COLLAPSE_MIN_SHARE = 1e-4
+
+
+def function_label(func):
+    """Name a pstats function key (filename, line, name) like pstats does, with a short filename."""
+    filename, line, name = func
+    if filename == '~' and line == 0:
+        # Built-ins: "<built-in method time.sleep>"
+        return name
+    return f"{os.path.basename(filename)}:{line}({name})"
+
+
+def top_functions(stats, limit):
+    """
+    Return the hottest functions of a pstats stats dict by own time.
+
+    Returns:
+        list: [(label, own seconds, cumulative seconds, calls)] for up to limit functions
+    """
+    rows = sorted(stats.items(), key=lambda item: item[1][2], reverse=True)[:limit]
+    return [(function_label(func), tt, ct, nc) for func, (cc, nc, tt, ct, callers) in rows]
+
+
+def collapse_stats(stats):
+    """
+    Rebuild approximate call stacks from a cProfile stats dict.
+
+    Each function's time is split over the paths reaching it in proportion
+    to the time its callers spent calling it. Recursion is cut at the first
+    repeat of a function on a path.
+
+    Returns:
+        dict: {tuple of function labels, root first: own seconds on that stack}
+    """
+    callees = defaultdict(dict)
+    for func, (_, _, _, _, callers) in stats.items():
+        for caller, edge in callers.items():
+            # cProfile: (cc, nc, tt, ct) per caller
+            callees[caller][func] = edge[3] if isinstance(edge, tuple) else 0.0
+    total = sum(entry[2] for entry in stats.values())
+    threshold = total * COLLAPSE_MIN_SHARE
+    stacks = defaultdict(float)
+
+    def walk(func, path, on_path, seconds):
+        _, _, tt, ct, _ = stats[func]
+        share = seconds / ct if ct else 0.0
+        path = path + (function_label(func),)
+        if tt * share > 0:
+            stacks[path] += tt * share
+        for callee, edge_seconds in callees.get(func, {}).items():
+            if callee in on_path or callee not in stats or edge_seconds * share < threshold:
+                continue
+            walk(callee, path, on_path | {callee}, edge_seconds * share)
+
+    for func, (_, _, _, ct, callers) in stats.items():
+        # Roots: functions whose callers were not profiled (entered before the phase started)
+        if not any(caller in stats for caller in callers):
+            walk(func, (), {func}, ct)
+    return dict(stacks)
+
+
+class _Sampler:
+    """Sample one thread's stack on a timer, crediting each sample to the phase running at the time."""
+
+    def __init__(self, thread_id, current_phase, interval):
+        self.thread_id = thread_id
+        self.current_phase = current_phase
+        self.interval = interval
+        self.samples = defaultdict(lambda: defaultdict(float))   # phase -> {stack: seconds}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='phase-profiler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            phase = self.current_phase()
+            frame = sys._current_frames().get(self.thread_id)
+            if phase is None or frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+                frame = frame.f_back
+            # Each sample stands for one interval; a late wakeup is not credited to the stack it lands on
+            self.samples[phase][tuple(reversed(stack))] += self.interval
+            del frame
+
+    def stats(self, phase):
+        """Build a pstats stats dict from one phase's samples."""
+        stats = {}
+        for stack, seconds in self.samples.get(phase, {}).items():
+            seen = set()
+            for depth, func in enumerate(stack):
+                cc, nc, tt, ct, callers = stats.get(func, (0, 0, 0.0, 0.0, {}))
+                leaf = depth == len(stack) - 1
+                if func not in seen:
+                    # Recursive frames count once per sample toward cumulative time
+                    seen.add(func)
+                    cc, nc, ct = cc + 1, nc + 1, ct + seconds
+                if leaf:
+                    tt += seconds
+                if depth:
+                    caller = stack[depth - 1]
+                    e_cc, e_nc, e_tt, e_ct = callers.get(caller, (0, 0, 0.0, 0.0))
+                    callers[caller] = (e_cc + 1, e_nc + 1, e_tt + (seconds if leaf else 0.0), e_ct + seconds)
+                stats[func] = (cc, nc, tt, ct, callers)
+        return stats
+
+
+class PhaseProfiler:
+    """
+    Profile the crawler's phases separately.
+
+    Disabled (mode None) it does nothing, so phase() can stay on the hot path.
+
+    Args:
+        mode: 'deterministic', 'sampling' or None
+        interval: Seconds between samples in sampling mode
+    """
+
+    def __init__(self, mode=None, interval=SAMPLING_INTERVAL):
+        if mode not in MODES + (None,):
+            raise ValueError(f"Unknown profiling mode {mode!r}, expected one of {MODES}")
+        self.mode = mode
+        self.interval = interval
+        self._stack = []
+        self._profiles = {}
+        self._sampler = None
+        self._thread_id = None
+
+    @property
+    def enabled(self):
+        return self.mode is not None
+
+    def start(self):
+        """Start profiling phases entered from the calling thread."""
+        if not self.enabled or self._thread_id is not None:
+            return
+        self._thread_id = threading.get_ident()
+        if self.mode == 'sampling':
+            self._sampler = _Sampler(self._thread_id, self.current_phase, self.interval)
+            self._sampler.start()
+
+    def stop(self):
+        """Stop profiling; the collected profiles stay available to top() and write()."""
+        if self._sampler is not None:
+            self._sampler.stop()
+        while self._stack:
+            self._leave()
+        self._thread_id = None
+
+    def current_phase(self):
+        stack = self._stack
+        return stack[-1] if stack else None
+
+    def _enter(self, name):
+        if self.mode == 'deterministic':
+            if self._stack:
+                self._profiles[self._stack[-1]].disable()
+            self._profiles.setdefault(name, cProfile.Profile()).enable()
+        self._stack.append(name)
+
+    def _leave(self):
+        name = self._stack.pop()
+        if self.mode == 'deterministic':
+            self._profiles[name].disable()
+            if self._stack:
+                self._profiles[self._stack[-1]].enable()
+
+    @contextmanager
+    def phase(self, name):
+        """Profile the block as phase name (nested phases take their time out of this one)."""
+        if self._thread_id != threading.get_ident():
+            # Disabled, not started, or another thread (e.g. a watch-mode re-crawl)
+            yield
+            return
+        self._enter(name)
+        try:
+            yield
+        finally:
+            self._leave()
+
+    def stats(self, name):
+        """Return a phase's pstats stats dict ({} if it never ran)."""
+        if self.mode == 'deterministic':
+            profile = self._profiles.get(name)
+            if profile is None:
+                return {}
+            # snapshot_stats, unlike create_stats, leaves a running profiler enabled
+            profile.snapshot_stats()
+            return profile.stats
+        return self._sampler.stats(name) if self._sampler is not None else {}
+
+    def collapsed(self, name):
+        """Return a phase's {stack: seconds}, stacks as tuples of function labels, root first."""
+        if self.mode == 'deterministic':
+            return collapse_stats(self.stats(name))
+        stacks = defaultdict(float)
+        if self._sampler is not None:
+            for stack, seconds in self._sampler.samples.get(name, {}).items():
+                stacks[tuple(function_label(func) for func in stack)] += seconds
+        return dict(stacks)
+
+    def phases(self):
+        """Return the phases that were profiled, in PHASES order."""
+        profiled = set(self._profiles) | set(self._sampler.samples if self._sampler is not None else ())
+        return [name for name in PHASES if name in profiled] + sorted(profiled - set(PHASES))
+
+    def report(self, limit=10):
+        """
+        Summarize every profiled phase.
+
+        Returns:
+            dict: {phase: {'seconds': own time of all functions, 'top': top_functions(...)}}
+        """
+        report = {}
+        for name in self.phases():
+            stats = self.stats(name)
+            report[name] = {'seconds': sum(entry[2] for entry in stats.values()),
+                            'top': top_functions(stats, limit)}
+        return report
+
+    def write(self, directory):
+        """
+        Write <phase>.pstats and <phase>.collapsed for every profiled phase.
+
+        Returns:
+            list: Paths written
+        """
+        os.makedirs(directory, exist_ok=True)
+        paths = []
+        for name in self.phases():
+            path = os.path.join(directory, f"{name}.pstats")
+            with atomic_open(path, 'wb') as f:
+                marshal.dump(self.stats(name), f)
+            paths.append(path)
+
+            path = os.path.join(directory, f"{name}.collapsed")
+            with atomic_open(path, 'w') as f:
+                for stack, seconds in sorted(self.collapsed(name).items()):
+                    microseconds = round(seconds * 1e6)
+                    if microseconds:
+                        f.write(';'.join(frame.replace(';', ':') for frame in stack) + f" {microseconds}\n")
+            paths.append(path)
+        return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print the hottest functions of a phase profile")
+    parser.add_argument('path', help="A <phase>.pstats file written by --profile")
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--sort', default='tottime', help="pstats sort key, e.g. tottime, cumulative, ncalls")
+    args = parser.parse_args()
+
+    pstats.Stats(args.path).strip_dirs().sort_stats(args.sort).print_stats(args.top)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+"""
+Precomputed ranking keys and sorted orderings for the catalog.
+
+Scores every workspace once per run so clients can render sorted views
+without sorting the whole catalog themselves:
+
+- popularity: repo stars on a log scale, relative to the most-starred repo
+- freshness: halves every FRESHNESS_HALF_LIFE_DAYS since the repo's last commit
+- compatibility_breadth: share of the catalog's Kasm release series the
+  workspace has pullable images for
+- image_freshness: how recent the newest Kasm release series it supports is
+
+The combined score is a weighted sum of the four. rankings.json holds the
+per-workspace scores and pre-sorted id arrays for the common orderings.
+Freshness is measured from the newest last_commit in the catalog rather
+than the wall clock, so the same catalog always ranks to the same file.
+"""
+
+import argparse
+import json
+import math
+import re
+from datetime import datetime, timezone
+
+from catalog_utils import iter_compatibility, iter_workspaces, workspace_id
+
+
+FRESHNESS_HALF_LIFE_DAYS = 180
+SCORE_WEIGHTS = {
+    'popularity': 0.4,
+    'freshness': 0.25,
+    'compatibility_breadth': 0.15,
+    'image_freshness': 0.2,
+}
+# Same fallback the frontend uses for repos without a last_commit
+DEFAULT_LAST_COMMIT = '2024-01-01T00:00:00Z'
+VERSION_RE = re.compile(r'^\s*v?(\d+)\.(\d+)')
+
+
+def version_series(version):
+    """Return the (major, minor) Kasm release series of a version string, or None."""
+    match = VERSION_RE.match(version) if isinstance(version, str) else None
+    return (int(match.group(1)), int(match.group(2))) if match else None
+
+
+def parse_timestamp(value):
+    """Parse an ISO 8601 timestamp; fall back to DEFAULT_LAST_COMMIT when missing or malformed."""
+    for candidate in (value, DEFAULT_LAST_COMMIT):
+        try:
+            parsed = datetime.fromisoformat(str(candidate).replace('Z', '+00:00'))
+        except ValueError:
+            continue
+        return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def compute_rankings(catalog, now=None):
+    """
+    Score every workspace and build the sorted orderings.
+
+    Args:
+        catalog: community_workspaces.json content
+        now: Reference time for freshness (defaults to the newest last_commit in the catalog)
+
+    Returns:
+        dict: {'generated_at' (the reference time), 'weights',
+               'scores': {workspace_id: {popularity, freshness, compatibility_breadth,
+                                         image_freshness, score}},
+               'orderings': {'stars' | 'updated' | 'score' | 'compatibility' | 'image_freshness':
+                             [workspace ids, best first]}}
+    """
+    workspaces = []
+    all_series = set()
+    max_stars = 0
+    for repo, repo_entry, ws_name, ws_data in iter_workspaces(catalog):
+        series = {version_series(version) for version, _, _ in iter_compatibility(ws_data)}
+        series.discard(None)
+        all_series.update(series)
+        stars = repo_entry.get('stars') if isinstance(repo_entry.get('stars'), int) else 0
+        max_stars = max(max_stars, stars)
+        workspaces.append({
+            'id': workspace_id(repo, ws_name),
+            'name': str(ws_data.get('friendly_name') or ws_name),
+            'stars': stars,
+            'last_commit': parse_timestamp(repo_entry.get('last_commit')),
+            'series': series,
+        })
+
+    if now is None:
+        now = max((workspace['last_commit'] for workspace in workspaces),
+                  default=parse_timestamp(DEFAULT_LAST_COMMIT))
+
+    # Series rank 0..1 across the catalog: the newest release the catalog knows scores 1
+    ordered_series = sorted(all_series)
+    series_rank = {
+        series: (index / (len(ordered_series) - 1) if len(ordered_series) > 1 else 1.0)
+        for index, series in enumerate(ordered_series)
+    }
+    star_scale = math.log1p(max_stars) or 1.0
+
+    scores = {}
+    for workspace in workspaces:
+        age_days = max(0.0, (now - workspace['last_commit']).total_seconds() / 86400)
+        components = {
+            'popularity': math.log1p(workspace['stars']) / star_scale,
+            'freshness': 0.5 ** (age_days / FRESHNESS_HALF_LIFE_DAYS),
+            'compatibility_breadth': len(workspace['series']) / len(ordered_series) if ordered_series else 0.0,
+            'image_freshness': max((series_rank[s] for s in workspace['series']), default=0.0),
+        }
+        components['score'] = sum(SCORE_WEIGHTS[key] * components[key] for key in SCORE_WEIGHTS)
+        scores[workspace['id']] = {key: round(value, 4) for key, value in components.items()}
+
+    def ordering(*keys):
+        # Every ordering ends with name then id so ties are broken the same way on every run
+        return [
+            workspace['id'] for workspace in sorted(
+                workspaces,
+                key=lambda w: tuple(key(w) for key in keys) + (w['name'].casefold(), w['id'])
+            )
+        ]
+
+    by_stars = lambda w: -w['stars']
+    by_updated = lambda w: -w['last_commit'].timestamp()
+    orderings = {
+        # 'stars' and 'updated' match the explorer's "Most stars" / "Most recently updated" sorts
+        'stars': ordering(by_stars, by_updated),
+        'updated': ordering(by_updated, by_stars),
+        'score': ordering(lambda w: -scores[w['id']]['score']),
+        'compatibility': ordering(lambda w: -len(w['series']), by_stars),
+        'image_freshness': ordering(lambda w: -scores[w['id']]['image_freshness'], by_stars),
+    }
+
+    return {
+        'generated_at': now.strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'weights': SCORE_WEIGHTS,
+        'scores': scores,
+        'orderings': orderings,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show the top workspaces for a ranking")
+    parser.add_argument('--file', default='generated/community_workspaces.json', help="Catalog JSON file")
+    parser.add_argument('--order', default='score',
+                        choices=('stars', 'updated', 'score', 'compatibility', 'image_freshness'))
+    parser.add_argument('--top', type=int, default=20)
+    args = parser.parse_args()
+
+    with open(args.file, 'r') as f:
+        catalog = json.load(f)
+    rankings = compute_rankings(catalog)
+    for ws_id in rankings['orderings'][args.order][:args.top]:
+        print(f"{rankings['scores'][ws_id]['score']:.3f}  {ws_id}")
+
+
+if __name__ == "__main__":
+    main()
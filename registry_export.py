@@ -0,0 +1,163 @@
+"""
+Export the catalog as one self-hosted Kasm workspace registry.
+
+A Kasm server fetches and parses every registry it is given separately, so
+adding hundreds of community registries is slow. This module writes the
+whole filtered catalog (the version-preserving workspace.json entries kept
+by filter_original_workspace_json) as a single registry:
+
+    registry/
+        1.0/list.json               every workspace, in its original format
+        workspaces/<sha256>.json    one content-addressed entry per workspace
+        index.json                  workspace id -> entry file, list hashes
+
+An entry's file name is the sha256 of its bytes, so a rebuild only writes
+entries for workspaces that changed, removes entries nothing points at any
+more, and leaves list files untouched when their content did not change
+(static hosts keep serving the same ETag). Identical workspaces published
+by several repos (forks) are listed once.
+
+Relative icon paths are rewritten to the source registry's Pages site,
+where the icon is actually hosted.
+
+    python registry_export.py generated/community_workspaces.json --out generated/registry
+"""
+
+import argparse
+import hashlib
+import json
+import os
+
+from atomic_output import atomic_open
+from catalog_utils import REGISTRY_LIST_FORMATS, iter_workspaces, registry_list_path, workspace_format, workspace_id
+from compact_records import to_builtin
+
+
+INDEX_FORMAT_VERSION = 1
+REGISTRY_NAME = 'Kasm Community Images'
+
+
+def encode(value):
+    """Canonical JSON bytes: the same value always gives the same file and hash."""
+    return json.dumps(value, sort_keys=True, separators=(',', ':'), default=to_builtin).encode('utf-8')
+
+
+def registry_entry(repo_entry, ws_data):
+    """Return the workspace.json to publish, with a relative image_src made absolute."""
+    entry = dict(ws_data)
+    image_src = entry.get('image_src')
+    github_pages = repo_entry.get('github_pages')
+    if isinstance(image_src, str) and image_src and not image_src.startswith(('http://', 'https://')) \
+            and github_pages:
+        entry['image_src'] = f"{github_pages.rstrip('/')}/{image_src.lstrip('/')}"
+    return entry
+
+
+def load_index(out_dir):
+    """Return the previous export's index, or an empty one."""
+    try:
+        with open(os.path.join(out_dir, 'index.json'), 'r') as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return {'workspaces': {}, 'lists': {}}
+    if index.get('format_version') != INDEX_FORMAT_VERSION:
+        return {'workspaces': {}, 'lists': {}}
+    return index
+
+
+def export_registry(catalog, out_dir='generated/registry', name=REGISTRY_NAME):
+    """
+    Write or update the aggregated registry.
+
+    Args:
+        catalog: community_workspaces.json content
+        out_dir: Registry root directory
+        name: Registry name written to each list file
+
+    Returns:
+        tuple: (paths of the list files and index, stats dict)
+    """
+    entries_dir = os.path.join(out_dir, 'workspaces')
+    os.makedirs(entries_dir, exist_ok=True)
+    previous = load_index(out_dir)
+    stats = {'registry_workspaces': 0, 'registry_entries_written': 0, 'registry_entries_unchanged': 0,
+             'registry_entries_removed': 0, 'registry_lists_written': 0}
+
+    index = {}
+    lists = {version: [] for version in REGISTRY_LIST_FORMATS}
+    listed = set()
+    for repo, repo_entry, ws_name, ws_data in iter_workspaces(catalog):
+        entry = registry_entry(repo_entry, ws_data)
+        data = encode(entry)
+        digest = hashlib.sha256(data).hexdigest()
+        path = f"workspaces/{digest}.json"
+        index[workspace_id(repo, ws_name)] = path
+        if digest in listed:
+            continue  # Same workspace published by another repo
+        listed.add(digest)
+        stats['registry_workspaces'] += 1
+
+        if os.path.exists(os.path.join(out_dir, path)):
+            stats['registry_entries_unchanged'] += 1
+        else:
+            with atomic_open(os.path.join(out_dir, path), 'wb') as f:
+                f.write(data)
+            stats['registry_entries_written'] += 1
+        ws_format = workspace_format(entry)
+        for version, formats in REGISTRY_LIST_FORMATS.items():
+            if ws_format in formats:
+                lists[version].append(entry)
+
+    list_paths = []
+    list_hashes = {}
+    for version, workspaces in lists.items():
+        data = encode({'name': name, 'schema_version': version, 'workspaces': workspaces})
+        digest = hashlib.sha256(data).hexdigest()
+        path = os.path.join(out_dir, *registry_list_path(version).split('/'))
+        list_hashes[version] = digest
+        list_paths.append(path)
+        if previous['lists'].get(version) == digest and os.path.exists(path):
+            continue
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with atomic_open(path, 'wb') as f:
+            f.write(data)
+        stats['registry_lists_written'] += 1
+
+    # Lists an earlier export wrote for list versions no longer published
+    for version in previous['lists']:
+        path = os.path.join(out_dir, *registry_list_path(version).split('/'))
+        if version not in lists and os.path.exists(path):
+            os.remove(path)
+
+    # Entries no workspace points at any more: changed or removed workspaces
+    in_use = {path.rsplit('/', 1)[-1] for path in index.values()}
+    for filename in os.listdir(entries_dir):
+        if filename.endswith('.json') and filename not in in_use:
+            os.remove(os.path.join(entries_dir, filename))
+            stats['registry_entries_removed'] += 1
+
+    index_path = os.path.join(out_dir, 'index.json')
+    with atomic_open(index_path) as f:
+        json.dump({'format_version': INDEX_FORMAT_VERSION, 'name': name, 'lists': list_hashes,
+                   'workspaces': dict(sorted(index.items()))}, f, indent=4)
+    return list_paths + [index_path], stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the catalog as one Kasm workspace registry")
+    parser.add_argument('catalog', nargs='?', default='generated/community_workspaces.json',
+                        help="community_workspaces.json to export")
+    parser.add_argument('--out', default='generated/registry', help="Registry root directory")
+    parser.add_argument('--name', default=REGISTRY_NAME, help="Registry name")
+    args = parser.parse_args()
+
+    with open(args.catalog, 'r') as f:
+        catalog = json.load(f)
+    _, stats = export_registry(catalog, args.out, args.name)
+    print(f"Exported {stats['registry_workspaces']} workspaces to {args.out}: "
+          f"{stats['registry_entries_written']} entries written, {stats['registry_entries_removed']} removed, "
+          f"{stats['registry_lists_written']} list files updated")
+
+
+if __name__ == '__main__':
+    main()
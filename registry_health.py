@@ -0,0 +1,198 @@
+"""
+Per-registry probe timeouts and circuit breakers.
+
+skopeo probes used to share one flat timeout, so a registry that is down
+cost the full timeout for every image it hosts. RegistryHealth keeps, for
+each registry host:
+
+- a window of recent probe latencies; once enough have been seen the probe
+  timeout becomes a multiple of their 95th percentile (bounded by a floor
+  and by the default timeout), so a stalled request to a registry that
+  normally answers in a second is given up on early
+- a circuit breaker. After `failure_threshold` consecutive failures
+  (timeouts, unreachable host) it opens and probes to that registry are not
+  run at all. After `cooldown` seconds it goes half-open and lets a single
+  probe through: success closes it, failure opens it again.
+
+A registry answering "manifest unknown" or "unauthorized" is healthy; only
+failures to get an answer count against the breaker.
+"""
+
+import math
+import threading
+import time
+from collections import deque
+
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# skopeo error output that means the registry could not be reached at all
+UNREACHABLE_MARKERS = (
+    'connection refused',
+    'connection reset',
+    'no such host',
+    'i/o timeout',
+    'tls handshake timeout',
+    'network is unreachable',
+    'no route to host',
+    'server misbehaving',
+    'context deadline exceeded',
+    '502 bad gateway',
+    '503 service unavailable',
+    '504 gateway timeout',
+)
+
+
+def is_unreachable_error(stderr):
+    """Return True if skopeo's error output means the registry did not answer."""
+    stderr = (stderr or '').lower()
+    return any(marker in stderr for marker in UNREACHABLE_MARKERS)
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of a non-empty sequence (q in 0..100)."""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+class CircuitBreaker:
+    """
+    Closed / open / half-open breaker for one registry.
+
+    Args:
+        failure_threshold: Consecutive failures that open the breaker
+        cooldown: Seconds the breaker stays open before a trial probe
+        clock: Monotonic clock, overridable for tests
+    """
+
+    def __init__(self, failure_threshold=3, cooldown=60.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.clock = clock
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.times_opened = 0
+        self._trial_in_flight = False
+
+    def allow(self):
+        """Return True if a probe may run now (claims the trial slot when half-open)."""
+        if self.state == OPEN and self.clock() - self.opened_at >= self.cooldown:
+            self.state = HALF_OPEN
+        if self.state == CLOSED:
+            return True
+        if self.state == HALF_OPEN and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        self._trial_in_flight = False
+        if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != OPEN:
+                self.times_opened += 1
+            self.state = OPEN
+            self.opened_at = self.clock()
+
+
+class RegistryHealth:
+    """
+    Latency tracking and circuit breakers for every registry probed in a run.
+
+    Args:
+        default_timeout: Timeout until enough latencies are known, and the upper bound
+        min_timeout: Lower bound of an adaptive timeout
+        multiplier: Adaptive timeout = multiplier x the latency percentile
+        latency_percentile: Which percentile of recent latencies to use
+        min_samples: Latencies needed before the timeout adapts
+        window: How many recent latencies to keep per registry
+        failure_threshold: Consecutive failures that open a registry's breaker
+        cooldown: Seconds before an open breaker lets a trial probe through
+        clock: Monotonic clock, overridable for tests
+    """
+
+    def __init__(self, default_timeout=45.0, min_timeout=5.0, multiplier=4.0, latency_percentile=95,
+                 min_samples=5, window=50, failure_threshold=3, cooldown=60.0, clock=time.monotonic):
+        self.default_timeout = default_timeout
+        self.min_timeout = min_timeout
+        self.multiplier = multiplier
+        self.latency_percentile = latency_percentile
+        self.min_samples = min_samples
+        self.window = window
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.clock = clock
+        self.latencies = {}
+        self.failure_costs = {}
+        self.breakers = {}
+        self._lock = threading.Lock()
+
+    def _breaker(self, registry):
+        if registry not in self.breakers:
+            self.breakers[registry] = CircuitBreaker(self.failure_threshold, self.cooldown, self.clock)
+            self.latencies[registry] = deque(maxlen=self.window)
+        return self.breakers[registry]
+
+    def timeout(self, registry):
+        """Timeout for the next probe to registry."""
+        with self._lock:
+            samples = self.latencies.get(registry)
+            if not samples or len(samples) < self.min_samples:
+                return self.default_timeout
+            adaptive = self.multiplier * percentile(samples, self.latency_percentile)
+            return min(self.default_timeout, max(self.min_timeout, adaptive))
+
+    def failure_cost(self, registry):
+        """Seconds the last failed probe to registry took (what a skipped probe saves)."""
+        with self._lock:
+            return self.failure_costs.get(registry, self.default_timeout)
+
+    def allow(self, registry):
+        """Return True unless the registry's breaker is open."""
+        with self._lock:
+            return self._breaker(registry).allow()
+
+    def state(self, registry):
+        with self._lock:
+            return self._breaker(registry).state
+
+    def record(self, registry, elapsed, ok):
+        """
+        Record a probe outcome.
+
+        Args:
+            registry: Registry host
+            elapsed: Seconds the probe took (only kept as a latency sample when ok)
+            ok: False if the registry timed out or could not be reached
+        """
+        with self._lock:
+            breaker = self._breaker(registry)
+            if ok:
+                self.latencies[registry].append(elapsed)
+                breaker.record_success()
+            else:
+                self.failure_costs[registry] = elapsed
+                breaker.record_failure()
+
+    def report(self):
+        """Return {registry: {'state', 'times_opened', 'samples', 'p95', 'timeout'}}."""
+        report = {}
+        for registry in sorted(self.breakers):
+            samples = list(self.latencies[registry])
+            report[registry] = {
+                'state': self.breakers[registry].state,
+                'times_opened': self.breakers[registry].times_opened,
+                'samples': len(samples),
+                'p95': round(percentile(samples, 95), 3) if samples else None,
+                'timeout': round(self.timeout(registry), 3)
+            }
+        return report
@@ -0,0 +1,114 @@
+"""
+Run deadline and per-phase time budgets for the crawler.
+
+A RunBudget splits an overall deadline into shares for the search, crawl
+and publish phases. The crawler asks it whether a phase still has time
+before starting expensive work (an image probe, a repo crawl) and caps
+probe timeouts to what is left, degrading to cached results instead of
+running past the deadline. Publishing always keeps its reserved share so
+a complete catalog is written on time.
+"""
+
+import math
+import time
+from contextlib import contextmanager
+
+
+DEFAULT_PHASE_SHARES = {
+    'search': 0.1,
+    'crawl': 0.8,
+    'publish': 0.1,
+}
+
+
+class RunBudget:
+    """
+    Track elapsed time against a deadline and per-phase budgets.
+
+    Args:
+        deadline: Seconds the whole run may take, or None for no limit
+        phase_shares: {phase: fraction of the deadline}; phases not listed
+                      are unbudgeted (tracked but never exhausted)
+        clock: Monotonic clock, overridable for tests
+    """
+
+    def __init__(self, deadline=None, phase_shares=None, clock=time.monotonic):
+        self.deadline = deadline if deadline and deadline > 0 else None
+        self.phase_shares = dict(DEFAULT_PHASE_SHARES if phase_shares is None else phase_shares)
+        self.clock = clock
+        self.started = clock()
+        self.current = None
+        self._phase_started = None
+        self.phase_elapsed = {}
+
+    def start_phase(self, name):
+        self.end_phase()
+        self.current = name
+        self._phase_started = self.clock()
+
+    def end_phase(self):
+        if self.current is not None:
+            elapsed = self.clock() - self._phase_started
+            self.phase_elapsed[self.current] = self.phase_elapsed.get(self.current, 0.0) + elapsed
+        self.current = None
+        self._phase_started = None
+
+    @contextmanager
+    def phase(self, name):
+        self.start_phase(name)
+        try:
+            yield self
+        finally:
+            self.end_phase()
+
+    def elapsed(self, name=None):
+        """Seconds spent overall, or in one phase (including the running one)."""
+        if name is None:
+            return self.clock() - self.started
+        elapsed = self.phase_elapsed.get(name, 0.0)
+        if name == self.current:
+            elapsed += self.clock() - self._phase_started
+        return elapsed
+
+    def phase_budget(self, name):
+        """Seconds allotted to a phase, or None if it is unbudgeted."""
+        if self.deadline is None or name not in self.phase_shares:
+            return None
+        return self.deadline * self.phase_shares[name]
+
+    def remaining(self, name=None):
+        """
+        Seconds left for a phase (or the run), whichever runs out first.
+
+        Time reserved for phases that have not started yet is not available
+        to the current one, so an overrunning crawl cannot eat the publish share.
+        """
+        if self.deadline is None:
+            return math.inf
+        reserved = sum(
+            self.deadline * share for phase, share in self.phase_shares.items()
+            if phase != name and phase not in self.phase_elapsed and phase != self.current
+        )
+        overall = self.deadline - self.elapsed() - reserved
+        budget = self.phase_budget(name) if name else None
+        if budget is None:
+            return overall
+        return min(overall, budget - self.elapsed(name))
+
+    def exhausted(self, name=None):
+        return self.remaining(name) <= 0
+
+    def timeout(self, default, name=None, minimum=1.0):
+        """Cap a timeout to the time left, but never below minimum seconds."""
+        return max(minimum, min(default, self.remaining(name)))
+
+    def report(self):
+        """Return {'deadline', 'elapsed', 'phases': {name: {'elapsed', 'budget'}}} for the summary."""
+        phases = {}
+        for name in list(self.phase_shares) + [p for p in self.phase_elapsed if p not in self.phase_shares]:
+            budget = self.phase_budget(name)
+            phases[name] = {
+                'elapsed': round(self.elapsed(name), 2),
+                'budget': round(budget, 2) if budget is not None else None
+            }
+        return {'deadline': self.deadline, 'elapsed': round(self.elapsed(), 2), 'phases': phases}
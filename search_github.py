@@ -1,8 +1,19 @@
+import argparse
+import hashlib
 import json
+import pickle
+import re
 import requests
+import sys
 import time
 import subprocess
 import shutil
+from collections import ChainMap, deque
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from urllib.parse import urljoin
 from better_profanity import profanity
 
 # dotenv for local development
@@ -10,6 +21,25 @@ from dotenv import load_dotenv
 import os
 load_dotenv()
 
+import webhook_server
+from atomic_output import atomic_open, write_manifest
+from binary_catalog import write_binary_catalog
+from cassette import Cassette, request_key
+from catalog_diff import compute_diff
+from catalog_store import CatalogStore, image_registry
+from catalog_utils import iter_compatibility, iter_workspaces, registry_list_path, workspace_id
+from compact_records import RepoStats, compact, compact_catalog, to_builtin
+from icon_thumbnails import MAX_ICON_BYTES, build_thumbnails
+from image_policy import ALLOW, BLOCK, ImagePolicy, PolicyRule, canonical_registry, load_policy_file
+from layer_planner import build_prepull_plan, manifest_layers
+from near_duplicates import find_near_duplicates
+from phase_profiler import MODES as PROFILE_MODES, PhaseProfiler
+from ranking import compute_rankings
+from registry_export import export_registry
+from registry_health import RegistryHealth, is_unreachable_error
+from run_budget import RunBudget
+from token_pool import TokenPool, resource_for_url
+
 # load whitelist
 with open('profanity_whitelist.json', 'r') as f:
     profanity_whitelist = json.load(f)
@@ -17,15 +47,56 @@ with open('profanity_whitelist.json', 'r') as f:
 # Load profanity filter word list
 profanity.load_censor_words(whitelist_words=profanity_whitelist)
 
-GITHUB_PAT = os.getenv('GH_PAT')
+# One token (GH_PAT) or a comma-separated pool (GH_PATS) whose rate limits add up
+GITHUB_TOKENS = [token for token in os.getenv('GH_PATS', '').split(',') if token.strip()] or \
+    [token for token in [os.getenv('GH_PAT')] if token]
 
 # if running locally, automatically set DEBUG mode
 DEBUG = os.getenv('DEBUG', 'true').lower() == 'true'
 
-if not GITHUB_PAT:
-    raise ValueError("GH_PAT environment variable not set. Please set it in the .env file or Secret Manager.")
+# Optional SQLite catalog store (e.g. generated/catalog.db). When set, repos are
+# upserted as they are parsed and community_workspaces.json is exported from it.
+CATALOG_DB = os.getenv('CATALOG_DB')
+
+if not GITHUB_TOKENS:
+    raise ValueError("GH_PAT environment variable not set. Please set it (or GH_PATS) in the .env file or Secret Manager.")
+TOKEN_POOL = TokenPool(GITHUB_TOKENS)
+# Extra attempts of a request after waiting for a rate-limit reset, when every token is out
+RATE_LIMIT_RETRIES = 3
+
+# Overridable so the crawl can be pointed at a mock API for local testing
+GITHUB_API_URL = os.getenv('GITHUB_API_URL', 'https://api.github.com').rstrip('/')
+SKOPEO_BIN = os.getenv('SKOPEO_BIN', 'skopeo')
+REQUEST_DELAY = float(os.getenv('GITHUB_REQUEST_DELAY', '0.5'))
+
+# Registries built from the workspaces_registry_template publish every workspace.json
+# in one listing on their GitHub Pages site. When that listing is newer than the repo's
+# last push it replaces the per-folder walk through the contents API.
+PAGES_FAST_PATH = os.getenv('PAGES_FAST_PATH', 'true').lower() == 'true'
+PAGES_LISTING_PATH = os.getenv('PAGES_LISTING_PATH', registry_list_path())
+PAGES_TIMEOUT = 30
+MAX_PAGES_LISTING_BYTES = 16 * 1024 * 1024
+# Added to each entry by the registry build; not part of the repo's workspace.json
+PAGES_LISTING_BUILD_FIELDS = ('sha',)
+
+# Fetch workspace icons and write generated/thumbnails/ (needs Pillow to render)
+GENERATE_THUMBNAILS = os.getenv('GENERATE_THUMBNAILS', 'false').lower() == 'true'
+THUMBNAIL_STATS = {}
+
+# Record the layers of every probed image and write generated/prepull_plan.json
+PREPULL_PLAN = os.getenv('PREPULL_PLAN', 'false').lower() == 'true'
+# skopeo_inspect cache key -> [(layer digest, compressed size)]
+IMAGE_LAYERS = {}
+# skopeo_inspect cache key -> digest of the manifest the probe was answered with
+IMAGE_DIGESTS = {}
+PREPULL_PLAN_SUMMARY = {}
+
+# Also write the catalog as one self-hosted Kasm registry (see registry_export.py)
+REGISTRY_EXPORT = os.getenv('REGISTRY_EXPORT', 'false').lower() == 'true'
+REGISTRY_EXPORT_DIR = os.getenv('REGISTRY_EXPORT_DIR', 'generated/registry')
+REGISTRY_EXPORT_STATS = {}
 
-SEARCH_URL = "https://api.github.com/search/repositories"
+SEARCH_URL = f"{GITHUB_API_URL}/search/repositories"
 SEARCH_QUERY = 'in:readme sort:updated -user:kasmtech "KASM-REGISTRY-DISCOVERY-IDENTIFIER"'
 
 
@@ -37,25 +108,28 @@ IMAGE_NAME_PREFIX_FILTERS = [
     "kasmweb/"
 ]
 
+# Optional JSON file with more block/allow rules and the default action (see image_policy.py)
+IMAGE_POLICY_FILE = os.getenv('IMAGE_POLICY_FILE')
 
-def should_skip_image(image_name, docker_registry=None):
-    """Return True when the image belongs to a blocked registry prefix."""
-    if not image_name:
-        return False
 
-    image_name = image_name.strip()
-    candidates = [image_name]
+def load_image_policy(policy_file=None):
+    """Compile IMAGE_NAME_PREFIX_FILTERS (as block rules) and the rules in policy_file."""
+    rules = [PolicyRule(BLOCK, prefix, 'IMAGE_NAME_PREFIX_FILTERS') for prefix in IMAGE_NAME_PREFIX_FILTERS]
+    default = ALLOW
+    if policy_file:
+        file_rules, default = load_policy_file(policy_file)
+        rules += file_rules
+    return ImagePolicy(rules, default)
 
-    if docker_registry:
-        docker_registry = docker_registry.strip()
-        if docker_registry and not image_name.startswith(f"{docker_registry}/"):
-            candidates.append(f"{docker_registry}/{image_name}")
 
-    for candidate in candidates:
-        if any(candidate.startswith(prefix) for prefix in IMAGE_NAME_PREFIX_FILTERS):
-            return True
+IMAGE_POLICY = load_image_policy(IMAGE_POLICY_FILE)
 
-    return False
+
+def should_skip_image(image_name, docker_registry=None):
+    """Return True when the image policy blocks the image."""
+    if not image_name or not image_name.strip():
+        return False
+    return IMAGE_POLICY.evaluate(image_name, canonical_registry(docker_registry)).blocked
 
 # Statistics tracking
 STATS = {
@@ -67,7 +141,21 @@ STATS = {
     'invalid_registry_urls': 0,
     'truncated_compatibility_workspaces': 0,
     'skopeo_timeouts': 0,
-    'cached_image_hits': 0
+    'cached_image_hits': 0,
+    'schema_invalid_workspaces': 0,
+    'near_duplicate_workspaces': 0,
+    'http_cache_hits': 0,
+    'budget_last_known_probes': 0,
+    'budget_skipped_probes': 0,
+    'budget_reused_repos': 0,
+    'circuit_breaker_skips': 0,
+    'circuit_breaker_seconds_saved': 0,
+    'circuit_last_known_probes': 0,
+    'circuit_skipped_probes': 0,
+    'adaptive_timeout_seconds_saved': 0,
+    'pages_listing_repos': 0,
+    'pages_listing_fallbacks': 0,
+    'contents_requests_saved': 0
 }
 
 # Security and performance limits
@@ -76,57 +164,376 @@ MAX_COMPATIBILITY_ENTRIES = 10
 # Cache for skopeo image inspections (persists during script execution)
 INSPECTED_IMAGES = {}
 
+# Seconds skopeo may take per attempt (an image can take two: plain, then registry-prefixed)
+PROBE_TIMEOUT = 45
 
-def make_request(url, params=None):
-    time.sleep(0.5)  # Rate limiting
-    headers = {
-        "Accept": "application/vnd.github+json",
-        "X-GitHub-Api-Version": "2022-11-28",
-        "Authorization": "Bearer " + GITHUB_PAT
-    }
-    response = requests.get(url, headers=headers, params=params)
+# Per-registry latency tracking and circuit breakers: timeouts shrink to a multiple of a
+# registry's observed p95 latency, and a registry that keeps failing is skipped until a
+# trial probe after PROBE_BREAKER_COOLDOWN seconds succeeds
+REGISTRY_HEALTH = RegistryHealth(
+    default_timeout=PROBE_TIMEOUT,
+    failure_threshold=int(os.getenv('PROBE_BREAKER_THRESHOLD', '3')),
+    cooldown=float(os.getenv('PROBE_BREAKER_COOLDOWN', '60'))
+)
+
+# Run deadline (--deadline / RUN_DEADLINE seconds, unlimited by default). Once the
+# crawl phase is out of time (or an image's registry breaker is open), images are not
+# probed: those in LAST_KNOWN_PULLABLE (published last run) are kept and listed in
+# UNVERIFIED_IMAGES, others are left out.
+RUN_DEADLINE = float(os.getenv('RUN_DEADLINE', '0'))
+BUDGET = RunBudget()
+PREVIOUS_CATALOG = {}
+LAST_KNOWN_PULLABLE = set()
+UNVERIFIED_IMAGES = {}
+# {workspace id: [(version, image)]} of compatibility entries found upstream but
+# dropped because their image was not pullable; tells changes.json which dropped
+# entries became unpullable and which were removed upstream
+UNPULLABLE_ENTRIES = {}
+
+# Optional process pool for the CPU-bound validation stages (0 = in-process)
+VALIDATION_WORKERS = int(os.getenv('VALIDATION_WORKERS', '0'))
+VALIDATION_BATCH_SIZE = 16
+VALIDATION_POOL = None
+
+# Record/replay cassette for offline runs (set from --record / --replay)
+CASSETTE = None
+
+# Per-phase profiles (set from --profile; see phase_profiler.py)
+PROFILER = PhaseProfiler()
+PROFILE_DIR = 'generated/profiles'
+PROFILE_TOP = 10
+
+# Watch mode only: GitHub responses by request, revalidated with If-None-Match
+# (304s don't count against the rate limit), and when each image was probed
+HTTP_CACHE = None
+PROBE_TIMES = {}
+PROBE_CACHE_TTL = 3600
+
+
+def make_request(url, params=None, authenticated=True, max_bytes=None, headers=None):
+    """
+    GET a URL through the cassette and the HTTP cache.
+
+    Authenticated requests to GITHUB_API_URL use the token in TOKEN_POOL with the
+    most requests left for the URL's rate-limit resource, and are retried with
+    another token when one is revoked or rate limited. When every token is rate
+    limited, the request waits for the earliest reset (within the run budget)
+    and is sent again. Other URLs never carry a token.
+
+    Args:
+        url: Request URL
+        params: Optional query parameters
+        authenticated: False to send an API request without a token; requests to
+                       anything but GITHUB_API_URL (raw downloads, Pages sites) never
+                       send one, and skip the API rate limit delay
+        max_bytes: Optional body size limit; see send_request and response_too_large
+        headers: Optional extra request headers. Callers that send their own
+                 conditional headers keep their own cache, so HTTP_CACHE is skipped
+    """
+    if CASSETTE and CASSETTE.replaying:
+        return CASSETTE.replay_http(url, params)
+    cache_key = request_key(url, params) if HTTP_CACHE is not None and not headers else None
+    cached = HTTP_CACHE.get(cache_key) if cache_key else None
+    start = time.perf_counter()
+    if not authenticated or not is_github_api_url(url):
+        response = send_request(url, params, dict(headers or {}), cached, max_bytes)
+    else:
+        resource = resource_for_url(url)
+        response = None
+        # One retry per token (revoked or newly rate limited), then a few after waiting for a reset
+        for _ in range(len(TOKEN_POOL) + RATE_LIMIT_RETRIES):
+            token, wait = TOKEN_POOL.acquire(resource)
+            if token is None:
+                break  # Every token has been revoked
+            if wait:
+                if response is not None and wait > BUDGET.remaining():
+                    print(f"Every GitHub token is out of {resource} requests until after the deadline")
+                    break
+                print(f"Every GitHub token is out of {resource} requests; waiting {wait:.0f}s for a reset")
+                time.sleep(BUDGET.timeout(wait, minimum=0))
+            # Rate limiting: the delay is per token, so a pool of N sends N times as fast
+            time.sleep(REQUEST_DELAY / max(1, TOKEN_POOL.active_count()))
+            api_headers = {
+                **(headers or {}),
+                "Accept": "application/vnd.github+json",
+                "X-GitHub-Api-Version": "2022-11-28",
+                "Authorization": "Bearer " + token
+            }
+            response = send_request(url, params, api_headers, cached, max_bytes)
+            if not TOKEN_POOL.record(token, resource, response.status_code, response.headers):
+                break
+        if response is None:
+            raise RuntimeError("Every GitHub token was rejected (401); check GH_PAT / GH_PATS")
+    # Only the answer the caller gets is recorded, not attempts retried with another token
+    if CASSETTE and CASSETTE.recording:
+        CASSETTE.record_http(url, params, response, time.perf_counter() - start)
+    if cached is not None and response.status_code == 304:
+        STATS['http_cache_hits'] += 1
+        return cached
+    if cache_key and response.status_code == 200 and response.headers.get('ETag'):
+        HTTP_CACHE[cache_key] = response
+    return response
+
+
+def request_icon(url, headers):
+    """Fetch a workspace icon for build_thumbnails: through the cassette, without a token, bounded."""
+    return make_request(url, authenticated=False, max_bytes=MAX_ICON_BYTES, headers=headers)
+
+
+def is_github_api_url(url):
+    """Whether url is a GitHub API request, the only kind the token pool is used for."""
+    return url == GITHUB_API_URL or url.startswith(GITHUB_API_URL + '/')
+
+
+def send_request(url, params, headers, cached, max_bytes=None):
+    """
+    GET url with headers, revalidating a cached response.
+
+    With max_bytes the body is streamed: nothing is downloaded when Content-Length
+    is already over the limit, otherwise at most max_bytes + 1 bytes are read, so
+    response_too_large can tell an oversized body without holding all of it.
+    """
+    if cached is not None:
+        headers['If-None-Match'] = cached.headers['ETag']
+    timeout = None if 'Authorization' in headers else PAGES_TIMEOUT
+    if max_bytes is None:
+        return requests.get(url, headers=headers, params=params, timeout=timeout)
+    response = requests.get(url, headers=headers, params=params, timeout=timeout, stream=True)
+    with response:
+        body = bytearray()
+        if declared_length(response) <= max_bytes:
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                body += chunk
+                if len(body) > max_bytes:
+                    del body[max_bytes + 1:]
+                    break
+    # What response.content would have read; the connection is released by the with block
+    response._content = bytes(body)
     return response
 
 
+def declared_length(response):
+    """Return a response's Content-Length, or 0 if it has none."""
+    length = response.headers.get('Content-Length', '')
+    return int(length) if length.isdigit() else 0
+
+
+def response_too_large(response, max_bytes):
+    """Whether a response fetched with make_request(max_bytes=...) had a body over max_bytes."""
+    return declared_length(response) > max_bytes or len(response.content) > max_bytes
+
+
+def probe_reference(reference, timeout=PROBE_TIMEOUT, manifests=None):
+    """
+    Run one `skopeo inspect` against an image reference, guarded by its registry's circuit breaker.
+
+    Args:
+        reference: Image reference, optionally prefixed with a registry host
+        timeout: Upper bound for the attempt; the registry's adaptive timeout may be shorter
+        manifests: Optional dict that receives {reference: raw manifest} on success
+
+    Returns:
+        str: 'ok', 'error' (the registry answered but the image is not pullable),
+             'unreachable', 'timeout' or 'skipped' (breaker open, skopeo not run)
+    """
+    registry = image_registry(reference)
+    if not REGISTRY_HEALTH.allow(registry):
+        print(f"Skipping {reference}: circuit breaker open for {registry}")
+        STATS['circuit_breaker_skips'] += 1
+        STATS['circuit_breaker_seconds_saved'] += min(timeout, REGISTRY_HEALTH.failure_cost(registry))
+        return 'skipped'
+
+    attempt_timeout = min(timeout, REGISTRY_HEALTH.timeout(registry))
+    cmd = [SKOPEO_BIN, "inspect", "--raw", f"docker://{reference}"]
+    start = time.perf_counter()
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=attempt_timeout)
+    except subprocess.TimeoutExpired:
+        print(f"Timeout inspecting image {reference}")
+        STATS['skopeo_timeouts'] += 1
+        STATS['adaptive_timeout_seconds_saved'] += timeout - attempt_timeout
+        REGISTRY_HEALTH.record(registry, attempt_timeout, ok=False)
+        return 'timeout'
+    elapsed = time.perf_counter() - start
+
+    if result.returncode == 0:
+        REGISTRY_HEALTH.record(registry, elapsed, ok=True)
+        if manifests is not None:
+            manifests[reference] = result.stdout
+        return 'ok'
+    print(f"Error inspecting image {reference}")
+    if is_unreachable_error(result.stderr):
+        REGISTRY_HEALTH.record(registry, elapsed, ok=False)
+        return 'unreachable'
+    # "manifest unknown", "unauthorized": the registry itself is fine
+    REGISTRY_HEALTH.record(registry, elapsed, ok=True)
+    return 'error'
+
+
+def run_skopeo_probe(image_full_name, docker_registry=None, timeout=PROBE_TIMEOUT, manifests=None):
+    """
+    Check with skopeo whether an image is pullable (no caching).
+
+    Args:
+        manifests: Optional dict that receives the raw manifest of the reference that answered
+
+    Returns:
+        bool: Whether the image is pullable, or None if it could not be checked
+              because a registry's circuit breaker is open
+    """
+    # very hacky, could be improved
+    statuses = [probe_reference(image_full_name, timeout, manifests)]
+    if statuses[0] not in ('ok', 'timeout') and docker_registry:
+        print("Trying with registry prefix..")
+        statuses.append(probe_reference(f"{docker_registry}/{image_full_name}", timeout, manifests))
+    if 'ok' in statuses:
+        return True
+    if 'skipped' in statuses:
+        return None
+    return False
+
+
 def skopeo_inspect(image_full_name, docker_registry=None):
     # Check cache first to avoid redundant inspections
     cache_key = f"{docker_registry}/{image_full_name}" if docker_registry else image_full_name
     if cache_key in INSPECTED_IMAGES:
         STATS['cached_image_hits'] += 1
         return INSPECTED_IMAGES[cache_key]
-    
-    # very hacky, could be improved
-    cmd = ["skopeo", "inspect", "--raw", f"docker://{image_full_name}"]
 
+    if CASSETTE and CASSETTE.replaying:
+        result, stats = CASSETTE.replay_probe(cache_key)
+        for key, value in stats.items():
+            STATS[key] = STATS.get(key, 0) + value
+    elif BUDGET.exhausted('crawl'):
+        return probe_fallback(cache_key, 'budget')
+    else:
+        stats_before = dict(STATS)
+        start = time.perf_counter()
+        manifests = {}
+        # Never let one probe run past what is left of the crawl budget
+        result = run_skopeo_probe(image_full_name, docker_registry, timeout=BUDGET.timeout(PROBE_TIMEOUT, 'crawl'),
+                                  manifests=manifests)
+        if manifests:
+            IMAGE_DIGESTS[cache_key] = manifest_digest(next(iter(manifests.values())))
+            if PREPULL_PLAN:
+                record_image_layers(cache_key, manifests)
+        if CASSETTE and CASSETTE.recording:
+            stats = {key: value - stats_before.get(key, 0)
+                     for key, value in STATS.items() if value != stats_before.get(key, 0)}
+            CASSETTE.record_probe(cache_key, result, time.perf_counter() - start, stats)
+
+    if result is None:
+        # A registry breaker was open: answer from last run without caching it
+        return probe_fallback(cache_key, 'circuit')
+    INSPECTED_IMAGES[cache_key] = result
+    PROBE_TIMES[cache_key] = time.time()
+    return result
+
+
+def fetch_manifest(reference):
+    """Return the raw manifest of reference from skopeo, or None (no stats, no breaker)."""
+    cmd = [SKOPEO_BIN, "inspect", "--raw", f"docker://{reference}"]
     try:
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=45)
-        if result.returncode != 0:
-            print(f"Error inspecting image {image_full_name}")
-            print("Trying with registry prefix..")
-            if docker_registry:
-                cmd = ["skopeo", "inspect", "--raw", f"docker://{docker_registry}/{image_full_name}"]
-                try:
-                    result = subprocess.run(cmd, capture_output=True, text=True, timeout=45)
-                    if result.returncode != 0:
-                        print(f"Error inspecting image {docker_registry}/{image_full_name}")
-                        INSPECTED_IMAGES[cache_key] = False
-                        return False
-                    INSPECTED_IMAGES[cache_key] = True
-                    return True
-                except subprocess.TimeoutExpired:
-                    print(f"Timeout inspecting image {docker_registry}/{image_full_name}")
-                    STATS['skopeo_timeouts'] += 1
-                    INSPECTED_IMAGES[cache_key] = False
-                    return False
-            INSPECTED_IMAGES[cache_key] = False
-            return False
-        INSPECTED_IMAGES[cache_key] = True
-        return True
+        result = subprocess.run(cmd, capture_output=True, text=True,
+                                timeout=REGISTRY_HEALTH.timeout(image_registry(reference)))
     except subprocess.TimeoutExpired:
-        print(f"Timeout inspecting image {image_full_name}")
-        STATS['skopeo_timeouts'] += 1
-        INSPECTED_IMAGES[cache_key] = False
-        return False
+        return None
+    return result.stdout if result.returncode == 0 else None
+
+
+def manifest_digest(raw):
+    """Return the digest a registry serves a raw manifest under (sha256 of its bytes)."""
+    return 'sha256:' + hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def record_image_layers(cache_key, manifests):
+    """
+    Keep the layers of a probed image for the pre-pull plan.
+
+    Args:
+        cache_key: skopeo_inspect cache key of the image
+        manifests: {reference: raw manifest} collected by run_skopeo_probe; for a
+                   multi-arch image the linux/amd64 manifest is fetched as well
+    """
+    for reference, raw in manifests.items():
+        layers = manifest_layers(reference, raw, fetch_manifest)
+        if layers is not None:
+            IMAGE_LAYERS[cache_key] = layers
+            return
+
+
+def probe_fallback(cache_key, reason):
+    """
+    Answer a probe without running skopeo (crawl budget used up, or registry breaker open).
+
+    Images that were in last run's catalog are assumed still pullable and
+    reported as unverified; images never seen before are left out.
+
+    Args:
+        cache_key: skopeo_inspect cache key of the image
+        reason: 'budget' or 'circuit', selects the STATS counters
+    """
+    if cache_key in LAST_KNOWN_PULLABLE:
+        if cache_key not in UNVERIFIED_IMAGES:
+            STATS[f'{reason}_last_known_probes'] += 1
+            UNVERIFIED_IMAGES[cache_key] = 'last_known_pullable'
+        return True
+    if cache_key not in UNVERIFIED_IMAGES:
+        STATS[f'{reason}_skipped_probes'] += 1
+        UNVERIFIED_IMAGES[cache_key] = 'not_probed'
+    return False
+
+
+def normalize_docker_registry(docker_registry):
+    """Strip the scheme and trailing slash from a workspace's docker_registry."""
+    if not docker_registry:
+        return docker_registry
+    docker_registry = docker_registry.replace('https://', '').replace('http://', '')
+    if docker_registry.endswith('/'):
+        docker_registry = docker_registry[:-1]
+    return docker_registry
+
+
+def workspace_image_keys(catalog):
+    """Return [(repo_full_name, workspace_name, [skopeo_inspect cache keys])] for a catalog."""
+    workspace_images = []
+    for repo_full_name, _, ws_name, ws_data in iter_workspaces(catalog):
+        docker_registry = normalize_docker_registry(ws_data.get('docker_registry'))
+        keys = []
+        for _, image, _ in iter_compatibility(ws_data):
+            key = f"{docker_registry}/{image}" if docker_registry and image else image
+            if key and key not in keys:
+                keys.append(key)
+        workspace_images.append((repo_full_name, ws_name, keys))
+    return workspace_images
+
+
+def image_digests(catalog):
+    """Return {image name: manifest digest} for the catalog's images probed this run."""
+    digests = {}
+    for _, _, _, ws_data in iter_workspaces(catalog):
+        docker_registry = normalize_docker_registry(ws_data.get('docker_registry'))
+        for _, image, _ in iter_compatibility(ws_data):
+            key = f"{docker_registry}/{image}" if docker_registry and image else image
+            if key in IMAGE_DIGESTS:
+                digests[image] = IMAGE_DIGESTS[key]
+    return digests
+
+
+def probe_cache_keys(catalog):
+    """Return the skopeo_inspect cache keys of every image in a catalog."""
+    return {key for _, _, keys in workspace_image_keys(catalog) for key in keys}
+
+
+def expire_probe_cache(max_age):
+    """Forget failed probes and probes older than max_age seconds (watch mode)."""
+    cutoff = time.time() - max_age
+    expired = [key for key, result in INSPECTED_IMAGES.items()
+               if not result or PROBE_TIMES.get(key, 0) < cutoff]
+    for key in expired:
+        del INSPECTED_IMAGES[key]
+        PROBE_TIMES.pop(key, None)
+    return len(expired)
 
 
 def normalize_workspace_json(workspace_json, folder_name):
@@ -177,6 +584,146 @@ def normalize_workspace_json(workspace_json, folder_name):
     return {folder_name: workspace_json}
 
 
+MAX_WORKSPACE_JSON_BYTES = 256 * 1024
+MAX_TEXT_LENGTH = 4096
+MAX_LIST_ITEMS = 64
+# Hard cap; entries beyond MAX_COMPATIBILITY_ENTRIES are truncated later rather than rejected
+MAX_SCHEMA_COMPATIBILITY_ENTRIES = 1000
+
+# field: (allowed types, required). Unknown fields are allowed and passed through.
+WORKSPACE_SCHEMA = {
+    'friendly_name': (str, True),
+    'compatibility': (list, True),
+    'name': (str, False),
+    'description': (str, False),
+    'image_src': (str, False),
+    'docker_registry': (str, False),
+    'notes': (str, False),
+    'image_type': (str, False),
+    'cpu_allocation_method': (str, False),
+    'persistent_profile_path': (str, False),
+    'categories': (list, False),
+    'architecture': (list, False),
+    'run_config': (dict, False),
+    'exec_config': (dict, False),
+    'launch_config': (dict, False),
+    'docker_run_config_override': (dict, False),
+    'proxy': (dict, False),
+    'cores': ((int, float), False),
+    'memory': ((int, float), False),
+    'gpu_count': (int, False),
+    'uncompressed_size_mb': ((int, float), False),
+    'enabled': (bool, False),
+    'require_gpu': (bool, False),
+    'allow_network_selection': (bool, False),
+}
+COMPATIBILITY_ENTRY_SCHEMA = {
+    'version': (str, True),
+    'image': (str, True),
+    'uncompressed_size_mb': ((int, float), False),
+    'available_tags': (list, False),
+}
+
+
+def _compile_field_checks(schema, prefix=''):
+    """Turn a {field: (types, required)} schema into a tuple of check functions."""
+    checks = []
+    for field, (types, required) in schema.items():
+        label = f"{prefix}{field}"
+
+        def check(document, field=field, types=types, required=required, label=label):
+            if field not in document:
+                return f"missing required field '{label}'" if required else None
+            value = document[field]
+            # bool is an int subclass; only accept it where bool is the declared type
+            if not isinstance(value, types) or (isinstance(value, bool) and types is not bool):
+                return f"'{label}' has type {type(value).__name__}"
+            if isinstance(value, str) and len(value) > MAX_TEXT_LENGTH:
+                return f"'{label}' is longer than {MAX_TEXT_LENGTH} characters"
+            return None
+        checks.append(check)
+    return tuple(checks)
+
+
+def _check_string_list(document, field):
+    values = document.get(field, [])
+    if len(values) > MAX_LIST_ITEMS:
+        return f"'{field}' has more than {MAX_LIST_ITEMS} items"
+    for value in values:
+        if not isinstance(value, str) or len(value) > MAX_TEXT_LENGTH:
+            return f"'{field}' must be a list of strings"
+    return None
+
+
+def _check_urls(document):
+    docker_registry = document.get('docker_registry')
+    # Bare hosts ("ghcr.io") are accepted; check_image_pullability strips schemes anyway
+    if docker_registry and not is_valid_http_url(
+            docker_registry if '://' in docker_registry else f"https://{docker_registry}"):
+        return f"'docker_registry' is not a valid registry URL: {docker_registry!r}"
+    image_src = document.get('image_src')
+    # Relative icon paths are fine; absolute ones must be http(s) (no javascript:, data:)
+    if image_src and ':' in image_src.split('/', 1)[0] and not is_valid_http_url(image_src):
+        return f"'image_src' is not a valid HTTP(S) URL: {image_src!r}"
+    return None
+
+
+def _check_compatibility(document):
+    compatibility = document['compatibility']
+    if not compatibility:
+        return "'compatibility' is empty"
+    if len(compatibility) > MAX_SCHEMA_COMPATIBILITY_ENTRIES:
+        return f"'compatibility' has more than {MAX_SCHEMA_COMPATIBILITY_ENTRIES} entries"
+    if isinstance(compatibility[0], str):
+        # Old format: version strings plus a top level image 'name'
+        if 'name' not in document:
+            return "'compatibility' lists versions but the workspace has no 'name'"
+        for version in compatibility:
+            if not isinstance(version, str) or len(version) > MAX_TEXT_LENGTH:
+                return "'compatibility' mixes version strings with other types"
+        return None
+    for entry in compatibility:
+        if not isinstance(entry, dict):
+            return f"'compatibility' entry has type {type(entry).__name__}"
+        for check in COMPATIBILITY_ENTRY_CHECKS:
+            error = check(entry)
+            if error:
+                return error
+    return None
+
+
+COMPATIBILITY_ENTRY_CHECKS = _compile_field_checks(COMPATIBILITY_ENTRY_SCHEMA, prefix='compatibility[].')
+# Checks run in order and stop at the first error, so later checks can rely on field types
+WORKSPACE_CHECKS = _compile_field_checks(WORKSPACE_SCHEMA) + (
+    lambda document: _check_string_list(document, 'categories'),
+    lambda document: _check_string_list(document, 'architecture'),
+    _check_urls,
+    _check_compatibility,
+)
+
+
+def validate_workspace_schema(workspace_json):
+    """
+    Check a parsed workspace.json against WORKSPACE_SCHEMA before any image is probed.
+
+    Validates types, required fields, size limits and URL fields, so malformed
+    files are rejected without spending registry calls.
+
+    Args:
+        workspace_json: The parsed workspace.json content
+
+    Returns:
+        str: Description of the first problem found, or None if the document is valid
+    """
+    if not isinstance(workspace_json, dict):
+        return f"top level is {type(workspace_json).__name__}, not an object"
+    for check in WORKSPACE_CHECKS:
+        error = check(workspace_json)
+        if error:
+            return error
+    return None
+
+
 def check_profanity_in_workspace(workspace_json, workspace_name):
     """
     Check workspace data for profanity in name, description, and categories.
@@ -205,23 +752,21 @@ def check_profanity_in_workspace(workspace_json, workspace_name):
     return False
  
 
-def check_image_pullability(workspace_json):
+def check_image_pullability(workspace_json, unpullable=None):
     """
     Extract docker_registry and images from workspace.json and check pullability.
     
     Args:
         workspace_json: The workspace.json content as a dict
+        unpullable: Optional list the compatibility entries whose image is not pullable are appended to
 
     Returns:
-        The workspace_json content with only images that are pullable, if none are pullable, return None
+        A view of workspace_json with only the images that are pullable, if none are pullable, return None
     """
-    workspace_json = workspace_json.copy()
-    docker_registry = workspace_json.get('docker_registry')
     # remove https:// or http:// from docker_registry if present
-    if docker_registry:
-        docker_registry = docker_registry.replace('https://', '').replace('http://', '')
-        if docker_registry.endswith('/'):
-            docker_registry = docker_registry[:-1]
+    docker_registry = normalize_docker_registry(workspace_json.get('docker_registry'))
+    # Registry aliases are resolved once for all of the workspace's images
+    policy_registry = canonical_registry(docker_registry)
 
     compatibility = workspace_json.get('compatibility', [])
     
@@ -248,8 +793,10 @@ def check_image_pullability(workspace_json):
             
         image = entry.get('image')
         if image:
-            if should_skip_image(image, docker_registry=docker_registry):
-                print(f"Skipping image {image}: matches blocked registry prefix")
+            decision = IMAGE_POLICY.evaluate(image, policy_registry)
+            if decision.blocked:
+                rule = f"rule {decision.rule.pattern!r} ({decision.rule.source})" if decision.rule else "default action"
+                print(f"Skipping image {image}: blocked by the image policy {rule}")
                 STATS['blocked_registry_images'] += 1
                 continue
             # if not image.startswith(f"{docker_registry}/"):
@@ -258,6 +805,8 @@ def check_image_pullability(workspace_json):
             if not result:
                 print(f"Image {image} is not pullable")
                 unpullable_count += 1
+                if unpullable is not None:
+                    unpullable.append(entry)
                 continue
 
             # print(f"Image {image} is pullable")
@@ -265,9 +814,9 @@ def check_image_pullability(workspace_json):
             pullable_images.append(entry)
 
     if pullable_images:
-        workspace_json['compatibility'] = pullable_images
         STATS['pullable_workspaces'] += 1
-        return workspace_json
+        # A view over the input rather than a copy of it
+        return ChainMap({'compatibility': pullable_images}, workspace_json)
     
     if unpullable_count > 0:
         STATS['unpullable_workspaces'] += 1
@@ -284,14 +833,12 @@ def filter_original_workspace_json(original_workspace_json, pullable_workspace_j
         pullable_workspace_json: The normalized workspace.json with filtered compatibility (new format)
     
     Returns:
-        dict: Filtered original workspace JSON, or None if no pullable entries
+        Mapping: Filtered original workspace JSON (a view over the original, which
+        is left unmodified), or None if no pullable entries
     """
     if pullable_workspace_json is None:
         return None
     
-    # Create a copy of the original to avoid modifying it
-    filtered = original_workspace_json.copy()
-    
     # Get pullable images from normalized format
     pullable_compatibility = pullable_workspace_json.get('compatibility', [])
     if not pullable_compatibility:
@@ -314,7 +861,6 @@ def filter_original_workspace_json(original_workspace_json, pullable_workspace_j
         filtered_compat = [v for v in original_compatibility if v in pullable_versions]
         if not filtered_compat:
             return None
-        filtered['compatibility'] = filtered_compat
     else:
         # New format: compatibility is array of objects with version/image
         # Filter by matching images
@@ -324,9 +870,148 @@ def filter_original_workspace_json(original_workspace_json, pullable_workspace_j
         ]
         if not filtered_compat:
             return None
-        filtered['compatibility'] = filtered_compat
     
-    return filtered
+    # Keeps the original key order: ChainMap iterates keys in the order of its last map
+    return ChainMap({'compatibility': filtered_compat}, original_workspace_json)
+
+
+def prevalidate_workspace(folder_name, raw_workspace_json):
+    """
+    Run the CPU-only validation stages on one raw workspace.json.
+
+    Parses the JSON, validates it against WORKSPACE_SCHEMA, normalizes it and
+    checks it for profanity. Has no network side effects, so it is safe to
+    run in a worker process.
+
+    Args:
+        folder_name: The workspace folder name
+        raw_workspace_json: The workspace.json file content (bytes or str)
+
+    Returns:
+        tuple: (status, ws_name, normalized_ws_data, original_workspace_json) where
+        status is 'ok', 'invalid_json', 'invalid_schema', 'unrecognized' or 'profanity'
+    """
+    if len(raw_workspace_json) > MAX_WORKSPACE_JSON_BYTES:
+        print(f"Invalid workspace.json in {folder_name}: larger than {MAX_WORKSPACE_JSON_BYTES} bytes")
+        return ('invalid_schema', folder_name, None, None)
+    try:
+        original_workspace_json = json.loads(raw_workspace_json)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return ('invalid_json', folder_name, None, None)
+
+    if not isinstance(original_workspace_json, dict):
+        return ('unrecognized', folder_name, None, None)
+    schema_error = validate_workspace_schema(original_workspace_json)
+    if schema_error:
+        print(f"Invalid workspace.json in {folder_name}: {schema_error}")
+        return ('invalid_schema', folder_name, None, None)
+
+    # Normalize workspace.json format for validation only
+    normalized_workspace = normalize_workspace_json(original_workspace_json, folder_name)
+    if normalized_workspace is None:
+        return ('unrecognized', folder_name, None, None)
+
+    # normalized_workspace is a dict: {folder_name: workspace_data}
+    ws_name = next(iter(normalized_workspace))
+    ws_data = normalized_workspace[ws_name]
+
+    if check_profanity_in_workspace(ws_data, ws_name):
+        return ('profanity', ws_name, None, None)
+
+    return ('ok', ws_name, ws_data, original_workspace_json)
+
+
+def prevalidate_batch(batch):
+    """Run prevalidate_workspace over a batch of (folder_name, raw_bytes), in order."""
+    return [prevalidate_workspace(folder_name, raw) for folder_name, raw in batch]
+
+
+def get_validation_pool():
+    """Return the shared validation process pool, creating it on first use."""
+    global VALIDATION_POOL
+    if VALIDATION_POOL is None and VALIDATION_WORKERS > 0:
+        try:
+            VALIDATION_POOL = ProcessPoolExecutor(max_workers=VALIDATION_WORKERS)
+        except (OSError, ValueError, NotImplementedError) as e:
+            print(f"Could not start validation process pool, validating in-process: {e}")
+            disable_validation_pool()
+    return VALIDATION_POOL
+
+
+def disable_validation_pool():
+    """Shut the pool down and fall back to in-process validation for the rest of the run."""
+    global VALIDATION_POOL, VALIDATION_WORKERS
+    if VALIDATION_POOL is not None:
+        VALIDATION_POOL.shutdown(wait=False, cancel_futures=True)
+    VALIDATION_POOL = None
+    VALIDATION_WORKERS = 0
+
+
+def submit_prevalidation(raw_workspaces):
+    """
+    Start prevalidating raw workspace.json files in the process pool, if enabled.
+
+    Files are split into VALIDATION_BATCH_SIZE batches, one future each, so
+    the crawler can fetch the next repos while these are validated.
+
+    Args:
+        raw_workspaces: List of (folder_name, raw workspace.json bytes)
+
+    Returns:
+        list: One future per batch, in input order, or None to validate in-process
+    """
+    pool = get_validation_pool()
+    if pool is None or not raw_workspaces:
+        return None
+    try:
+        return [
+            pool.submit(prevalidate_batch, raw_workspaces[i:i + VALIDATION_BATCH_SIZE])
+            for i in range(0, len(raw_workspaces), VALIDATION_BATCH_SIZE)
+        ]
+    except (BrokenProcessPool, OSError, RuntimeError) as e:
+        print(f"Validation process pool failed, falling back to in-process validation: {e}")
+        disable_validation_pool()
+        return None
+
+
+def collect_prevalidation(raw_workspaces, futures):
+    """
+    Wait for submit_prevalidation's futures and return the results in input order.
+
+    If the pool could not be used (broken worker, unpicklable payload, pool
+    shut down after another failure) the files are validated in-process instead.
+
+    Args:
+        raw_workspaces: The list given to submit_prevalidation
+        futures: What submit_prevalidation returned
+
+    Returns:
+        list: prevalidate_workspace results in input order
+    """
+    if futures is not None:
+        try:
+            results = [result for future in futures for result in future.result()]
+        except (BrokenProcessPool, CancelledError, OSError, pickle.PicklingError) as e:
+            print(f"Validation process pool failed, falling back to in-process validation: {e}")
+            disable_validation_pool()
+        else:
+            # Workers count profanity in their own copy of STATS
+            STATS['profanity_filtered_workspaces'] += sum(1 for result in results if result[0] == 'profanity')
+            return results
+    return prevalidate_batch(raw_workspaces)
+
+
+def prevalidate_workspaces(raw_workspaces):
+    """
+    Prevalidate raw workspace.json files, in a process pool when enabled.
+
+    Args:
+        raw_workspaces: List of (folder_name, raw workspace.json bytes)
+
+    Returns:
+        list: prevalidate_workspace results in input order
+    """
+    return collect_prevalidation(raw_workspaces, submit_prevalidation(raw_workspaces))
 
 
 stop_after = 100
@@ -359,20 +1044,173 @@ def get_search_results():
         items = data.get('items', [])
         if not items:
             break
-        REPOS.extend(item['full_name'] for item in items)
+        # Interned: repo names are also the keys of REPO_STATS and the catalog
+        REPOS.extend(sys.intern(item['full_name']) for item in items)
         # also track stars and latest commit timestamp
         for item in items:
-            REPO_STATS[item['full_name']] = {
-                'stars': item['stargazers_count'],
-                'last_commit': item.get('pushed_at', 'Unknown')
-            }
+            REPO_STATS[sys.intern(item['full_name'])] = RepoStats(
+                item['stargazers_count'], item.get('pushed_at', 'Unknown')
+            )
         page += 1
     print(f"Total repositories found: {len(REPOS)}")
     return REPOS
 
-def parse_repo(repo_full_name):
+def folder_key(name):
+    """Normalize a name for matching listing entries to folders ("Kasm Chrome" == "kasm-chrome")."""
+    return re.sub(r'[^a-z0-9]', '', name.lower())
+
+
+def pages_listing_names(entry):
+    """Return the folder keys a listed workspace may be filed under: friendly name, icon file or image name."""
+    candidates = [entry.get('friendly_name')]
+    icon = entry.get('image_src')
+    if isinstance(icon, str):
+        candidates.append(os.path.splitext(icon.split('?')[0].rstrip('/').rsplit('/', 1)[-1])[0])
+    image = entry.get('name')
+    compatibility = entry.get('compatibility')
+    if not image and isinstance(compatibility, list) and compatibility and isinstance(compatibility[0], dict):
+        image = compatibility[0].get('image')
+    if isinstance(image, str):
+        repository = image.split(':')[0].rsplit('/', 1)[-1]
+        candidates += [repository, repository.removeprefix('kasm-')]
+    return {folder_key(name) for name in candidates if isinstance(name, str) and folder_key(name)}
+
+
+def match_listing_to_folders(entries, folder_names):
+    """
+    Work out which workspaces/ folder each entry of a published listing came from.
+
+    The listing does not name folders, so entries are matched on their
+    friendly name, icon file name or image name.
+
+    Args:
+        entries: The listing's 'workspaces' list
+        folder_names: Folder names under workspaces/
+
+    Returns:
+        list: [(folder_name, entry)] in folder order, or None unless every entry
+        matches exactly one folder and no folder is matched twice. Folders
+        without an entry are left out; the caller has to walk them.
+    """
+    folders_by_key = {}
+    for name in folder_names:
+        folders_by_key.setdefault(folder_key(name), []).append(name)
+    matched = {}
+    for entry in entries:
+        if not isinstance(entry, dict):
+            return None
+        candidates = {folder for key in pages_listing_names(entry) for folder in folders_by_key.get(key, [])}
+        if len(candidates) != 1:
+            return None
+        folder = candidates.pop()
+        if folder in matched:
+            return None
+        matched[folder] = entry
+    return [(name, matched[name]) for name in folder_names if name in matched]
+
+
+def is_listing_current(last_modified, pushed_at):
+    """Return True if a listing served with Last-Modified last_modified was built after the push at pushed_at."""
+    try:
+        published = parsedate_to_datetime(last_modified)
+        pushed = datetime.fromisoformat(pushed_at.replace('Z', '+00:00'))
+        return published >= pushed
+    except (TypeError, ValueError, AttributeError):
+        # Missing or unparsable dates: we cannot tell, so treat it as stale
+        return False
+
+
+def fetch_pages_workspaces(repo_full_name, pages_url, folder_names):
+    """
+    Read a repo's workspace.json files from the registry listing on its Pages site.
+
+    One request replaces a contents API listing per folder plus a download per
+    workspace.json. The Pages site is not the GitHub API, so no token is sent.
+
+    Args:
+        repo_full_name: The repo full name
+        pages_url: The repo's GitHub Pages URL
+        folder_names: Folder names under workspaces/ (from the contents API)
+
+    Returns:
+        list: [(folder_name, workspace.json text)] like the contents API walk for the
+        folders the listing covers (possibly not all of them), or None if the listing
+        is missing, older than the last push or does not match the folders
+    """
+    listing_url = urljoin(pages_url.rstrip('/') + '/', PAGES_LISTING_PATH)
+    try:
+        response = make_request(listing_url, authenticated=False, max_bytes=MAX_PAGES_LISTING_BYTES)
+    except requests.RequestException as e:
+        print(f"Could not fetch {listing_url}: {e}")
+        response = None
+
+    matched = None
+    if response is None or response.status_code != 200:
+        reason = "no published listing"
+    elif response_too_large(response, MAX_PAGES_LISTING_BYTES):
+        reason = f"listing larger than {MAX_PAGES_LISTING_BYTES} bytes"
+    elif not is_listing_current(response.headers.get('Last-Modified'),
+                                REPO_STATS.get(repo_full_name, RepoStats()).last_commit):
+        reason = "listing is older than the last push"
+    else:
+        try:
+            entries = response.json().get('workspaces')
+        except (ValueError, AttributeError):
+            entries = None
+        if isinstance(entries, list):
+            matched = match_listing_to_folders(entries, folder_names)
+        reason = "listing does not match the workspaces/ folders"
+
+    if not matched:
+        print(f"Walking workspaces/ of {repo_full_name} through the contents API: {reason}")
+        STATS['pages_listing_fallbacks'] += 1
+        return None
+    print(f"Using the published listing of {repo_full_name} ({len(matched)} of {len(folder_names)} folders)")
+    STATS['pages_listing_repos'] += 1
+    # Each listed folder saves its contents listing and its workspace.json download
+    STATS['contents_requests_saved'] += 2 * len(matched)
+    return [
+        (folder, json.dumps({key: value for key, value in entry.items() if key not in PAGES_LISTING_BUILD_FIELDS}))
+        for folder, entry in matched
+    ]
+
+
+def fetch_workspace_files(workspace_folders):
+    """Download workspace.json from each folder through the contents API; return [(folder_name, bytes)]."""
+    raw_workspaces = []
+    for folder in workspace_folders:
+        folder_url = folder['url']
+        # folder_response = requests.get(folder_url)
+        folder_response = make_request(folder_url)
+        if folder_response.status_code != 200:
+            print(f"Skipping folder {folder['name']}: Unable to access folder contents")
+            continue
+        folder_items = folder_response.json()
+        workspace_file = next((item for item in folder_items if item['name'] == 'workspace.json'), None)
+        if not workspace_file:
+            print(f"Skipping subfolder {folder['name']}: No workspace.json file found")
+            continue
+        
+        # file_response = requests.get(workspace_file['download_url'])
+        # Served by raw.githubusercontent.com, not the API: no token and no API rate limit
+        file_response = make_request(workspace_file['download_url'], authenticated=False)
+        if file_response.status_code == 200:
+            raw_workspaces.append((folder['name'], file_response.content))
+    return raw_workspaces
+
+
+def parse_repo(repo_full_name, pages_url=None):
+    """Fetch, validate and probe a repo's workspaces; return [{ws_name: workspace record}]."""
+    raw_workspaces = fetch_repo_workspaces(repo_full_name, pages_url)
+    with PROFILER.phase('validate'):
+        prevalidated = prevalidate_workspaces(raw_workspaces)
+    return build_workspace_data(repo_full_name, prevalidated)
+
+
+def fetch_repo_workspaces(repo_full_name, pages_url=None):
+    """Return a repo's [(folder_name, raw workspace.json)], [] if it has none."""
     # go through the repo and go to "workspaces" folder
-    contents_url = f"https://api.github.com/repos/{repo_full_name}/contents/workspaces"
+    contents_url = f"{GITHUB_API_URL}/repos/{repo_full_name}/contents/workspaces"
     response = make_request(contents_url)
     # print(response.json())
     if response.status_code != 200:
@@ -389,63 +1227,68 @@ def parse_repo(repo_full_name):
         print(f"Skipping {repo_full_name}: 'workspaces' folder has no subfolders")
         return []
 
+    # Fast path: every workspace.json from the listing published on the Pages site;
+    # otherwise get workspace.json from each folder
+    raw_workspaces = None
+    if pages_url and PAGES_FAST_PATH:
+        raw_workspaces = fetch_pages_workspaces(repo_full_name, pages_url,
+                                                [folder['name'] for folder in workspace_folders])
+    if raw_workspaces is None:
+        raw_workspaces = fetch_workspace_files(workspace_folders)
+    else:
+        # Folders without a listing entry are walked, so a listing that publishes
+        # only some of the workspaces never drops the others
+        listed = dict(raw_workspaces)
+        unlisted = [folder for folder in workspace_folders if folder['name'] not in listed]
+        if unlisted:
+            print(f"Walking {len(unlisted)} folders of {repo_full_name} missing from the listing")
+            listed.update(fetch_workspace_files(unlisted))
+        raw_workspaces = [(folder['name'], listed[folder['name']])
+                          for folder in workspace_folders if folder['name'] in listed]
+    return raw_workspaces
+
+
+def build_workspace_data(repo_full_name, prevalidated):
+    """Probe the images of a repo's prevalidated workspaces; return [{ws_name: workspace record}]."""
     workspace_data = []
-    # in each folder, get workspace.json file
-    for folder in workspace_folders:
-        folder_url = folder['url']
-        # folder_response = requests.get(folder_url)
-        folder_response = make_request(folder_url)
-        if folder_response.status_code != 200:
-            print(f"Skipping folder {folder['name']}: Unable to access folder contents")
+    for status, ws_name, ws_data, original_workspace_json in prevalidated:
+        if status == 'invalid_json':
+            print(f"Skipping subfolder {ws_name}: Invalid JSON in workspace.json")
             continue
-        folder_items = folder_response.json()
-        workspace_file = next((item for item in folder_items if item['name'] == 'workspace.json'), None)
-        if not workspace_file:
-            print(f"Skipping subfolder {folder['name']}: No workspace.json file found")
+        if status == 'invalid_schema':
+            print(f"Skipping subfolder {ws_name}: workspace.json failed schema validation")
+            STATS['schema_invalid_workspaces'] += 1
+            continue
+        if status == 'unrecognized':
+            print(f"Skipping subfolder {ws_name}: Unrecognized workspace.json format")
+            continue
+        if status == 'profanity':
+            print(f"Skipping workspace {ws_name}: Profanity detected in workspace data")
             continue
         
-        # file_response = requests.get(workspace_file['download_url'])
-        file_response = make_request(workspace_file['download_url'])
-        if file_response.status_code == 200:
-            try:
-                original_workspace_json = file_response.json()
-                
-                # Normalize workspace.json format for validation only
-                normalized_workspace = normalize_workspace_json(original_workspace_json, folder['name'])
-                if normalized_workspace is None:
-                    print(f"Skipping subfolder {folder['name']}: Unrecognized workspace.json format")
-                    continue
-                
-                # normalized_workspace is a dict: {folder_name: workspace_data}
-                # Extract the workspace name and data
-                ws_name = list(normalized_workspace.keys())[0]
-                ws_data = normalized_workspace[ws_name]
-                
-                # Check for profanity
-                if check_profanity_in_workspace(ws_data, ws_name):
-                    print(f"Skipping workspace {ws_name}: Profanity detected in workspace data")
-                    continue
-                
-                # Check image pullability on normalized data
-                pullable_workspace_json = check_image_pullability(ws_data)
-                if pullable_workspace_json is None:
-                    print(f"Skipping workspace {ws_name}: No pullable images found in workspace.json")
-                    continue
-                
-                # Filter the original workspace.json to only include pullable entries
-                filtered_workspace_json = filter_original_workspace_json(original_workspace_json, pullable_workspace_json)
-                if filtered_workspace_json is None:
-                    print(f"Skipping workspace {ws_name}: No pullable compatibility entries after filtering")
-                    continue
-                
-                # Save the FILTERED original workspace.json (preserves original format)
-                temp = {}
-                temp[ws_name] = filtered_workspace_json
-                workspace_data.append(temp)
-                        
-            except json.JSONDecodeError:
-                print(f"Skipping subfolder {folder['name']}: Invalid JSON in workspace.json")
-                continue
+        # Check image pullability on normalized data
+        unpullable = []
+        with PROFILER.phase('probe'):
+            pullable_workspace_json = check_image_pullability(ws_data, unpullable=unpullable)
+        if unpullable:
+            UNPULLABLE_ENTRIES[workspace_id(repo_full_name, ws_name)] = [
+                (entry.get('version'), entry.get('image')) for entry in unpullable
+            ]
+        if pullable_workspace_json is None:
+            print(f"Skipping workspace {ws_name}: No pullable images found in workspace.json")
+            continue
+        
+        # Filter the original workspace.json to only include pullable entries
+        filtered_workspace_json = filter_original_workspace_json(original_workspace_json, pullable_workspace_json)
+        if filtered_workspace_json is None:
+            print(f"Skipping workspace {ws_name}: No pullable compatibility entries after filtering")
+            continue
+        
+        # Save the FILTERED original workspace.json (preserves original format),
+        # as a compact record: it is kept in memory until the catalog is written
+        temp = {}
+        temp[ws_name] = compact(filtered_workspace_json)
+        workspace_data.append(temp)
 
     return workspace_data
 
@@ -476,12 +1319,7 @@ def is_valid_http_url(url_string):
 
 
 def get_github_pages_url(repo_full_name):
-    pages_url = f"https://api.github.com/repos/{repo_full_name}/pages"
-    headers = {
-        "Accept": "application/vnd.github+json",
-        "X-GitHub-Api-Version": "2022-11-28",
-        "Authorization": "Bearer " + GITHUB_PAT
-    }
+    pages_url = f"{GITHUB_API_URL}/repos/{repo_full_name}/pages"
     response = make_request(pages_url)
     if response.status_code == 200:
         data = response.json()
@@ -498,11 +1336,24 @@ def get_github_pages_url(repo_full_name):
     return None
 
 def save_results_to_file(results, filename='search_results.json'):
-    with open(filename, 'w') as f:
-        json.dump(results, f, indent=4)
+    # Readers never see a partially written file, even if we crash mid-write
+    with atomic_open(filename) as f:
+        json.dump(results, f, indent=4, default=to_builtin)
     print(f"Results saved to {filename}")
 
 
+def load_previous_results(filename):
+    """Load the previous run's output, or an empty dict if missing or unreadable."""
+    if not os.path.exists(filename):
+        return {}
+    try:
+        with open(filename, 'r') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"Could not load previous results from {filename}: {e}")
+        return {}
+
+
 def parse_categories(all_workspace_data):
     # get all categories from all workspaces
     print("Parsing categories from all workspaces...")
@@ -515,32 +1366,245 @@ def parse_categories(all_workspace_data):
                 categories.update(ws_categories)
     return list(categories)
 
-if __name__ == "__main__":
-    # Create directory called "generated" if it doesn't exist
-    if not os.path.exists('generated'):
-        os.makedirs('generated')
-    search_results = get_search_results()
-    STATS['total_repos'] = len(search_results)
-    save_results_to_file(search_results, 'generated/repos.json')
+def shard_for_repo(repo_full_name, shard_count):
+    """
+    Return the shard a repo belongs to.
+
+    Uses a stable hash of the repo full name (not Python's randomized hash()),
+    so every worker agrees on the partitioning.
+    """
+    digest = hashlib.sha1(repo_full_name.encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') % shard_count
+
+
+def crawl_repos(search_results, catalog_store=None, shard_index=0, shard_count=1):
+    """
+    Parse every repo in search_results that belongs to this shard.
+
+    Args:
+        search_results: Repo full names in search order
+        catalog_store: Optional CatalogStore to upsert repos into as they are parsed
+        shard_index: Index of this worker's shard
+        shard_count: Total number of shards (1 = whole crawl)
+
+    Returns:
+        dict: {repo_full_name: repo_entry} in search order
+    """
     all_workspace_data = {}
-    for repo in search_results:
-        print(f"\n------------\nParsing repository: {repo}")
-        workspace_data = parse_repo(repo)
+
+    def add_repo(position, repo, finish):
+        with PROFILER.phase('parse'):
+            repo_entry = finish()
+        if repo_entry:
+            all_workspace_data[repo] = repo_entry
+            if catalog_store:
+                catalog_store.upsert_repo(repo, repo_entry, position)
+
+    # Repos fetched and validating in the pool, oldest first. Up to VALIDATION_WORKERS
+    # of them validate while the next repos are fetched; they are finished (probed)
+    # in search order, so the catalog comes out the same as without the pool.
+    in_flight = deque()
+    for position, repo in enumerate(search_results):
+        if shard_count > 1 and shard_for_repo(repo, shard_count) != shard_index:
+            continue
+        if BUDGET.exhausted('crawl'):
+            # Out of time: publish what we had last run rather than nothing
+            repo_entry = PREVIOUS_CATALOG.get(repo)
+            if repo_entry:
+                STATS['budget_reused_repos'] += 1
+                print(f"Crawl budget used up, reusing last run's entry for {repo}")
+                for key in probe_cache_keys({repo: repo_entry}):
+                    if key not in INSPECTED_IMAGES:
+                        UNVERIFIED_IMAGES.setdefault(key, 'last_known_pullable')
+            in_flight.append((position, repo, lambda repo_entry=repo_entry: repo_entry))
+        else:
+            with PROFILER.phase('parse'):
+                in_flight.append((position, repo, start_crawl_repo(repo)))
+        while len(in_flight) > VALIDATION_WORKERS:
+            add_repo(*in_flight.popleft())
+    while in_flight:
+        add_repo(*in_flight.popleft())
+    return all_workspace_data
+
+
+def crawl_repo(repo):
+    """Parse one repo; return its catalog entry, or None if it has nothing to publish."""
+    return start_crawl_repo(repo)()
+
+
+def start_crawl_repo(repo):
+    """
+    Fetch one repo's workspace.json files and start validating them.
+
+    Returns:
+        callable: Finishes the repo (waits for validation, probes its images) and
+        returns its catalog entry, or None if it has nothing to publish
+    """
+    print(f"\n------------\nParsing repository: {repo}")
+    # Pages first: a repo without a valid Pages site is never published, and
+    # the site's registry listing can replace walking workspaces/
+    pages_url = get_github_pages_url(repo)
+    if not pages_url:
+        print(f"Skipping {repo}: No valid GitHub Pages site")
+        return lambda: None
+    raw_workspaces = fetch_repo_workspaces(repo, pages_url)
+    # JSON parsing, normalization and profanity checks are pure CPU work and
+    # may run in the validation process pool; image probes stay in this process
+    futures = submit_prevalidation(raw_workspaces)
+
+    def finish():
+        with PROFILER.phase('validate'):
+            prevalidated = collect_prevalidation(raw_workspaces, futures)
+        workspace_data = build_workspace_data(repo, prevalidated)
         print(f"Found {len(workspace_data)} workspaces in {repo}")
-        if workspace_data:
-            pages_url = get_github_pages_url(repo)
-            if not pages_url:
-                pages_url = "No GitHub Pages URL"
-                continue
-            temp = {}
-            temp['github_pages'] = pages_url
-            temp['stars'] = REPO_STATS.get(repo, {}).get('stars', 0)
-            temp['last_commit'] = REPO_STATS.get(repo, {}).get('last_commit', 'Unknown')
-            temp['workspaces'] = workspace_data
-            all_workspace_data[repo] = temp
-    
-    save_results_to_file(all_workspace_data, filename='generated/community_workspaces.json')
+        if not workspace_data:
+            return None
+        temp = {}
+        temp['github_pages'] = pages_url
+        repo_stats = REPO_STATS.get(repo, RepoStats())
+        temp['stars'] = repo_stats.stars
+        temp['last_commit'] = repo_stats.last_commit
+        temp['workspaces'] = workspace_data
+        return temp
+    return finish
+
+
+def save_partial_results(search_results, all_workspace_data, shard_index, shard_count, partial_dir):
+    """Write one worker's share of the crawl plus its stats for a later merge."""
+    if not os.path.exists(partial_dir):
+        os.makedirs(partial_dir)
+    partial = {
+        'shard_index': shard_index,
+        'shard_count': shard_count,
+        'search_results': search_results,
+        'workspaces': all_workspace_data,
+        'stats': STATS,
+        'probe_results': INSPECTED_IMAGES,
+        'image_layers': IMAGE_LAYERS,
+        'image_digests': IMAGE_DIGESTS,
+        'unverified_images': UNVERIFIED_IMAGES,
+        'unpullable_entries': UNPULLABLE_ENTRIES
+    }
+    filename = os.path.join(partial_dir, f"partial-{shard_index}-of-{shard_count}.json")
+    save_results_to_file(partial, filename)
+    return filename
+
+
+def merge_partial_results(partials):
+    """
+    Combine worker partials into the output of a single-process crawl.
+
+    Args:
+        partials: List of partial dicts written by save_partial_results
+
+    Returns:
+        tuple: (search_results, all_workspace_data, stats, probe_results)
+
+    Raises:
+        ValueError: If shards are missing, duplicated or from different shard counts
+    """
+    if not partials:
+        raise ValueError("No partial results to merge")
+    shard_counts = {partial['shard_count'] for partial in partials}
+    if len(shard_counts) != 1:
+        raise ValueError(f"Partials come from different shard counts: {sorted(shard_counts)}")
+    shard_count = shard_counts.pop()
+    shard_indexes = sorted(partial['shard_index'] for partial in partials)
+    if shard_indexes != list(range(shard_count)):
+        raise ValueError(f"Expected shards 0..{shard_count - 1}, got {shard_indexes}")
+
+    # Every worker runs the same search; if they disagree (results changed
+    # between workers starting) fall back to the union in first-seen order.
+    search_results = list(partials[0]['search_results'])
+    seen = set(search_results)
+    for partial in partials[1:]:
+        if partial['search_results'] != partials[0]['search_results']:
+            print(f"Warning: shard {partial['shard_index']} saw different search results")
+        for repo in partial['search_results']:
+            if repo not in seen:
+                seen.add(repo)
+                search_results.append(repo)
+
+    repo_entries = {}
+    for partial in partials:
+        repo_entries.update(partial['workspaces'])
+    all_workspace_data = {repo: repo_entries[repo] for repo in search_results if repo in repo_entries}
+
+    stats = {key: 0 for key in STATS}
+    probe_results = {}
+    image_lookups = 0
+    for partial in partials:
+        for key, value in partial['stats'].items():
+            stats[key] = stats.get(key, 0) + value
+        probe_results.update(partial.get('probe_results', {}))
+        image_lookups += partial['stats'].get('cached_image_hits', 0) + len(partial.get('probe_results', {}))
+    stats['total_repos'] = len(search_results)
+    # Each worker has its own image cache; count hits as if they had shared one
+    stats['cached_image_hits'] = image_lookups - len(probe_results)
+    return search_results, all_workspace_data, stats, probe_results
+
+
+def publish_results(search_results, all_workspace_data, catalog_store=None):
+    """Write the catalog and the diff against the previous run; return the diff."""
+    previous_workspace_data = compact_catalog(load_previous_results('generated/community_workspaces.json'))
+
+    if catalog_store:
+        catalog_store.record_probe_results(INSPECTED_IMAGES)
+        catalog_store.set_image_digests(image_digests(all_workspace_data))
+        pruned = catalog_store.prune_missing_repos()
+        print(f"Pruned {pruned} repos no longer in search results from {CATALOG_DB}")
+        catalog_store.export_json('generated/community_workspaces.json')
+        catalog_store.close()
+    else:
+        save_results_to_file(all_workspace_data, filename='generated/community_workspaces.json')
+    # The same catalog for consumers that look up single workspaces (see binary_catalog.py)
+    write_binary_catalog(all_workspace_data, 'generated/community_workspaces.bin')
+    print("Binary catalog saved to generated/community_workspaces.bin")
+
+    # Delta against the previous run so consumers don't have to refetch everything
+    changes = compute_diff(previous_workspace_data, all_workspace_data, unpullable_entries=UNPULLABLE_ENTRIES)
+    save_results_to_file(changes, filename='generated/changes.json')
 
+    # Forks and republished images: point each near-duplicate at a canonical workspace
+    duplicates = find_near_duplicates(all_workspace_data)
+    STATS['near_duplicate_workspaces'] = len(duplicates['duplicate_of'])
+    save_results_to_file(duplicates, filename='generated/duplicates.json')
+
+    # Scores and pre-sorted orderings so clients don't sort the whole catalog
+    save_results_to_file(compute_rankings(all_workspace_data), filename='generated/rankings.json')
+
+    published = ['generated/community_workspaces.json', 'generated/community_workspaces.bin',
+                 'generated/changes.json', 'generated/duplicates.json', 'generated/rankings.json']
+    if GENERATE_THUMBNAILS:
+        thumbnails, stats = build_thumbnails(all_workspace_data, request=request_icon)
+        THUMBNAIL_STATS.update(stats)
+        save_results_to_file(thumbnails, filename='generated/thumbnails.json')
+        published.append('generated/thumbnails.json')
+
+    if PREPULL_PLAN:
+        plan = build_prepull_plan(workspace_image_keys(all_workspace_data), IMAGE_LAYERS)
+        PREPULL_PLAN_SUMMARY.update(plan['summary'])
+        save_results_to_file(plan, filename='generated/prepull_plan.json')
+        published.append('generated/prepull_plan.json')
+
+    if REGISTRY_EXPORT:
+        registry_files, stats = export_registry(all_workspace_data, REGISTRY_EXPORT_DIR)
+        REGISTRY_EXPORT_STATS.update(stats)
+        print(f"Registry exported to {REGISTRY_EXPORT_DIR}")
+        published.extend(registry_files)
+
+    # Images the deadline or an open circuit breaker kept us from probing, so
+    # consumers know which entries are stale
+    save_results_to_file(dict(sorted(UNVERIFIED_IMAGES.items())), filename='generated/unverified_images.json')
+    published.append('generated/unverified_images.json')
+
+    # Written last: lets consumers check that the files they read belong together
+    write_manifest(published, 'generated/manifest.json')
+    print("Manifest saved to generated/manifest.json")
+    return changes
+
+
+def print_summary(changes=None):
     # Print summary statistics
     print("\n" + "="*60)
     print("EXECUTION SUMMARY")
@@ -552,6 +1616,372 @@ if __name__ == "__main__":
     print(f"Images skipped due to blocked registries: {STATS['blocked_registry_images']}")
     print(f"Invalid registry URLs: {STATS['invalid_registry_urls']}")
     print(f"Workspaces with truncated compatibility entries: {STATS['truncated_compatibility_workspaces']}")
+    print(f"Workspaces rejected by schema validation: {STATS['schema_invalid_workspaces']}")
     print(f"Skopeo inspect timeouts: {STATS['skopeo_timeouts']}")
     print(f"Cached image hits (avoided redundant checks): {STATS['cached_image_hits']}")
-    print("="*60)
\ No newline at end of file
+    print(f"Near-duplicate workspaces (see duplicates.json): {STATS['near_duplicate_workspaces']}")
+    if HTTP_CACHE is not None:
+        print(f"GitHub responses revalidated from the HTTP cache: {STATS['http_cache_hits']}")
+    if len(TOKEN_POOL) > 1:
+        for label, usage in TOKEN_POOL.report().items():
+            sent = ', '.join(f"{resource} {count}" for resource, count in usage['requests'].items()) or 'none'
+            left = ', '.join(f"{resource} {count}" for resource, count in usage['remaining'].items()) or 'unknown'
+            print(f"GitHub token {label} ({usage['state']}): requests {sent}; remaining {left}; "
+                  f"rate limited {usage['rate_limited']} times")
+    if PAGES_FAST_PATH:
+        print(f"Repos read from their published listing / walked through the contents API: "
+              f"{STATS['pages_listing_repos']}/{STATS['pages_listing_fallbacks']}")
+        print(f"Contents API requests saved by published listings: {STATS['contents_requests_saved']}")
+    if changes:
+        print(f"Repos added/removed/modified since last run: "
+              f"{changes['summary']['repos_added']}/{changes['summary']['repos_removed']}/{changes['summary']['repos_modified']}")
+        print(f"Workspaces added/removed/modified since last run: "
+              f"{changes['summary']['workspaces_added']}/{changes['summary']['workspaces_removed']}/{changes['summary']['workspaces_modified']}")
+        print(f"Compatibility entries that became unpullable: {changes['summary']['compatibility_entries_unpullable']}")
+        print(f"Compatibility entries removed since last run: {changes['summary']['compatibility_entries_removed']}")
+    if PREPULL_PLAN_SUMMARY:
+        print(f"Pre-pull plan: {PREPULL_PLAN_SUMMARY['images']} images, "
+              f"{PREPULL_PLAN_SUMMARY['bytes_to_pull'] / 1e9:.2f} GB to pull "
+              f"({PREPULL_PLAN_SUMMARY['bytes_saved_by_sharing'] / 1e9:.2f} GB saved by shared layers, "
+              f"{PREPULL_PLAN_SUMMARY['images_without_layers']} images without layer data)")
+    if REGISTRY_EXPORT_STATS:
+        print(f"Registry export: {REGISTRY_EXPORT_STATS['registry_workspaces']} workspaces, "
+              f"{REGISTRY_EXPORT_STATS['registry_entries_written']} entries written, "
+              f"{REGISTRY_EXPORT_STATS['registry_entries_removed']} removed, "
+              f"{REGISTRY_EXPORT_STATS['registry_lists_written']} list files updated")
+    if THUMBNAIL_STATS:
+        print(f"Icons fetched/revalidated from cache: {THUMBNAIL_STATS['icons_fetched']}/{THUMBNAIL_STATS['icons_cached']}")
+        print(f"Workspaces without a usable icon: "
+              f"{THUMBNAIL_STATS['icons_missing'] + THUMBNAIL_STATS['icons_unavailable']}")
+        print(f"New thumbnails written: {THUMBNAIL_STATS['thumbnails_written']}")
+    if BUDGET.deadline is not None:
+        report = BUDGET.report()
+        print(f"Run time: {report['elapsed']}s of a {report['deadline']:g}s deadline")
+        for name, phase in report['phases'].items():
+            budget = f"{phase['budget']}s" if phase['budget'] is not None else "unbudgeted"
+            print(f"  {name}: {phase['elapsed']}s (budget {budget})")
+        print(f"Repos reused from last run (crawl budget used up): {STATS['budget_reused_repos']}")
+        print(f"Images kept as last known pullable without probing: {STATS['budget_last_known_probes']}")
+        print(f"New images skipped without probing: {STATS['budget_skipped_probes']}")
+    if STATS['circuit_breaker_skips'] or STATS['adaptive_timeout_seconds_saved']:
+        print(f"Probes skipped by open circuit breakers: {STATS['circuit_breaker_skips']} "
+              f"(~{STATS['circuit_breaker_seconds_saved']:.1f}s saved)")
+        print(f"Images kept as last known pullable / left out behind open breakers: "
+              f"{STATS['circuit_last_known_probes']}/{STATS['circuit_skipped_probes']}")
+        print(f"Seconds saved by adaptive probe timeouts: {STATS['adaptive_timeout_seconds_saved']:.1f}")
+        for registry, health in REGISTRY_HEALTH.report().items():
+            if health['times_opened']:
+                print(f"  {registry}: breaker opened {health['times_opened']}x, now {health['state']}")
+    if PROFILER.enabled:
+        calls = 'samples' if PROFILER.mode == 'sampling' else 'calls'
+        print(f"Hottest functions by own time per phase ({PROFILER.mode} profile, written to {PROFILE_DIR}/):")
+        for name, phase in PROFILER.report(PROFILE_TOP).items():
+            print(f"  {name}: {phase['seconds']:.3f}s")
+            for label, own, cumulative, count in phase['top']:
+                print(f"    {own:8.3f}s own {cumulative:8.3f}s cumulative {count:7d} {calls}  {label}")
+    print("="*60)
+
+
+def start_budget(deadline):
+    """Start the run clock and load last run's catalog to fall back on when probes are skipped."""
+    global BUDGET, PREVIOUS_CATALOG, LAST_KNOWN_PULLABLE
+    BUDGET = RunBudget(deadline)
+    if BUDGET.deadline is not None:
+        print(f"Run deadline: {BUDGET.deadline:g}s")
+    PREVIOUS_CATALOG = compact_catalog(load_previous_results('generated/community_workspaces.json'))
+    LAST_KNOWN_PULLABLE = probe_cache_keys(PREVIOUS_CATALOG)
+
+
+def start_profiler(args):
+    """Start profiling this run's phases if --profile was given."""
+    global PROFILER, PROFILE_DIR, PROFILE_TOP
+    if args.profile:
+        PROFILER = PhaseProfiler(args.profile)
+        PROFILE_DIR = args.profile_dir
+        PROFILE_TOP = args.profile_top
+        PROFILER.start()
+
+
+def run_crawl(args):
+    global VALIDATION_WORKERS, CASSETTE, GENERATE_THUMBNAILS, PREPULL_PLAN, REGISTRY_EXPORT
+    VALIDATION_WORKERS = args.validation_workers
+    GENERATE_THUMBNAILS = args.thumbnails
+    PREPULL_PLAN = args.prepull_plan
+    REGISTRY_EXPORT = args.registry_export
+    start_profiler(args)
+    start_budget(args.deadline)
+    if args.record:
+        CASSETTE = Cassette(args.record, 'record')
+    elif args.replay:
+        CASSETTE = Cassette(args.replay, 'replay', latency=args.replay_latency)
+        print(f"Replaying crawl from {args.replay} ({args.replay_latency} latency)")
+    with BUDGET.phase('search'), PROFILER.phase('search'):
+        search_results = get_search_results()
+    STATS['total_repos'] = len(search_results)
+
+    if args.shard_count > 1:
+        # Worker mode: crawl our share and leave publishing to the merge step
+        with BUDGET.phase('crawl'):
+            all_workspace_data = crawl_repos(search_results, shard_index=args.shard_index, shard_count=args.shard_count)
+        with PROFILER.phase('output'):
+            save_partial_results(search_results, all_workspace_data, args.shard_index, args.shard_count,
+                                 args.partial_dir)
+        PROFILER.stop()
+        print_summary()
+        return
+
+    save_results_to_file(search_results, 'generated/repos.json')
+    catalog_store = CatalogStore(CATALOG_DB) if CATALOG_DB else None
+    if catalog_store:
+        LAST_KNOWN_PULLABLE.update(key for key, pullable in catalog_store.load_probe_results().items() if pullable)
+    with BUDGET.phase('crawl'):
+        all_workspace_data = crawl_repos(search_results, catalog_store=catalog_store)
+    with BUDGET.phase('publish'), PROFILER.phase('output'):
+        changes = publish_results(search_results, all_workspace_data, catalog_store=catalog_store)
+    PROFILER.stop()
+    print_summary(changes)
+
+
+def run_merge(args):
+    global GENERATE_THUMBNAILS, PREPULL_PLAN, REGISTRY_EXPORT
+    GENERATE_THUMBNAILS = args.thumbnails
+    PREPULL_PLAN = args.prepull_plan
+    REGISTRY_EXPORT = args.registry_export
+    start_profiler(args)
+    partials = []
+    for filename in args.partials:
+        with open(filename, 'r') as f:
+            partials.append(json.load(f))
+    search_results, all_workspace_data, stats, probe_results = merge_partial_results(partials)
+    STATS.update(stats)
+    INSPECTED_IMAGES.update(probe_results)
+    for partial in partials:
+        IMAGE_LAYERS.update(partial.get('image_layers', {}))
+        IMAGE_DIGESTS.update(partial.get('image_digests', {}))
+        UNPULLABLE_ENTRIES.update(partial.get('unpullable_entries', {}))
+        # As in a single process: an image probed by any worker is not unverified
+        for key, reason in partial.get('unverified_images', {}).items():
+            if key not in INSPECTED_IMAGES:
+                UNVERIFIED_IMAGES.setdefault(key, reason)
+
+    save_results_to_file(search_results, 'generated/repos.json')
+    catalog_store = store_catalog(search_results, all_workspace_data)
+    with PROFILER.phase('output'):
+        changes = publish_results(search_results, all_workspace_data, catalog_store=catalog_store)
+    PROFILER.stop()
+    print_summary(changes)
+
+
+def store_catalog(search_results, all_workspace_data):
+    """
+    Upsert a catalog built outside crawl_repos into CATALOG_DB.
+
+    Unchanged repos cost a single row update; repos no longer in the catalog
+    are pruned when the store is passed to publish_results.
+
+    Returns:
+        CatalogStore or None: The open store, or None when CATALOG_DB is unset
+    """
+    if not CATALOG_DB:
+        return None
+    catalog_store = CatalogStore(CATALOG_DB)
+    for position, repo in enumerate(search_results):
+        if repo in all_workspace_data:
+            catalog_store.upsert_repo(repo, all_workspace_data[repo], position)
+    return catalog_store
+
+
+def is_discoverable_repo(repo_full_name):
+    """Return True if the repo matches the discovery search (README identifier, not kasmtech)."""
+    params = {'q': f"{SEARCH_QUERY} repo:{repo_full_name}", 'per_page': 1}
+    response = make_request(SEARCH_URL, params=params)
+    if response.status_code != 200:
+        return False
+    return any(item.get('full_name') == repo_full_name for item in response.json().get('items', []))
+
+
+def recrawl_repos(repos, search_results, all_workspace_data):
+    """
+    Re-crawl some repos, update the catalog in place and republish it (watch mode).
+
+    Args:
+        repos: Repo full names to re-crawl
+        search_results: Repo full names in catalog order, updated in place
+        all_workspace_data: The current catalog, updated in place
+    """
+    for key in STATS:
+        STATS[key] = 0
+    UNVERIFIED_IMAGES.clear()
+    UNPULLABLE_ENTRIES.clear()
+    # Images already in the catalog stay listed if their registry's breaker is open
+    LAST_KNOWN_PULLABLE.clear()
+    LAST_KNOWN_PULLABLE.update(probe_cache_keys(all_workspace_data))
+    expired = expire_probe_cache(PROBE_CACHE_TTL)
+    if expired:
+        print(f"Expired {expired} cached image probe results")
+
+    for repo in repos:
+        response = make_request(f"{GITHUB_API_URL}/repos/{repo}")
+        if response.status_code == 404:
+            print(f"Repository {repo} no longer exists, removing it")
+            all_workspace_data.pop(repo, None)
+            if repo in search_results:
+                search_results.remove(repo)
+            continue
+        if response.status_code != 200:
+            print(f"Skipping {repo}: could not fetch repository ({response.status_code})")
+            continue
+        if repo not in search_results:
+            if not is_discoverable_repo(repo):
+                print(f"Skipping {repo}: not a community registry (discovery identifier not found)")
+                continue
+            search_results.append(repo)
+        info = response.json()
+        REPO_STATS[repo] = RepoStats(info.get('stargazers_count', 0), info.get('pushed_at', 'Unknown'))
+        repo_entry = crawl_repo(repo)
+        if repo_entry:
+            all_workspace_data[repo] = repo_entry
+        else:
+            all_workspace_data.pop(repo, None)
+
+    # Keep catalog order = search order, as a full crawl would write it
+    ordered = {repo: all_workspace_data[repo] for repo in search_results if repo in all_workspace_data}
+    all_workspace_data.clear()
+    all_workspace_data.update(ordered)
+    STATS['total_repos'] = len(search_results)
+
+    save_results_to_file(search_results, 'generated/repos.json')
+    catalog_store = store_catalog(search_results, all_workspace_data)
+    changes = publish_results(search_results, all_workspace_data, catalog_store=catalog_store)
+    print_summary(changes)
+
+
+def run_watch(args):
+    global HTTP_CACHE, GENERATE_THUMBNAILS, PROBE_CACHE_TTL, PREPULL_PLAN, REGISTRY_EXPORT
+    HTTP_CACHE = {}
+    GENERATE_THUMBNAILS = args.thumbnails
+    PREPULL_PLAN = args.prepull_plan
+    REGISTRY_EXPORT = args.registry_export
+    PROBE_CACHE_TTL = args.probe_ttl
+
+    all_workspace_data = compact_catalog(load_previous_results('generated/community_workspaces.json'))
+    if all_workspace_data:
+        search_results = load_previous_results('generated/repos.json') or list(all_workspace_data)
+        for repo, repo_entry in all_workspace_data.items():
+            REPO_STATS[repo] = RepoStats(repo_entry.get('stars', 0), repo_entry.get('last_commit', 'Unknown'))
+        print(f"Loaded {len(all_workspace_data)} repos from the existing catalog")
+    else:
+        print("No existing catalog, running a full crawl first")
+        search_results = get_search_results()
+        STATS['total_repos'] = len(search_results)
+        save_results_to_file(search_results, 'generated/repos.json')
+        catalog_store = CatalogStore(CATALOG_DB) if CATALOG_DB else None
+        all_workspace_data = crawl_repos(search_results, catalog_store=catalog_store)
+        print_summary(publish_results(search_results, all_workspace_data, catalog_store=catalog_store))
+
+    queue = webhook_server.RecrawlQueue(
+        lambda repos: recrawl_repos(repos, search_results, all_workspace_data),
+        debounce=args.debounce, max_delay=args.max_delay
+    ).start()
+    server = webhook_server.make_server(queue, args.host, args.port, secret=os.getenv('WEBHOOK_SECRET'))
+    print(f"Watching for webhooks on http://{args.host}:{server.server_address[1]}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        queue.stop()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Crawl GitHub for community Kasm registries")
+    subparsers = parser.add_subparsers(dest='command')
+
+    crawl_parser = subparsers.add_parser('crawl', help="Search GitHub and crawl repos (default)")
+    crawl_parser.add_argument('--shard-index', type=int, default=0,
+                              help="Index of this worker when the crawl is split across workers")
+    crawl_parser.add_argument('--shard-count', type=int, default=1,
+                              help="Total number of workers; >1 writes a partial result instead of the catalog")
+    crawl_parser.add_argument('--partial-dir', default='generated/partials',
+                              help="Directory for partial results in worker mode")
+    crawl_parser.add_argument('--record', metavar='CASSETTE',
+                              help="Record GitHub responses and image probe results to a cassette file")
+    crawl_parser.add_argument('--replay', metavar='CASSETTE',
+                              help="Replay GitHub responses and image probe results from a cassette file")
+    crawl_parser.add_argument('--replay-latency', choices=('zero', 'original'), default='zero',
+                              help="Replay with no delay or with the originally recorded latency")
+    crawl_parser.add_argument('--deadline', type=float, default=RUN_DEADLINE, metavar='SECONDS',
+                              help="Finish within this many seconds, skipping probes once the crawl share "
+                                   "is used up (default: RUN_DEADLINE env var, 0 = no limit)")
+    crawl_parser.add_argument('--validation-workers', type=int, default=VALIDATION_WORKERS,
+                              help="Processes for JSON parsing/normalization/profanity checks (0 = in-process)")
+
+    merge_parser = subparsers.add_parser('merge', help="Merge worker partials into the catalog")
+    merge_parser.add_argument('partials', nargs='+', help="Partial result files from every shard")
+
+    watch_parser = subparsers.add_parser(
+        'watch', help="Stay running and re-crawl repos on GitHub push webhooks (secret: WEBHOOK_SECRET)")
+    watch_parser.add_argument('--host', default='127.0.0.1')
+    watch_parser.add_argument('--port', type=int, default=8090)
+    watch_parser.add_argument('--debounce', type=float, default=webhook_server.DEFAULT_DEBOUNCE,
+                              help="Seconds without new events before a batch of repos is re-crawled")
+    watch_parser.add_argument('--max-delay', type=float, default=webhook_server.DEFAULT_MAX_DELAY,
+                              help="Longest an event waits while a burst keeps arriving")
+    watch_parser.add_argument('--probe-ttl', type=float, default=PROBE_CACHE_TTL,
+                              help="Seconds a successful image probe stays cached between events")
+
+    for subparser in (crawl_parser, merge_parser):
+        subparser.add_argument('--profile', nargs='?', const='deterministic', choices=PROFILE_MODES,
+                               help="Profile each phase (search, parse, validate, probe, output) with cProfile "
+                                    "or, with 'sampling', a stack sampler; write <phase>.pstats and "
+                                    "<phase>.collapsed to --profile-dir")
+        subparser.add_argument('--profile-dir', default=PROFILE_DIR,
+                               help="Directory for the profiles written by --profile")
+        subparser.add_argument('--profile-top', type=int, default=PROFILE_TOP, metavar='N',
+                               help="Hottest functions per phase to print in the summary")
+
+    for subparser in (crawl_parser, merge_parser, watch_parser):
+        subparser.add_argument('--thumbnails', action=argparse.BooleanOptionalAction, default=GENERATE_THUMBNAILS,
+                               help="Fetch workspace icons and write generated/thumbnails/ (needs Pillow)")
+        subparser.add_argument('--prepull-plan', action=argparse.BooleanOptionalAction, default=PREPULL_PLAN,
+                               help="Record image layers and write generated/prepull_plan.json")
+        subparser.add_argument('--registry-export', action=argparse.BooleanOptionalAction, default=REGISTRY_EXPORT,
+                               help=f"Also write the catalog as one Kasm registry to {REGISTRY_EXPORT_DIR}/")
+
+    argv = list(sys.argv[1:] if argv is None else argv)
+    if not argv or argv[0].startswith('-'):
+        argv.insert(0, 'crawl')
+    args = parser.parse_args(argv)
+    if args.command == 'crawl' and not 0 <= args.shard_index < args.shard_count:
+        parser.error("--shard-index must be between 0 and --shard-count - 1")
+    if args.command == 'crawl' and args.record and args.replay:
+        parser.error("--record and --replay are mutually exclusive")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    # Create directory called "generated" if it doesn't exist
+    if not os.path.exists('generated'):
+        os.makedirs('generated')
+    try:
+        if args.command == 'merge':
+            run_merge(args)
+        elif args.command == 'watch':
+            run_watch(args)
+        else:
+            run_crawl(args)
+    finally:
+        disable_validation_pool()
+        if CASSETTE:
+            CASSETTE.save()
+        if PROFILER.enabled:
+            # Written after a crash too, so a failing run can still be profiled
+            PROFILER.stop()
+            PROFILER.write(PROFILE_DIR)
+            print(f"Profiles written to {PROFILE_DIR}/")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Stand-in for `skopeo inspect --raw docker://IMAGE` used by end-to-end tests.
+
+Every image is reported pullable with a small manifest, except images listed
+(comma-separated, without the docker:// prefix) in FAKE_SKOPEO_UNPULLABLE.
+Images on 127.0.0.1 are looked up in the tests/stub_registry.py server
+listening on that port.
+"""
+
+import json
+import os
+import sys
+import urllib.error
+import urllib.request
+
+reference = sys.argv[-1].replace('docker://', '', 1)
+unpullable = {image for image in os.getenv('FAKE_SKOPEO_UNPULLABLE', '').split(',') if image}
+
+if reference in unpullable:
+    sys.stderr.write(f"manifest unknown: {reference}\n")
+    sys.exit(1)
+
+if reference.startswith('127.0.0.1:'):
+    host, _, repository = reference.partition('/')
+    if '@' in repository:
+        name, _, tag = repository.partition('@')
+    else:
+        name, _, tag = repository.rpartition(':')
+    try:
+        with urllib.request.urlopen(f"http://{host}/v2/{name}/manifests/{tag}", timeout=10) as response:
+            sys.stdout.write(response.read().decode('utf-8'))
+    except urllib.error.HTTPError:
+        sys.stderr.write(f"manifest unknown: {reference}\n")
+        sys.exit(1)
+    sys.exit(0)
+
+# Like skopeo --raw, the manifest bytes exactly as served (no trailing newline)
+sys.stdout.write(json.dumps({
+    'schemaVersion': 2,
+    'mediaType': 'application/vnd.docker.distribution.manifest.v2+json',
+    'config': {'digest': 'sha256:' + '0' * 64, 'size': 100},
+    'layers': []
+}))
@@ -0,0 +1,200 @@
+"""
+Minimal mock of the GitHub REST API endpoints used by search_github.py.
+
+Serves search results, the workspaces/ contents listing, per-folder
+listings, raw workspace.json downloads, repo metadata and the Pages
+endpoint for a set of repos (which tests may change while it runs), plus
+each repo's Pages site serving the registry's 1.0/list.json. Responses
+carry an ETag and honour If-None-Match. Point the crawler at it with
+GITHUB_API_URL.
+
+With tokens={token: limit}, API requests are rate limited per token and
+resource like GitHub's: X-RateLimit-* headers on every answer, 403 once a
+token has used its limit, and 401 for a token not in the dict.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from email.utils import format_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+MOCK_DATA_DIR = os.path.join(os.path.dirname(__file__), 'mock_data')
+
+
+def load_mock(name):
+    with open(os.path.join(MOCK_DATA_DIR, name)) as f:
+        return json.load(f)
+
+
+def mock_repos():
+    """A handful of repos covering pullable, unpullable, blocked and profane workspaces"""
+    repos = {}
+    for index in range(8):
+        workspaces = {'OldApp': load_mock('workspace_old_format.json')}
+        if index % 2:
+            workspaces['NewApp'] = load_mock('workspace_new_format.json')
+        if index == 3:
+            workspaces['Rude'] = load_mock('workspace_profanity.json')
+        if index == 5:
+            workspaces['Blocked'] = load_mock('workspace_blocked_image.json')
+        repos[f"user{index}/kasm-registry"] = {
+            'stars': index,
+            'pushed_at': f"2024-01-0{index + 1}T00:00:00Z",
+            'workspaces': workspaces
+        }
+    return repos
+
+
+class MockGitHubAPI:
+    """
+    Serve a fake GitHub API on a free localhost port.
+
+    Args:
+        repos: dict of full_name -> {'stars': int, 'pushed_at': str,
+               'workspaces': {folder_name: workspace_json}}. Optional keys:
+               'pages_listing' (False: the site has no list.json, or a list of the
+               folders it publishes) and 'pages_built_at' (ISO time of the site
+               build, default pushed_at)
+        tokens: Optional {token: requests allowed per resource} to enforce rate limits
+    """
+
+    def __init__(self, repos, tokens=None):
+        self.repos = repos
+        self.tokens = tokens
+        self.token_requests = Counter()
+        self.requests = []
+        self.request_headers = []
+        self.not_modified = 0
+        handler = self._make_handler()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _route(self, path, query):
+        """Return (status, payload) or (status, payload, extra headers) for a GET."""
+        parts = [part for part in path.split('/') if part]
+        if parts == ['search', 'repositories']:
+            page = int(query.get('page', ['1'])[0])
+            items = []
+            if page == 1:
+                # Honour a repo: qualifier; every mock repo carries the discovery identifier
+                qualifiers = [term[len('repo:'):] for term in query.get('q', [''])[0].split()
+                              if term.startswith('repo:')]
+                items = [
+                    {'full_name': name, 'stargazers_count': repo.get('stars', 0),
+                     'pushed_at': repo.get('pushed_at', '2024-01-01T00:00:00Z')}
+                    for name, repo in list(self.repos.items())
+                    if not qualifiers or name in qualifiers
+                ]
+            return 200, {'items': items}
+
+        if len(parts) < 3 or parts[0] not in ('repos', 'raw', 'sites'):
+            return 404, {'message': 'Not Found'}
+        full_name = f"{parts[1]}/{parts[2]}"
+        repo = self.repos.get(full_name)
+        if repo is None:
+            return 404, {'message': 'Not Found'}
+
+        if parts[0] == 'repos' and len(parts) == 3:
+            return 200, {'full_name': full_name, 'stargazers_count': repo.get('stars', 0),
+                         'pushed_at': repo.get('pushed_at', '2024-01-01T00:00:00Z')}
+        if parts[0] == 'sites':
+            if parts[3:] != ['1.0', 'list.json'] or repo.get('pages_listing') is False:
+                return 404, {'message': 'Not Found'}
+            built_at = datetime.fromisoformat(
+                repo.get('pages_built_at', repo.get('pushed_at', '2024-01-01T00:00:00Z')).replace('Z', '+00:00'))
+            # Like the registry's build: every workspace.json plus build metadata
+            published = repo.get('pages_listing', True)
+            listing = {'workspaces': [dict(workspace, sha=hashlib.sha1(folder.encode()).hexdigest())
+                                      for folder, workspace in repo['workspaces'].items()
+                                      if published is True or folder in published]}
+            return 200, listing, {'Last-Modified': format_datetime(built_at, usegmt=True)}
+        if parts[0] == 'raw':
+            workspace = repo['workspaces'].get(parts[3])
+            return (200, workspace) if workspace is not None else (404, {'message': 'Not Found'})
+        if parts[3:] == ['pages']:
+            return 200, {'html_url': f"{self.url}/sites/{full_name}/"}
+        if parts[3:] == ['contents', 'workspaces']:
+            if not repo['workspaces']:
+                return 404, {'message': 'Not Found'}
+            return 200, [
+                {'name': folder, 'type': 'dir',
+                 'url': f"{self.url}/repos/{full_name}/contents/workspaces/{folder}"}
+                for folder in repo['workspaces']
+            ]
+        if parts[3:5] == ['contents', 'workspaces'] and len(parts) == 6:
+            folder = parts[5]
+            return 200, [
+                {'name': 'workspace.json', 'type': 'file',
+                 'download_url': f"{self.url}/raw/{full_name}/{folder}"}
+            ]
+        return 404, {'message': 'Not Found'}
+
+    def _rate_limit(self, path, authorization):
+        """Return (status or None to serve the request, X-RateLimit headers) for a request."""
+        parts = [part for part in path.split('/') if part]
+        if self.tokens is None or not parts or parts[0] not in ('search', 'repos'):
+            return None, {}
+        token = (authorization or '').removeprefix('Bearer ')
+        if token not in self.tokens:
+            return 401, {}
+        resource = 'search' if parts[0] == 'search' else 'core'
+        used = self.token_requests[(token, resource)]
+        headers = {'X-RateLimit-Limit': str(self.tokens[token]), 'X-RateLimit-Resource': resource,
+                   'X-RateLimit-Reset': str(int(time.time()) + 3600)}
+        if used >= self.tokens[token]:
+            headers['X-RateLimit-Remaining'] = '0'
+            return 403, headers
+        self.token_requests[(token, resource)] += 1
+        headers['X-RateLimit-Remaining'] = str(self.tokens[token] - used - 1)
+        return None, headers
+
+    def _make_handler(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                api.requests.append(parsed.path)
+                limited, rate_headers = api._rate_limit(parsed.path, self.headers.get('Authorization'))
+                if limited:
+                    status, payload, extra_headers = limited, {'message': 'Rate limited or bad credentials'}, []
+                else:
+                    status, payload, *extra_headers = api._route(parsed.path, parse_qs(parsed.query))
+                extra_headers = [dict(extra_headers[0] if extra_headers else {}, **rate_headers)]
+                api.request_headers.append(dict(self.headers))
+                body = json.dumps(payload).encode('utf-8')
+                etag = f'"{hashlib.sha1(body).hexdigest()}"'
+                if status == 200 and self.headers.get('If-None-Match') == etag:
+                    api.not_modified += 1
+                    status, body = 304, b''
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                if status in (200, 304):
+                    self.send_header('ETag', etag)
+                for name, value in (extra_headers[0] if extra_headers else {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
@@ -0,0 +1,270 @@
+"""
+Microbenchmark runner for the pure pipeline functions.
+Runs each hot-path function over the tests/mock_data fixtures and a scaled
+synthetic corpus, records ops/sec and allocations, and compares them with a
+saved baseline.
+
+Usage:
+    GH_PAT=dummy python tests/run_benchmarks.py                    # compare (saves a baseline on first run)
+    GH_PAT=dummy python tests/run_benchmarks.py --update-baseline  # accept the current numbers
+    GH_PAT=dummy python tests/run_benchmarks.py --threshold 0.1 --only should_skip_image
+
+Exits with 1 when a benchmark's ops/sec drops, or its allocations grow, by
+more than --threshold relative to the baseline. Baselines are only
+comparable on the machine that recorded them.
+"""
+
+import argparse
+import contextlib
+import glob
+import itertools
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+# Add parent directory to path
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT_DIR)
+os.chdir(ROOT_DIR)  # search_github loads profanity_whitelist.json from the cwd
+os.environ.setdefault('GH_PAT', 'benchmark')
+
+import search_github
+from benchmarks.synthetic import make_workspace
+from compact_records import compact, to_builtin
+
+MOCK_DATA_DIR = os.path.join(os.path.dirname(__file__), 'mock_data')
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), 'benchmark_baseline.json')
+BASELINE_FORMAT_VERSION = 1
+# Calls between clock reads while timing
+TIMING_BATCH = 16
+# Calls traced per benchmark to measure allocations
+ALLOCATION_SAMPLE = 200
+
+
+def load_fixtures():
+    """The workspace.json fixtures in tests/mock_data, keyed by file name."""
+    fixtures = []
+    for path in sorted(glob.glob(os.path.join(MOCK_DATA_DIR, 'workspace_*.json'))):
+        with open(path, 'r') as f:
+            fixtures.append((os.path.splitext(os.path.basename(path))[0], json.load(f)))
+    return fixtures
+
+
+def make_synthetic(scale, seed=0):
+    rng = random.Random(seed)
+    return [(f"Workspace{index}", make_workspace(rng, index)) for index in range(scale)]
+
+
+def pullable_view(workspace, folder_name):
+    """The normalized workspace with every image pullable, as check_image_pullability would return it."""
+    normalized = (search_github.normalize_workspace_json(workspace, folder_name) or {}).get(folder_name)
+    return normalized if normalized and normalized.get('compatibility') else None
+
+
+def image_calls(corpus):
+    """(image, docker_registry) for every image in the corpus, in both workspace formats."""
+    calls = []
+    for _, workspace in corpus:
+        for entry in workspace.get('compatibility') or []:
+            image = entry.get('image') if isinstance(entry, dict) else workspace.get('name')
+            if isinstance(image, str):
+                calls.append((image, workspace.get('docker_registry')))
+    return calls
+
+
+# name -> function(corpus) returning (callable, [argument tuples])
+BENCHMARKS = {
+    'normalize_workspace_json': lambda corpus: (
+        search_github.normalize_workspace_json,
+        [(workspace, folder) for folder, workspace in corpus]
+    ),
+    'check_profanity_in_workspace': lambda corpus: (
+        search_github.check_profanity_in_workspace,
+        [(workspace, folder) for folder, workspace in corpus]
+    ),
+    'should_skip_image': lambda corpus: (
+        search_github.should_skip_image,
+        image_calls(corpus)
+    ),
+    'filter_original_workspace_json': lambda corpus: (
+        search_github.filter_original_workspace_json,
+        [(workspace, pullable_view(workspace, folder)) for folder, workspace in corpus
+         if pullable_view(workspace, folder)]
+    ),
+    'is_valid_http_url': lambda corpus: (
+        search_github.is_valid_http_url,
+        [(workspace.get(field),) for _, workspace in corpus
+         for field in ('image_src', 'docker_registry') if isinstance(workspace.get(field), str)]
+        + [('javascript:alert(1)',), ('ftp://registry.example.com',)]
+    ),
+    'json_serialization': lambda corpus: (
+        lambda record: json.dumps(record, indent=4, default=to_builtin),
+        [(compact(workspace),) for _, workspace in corpus]
+    ),
+}
+
+
+def measure(function, calls, min_time, repeat):
+    """
+    Time and trace one benchmark.
+
+    Args:
+        function: The function under test
+        calls: Argument tuples, cycled through in batches until min_time has passed
+        min_time: Seconds per timing round
+        repeat: Timing rounds; the best one is kept
+
+    Returns:
+        dict: ops_per_sec, alloc_bytes (mean peak bytes allocated per call, over up to
+        ALLOCATION_SAMPLE calls or min_time seconds of tracing) and calls
+    """
+    best = 0.0
+    batches = [calls[index:index + TIMING_BATCH] for index in range(0, len(calls), TIMING_BATCH)]
+    for _ in range(repeat):
+        ops = 0
+        start = time.perf_counter()
+        # Slow functions (profanity checks) need not get through the whole corpus
+        for batch in itertools.cycle(batches):
+            for args in batch:
+                function(*args)
+            ops += len(batch)
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time:
+                break
+        best = max(best, ops / elapsed)
+
+    allocated = traced = 0
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        for args in calls[:ALLOCATION_SAMPLE]:
+            current, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            function(*args)
+            allocated += tracemalloc.get_traced_memory()[1] - current
+            traced += 1
+            if time.perf_counter() - start >= min_time:
+                break
+    finally:
+        tracemalloc.stop()
+    return {'ops_per_sec': best, 'alloc_bytes': allocated / traced, 'calls': len(calls)}
+
+
+def run_benchmarks(scale, min_time, repeat, only=None):
+    """Run every benchmark on both corpora; returns {"name[corpus]": result}."""
+    corpora = {'fixtures': load_fixtures(), 'synthetic': make_synthetic(scale)}
+    results = {}
+    # check_profanity_in_workspace prints what it finds
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for name, prepare in BENCHMARKS.items():
+            if only and name not in only:
+                continue
+            for corpus_name, corpus in corpora.items():
+                function, calls = prepare(corpus)
+                if calls:
+                    results[f"{name}[{corpus_name}]"] = measure(function, calls, min_time, repeat)
+    return results
+
+
+def compare_to_baseline(results, baseline, threshold):
+    """
+    Find benchmarks that regressed past the threshold.
+
+    Args:
+        results: This run's {"name[corpus]": result}
+        baseline: The baseline's results
+        threshold: Allowed relative change, e.g. 0.2 for 20%
+
+    Returns:
+        list: Descriptions of the regressions, empty if there are none
+    """
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if not reference:
+            continue
+        if result['ops_per_sec'] < reference['ops_per_sec'] * (1 - threshold):
+            regressions.append(f"{name}: {result['ops_per_sec']:,.0f} ops/sec vs. "
+                               f"{reference['ops_per_sec']:,.0f} in the baseline")
+        # A few bytes of tracing noise never count
+        if result['alloc_bytes'] > reference['alloc_bytes'] * (1 + threshold) + 64:
+            regressions.append(f"{name}: {result['alloc_bytes']:,.0f} bytes allocated per call vs. "
+                               f"{reference['alloc_bytes']:,.0f} in the baseline")
+    return regressions
+
+
+def load_baseline(path):
+    """Return the saved results, or None if there is no usable baseline."""
+    try:
+        with open(path, 'r') as f:
+            baseline = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if baseline.get('version') != BASELINE_FORMAT_VERSION:
+        return None
+    return baseline
+
+
+def save_baseline(path, results, args):
+    with open(path, 'w') as f:
+        json.dump({
+            'version': BASELINE_FORMAT_VERSION,
+            'python': sys.version.split()[0],
+            'scale': args.scale,
+            'results': results
+        }, f, indent=2, sort_keys=True)
+    print(f"Baseline saved to {path}")
+
+
+def main():
+    """Main entry point for the benchmark runner"""
+    parser = argparse.ArgumentParser(description="Microbenchmarks with regression budgets")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="Baseline JSON file")
+    parser.add_argument('--update-baseline', action='store_true', help="Save this run as the new baseline")
+    parser.add_argument('--threshold', type=float, default=float(os.getenv('BENCHMARK_THRESHOLD', '0.25')),
+                        help="Allowed relative regression before failing (default 0.25)")
+    parser.add_argument('--scale', type=int, default=1000, help="Workspaces in the synthetic corpus")
+    parser.add_argument('--min-time', type=float, default=0.2, help="Seconds per timing round")
+    parser.add_argument('--repeat', type=int, default=3, help="Timing rounds, the best is kept")
+    parser.add_argument('--only', nargs='+', choices=sorted(BENCHMARKS), help="Run only these benchmarks")
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("Kasm Community Images Explorer - Microbenchmarks")
+    print("=" * 70)
+    results = run_benchmarks(args.scale, args.min_time, args.repeat, args.only)
+    baseline = load_baseline(args.baseline)
+    reference = baseline['results'] if baseline and baseline.get('scale') == args.scale else {}
+
+    print(f"{'benchmark':<46} {'ops/sec':>12} {'vs base':>8} {'bytes/call':>11}")
+    for name, result in results.items():
+        change = ''
+        if name in reference:
+            change = f"{result['ops_per_sec'] / reference[name]['ops_per_sec'] - 1:+.0%}"
+        print(f"{name:<46} {result['ops_per_sec']:>12,.0f} {change:>8} {result['alloc_bytes']:>11,.0f}")
+    print("=" * 70)
+
+    if args.update_baseline or baseline is None:
+        if baseline is None:
+            print("No baseline to compare with")
+        # Keep baseline entries for benchmarks not run this time (--only)
+        merged = dict(baseline['results']) if baseline and baseline.get('scale') == args.scale else {}
+        merged.update(results)
+        save_baseline(args.baseline, merged, args)
+        sys.exit(0)
+    if not reference:
+        print(f"Baseline was recorded with --scale {baseline.get('scale')}; nothing to compare")
+        sys.exit(0)
+
+    regressions = compare_to_baseline(results, reference, args.threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    print(f"{len(regressions)} regression(s) past the {args.threshold:.0%} threshold")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -17,7 +17,30 @@ from tests import (
     test_image_filtering,
     test_url_validation,
     test_filter_workspace,
-    test_compatibility_limits
+    test_compatibility_limits,
+    test_catalog_store,
+    test_catalog_server,
+    test_catalog_diff,
+    test_distributed_crawl,
+    test_validation_pool,
+    test_cassette,
+    test_icon_thumbnails,
+    test_schema_validation,
+    test_near_duplicates,
+    test_ranking,
+    test_watch_mode,
+    test_atomic_output,
+    test_run_budget,
+    test_registry_health,
+    test_compact_records,
+    test_pages_listing,
+    test_image_policy,
+    test_run_benchmarks,
+    test_layer_planner,
+    test_registry_export,
+    test_token_pool,
+    test_binary_catalog,
+    test_phase_profiler
 )
 
 
@@ -42,7 +65,30 @@ def run_all_tests(verbosity=2):
         test_image_filtering,
         test_url_validation,
         test_filter_workspace,
-        test_compatibility_limits
+        test_compatibility_limits,
+        test_catalog_store,
+        test_catalog_server,
+        test_catalog_diff,
+        test_distributed_crawl,
+        test_validation_pool,
+        test_cassette,
+        test_icon_thumbnails,
+        test_schema_validation,
+        test_near_duplicates,
+        test_ranking,
+        test_watch_mode,
+        test_atomic_output,
+        test_run_budget,
+        test_registry_health,
+        test_compact_records,
+        test_pages_listing,
+        test_image_policy,
+        test_run_benchmarks,
+        test_layer_planner,
+        test_registry_export,
+        test_token_pool,
+        test_binary_catalog,
+        test_phase_profiler
     ]
     
     for module in test_modules:
@@ -0,0 +1,113 @@
+"""
+Minimal stand-in for a container registry's manifest endpoint.
+
+Serves GET /v2/<name>/manifests/<tag or digest> for images added with
+add_image() (a single-platform manifest with the given layers) or
+add_index() (a multi-arch index pointing at one manifest per platform).
+tests/mock_data/fake_skopeo.py forwards references on 127.0.0.1 here, so
+an end-to-end crawl sees real layer digests and sizes.
+"""
+
+import hashlib
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MANIFEST_TYPE = 'application/vnd.docker.distribution.manifest.v2+json'
+INDEX_TYPE = 'application/vnd.oci.image.index.v1+json'
+
+
+def layer_digest(name):
+    """A stable fake layer digest, e.g. layer_digest('ubuntu-base')."""
+    return 'sha256:' + hashlib.sha256(name.encode('utf-8')).hexdigest()
+
+
+class StubRegistry:
+    """Serve manifests on a free localhost port; host is the "127.0.0.1:PORT" image prefix."""
+
+    def __init__(self):
+        self.manifests = {}
+        self.requests = []
+        handler = self._make_handler()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        self.server.daemon_threads = True
+        self.host = f"127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _store(self, name, tag, manifest):
+        body = json.dumps(manifest).encode('utf-8')
+        digest = 'sha256:' + hashlib.sha256(body).hexdigest()
+        self.manifests[(name, digest)] = (manifest['mediaType'], body)
+        if tag:
+            self.manifests[(name, tag)] = (manifest['mediaType'], body)
+        return digest, len(body)
+
+    def add_image(self, name, tag, layers):
+        """
+        Publish a single-platform image.
+
+        Args:
+            name: Repository, e.g. "org/app"
+            tag: Tag, or None to reach it only by digest
+            layers: [(layer name or digest, size)]
+
+        Returns:
+            tuple: (manifest digest, manifest size)
+        """
+        return self._store(name, tag, {
+            'schemaVersion': 2,
+            'mediaType': MANIFEST_TYPE,
+            'config': {'mediaType': 'application/vnd.docker.container.image.v1+json',
+                       'digest': layer_digest(f"{name}:{tag}:config"), 'size': 1000},
+            'layers': [{'mediaType': 'application/vnd.docker.image.rootfs.diff.tar.gzip',
+                        'digest': layer if layer.startswith('sha256:') else layer_digest(layer), 'size': size}
+                       for layer, size in layers]
+        })
+
+    def add_index(self, name, tag, platforms):
+        """
+        Publish a multi-arch image.
+
+        Args:
+            name: Repository
+            tag: Tag of the index
+            platforms: {(os, architecture): [(layer, size)]}
+        """
+        entries = []
+        for (os_name, architecture), layers in platforms.items():
+            digest, size = self.add_image(name, None, layers)
+            entries.append({'mediaType': MANIFEST_TYPE, 'digest': digest, 'size': size,
+                            'platform': {'os': os_name, 'architecture': architecture}})
+        return self._store(name, tag, {'schemaVersion': 2, 'mediaType': INDEX_TYPE, 'manifests': entries})
+
+    def _make_handler(self):
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                registry.requests.append(self.path)
+                name, _, reference = self.path.removeprefix('/v2/').rpartition('/manifests/')
+                found = registry.manifests.get((name, reference))
+                if found is None:
+                    status, media_type = 404, 'application/json'
+                    body = json.dumps({'errors': [{'code': 'MANIFEST_UNKNOWN'}]}).encode('utf-8')
+                else:
+                    status, (media_type, body) = 200, found
+                self.send_response(status)
+                self.send_header('Content-Type', media_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
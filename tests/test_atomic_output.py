@@ -0,0 +1,99 @@
+"""
+Unit tests for crash-safe output publishing.
+Tests atomic_open, save_results_to_file under a simulated crash, and the
+content-hash manifest.
+"""
+
+import unittest
+import json
+import os
+import stat
+import sys
+import tempfile
+from unittest.mock import patch
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from atomic_output import atomic_open, verify_manifest, write_manifest
+from search_github import save_results_to_file
+
+
+class TestAtomicOutput(unittest.TestCase):
+    """Test cases for atomic_output"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'catalog.json')
+        with open(self.path, 'w') as f:
+            f.write('{"old": true}')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _read(self):
+        with open(self.path) as f:
+            return f.read()
+
+    def test_replaces_on_success(self):
+        """Test that the target is replaced and no temporary file is left behind"""
+        with atomic_open(self.path) as f:
+            f.write('{"new": true}')
+            # Readers still see the old content until the block completes
+            self.assertEqual(self._read(), '{"old": true}')
+        self.assertEqual(self._read(), '{"new": true}')
+        self.assertEqual(os.listdir(self.tmpdir.name), ['catalog.json'])
+        # Not mkstemp's 0600: other users (web server, CI steps) can read it
+        self.assertTrue(os.stat(self.path).st_mode & stat.S_IRGRP or os.name == 'nt')
+
+    def test_crash_leaves_previous_file(self):
+        """Test that an exception mid-write keeps the previous file intact"""
+        with self.assertRaises(RuntimeError):
+            with atomic_open(self.path) as f:
+                f.write('{"trunc')
+                raise RuntimeError("crash")
+        self.assertEqual(self._read(), '{"old": true}')
+        self.assertEqual(os.listdir(self.tmpdir.name), ['catalog.json'])
+
+    def test_save_results_to_file_is_atomic(self):
+        """Test that a failing json.dump never truncates the published file"""
+        def partial_dump(obj, f, **kwargs):
+            f.write('{"partial": ')
+            raise OSError("disk full")
+
+        with patch('search_github.json.dump', side_effect=partial_dump):
+            with self.assertRaises(OSError):
+                save_results_to_file({'new': True}, filename=self.path)
+        self.assertEqual(self._read(), '{"old": true}')
+
+        save_results_to_file({'new': True}, filename=self.path)
+        self.assertEqual(json.loads(self._read()), {'new': True})
+
+    def test_manifest_round_trip(self):
+        """Test that the manifest records hashes and detects changed or missing files"""
+        other = os.path.join(self.tmpdir.name, 'changes.json')
+        with open(other, 'w') as f:
+            f.write('{}')
+        manifest_path = os.path.join(self.tmpdir.name, 'manifest.json')
+
+        manifest = write_manifest([self.path, other, os.path.join(self.tmpdir.name, 'absent.json')],
+                                  manifest_path)
+
+        self.assertEqual(list(manifest['files']), ['catalog.json', 'changes.json'])
+        self.assertEqual(manifest['files']['changes.json']['bytes'], 2)
+        self.assertEqual(verify_manifest(manifest_path), [])
+        # Unchanged files give a byte-identical manifest on the next run
+        with open(manifest_path, 'rb') as f:
+            first = f.read()
+        write_manifest([self.path, other], manifest_path)
+        with open(manifest_path, 'rb') as f:
+            self.assertEqual(f.read(), first)
+
+        with open(other, 'w') as f:
+            f.write('{"changed": 1}')
+        os.remove(self.path)
+        self.assertEqual(verify_manifest(manifest_path), ['catalog.json', 'changes.json'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+"""
+Unit tests for the binary catalog.
+Tests the round trip of every workspace, lookups by id, repo and category,
+rejecting files that are not binary catalogs and the crawler writing one.
+"""
+
+import unittest
+import json
+import os
+import sys
+import tempfile
+from unittest.mock import patch
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import search_github
+from benchmarks.synthetic import make_catalog
+from binary_catalog import BinaryCatalog, write_binary_catalog
+from catalog_utils import iter_workspaces, workspace_id
+from compact_records import compact_catalog
+from tests.mock_github_api import load_mock
+
+
+def mock_catalog():
+    old = load_mock('workspace_old_format.json')
+    new = load_mock('workspace_new_format.json')
+    # Values the record cannot hold stay in the document as they are
+    new['categories'] = ['Browser', 7]
+    new['docker_registry'] = None
+    return {
+        'user1/kasm-registry': {'github_pages': 'https://user1.github.io/kasm-registry/', 'stars': 3,
+                                'last_commit': '2024-01-02T03:04:05Z',
+                                'workspaces': [{'OldApp': old}, {'NewApp': new}]},
+        'user2/kasm-registry': {'github_pages': 'https://user2.github.io/kasm-registry/', 'stars': 1,
+                                'workspaces': [{'Ünïcode': {'friendly_name': 'Ünïcode', 'categories': ['browser']}}]},
+    }
+
+
+class TestBinaryCatalog(unittest.TestCase):
+    """Test cases for write_binary_catalog and BinaryCatalog"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'community_workspaces.bin')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def open(self, catalog):
+        write_binary_catalog(catalog, self.path)
+        reader = BinaryCatalog(self.path)
+        self.addCleanup(reader.close)
+        return reader
+
+    def test_round_trip(self):
+        """Test that every workspace reads back equal, with its keys in order"""
+        for catalog in (mock_catalog(), make_catalog(500)):
+            reader = self.open(catalog)
+            self.assertEqual(len(reader), sum(1 for _ in iter_workspaces(catalog)))
+            for repo, _, ws_name, ws_data in iter_workspaces(catalog):
+                workspace = reader.get(workspace_id(repo, ws_name))
+                self.assertEqual(workspace, ws_data)
+                self.assertEqual(list(workspace), list(ws_data))
+
+    def test_compact_catalog_round_trip(self):
+        """Test that the interned catalog the crawler publishes encodes the same"""
+        catalog = mock_catalog()
+        reader = self.open(compact_catalog(mock_catalog()))
+        self.assertEqual(reader.get('user1/kasm-registry/NewApp'),
+                         catalog['user1/kasm-registry']['workspaces'][1]['NewApp'])
+
+    def test_record(self):
+        """Test the indexed fields, including old-format compatibility"""
+        reader = self.open(mock_catalog())
+        old = load_mock('workspace_old_format.json')
+        record = reader.record(reader.find('user1/kasm-registry/OldApp'))
+        self.assertEqual(record['id'], 'user1/kasm-registry/OldApp')
+        self.assertEqual(record['repo'], 'user1/kasm-registry')
+        self.assertEqual(record['friendly_name'], old['friendly_name'])
+        self.assertEqual([entry['version'] for entry in record['compatibility']], old['compatibility'])
+        self.assertEqual({entry['image'] for entry in record['compatibility']}, {old['name']})
+        new = reader.record(reader.find('user1/kasm-registry/NewApp'))
+        self.assertEqual(new['categories'], ['Browser'])
+        self.assertIsNone(new['docker_registry'])
+
+    def test_repo_and_category_lookup(self):
+        """Test repo lookup and case-insensitive category postings in catalog order"""
+        reader = self.open(mock_catalog())
+        repo = reader.repo('user1/kasm-registry')
+        self.assertEqual((repo['stars'], repo['last_commit']), (3, '2024-01-02T03:04:05Z'))
+        self.assertEqual(list(repo['workspace_positions']), [0, 1])
+        self.assertIsNone(reader.repo('user1/missing'))
+        self.assertEqual(list(reader.by_category('BROWSER')), [1, 2])
+        self.assertEqual(list(reader.by_category('Nothing')), [])
+        self.assertEqual(reader.categories()['browser'], 2)
+
+    def test_missing_ids(self):
+        """Test that unknown ids are not found, also in an empty catalog"""
+        reader = self.open(make_catalog(50))
+        self.assertIsNone(reader.get('user1/kasm-registry/Missing'))
+        self.assertIsNone(self.open({}).find('user1/kasm-registry/OldApp'))
+
+    def test_rejects_other_files(self):
+        """Test that a JSON file or a truncated file raises ValueError"""
+        with open(self.path, 'w') as f:
+            json.dump(mock_catalog(), f)
+        with self.assertRaises(ValueError):
+            BinaryCatalog(self.path)
+        with open(self.path, 'wb') as f:
+            f.write(b'KCAT')
+        with self.assertRaises(ValueError):
+            BinaryCatalog(self.path)
+
+    def test_publish_results_writes_binary_catalog(self):
+        """Test that the crawler writes the binary catalog and lists it in the manifest"""
+        cwd = os.getcwd()
+        os.chdir(self.tmpdir.name)
+        try:
+            os.makedirs('generated')
+            catalog = compact_catalog(mock_catalog())
+            with patch('builtins.print'):
+                search_github.publish_results(list(catalog), catalog)
+            with open('generated/manifest.json') as f:
+                files = json.load(f)['files']
+            with BinaryCatalog('generated/community_workspaces.bin') as reader:
+                self.assertEqual(len(reader), 3)
+        finally:
+            os.chdir(cwd)
+        self.assertIn('community_workspaces.bin', files)
+
+
+if __name__ == '__main__':
+    unittest.main()
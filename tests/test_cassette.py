@@ -0,0 +1,142 @@
+"""
+Unit tests for record/replay cassettes.
+Tests the Cassette class, icon fetches going through the cassette and a
+full crawl recorded against a mock API and replayed offline.
+"""
+
+import unittest
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from unittest.mock import Mock, patch
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import search_github
+from cassette import Cassette, CassetteMiss
+from icon_thumbnails import build_thumbnails
+from tests.mock_github_api import MOCK_DATA_DIR, ROOT_DIR, MockGitHubAPI, mock_repos
+
+
+class TestCassette(unittest.TestCase):
+    """Test cases for Cassette record/replay"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'crawl.cassette.gz')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _record(self):
+        cassette = Cassette(self.path, 'record')
+        for body in (b'{"page": 1}', b'{"page": 2}'):
+            response = Mock(status_code=200, content=body, headers={'etag': '"abc"'})
+            cassette.record_http('https://api.github.com/x', {'page': '1', 'q': 'a'}, response, 0.25)
+        cassette.record_probe('org/image:1', True, 1.5, {'skopeo_timeouts': 1})
+        cassette.save()
+
+    def test_http_round_trip_in_recorded_order(self):
+        """Test that repeated requests replay in order, then repeat the last"""
+        self._record()
+        cassette = Cassette(self.path, 'replay')
+
+        first = cassette.replay_http('https://api.github.com/x', {'q': 'a', 'page': '1'})
+        second = cassette.replay_http('https://api.github.com/x', {'q': 'a', 'page': '1'})
+        third = cassette.replay_http('https://api.github.com/x', {'q': 'a', 'page': '1'})
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.json(), {'page': 1})
+        self.assertEqual(second.json(), {'page': 2})
+        self.assertEqual(third.json(), {'page': 2})
+        self.assertEqual(first.headers['etag'], '"abc"')
+
+    def test_probe_round_trip_with_stats(self):
+        """Test that probe results and their stats increments are replayed"""
+        self._record()
+        cassette = Cassette(self.path, 'replay')
+        self.assertEqual(cassette.replay_probe('org/image:1'), (True, {'skopeo_timeouts': 1}))
+
+    def test_unrecorded_call_raises(self):
+        """Test that replaying an unknown call raises CassetteMiss"""
+        self._record()
+        cassette = Cassette(self.path, 'replay')
+        with self.assertRaises(CassetteMiss):
+            cassette.replay_http('https://api.github.com/unknown')
+
+    @patch('cassette.time.sleep')
+    def test_original_latency(self, mock_sleep):
+        """Test that 'original' latency sleeps for the recorded duration"""
+        self._record()
+        Cassette(self.path, 'replay', latency='original').replay_probe('org/image:1')
+        mock_sleep.assert_called_once_with(1.5)
+
+        mock_sleep.reset_mock()
+        Cassette(self.path, 'replay', latency='zero').replay_probe('org/image:1')
+        mock_sleep.assert_not_called()
+
+    def test_icons_replay_from_the_cassette(self):
+        """Test that thumbnail icon fetches are recorded and replayed like every other request"""
+        url = 'https://user.github.io/kasm-registry/app.png'
+        catalog = {'user/kasm-registry': {'github_pages': 'https://user.github.io/kasm-registry/',
+                                          'workspaces': [{'App': {'image_src': 'app.png'}}]}}
+        body = b'\x89PNG\r\n\x1a\n' + b'\x01' * 32
+        icon = Mock(status_code=200, content=body, headers={'ETag': '"1"'})
+        live = Mock()
+        cache_dir = os.path.join(self.tmpdir.name, 'icon_cache')
+        out_dir = os.path.join(self.tmpdir.name, 'thumbnails')
+
+        cassette = Cassette(self.path, 'record')
+        with patch.object(search_github, 'CASSETTE', cassette), \
+                patch('search_github.send_request', return_value=icon) as mock_send:
+            build_thumbnails(catalog, out_dir, cache_dir, workers=1, session=live,
+                             request=search_github.request_icon)
+        self.assertEqual(mock_send.call_args.args[0], url)
+        cassette.save()
+
+        shutil.rmtree(cache_dir)
+        with patch.object(search_github, 'CASSETTE', Cassette(self.path, 'replay')), \
+                patch('search_github.send_request') as mock_send, patch('builtins.print'):
+            _, stats = build_thumbnails(catalog, out_dir, cache_dir, workers=1, session=live,
+                                        request=search_github.request_icon)
+        mock_send.assert_not_called()
+        live.get.assert_not_called()
+        self.assertEqual(stats['icons_fetched'], 1)
+
+    def test_replayed_crawl_matches_recorded_crawl(self):
+        """Test that an offline replay reproduces the recorded crawl's output"""
+        outputs = {}
+        for mode in ('record', 'replay'):
+            workdir = os.path.join(self.tmpdir.name, mode)
+            os.makedirs(workdir)
+            shutil.copy(os.path.join(ROOT_DIR, 'profanity_whitelist.json'), workdir)
+            env = dict(os.environ, GH_PAT='test-token', DEBUG='false', GITHUB_REQUEST_DELAY='0',
+                       FAKE_SKOPEO_UNPULLABLE='myregistry/test-image:1.15.0')
+            env.pop('CATALOG_DB', None)
+            if mode == 'record':
+                api = MockGitHubAPI(mock_repos()).__enter__()
+                env.update(GITHUB_API_URL=api.url,
+                           SKOPEO_BIN=os.path.join(MOCK_DATA_DIR, 'fake_skopeo.py'))
+                args = ['--record', self.path]
+            else:
+                # Same API URL (so recorded keys match), but nothing is listening
+                api.__exit__(None, None, None)
+                env.update(GITHUB_API_URL=api.url, SKOPEO_BIN='/nonexistent/skopeo')
+                args = ['--replay', self.path]
+            result = subprocess.run(
+                [sys.executable, os.path.join(ROOT_DIR, 'search_github.py')] + args,
+                cwd=workdir, env=env, capture_output=True, text=True, timeout=120
+            )
+            self.assertEqual(result.returncode, 0, result.stdout + result.stderr)
+            summary = result.stdout[result.stdout.index('EXECUTION SUMMARY'):result.stdout.rindex('=' * 60)]
+            with open(os.path.join(workdir, 'generated', 'community_workspaces.json')) as f:
+                outputs[mode] = (f.read(), summary)
+
+        self.assertEqual(outputs['replay'], outputs['record'])
+
+
+if __name__ == '__main__':
+    unittest.main()
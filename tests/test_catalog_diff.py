@@ -0,0 +1,198 @@
+"""
+Unit tests for run-to-run catalog diffs.
+Tests compute_diff and apply_diff from catalog_diff, and the changes.json
+of two crawls against a mock GitHub API.
+"""
+
+import unittest
+import copy
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from catalog_diff import apply_diff, compute_diff, has_changes
+from tests.mock_github_api import MOCK_DATA_DIR, ROOT_DIR, MockGitHubAPI, mock_repos
+
+
+class TestCatalogDiff(unittest.TestCase):
+    """Test cases for compute_diff and apply_diff"""
+
+    @classmethod
+    def setUpClass(cls):
+        """Load mock data once for all tests"""
+        cls.mock_data_dir = os.path.join(os.path.dirname(__file__), 'mock_data')
+
+        with open(os.path.join(cls.mock_data_dir, 'workspace_old_format.json')) as f:
+            cls.old_format_data = json.load(f)
+
+        with open(os.path.join(cls.mock_data_dir, 'workspace_new_format.json')) as f:
+            cls.new_format_data = json.load(f)
+
+    def setUp(self):
+        """Build a baseline catalog"""
+        self.old = {
+            'alice/kasm-registry': {
+                'github_pages': 'https://alice.github.io/kasm-registry/',
+                'stars': 5,
+                'last_commit': '2024-01-01T00:00:00Z',
+                'workspaces': [{'OldApp': self.old_format_data}, {'NewApp': self.new_format_data}]
+            },
+            'bob/kasm-registry': {
+                'github_pages': 'https://bob.github.io/kasm-registry/',
+                'stars': 1,
+                'last_commit': '2024-01-01T00:00:00Z',
+                'workspaces': [{'NewApp': copy.deepcopy(self.new_format_data)}]
+            }
+        }
+        self.new = copy.deepcopy(self.old)
+
+    def test_identical_catalogs_have_no_changes(self):
+        """Test that an unchanged catalog produces an empty diff"""
+        diff = compute_diff(self.old, self.new)
+        self.assertFalse(has_changes(diff))
+        self.assertEqual(sum(diff['summary'].values()), 0)
+
+    def test_added_and_removed_repos(self):
+        """Test repo level additions and removals"""
+        del self.new['bob/kasm-registry']
+        self.new['carol/kasm-registry'] = copy.deepcopy(self.old['bob/kasm-registry'])
+
+        diff = compute_diff(self.old, self.new)
+
+        self.assertEqual(diff['repos']['removed'], ['bob/kasm-registry'])
+        self.assertEqual(list(diff['repos']['added']), ['carol/kasm-registry'])
+        self.assertEqual(diff['workspaces']['removed'], ['bob/kasm-registry/NewApp'])
+        self.assertIn('carol/kasm-registry/NewApp', diff['workspaces']['added'])
+        # Entries of a removed repo are not reported as unpullable
+        self.assertEqual(diff['unpullable_compatibility'], [])
+
+    def test_modified_workspace_splits_unpullable_and_removed_entries(self):
+        """Test that only dropped entries the crawler found unpullable are reported as unpullable"""
+        del self.new['alice/kasm-registry']['workspaces'][1]['NewApp']['compatibility'][:2]
+        unpullable_entries = {'alice/kasm-registry/NewApp': [('1.16.x', 'myregistry/test-image:1.16.0')]}
+
+        diff = compute_diff(self.old, self.new, unpullable_entries=unpullable_entries)
+
+        self.assertEqual(list(diff['workspaces']['modified']), ['alice/kasm-registry/NewApp'])
+        self.assertEqual(diff['unpullable_compatibility'], [{
+            'workspace': 'alice/kasm-registry/NewApp',
+            'version': '1.16.x',
+            'image': 'myregistry/test-image:1.16.0'
+        }])
+        self.assertEqual(diff['removed_compatibility'], [{
+            'workspace': 'alice/kasm-registry/NewApp',
+            'version': '1.15.x',
+            'image': 'myregistry/test-image:1.15.0'
+        }])
+        self.assertEqual(diff['summary']['compatibility_entries_removed'], 1)
+
+    def test_removed_workspace_in_listed_repo(self):
+        """Test that a workspace dropped from a still-listed repo is unpullable only if it failed to pull"""
+        self.new['alice/kasm-registry']['workspaces'].pop(0)
+
+        diff = compute_diff(self.old, self.new)
+
+        self.assertEqual(list(diff['repos']['modified']), ['alice/kasm-registry'])
+        self.assertEqual(diff['unpullable_compatibility'], [])
+        self.assertEqual(len(diff['removed_compatibility']), 3)
+        self.assertEqual(diff['removed_compatibility'][0]['image'], 'myregistry/test-image')
+
+        entries = [('1.15.x', 'myregistry/test-image'), ('1.16.x', 'myregistry/test-image'),
+                   ('1.17.x', 'myregistry/test-image')]
+        diff = compute_diff(self.old, self.new, unpullable_entries={'alice/kasm-registry/OldApp': entries})
+
+        self.assertEqual(len(diff['unpullable_compatibility']), 3)
+        self.assertEqual(diff['removed_compatibility'], [])
+
+    def test_removed_repo_that_failed_to_pull_is_unpullable(self):
+        """Test that a repo dropped because none of its images pulled reports them as unpullable"""
+        del self.new['bob/kasm-registry']
+        entries = [['1.15.x', 'myregistry/test-image:1.15.0'], ['1.16.x', 'myregistry/test-image:1.16.0'],
+                   ['1.17.x', 'myregistry/test-image:1.17.0']]
+
+        # As read back from a worker's partial: lists, not tuples
+        diff = compute_diff(self.old, self.new, unpullable_entries={'bob/kasm-registry/NewApp': entries})
+
+        self.assertEqual(diff['repos']['removed'], ['bob/kasm-registry'])
+        self.assertEqual([entry['version'] for entry in diff['unpullable_compatibility']], ['1.15.x', '1.16.x', '1.17.x'])
+        self.assertEqual(diff['removed_compatibility'], [])
+
+    def test_repo_metadata_change_is_modified(self):
+        """Test that a stars change marks the repo modified without touching workspaces"""
+        self.new['bob/kasm-registry']['stars'] = 10
+
+        diff = compute_diff(self.old, self.new)
+
+        self.assertEqual(diff['repos']['modified']['bob/kasm-registry']['stars'], 10)
+        self.assertEqual(diff['summary']['workspaces_modified'], 0)
+
+    def test_apply_diff_round_trip(self):
+        """Test that applying the diff reproduces the new catalog exactly"""
+        self.new['alice/kasm-registry']['workspaces'].pop(0)
+        self.new['bob/kasm-registry']['workspaces'][0]['NewApp']['description'] = 'changed'
+        self.new['carol/kasm-registry'] = copy.deepcopy(self.old['alice/kasm-registry'])
+        self.new = dict(reversed(list(self.new.items())))
+
+        diff = compute_diff(self.old, self.new)
+        result = apply_diff(self.old, json.loads(json.dumps(diff)))
+
+        self.assertEqual(json.dumps(result), json.dumps(self.new))
+
+    def test_apply_diff_rejects_wrong_base(self):
+        """Test that a diff is not applied to a different catalog"""
+        diff = compute_diff(self.old, self.new)
+        with self.assertRaises(ValueError):
+            apply_diff({}, diff)
+
+
+class TestCrawlChanges(unittest.TestCase):
+    """Test the changes.json written by a second crawl"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        shutil.copy(os.path.join(ROOT_DIR, 'profanity_whitelist.json'), self.tmpdir.name)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _crawl(self, api, unpullable):
+        env = dict(os.environ, GH_PAT='test-token', DEBUG='false', GITHUB_REQUEST_DELAY='0',
+                   GITHUB_API_URL=api.url, SKOPEO_BIN=os.path.join(MOCK_DATA_DIR, 'fake_skopeo.py'),
+                   FAKE_SKOPEO_UNPULLABLE=unpullable)
+        env.pop('CATALOG_DB', None)
+        env.pop('GH_PATS', None)
+        result = subprocess.run([sys.executable, os.path.join(ROOT_DIR, 'search_github.py')],
+                                cwd=self.tmpdir.name, env=env, capture_output=True, text=True, timeout=120)
+        self.assertEqual(result.returncode, 0, result.stdout + result.stderr)
+        with open(os.path.join(self.tmpdir.name, 'generated', 'changes.json')) as f:
+            return json.load(f)
+
+    def test_unpullable_and_removed_entries(self):
+        """Test that an entry deleted upstream is removed and one whose image stopped pulling is unpullable"""
+        repos = mock_repos()
+        with MockGitHubAPI(repos) as api:
+            self._crawl(api, 'myregistry/test-image:1.15.0')
+            # user1 deletes its 1.17.x entry; the 1.16.0 image stops pulling everywhere
+            repos['user1/kasm-registry']['workspaces']['NewApp']['compatibility'].pop()
+            # With and without the workspace's registry prefix, the two references the crawler tries
+            changes = self._crawl(api, 'myregistry/test-image:1.15.0,myregistry/test-image:1.16.0,'
+                                       'index.docker.io/v1/myregistry/test-image:1.16.0')
+
+        self.assertEqual(changes['removed_compatibility'], [{
+            'workspace': 'user1/kasm-registry/NewApp',
+            'version': '1.17.x',
+            'image': 'myregistry/test-image:1.17.0'
+        }])
+        self.assertEqual({entry['workspace'] for entry in changes['unpullable_compatibility']},
+                         {f"user{index}/kasm-registry/NewApp" for index in (1, 3, 5, 7)})
+        self.assertEqual({entry['version'] for entry in changes['unpullable_compatibility']}, {'1.16.x'})
+
+
+if __name__ == '__main__':
+    unittest.main()
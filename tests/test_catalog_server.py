@@ -0,0 +1,153 @@
+"""
+Unit tests for the read-only catalog query server.
+Tests index lookups, pagination, ETag handling and hot reload.
+"""
+
+import unittest
+import http.client
+import json
+import os
+import sys
+import tempfile
+import threading
+from unittest.mock import patch
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from catalog_server import CatalogIndex, make_server
+
+
+class TestCatalogServer(unittest.TestCase):
+    """Test cases for CatalogIndex and the HTTP handler"""
+
+    @classmethod
+    def setUpClass(cls):
+        """Load mock data once for all tests"""
+        cls.mock_data_dir = os.path.join(os.path.dirname(__file__), 'mock_data')
+
+        with open(os.path.join(cls.mock_data_dir, 'workspace_old_format.json')) as f:
+            cls.old_format_data = json.load(f)
+
+        with open(os.path.join(cls.mock_data_dir, 'workspace_new_format.json')) as f:
+            cls.new_format_data = json.load(f)
+
+    def setUp(self):
+        """Write a small catalog and start a server on a free port"""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'community_workspaces.json')
+        browser = dict(self.new_format_data, friendly_name='Fast Browser',
+                       categories=['Browser'], architecture=['amd64'])
+        self.catalog = {
+            'alice/kasm-registry': {
+                'github_pages': 'https://alice.github.io/kasm-registry/',
+                'stars': 5,
+                'last_commit': '2024-01-01T00:00:00Z',
+                'workspaces': [{'OldApp': self.old_format_data}, {'Browser': browser}]
+            }
+        }
+        self._write(self.catalog)
+
+        self.server = make_server(self.path, port=0, reload_interval=0)
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmpdir.cleanup()
+
+    def _write(self, catalog):
+        with open(self.path, 'w') as f:
+            json.dump(catalog, f)
+
+    def _get(self, path, headers=None):
+        conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=5)
+        conn.request('GET', path, headers=headers or {})
+        response = conn.getresponse()
+        body = response.read()
+        conn.close()
+        return response, (json.loads(body) if body else None)
+
+    def test_filter_by_category_is_case_insensitive(self):
+        """Test category filter"""
+        _, data = self._get('/workspaces?category=browser')
+        self.assertEqual([item['name'] for item in data['items']], ['Browser'])
+
+    def test_filter_by_version_covers_old_format(self):
+        """Test version filter on both compatibility formats"""
+        _, data = self._get('/workspaces?version=1.15.x')
+        self.assertEqual(data['total'], 2)
+
+    def test_filter_by_arch_and_text(self):
+        """Test combined architecture and free-text filters"""
+        _, data = self._get('/workspaces?arch=arm64&q=old+format')
+        self.assertEqual([item['id'] for item in data['items']], ['alice/kasm-registry/OldApp'])
+
+    def test_pagination(self):
+        """Test page and per_page parameters"""
+        _, data = self._get('/workspaces?per_page=1&page=2')
+        self.assertEqual(data['total'], 2)
+        self.assertEqual([item['name'] for item in data['items']], ['Browser'])
+
+    def test_workspace_lookup_by_id(self):
+        """Test single workspace lookup and 404"""
+        response, data = self._get('/workspace?id=alice/kasm-registry/OldApp')
+        self.assertEqual(response.status, 200)
+        self.assertEqual(data['workspace'], self.old_format_data)
+
+        response, _ = self._get('/workspace?id=missing')
+        self.assertEqual(response.status, 404)
+
+    def test_etag_returns_304(self):
+        """Test that a matching If-None-Match returns 304"""
+        response, _ = self._get('/workspaces?category=browser')
+        etag = response.getheader('ETag')
+        self.assertIsNotNone(etag)
+
+        response, body = self._get('/workspaces?category=browser', {'If-None-Match': etag})
+        self.assertEqual(response.status, 304)
+        self.assertIsNone(body)
+
+    def test_hot_reload_changes_etag(self):
+        """Test that a changed file is reloaded and invalidates ETags"""
+        response, _ = self._get('/workspaces')
+        etag = response.getheader('ETag')
+
+        self.catalog['alice/kasm-registry']['workspaces'].pop()
+        self._write(self.catalog)
+
+        response, data = self._get('/workspaces', {'If-None-Match': etag})
+        self.assertEqual(response.status, 200)
+        self.assertEqual(data['total'], 1)
+        self.assertNotEqual(response.getheader('ETag'), etag)
+
+    def test_unchanged_content_is_not_reindexed(self):
+        """Test that touching the file without changing content keeps the snapshot"""
+        index = CatalogIndex(self.path, reload_interval=0)
+        self._write(self.catalog)
+        os.utime(self.path, ns=(1, 1))
+        index.current()
+        self.assertEqual(index.reloads, 1)
+
+
+    def test_corrupt_file_is_retried(self):
+        """Test that a file that failed to parse is read again even if its mtime and size stay the same"""
+        index = CatalogIndex(self.path, reload_interval=0)
+        self.catalog['alice/kasm-registry']['workspaces'].pop()
+        content = json.dumps(self.catalog)
+        with open(self.path, 'w') as f:
+            f.write('{' + ' ' * (len(content) - 1))
+        os.utime(self.path, ns=(1, 1))
+        with patch('builtins.print'):
+            self.assertEqual(len(index.current().records), 2)
+
+            with open(self.path, 'w') as f:
+                f.write(content)
+            os.utime(self.path, ns=(1, 1))
+            self.assertEqual(len(index.current().records), 1)
+        self.assertEqual(index.reloads, 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,181 @@
+"""
+Unit tests for the SQLite catalog store.
+Tests incremental upserts, indexed queries, the streaming JSON export and
+the image digests recorded from the crawler's probes.
+"""
+
+import unittest
+import hashlib
+import json
+import os
+import sys
+import subprocess
+import tempfile
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import search_github
+from catalog_store import CatalogStore, image_registry
+
+
+class TestCatalogStore(unittest.TestCase):
+    """Test cases for CatalogStore"""
+
+    @classmethod
+    def setUpClass(cls):
+        """Load mock data once for all tests"""
+        cls.mock_data_dir = os.path.join(os.path.dirname(__file__), 'mock_data')
+
+        with open(os.path.join(cls.mock_data_dir, 'workspace_old_format.json')) as f:
+            cls.old_format_data = json.load(f)
+
+        with open(os.path.join(cls.mock_data_dir, 'workspace_new_format.json')) as f:
+            cls.new_format_data = json.load(f)
+
+    def setUp(self):
+        """Create a fresh database per test"""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, 'catalog.db')
+        self.store = CatalogStore(self.db_path)
+        self.catalog = {
+            'alice/kasm-registry': {
+                'github_pages': 'https://alice.github.io/kasm-registry/',
+                'stars': 5,
+                'last_commit': '2020-01-01T00:00:00Z',
+                'workspaces': [{'OldApp': self.old_format_data}]
+            },
+            'bob/kasm-registry': {
+                'github_pages': 'https://bob.github.io/kasm-registry/',
+                'stars': 1,
+                'last_commit': '2099-01-01T00:00:00Z',
+                'workspaces': [{'NewApp': self.new_format_data}]
+            }
+        }
+        for position, (repo, entry) in enumerate(self.catalog.items()):
+            self.store.upsert_repo(repo, entry, position)
+
+    def tearDown(self):
+        self.store.close()
+        self.tmpdir.cleanup()
+
+    def test_export_matches_json_dump(self):
+        """Test that the streaming export is byte-identical to json.dump(indent=4)"""
+        out = os.path.join(self.tmpdir.name, 'out.json')
+        self.store.export_json(out)
+
+        with open(out) as f:
+            exported = f.read()
+        self.assertEqual(exported, json.dumps(self.catalog, indent=4))
+
+    def test_export_empty_store(self):
+        """Test that an empty store exports an empty JSON object"""
+        self.store.run_id += 1
+        self.store.prune_missing_repos()
+        out = os.path.join(self.tmpdir.name, 'out.json')
+        self.store.export_json(out)
+
+        with open(out) as f:
+            self.assertEqual(json.load(f), {})
+
+    def test_unchanged_repo_is_not_rewritten(self):
+        """Test that upserting identical content reports no change"""
+        changed = self.store.upsert_repo('alice/kasm-registry', self.catalog['alice/kasm-registry'], 0)
+        self.assertFalse(changed)
+
+    def test_changed_repo_replaces_workspaces(self):
+        """Test that changed content replaces the repo's workspaces"""
+        entry = dict(self.catalog['alice/kasm-registry'], workspaces=[{'NewApp': self.new_format_data}])
+        changed = self.store.upsert_repo('alice/kasm-registry', entry, 0)
+
+        self.assertTrue(changed)
+        names = self.store.conn.execute(
+            "SELECT name FROM workspaces WHERE repo = 'alice/kasm-registry'"
+        ).fetchall()
+        self.assertEqual(names, [('NewApp',)])
+
+    def test_prune_removes_repos_not_seen_this_run(self):
+        """Test that repos not upserted in the current run are pruned"""
+        self.store.run_id += 1
+        self.store.upsert_repo('bob/kasm-registry', self.catalog['bob/kasm-registry'], 0)
+
+        self.assertEqual(self.store.prune_missing_repos(), 1)
+        repos = [name for name, _ in self.store.iter_repo_entries()]
+        self.assertEqual(repos, ['bob/kasm-registry'])
+
+    def test_prune_removes_unreferenced_images(self):
+        """Test that images only pruned or replaced workspaces used are pruned too"""
+        self.store.set_image_digests({'myregistry/test-image:1.16.0': 'sha256:aaa'})
+        self.assertIn('myregistry/test-image', self.store.images_in_registry('index.docker.io'))
+        self.store.run_id += 1
+        self.store.upsert_repo('bob/kasm-registry', self.catalog['bob/kasm-registry'], 0)
+
+        self.store.prune_missing_repos()
+        # OldApp's image went with alice; bob's images are still referenced
+        self.assertNotIn('myregistry/test-image', self.store.images_in_registry('index.docker.io'))
+        self.assertEqual(self.store.images_with_digest('sha256:aaa'), ['myregistry/test-image:1.16.0'])
+        images = {row[0] for row in self.store.conn.execute('SELECT name FROM images')}
+        referenced = {row[0] for row in self.store.conn.execute('SELECT image FROM compatibility')}
+        self.assertEqual(images, referenced)
+
+    def test_workspaces_using_image(self):
+        """Test lookup of workspaces by image, including old format entries"""
+        rows = self.store.workspaces_using_image('myregistry/test-image')
+        self.assertEqual([row[:2] for row in rows], [('alice/kasm-registry', 'OldApp')] * 3)
+
+    def test_workspaces_for_version(self):
+        """Test lookup of workspaces by compatibility version"""
+        repos = {row[0] for row in self.store.workspaces_for_version('1.16.x')}
+        self.assertEqual(repos, {'alice/kasm-registry', 'bob/kasm-registry'})
+
+    def test_repos_unchanged_since(self):
+        """Test stale repo query by last_commit"""
+        now = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        rows = self.store.repos_unchanged_since(90, now=now)
+        self.assertEqual(rows, [('alice/kasm-registry', '2020-01-01T00:00:00Z')])
+
+    def test_probe_results_upsert(self):
+        """Test that probe results are stored and overwritten"""
+        self.store.record_probe_results({'a/b:latest': True})
+        self.store.record_probe_results({'a/b:latest': False})
+        row = self.store.conn.execute('SELECT pullable FROM probe_results').fetchall()
+        self.assertEqual(row, [(0,)])
+        self.store.record_probe_results({'c/d:1': True})
+        self.assertEqual(self.store.load_probe_results(), {'a/b:latest': False, 'c/d:1': True})
+
+    def test_image_digests(self):
+        """Test that recorded digests are queryable and images not probed keep none"""
+        self.store.set_image_digests({'myregistry/test-image:1.15.0': 'sha256:aaa',
+                                      'myregistry/test-image:1.16.0': 'sha256:aaa',
+                                      'not/in-store:1': 'sha256:aaa'})
+        self.assertEqual(sorted(self.store.images_with_digest('sha256:aaa')),
+                         ['myregistry/test-image:1.15.0', 'myregistry/test-image:1.16.0'])
+        self.assertEqual(self.store.images_with_digest('sha256:bbb'), [])
+
+    @patch('search_github.subprocess.run')
+    def test_probe_digests_feed_the_store(self, mock_run):
+        """Test that skopeo_inspect records the manifest digest and publishing maps it to image names"""
+        manifest = '{"schemaVersion": 2, "layers": []}'
+        mock_run.return_value = subprocess.CompletedProcess([], 0, stdout=manifest, stderr='')
+        with patch.dict(search_github.INSPECTED_IMAGES, clear=True), \
+                patch.dict(search_github.IMAGE_DIGESTS, clear=True):
+            self.assertTrue(search_github.skopeo_inspect('myregistry/test-image:1.16.0', 'index.docker.io/v1'))
+            digests = search_github.image_digests(self.catalog)
+
+        digest = 'sha256:' + hashlib.sha256(manifest.encode('utf-8')).hexdigest()
+        self.assertEqual(digests, {'myregistry/test-image:1.16.0': digest})
+        self.store.set_image_digests(digests)
+        self.assertEqual(self.store.images_with_digest(digest), ['myregistry/test-image:1.16.0'])
+
+    def test_image_registry(self):
+        """Test registry detection from image reference and docker_registry"""
+        self.assertEqual(image_registry('ghcr.io/org/app:1'), 'ghcr.io')
+        self.assertEqual(image_registry('org/app:1', 'https://index.docker.io/v1/'), 'index.docker.io')
+        self.assertEqual(image_registry('org/app:1'), 'docker.io')
+        self.assertIsNone(image_registry(None))
+
+
+if __name__ == '__main__':
+    unittest.main()
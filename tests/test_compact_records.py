@@ -0,0 +1,76 @@
+"""
+Unit tests for the compact in-memory workspace representation.
+Tests CompactRecord, compact, compact_catalog and their use by the crawler's
+serialization and hashing.
+"""
+
+import unittest
+import json
+import os
+import pickle
+import sys
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from catalog_utils import content_hash, iter_compatibility
+from compact_records import CompactRecord, compact, compact_catalog, to_builtin
+
+
+class TestCompactRecords(unittest.TestCase):
+    """Test cases for compact_records"""
+
+    @classmethod
+    def setUpClass(cls):
+        mock_data_dir = os.path.join(os.path.dirname(__file__), 'mock_data')
+        with open(os.path.join(mock_data_dir, 'workspace_new_format.json'), 'r') as f:
+            cls.new_format_data = json.load(f)
+        with open(os.path.join(mock_data_dir, 'workspace_old_format.json'), 'r') as f:
+            cls.old_format_data = json.load(f)
+
+    def test_behaves_like_the_dict(self):
+        """Test lookups, iteration order and equality against the original dict"""
+        record = compact(self.new_format_data)
+        self.assertEqual(record, self.new_format_data)
+        self.assertEqual(self.new_format_data, record)
+        self.assertEqual(list(record), list(self.new_format_data))
+        self.assertEqual(record['friendly_name'], self.new_format_data['friendly_name'])
+        self.assertIsNone(record.get('missing'))
+        self.assertNotIn('missing', record)
+        self.assertIsInstance(record['compatibility'][0], CompactRecord)
+        with self.assertRaises(KeyError):
+            record['missing']
+        with self.assertRaises(TypeError):
+            record['friendly_name'] = 'changed'
+
+    def test_serializes_to_identical_json(self):
+        """Test that records produce the same JSON and content hash as the dicts"""
+        for data in (self.new_format_data, self.old_format_data):
+            record = compact(data)
+            self.assertEqual(json.dumps(record, indent=4, default=to_builtin), json.dumps(data, indent=4))
+            self.assertEqual(content_hash(record), content_hash(data))
+            self.assertEqual(list(iter_compatibility(record)), list(iter_compatibility(data)))
+
+    def test_layouts_and_values_are_shared(self):
+        """Test that records with the same keys share one layout and repeated values are interned"""
+        first = compact(json.loads(json.dumps(self.new_format_data)))
+        second = compact(json.loads(json.dumps(self.new_format_data)))
+        self.assertIs(first._layout, second._layout)
+        self.assertIs(first['compatibility'][0]['version'], second['compatibility'][0]['version'])
+        self.assertIs(first['categories'][0], second['categories'][0])
+
+        restored = pickle.loads(pickle.dumps(first))
+        self.assertIs(restored._layout, first._layout)
+        self.assertEqual(restored, first)
+
+    def test_compact_catalog(self):
+        """Test that only workspaces are compacted so repo entries stay mutable"""
+        catalog = {'owner/repo': {'stars': 1, 'workspaces': [{'App': dict(self.old_format_data)}]}}
+        compact_catalog(catalog)
+        self.assertIsInstance(catalog['owner/repo'], dict)
+        self.assertIsInstance(catalog['owner/repo']['workspaces'][0]['App'], CompactRecord)
+        self.assertEqual(catalog['owner/repo']['workspaces'][0]['App'].copy(), self.old_format_data)
+
+
+if __name__ == '__main__':
+    unittest.main()
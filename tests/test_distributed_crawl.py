@@ -0,0 +1,119 @@
+"""
+Tests for splitting the crawl across workers and merging their partials.
+Runs search_github.py in separate processes against a mock GitHub API.
+"""
+
+import unittest
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from search_github import merge_partial_results, shard_for_repo
+from tests.mock_github_api import MOCK_DATA_DIR, ROOT_DIR, MockGitHubAPI, mock_repos
+
+
+class TestDistributedCrawl(unittest.TestCase):
+    """Test cases for shard_for_repo, merge_partial_results and the merge subcommand"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        shutil.copy(os.path.join(ROOT_DIR, 'profanity_whitelist.json'), self.tmpdir.name)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _env(self, api):
+        env = dict(os.environ)
+        env.update({
+            'GH_PAT': 'test-token',
+            'DEBUG': 'false',
+            'GITHUB_API_URL': api.url,
+            'GITHUB_REQUEST_DELAY': '0',
+            'SKOPEO_BIN': os.path.join(MOCK_DATA_DIR, 'fake_skopeo.py'),
+            'FAKE_SKOPEO_UNPULLABLE': 'myregistry/test-image:1.15.0',
+        })
+        env.pop('CATALOG_DB', None)
+        return env
+
+    def _run(self, workdir, args, env):
+        os.makedirs(workdir, exist_ok=True)
+        shutil.copy(os.path.join(ROOT_DIR, 'profanity_whitelist.json'), workdir)
+        return subprocess.Popen(
+            [sys.executable, os.path.join(ROOT_DIR, 'search_github.py')] + args,
+            cwd=workdir, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True
+        )
+
+    @staticmethod
+    def _summary(output):
+        return output[output.index('EXECUTION SUMMARY'):]
+
+    def test_shard_assignment_is_stable(self):
+        """Test that shard assignment is deterministic and in range"""
+        self.assertEqual(shard_for_repo('owner/repo', 4), shard_for_repo('owner/repo', 4))
+        shards = {shard_for_repo(f"user{i}/repo", 4) for i in range(100)}
+        self.assertEqual(shards, {0, 1, 2, 3})
+
+    def test_merge_rejects_missing_shard(self):
+        """Test that merging an incomplete set of shards fails"""
+        partial = {'shard_index': 0, 'shard_count': 2, 'search_results': [], 'workspaces': {}, 'stats': {}}
+        with self.assertRaises(ValueError):
+            merge_partial_results([partial])
+
+    def _crawl_both_ways(self, env, args=()):
+        """Crawl in one process and in 3 workers + merge; return (single_dir, shard_dir, outputs)."""
+        single_dir = os.path.join(self.tmpdir.name, 'single')
+        single = self._run(single_dir, ['crawl'] + list(args), env)
+        single_output = single.communicate(timeout=120)[0]
+        self.assertEqual(single.returncode, 0, single_output)
+
+        shard_dir = os.path.join(self.tmpdir.name, 'sharded')
+        partial_dir = os.path.join(self.tmpdir.name, 'partials')
+        workers = [
+            self._run(shard_dir, ['crawl', '--shard-index', str(i), '--shard-count', '3',
+                                  '--partial-dir', partial_dir] + list(args), env)
+            for i in range(3)
+        ]
+        for worker in workers:
+            output = worker.communicate(timeout=120)[0]
+            self.assertEqual(worker.returncode, 0, output)
+
+        partials = sorted(os.path.join(partial_dir, name) for name in os.listdir(partial_dir))
+        merge = self._run(shard_dir, ['merge'] + partials, env)
+        merge_output = merge.communicate(timeout=120)[0]
+        self.assertEqual(merge.returncode, 0, merge_output)
+        return single_dir, shard_dir, single_output, merge_output
+
+    @staticmethod
+    def _read(workdir, filename):
+        with open(os.path.join(workdir, 'generated', filename)) as f:
+            return f.read()
+
+    def test_sharded_crawl_matches_single_process(self):
+        """Test that N workers + merge produce the same catalog and totals as one process"""
+        with MockGitHubAPI(mock_repos()) as api:
+            env = self._env(api)
+            single_dir, shard_dir, single_output, merge_output = self._crawl_both_ways(env)
+
+            single_catalog = self._read(single_dir, 'community_workspaces.json')
+            self.assertEqual(self._read(shard_dir, 'community_workspaces.json'), single_catalog)
+            self.assertEqual(len(json.loads(single_catalog)), 8)
+            self.assertEqual(self._summary(merge_output), self._summary(single_output))
+
+            # Out of crawl time: every repo is reused from the catalog above and its images are unverified
+            single_dir, shard_dir, single_output, merge_output = self._crawl_both_ways(env, ['--deadline', '0.001'])
+
+        unverified = json.loads(self._read(single_dir, 'unverified_images.json'))
+        self.assertTrue(unverified)
+        self.assertEqual(set(unverified.values()), {'last_known_pullable'})
+        self.assertEqual(json.loads(self._read(shard_dir, 'unverified_images.json')), unverified)
+        self.assertEqual(self._read(shard_dir, 'community_workspaces.json'),
+                         self._read(single_dir, 'community_workspaces.json'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -103,6 +103,8 @@ class TestFilterOriginalWorkspaceJson(unittest.TestCase):
         self.assertEqual(result['friendly_name'], self.old_format_data['friendly_name'])
         self.assertEqual(result['description'], self.old_format_data['description'])
         self.assertEqual(result['categories'], self.old_format_data['categories'])
+        # In the original key order, so the published JSON matches upstream
+        self.assertEqual(list(result), list(self.old_format_data))
     
     def test_filter_creates_copy_not_modifies_original(self):
         """Test that filtering creates a copy and doesn't modify original"""
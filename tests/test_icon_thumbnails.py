@@ -0,0 +1,162 @@
+"""
+Unit tests for workspace icon fetching and thumbnail generation.
+Tests image sniffing, candidate URLs, the conditional-request cache and
+thumbnail output, using a fake HTTP session.
+"""
+
+import unittest
+import io
+import os
+import sys
+import tempfile
+from unittest.mock import Mock, patch
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import icon_thumbnails
+from icon_thumbnails import IconCache, build_thumbnails, fetch_icon, icon_urls, sniff_image_type
+
+
+def make_png(color=(255, 0, 0, 255), size=(128, 96)):
+    """Return PNG bytes (requires Pillow)"""
+    image = icon_thumbnails.Image.new('RGBA', size, color)
+    out = io.BytesIO()
+    image.save(out, format='PNG')
+    return out.getvalue()
+
+
+class FakeSession:
+    """Serves fixed bodies by URL; answers 304 when the client's ETag matches"""
+
+    def __init__(self, bodies):
+        self.bodies = bodies
+        self.calls = []
+
+    def get(self, url, headers=None, timeout=None, stream=False):
+        self.calls.append((url, dict(headers or {})))
+        body = self.bodies.get(url)
+        if body is None:
+            return Mock(status_code=404, headers={})
+        etag = f'"{len(body)}"'
+        if (headers or {}).get('If-None-Match') == etag:
+            return Mock(status_code=304, headers={'ETag': etag})
+        response = Mock(status_code=200, headers={'ETag': etag})
+        response.iter_content.return_value = [body[:16], body[16:]]
+        return response
+
+
+class TestIconThumbnails(unittest.TestCase):
+    """Test cases for icon_thumbnails"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.out_dir = os.path.join(self.tmpdir.name, 'thumbnails')
+        self.cache_dir = os.path.join(self.tmpdir.name, 'cache')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_sniff_image_type(self):
+        """Test that magic bytes identify images and reject HTML error pages"""
+        self.assertEqual(sniff_image_type(b'\x89PNG\r\n\x1a\n' + b'\x00' * 8), 'png')
+        self.assertEqual(sniff_image_type(b'\xff\xd8\xff\xe0rest'), 'jpeg')
+        self.assertEqual(sniff_image_type(b'RIFF\x00\x00\x00\x00WEBPVP8 '), 'webp')
+        self.assertIsNone(sniff_image_type(b'<!DOCTYPE html><html>404</html>'))
+        self.assertIsNone(sniff_image_type(None))
+
+    def test_icon_urls(self):
+        """Test that Pages-relative icons fall back to the raw repo file"""
+        entry = {'github_pages': 'https://user.github.io/kasm-registry'}
+        urls = icon_urls('user/kasm-registry', entry, 'Cura', {'image_src': 'cura.png'})
+        self.assertEqual(urls, [
+            'https://user.github.io/kasm-registry/cura.png',
+            'https://raw.githubusercontent.com/user/kasm-registry/HEAD/workspaces/Cura/cura.png',
+        ])
+        self.assertEqual(icon_urls('user/r', entry, 'X', {'image_src': 'https://cdn.example.com/x.png'}),
+                         ['https://cdn.example.com/x.png'])
+        self.assertEqual(icon_urls('user/r', entry, 'X', {}), [])
+
+    def test_fetch_revalidates_with_etag(self):
+        """Test that a second fetch sends If-None-Match and reuses the cached bytes"""
+        body = b'\x89PNG\r\n\x1a\n' + b'\x01' * 32
+        session = FakeSession({'https://example.com/a.png': body})
+
+        cache = IconCache(self.cache_dir)
+        self.assertEqual(fetch_icon('https://example.com/a.png', cache, session), (body, 'fetched'))
+        cache.save()
+
+        cache = IconCache(self.cache_dir)
+        self.assertEqual(fetch_icon('https://example.com/a.png', cache, session), (body, 'cached'))
+        self.assertEqual(session.calls[-1][1]['If-None-Match'], f'"{len(body)}"')
+        self.assertNotIn('Authorization', session.calls[-1][1])
+
+    def test_fetch_through_request_callable(self):
+        """Test that a request callable replaces the session, with the size limit still applied"""
+        body = b'\x89PNG\r\n\x1a\n' + b'\x01' * 32
+        calls = []
+
+        def request(url, headers):
+            calls.append((url, headers))
+            if url.endswith('huge.png'):
+                return Mock(status_code=200, headers={'Content-Length': str(icon_thumbnails.MAX_ICON_BYTES + 1)},
+                            content=b'')
+            return Mock(status_code=200, headers={'ETag': '"1"'}, content=body)
+
+        session = FakeSession({})
+        cache = IconCache(self.cache_dir)
+        with patch('builtins.print'):
+            self.assertEqual(fetch_icon('https://example.com/a.png', cache, session, request), (body, 'fetched'))
+            self.assertEqual(fetch_icon('https://example.com/huge.png', cache, session, request), (None, 'error'))
+        self.assertEqual([url for url, _ in calls], ['https://example.com/a.png', 'https://example.com/huge.png'])
+        self.assertEqual(session.calls, [])
+
+    @unittest.skipUnless(icon_thumbnails.Image, "Pillow is not installed")
+    def test_build_thumbnails(self):
+        """Test thumbnail mapping, fallback URLs, dedupe of identical icons and pruning"""
+        red = make_png()
+        catalog = {
+            'user/kasm-registry': {
+                'github_pages': 'https://user.github.io/kasm-registry/',
+                'workspaces': [
+                    {'App': {'image_src': 'app.png'}},
+                    {'Same': {'image_src': 'same.png'}},
+                    {'Moved': {'image_src': 'moved.png'}},
+                    {'Broken': {'image_src': 'broken.png'}},
+                    {'NoIcon': {'name': 'NoIcon'}},
+                ]
+            }
+        }
+        session = FakeSession({
+            'https://user.github.io/kasm-registry/app.png': red,
+            'https://user.github.io/kasm-registry/same.png': red,
+            'https://raw.githubusercontent.com/user/kasm-registry/HEAD/workspaces/Moved/moved.png': red,
+            'https://user.github.io/kasm-registry/broken.png': b'<html>not an image</html>',
+        })
+        stale = os.path.join(self.out_dir, 'stale.webp')
+        os.makedirs(self.out_dir)
+        open(stale, 'wb').close()
+
+        thumbnails, stats = build_thumbnails(catalog, self.out_dir, self.cache_dir, workers=2, session=session)
+
+        self.assertEqual(set(thumbnails), {'user/kasm-registry/App', 'user/kasm-registry/Same',
+                                           'user/kasm-registry/Moved'})
+        self.assertEqual(len(set(thumbnails.values())), 1)
+        self.assertEqual(stats['thumbnails_written'], 1)
+        self.assertEqual(stats['icons_unavailable'], 1)
+        self.assertEqual(stats['icons_missing'], 1)
+        self.assertFalse(os.path.exists(stale))
+
+        path = os.path.join(self.tmpdir.name, thumbnails['user/kasm-registry/App'])
+        with icon_thumbnails.Image.open(path) as image:
+            self.assertEqual(image.format, 'WEBP')
+            self.assertEqual(image.size, (icon_thumbnails.THUMBNAIL_SIZE, icon_thumbnails.THUMBNAIL_SIZE))
+
+        # A rerun revalidates instead of redownloading and writes nothing new
+        _, stats = build_thumbnails(catalog, self.out_dir, self.cache_dir, workers=2, session=session)
+        self.assertEqual(stats['icons_fetched'], 0)
+        self.assertEqual(stats['thumbnails_written'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,165 @@
+"""
+Unit tests for the compiled image policy.
+Tests registry alias normalization, rule precedence, policy files and
+check_image_pullability's use of the policy.
+"""
+
+import unittest
+import json
+import os
+import sys
+import tempfile
+from unittest.mock import patch
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import search_github
+from image_policy import (ALLOW, BLOCK, ImagePolicy, PolicyRule, candidate_references, canonical_reference,
+                          canonical_registry, load_policy_file)
+
+
+def rule(action, pattern):
+    return PolicyRule(action, pattern, 'test')
+
+
+class TestCanonicalReferences(unittest.TestCase):
+    """Test cases for canonical_registry and canonical_reference"""
+
+    def test_docker_hub_aliases(self):
+        """Test that every way of naming Docker Hub gives the same reference"""
+        for docker_registry in (None, '', 'docker.io', 'https://index.docker.io/v1/', 'index.docker.io/v1',
+                                'registry-1.docker.io', 'https://registry.hub.docker.com/'):
+            registry = canonical_registry(docker_registry)
+            self.assertEqual(canonical_reference(' kasmweb/chrome:1.16.0 ', registry),
+                             'docker.io/kasmweb/chrome:1.16.0', docker_registry)
+        self.assertEqual(canonical_reference('index.docker.io/kasmweb/chrome:1.16.0'),
+                         'docker.io/kasmweb/chrome:1.16.0')
+
+    def test_other_registries(self):
+        """Test that hosts are kept, image hosts win and namespaces are not prefixed twice"""
+        self.assertEqual(canonical_reference('org/app:1', canonical_registry('https://GHCR.io/')), 'ghcr.io/org/app:1')
+        self.assertEqual(canonical_reference('quay.io/org/app:1', canonical_registry('ghcr.io')), 'quay.io/org/app:1')
+        self.assertEqual(canonical_reference('chrome:1', canonical_registry('kasmweb')), 'docker.io/kasmweb/chrome:1')
+        self.assertEqual(canonical_reference('kasmweb/chrome:1', canonical_registry('kasmweb')),
+                         'docker.io/kasmweb/chrome:1')
+        self.assertEqual(canonical_reference('ghcr.io/org/', is_rule=True), 'ghcr.io/org/')
+        self.assertEqual(canonical_reference('*/xmrig*', is_rule=True), '*/xmrig*')
+
+    def test_candidates_include_docker_hub(self):
+        """Test that an image without a host is also checked as the Docker Hub image skopeo tries first"""
+        self.assertEqual(candidate_references('kasmweb/x:1', canonical_registry('ghcr.io')),
+                         ['ghcr.io/kasmweb/x:1', 'docker.io/kasmweb/x:1'])
+        self.assertEqual(candidate_references('quay.io/org/app:1', canonical_registry('ghcr.io')),
+                         ['quay.io/org/app:1'])
+        self.assertEqual(candidate_references('kasmweb/x:1', canonical_registry('https://index.docker.io/v1/')),
+                         ['docker.io/kasmweb/x:1'])
+
+
+def baseline_should_skip_image(image_name, docker_registry=None):
+    """should_skip_image as it was before the policy engine: plain prefix checks on two candidates"""
+    if not image_name:
+        return False
+    image_name = image_name.strip()
+    candidates = [image_name]
+    if docker_registry:
+        docker_registry = docker_registry.strip()
+        if docker_registry and not image_name.startswith(f"{docker_registry}/"):
+            candidates.append(f"{docker_registry}/{image_name}")
+    return any(candidate.startswith(prefix) for candidate in candidates
+               for prefix in search_github.IMAGE_NAME_PREFIX_FILTERS)
+
+
+class TestShouldSkipImage(unittest.TestCase):
+    """Test that the default policy blocks whatever the prefix filter blocked"""
+
+    def test_matches_baseline(self):
+        """Test kasmweb images under Docker Hub aliases and other registries"""
+        cases = [('kasmweb/x:1', None), ('kasmweb/x:1', 'ghcr.io'), ('kasmweb/x:1', 'https://quay.io/'),
+                 ('kasmweb/x:1', 'https://index.docker.io/v1/'), ('chrome:1', 'kasmweb'),
+                 ('someone/app:1', 'ghcr.io'), ('someone/app:1', None), ('kasmwebby/app:1', 'quay.io')]
+        for image, docker_registry in cases:
+            self.assertEqual(search_github.should_skip_image(image, docker_registry),
+                             baseline_should_skip_image(image, docker_registry), (image, docker_registry))
+        self.assertTrue(search_github.should_skip_image('kasmweb/x:1', 'ghcr.io'))
+        self.assertTrue(search_github.should_skip_image('kasmweb/x:1', 'https://quay.io/'))
+        self.assertFalse(search_github.should_skip_image('someone/app:1', 'ghcr.io'))
+
+
+class TestImagePolicy(unittest.TestCase):
+    """Test cases for ImagePolicy precedence"""
+
+    def setUp(self):
+        self.policy = ImagePolicy([
+            rule(BLOCK, 'badorg/'),
+            rule(ALLOW, 'badorg/good-app'),
+            rule(BLOCK, 'ghcr.io/'),
+            rule(ALLOW, 'ghcr.io/trusted/'),
+            rule(BLOCK, 'ghcr.io/trusted/*miner*'),
+            rule(BLOCK, '*/xmrig*'),
+            rule(BLOCK, '*:evil-?'),
+        ])
+
+    def decide(self, image, docker_registry=None):
+        decision = self.policy.evaluate(image, canonical_registry(docker_registry))
+        return decision.blocked, decision.rule.pattern if decision.rule else None
+
+    def test_longest_prefix_wins(self):
+        """Test org blocks with allowed exceptions and a registry allowlist entry"""
+        self.assertEqual(self.decide('badorg/app:1'), (True, 'badorg/'))
+        self.assertEqual(self.decide('badorg/good-app:1', 'https://index.docker.io/v1/'), (False, 'badorg/good-app'))
+        self.assertEqual(self.decide('ghcr.io/someone/app:1'), (True, 'ghcr.io/'))
+        self.assertEqual(self.decide('trusted/app:1', 'ghcr.io'), (False, 'ghcr.io/trusted/'))
+        self.assertEqual(self.decide('badorgs/app:1'), (False, None))
+
+    def test_block_globs_win(self):
+        """Test that block globs override any prefix rule, anchored or starting with a wildcard"""
+        self.assertEqual(self.decide('trusted/coin-miner:2', 'ghcr.io'), (True, 'ghcr.io/trusted/*miner*'))
+        self.assertEqual(self.decide('badorg/good-app:evil-1'), (True, '*:evil-?'))
+        self.assertEqual(self.decide('quay.io/someone/xmrig:6'), (True, '*/xmrig*'))
+        self.assertEqual(self.decide('quay.io/someone/app:evil-10'), (False, None))
+
+    def test_default_action(self):
+        """Test that a block default turns the allow rules into an allowlist"""
+        policy = ImagePolicy([rule(ALLOW, 'ghcr.io/'), rule(ALLOW, '*/approved-*')], default=BLOCK)
+        self.assertFalse(policy.evaluate('ghcr.io/org/app:1').blocked)
+        self.assertFalse(policy.evaluate('quay.io/org/approved-app:1').blocked)
+        decision = policy.evaluate('org/app:1')
+        self.assertTrue(decision.blocked)
+        self.assertIsNone(decision.rule)
+
+    def test_policy_file(self):
+        """Test loading rules from JSON, and rejecting malformed rules"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'policy.json')
+            with open(path, 'w') as f:
+                json.dump({'default': 'allow', 'rules': [{'block': 'badorg/'}, {'allow': 'badorg/ok'}]}, f)
+            rules, default = load_policy_file(path)
+            self.assertEqual(default, ALLOW)
+            self.assertEqual(rules[1], PolicyRule(ALLOW, 'badorg/ok', f"{path}#1"))
+
+            with open(path, 'w') as f:
+                json.dump({'rules': [{'deny': 'badorg/'}]}, f)
+            with self.assertRaises(ValueError):
+                ImagePolicy(*load_policy_file(path))
+
+    def test_pullability_reports_rule(self):
+        """Test that check_image_pullability skips blocked images without probing them"""
+        policy = search_github.load_image_policy()
+        policy.add(rule(BLOCK, '*/xmrig*'))
+        policy.compile()
+        workspace = {'docker_registry': 'https://index.docker.io/v1/',
+                     'compatibility': [{'image': 'kasmweb/chrome:1'}, {'image': 'someone/xmrig:1'},
+                                       {'image': 'someone/app:1'}]}
+        with patch.object(search_github, 'IMAGE_POLICY', policy), \
+                patch.object(search_github, 'skopeo_inspect', return_value=True) as mock_inspect, \
+                patch('builtins.print') as mock_print:
+            result = search_github.check_image_pullability(workspace)
+        self.assertEqual(result['compatibility'], [{'image': 'someone/app:1'}])
+        mock_inspect.assert_called_once()
+        messages = [call.args[0] for call in mock_print.call_args_list]
+        self.assertIn("Skipping image someone/xmrig:1: blocked by the image policy rule '*/xmrig*' (test)", messages)
+
+
+if __name__ == '__main__':
+    unittest.main()
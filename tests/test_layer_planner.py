@@ -0,0 +1,181 @@
+"""
+Unit tests for layer-sharing analysis and the pre-pull plan.
+Tests manifest parsing, the pull order, per-workspace byte accounting and a
+crawl whose images are served by a stub registry.
+"""
+
+import unittest
+import copy
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from layer_planner import build_prepull_plan, digest_reference, manifest_layers, parse_manifest, pull_order
+from tests.mock_github_api import MOCK_DATA_DIR, ROOT_DIR, MockGitHubAPI, load_mock
+from tests.stub_registry import StubRegistry, layer_digest
+
+MB = 1000 * 1000
+
+
+class TestManifests(unittest.TestCase):
+    """Test cases for parse_manifest, digest_reference and manifest_layers"""
+
+    def test_parse_image_manifest(self):
+        """Test that layers come back as (digest, size) in order"""
+        raw = json.dumps({'schemaVersion': 2, 'mediaType': 'application/vnd.oci.image.manifest.v1+json',
+                          'layers': [{'digest': 'sha256:a', 'size': 10}, {'digest': 'sha256:b', 'size': 5}]})
+        self.assertEqual(parse_manifest(raw), ('layers', [('sha256:a', 10), ('sha256:b', 5)]))
+
+    def test_parse_rejects_unusable_manifests(self):
+        """Test schema 1 manifests, bad JSON and malformed layers"""
+        self.assertIsNone(parse_manifest(json.dumps({'schemaVersion': 1, 'fsLayers': []})))
+        self.assertIsNone(parse_manifest('not json'))
+        self.assertIsNone(parse_manifest(None))
+        self.assertIsNone(parse_manifest(json.dumps({'schemaVersion': 2, 'layers': [{'size': 1}]})))
+
+    def test_digest_reference(self):
+        """Test pinning references with a registry port, a tag or a digest"""
+        self.assertEqual(digest_reference('127.0.0.1:5000/org/app:1', 'sha256:x'), '127.0.0.1:5000/org/app@sha256:x')
+        self.assertEqual(digest_reference('org/app', 'sha256:x'), 'org/app@sha256:x')
+        self.assertEqual(digest_reference('org/app@sha256:y', 'sha256:x'), 'org/app@sha256:x')
+
+    def test_index_fetches_platform_manifest(self):
+        """Test that a multi-arch index resolves to the linux/amd64 manifest"""
+        index = json.dumps({'schemaVersion': 2, 'manifests': [
+            {'digest': 'sha256:arm', 'platform': {'os': 'linux', 'architecture': 'arm64'}},
+            {'digest': 'sha256:amd', 'platform': {'os': 'linux', 'architecture': 'amd64'}},
+        ]})
+        child = json.dumps({'schemaVersion': 2, 'layers': [{'digest': 'sha256:l', 'size': 3}]})
+        fetched = []
+
+        def fetch(reference):
+            fetched.append(reference)
+            return child
+
+        self.assertEqual(manifest_layers('org/app:1', index, fetch), [('sha256:l', 3)])
+        self.assertEqual(fetched, ['org/app@sha256:amd'])
+        self.assertIsNone(manifest_layers('org/app:1', index, fetch, platform=('windows', 'amd64')))
+
+
+class TestPrepullPlan(unittest.TestCase):
+    """Test cases for pull_order and build_prepull_plan"""
+
+    def setUp(self):
+        self.image_layers = {
+            'org/desktop:1': [('base', 50 * MB), ('desktop', 20 * MB)],
+            'org/editor:1': [('base', 50 * MB), ('editor', 10 * MB)],
+            'org/tool:1': [('tool', 5 * MB)],
+        }
+        self.workspace_images = [
+            ('user/repo', 'Desktop', ['org/desktop:1']),
+            ('user/repo', 'Editor', ['org/editor:1', 'org/missing:1']),
+            ('other/repo', 'Tool', ['org/tool:1']),
+        ]
+
+    def test_pull_order_reuses_layers(self):
+        """Test that once the base is pulled, images needing it are cheapest"""
+        layers = {image: dict(entries) for image, entries in self.image_layers.items()}
+        layers['org/big:1'] = {'big': 40 * MB}
+        workspaces = {image: ['ws'] for image in layers}
+        self.assertEqual(pull_order(layers, workspaces), [
+            ('org/tool:1', 5 * MB), ('org/big:1', 40 * MB), ('org/editor:1', 60 * MB), ('org/desktop:1', 20 * MB)
+        ])
+
+    def test_plan_bytes(self):
+        """Test totals, per-step reuse and unique versus shared bytes per workspace"""
+        plan = build_prepull_plan(self.workspace_images, self.image_layers)
+        self.assertEqual(plan['summary'], {
+            'images': 3, 'images_without_layers': 1, 'layers': 4, 'shared_layers': 1,
+            'bytes_to_pull': 85 * MB, 'bytes_without_sharing': 135 * MB, 'bytes_saved_by_sharing': 50 * MB
+        })
+        self.assertEqual([step['image'] for step in plan['steps']], ['org/tool:1', 'org/editor:1', 'org/desktop:1'])
+        self.assertEqual(plan['steps'][2]['reused_bytes'], 50 * MB)
+        self.assertEqual(plan['steps'][2]['cumulative_bytes'], 85 * MB)
+        self.assertEqual(plan['workspaces']['user/repo']['Desktop'], {
+            'images': ['org/desktop:1'], 'missing_images': [],
+            'total_bytes': 70 * MB, 'unique_bytes': 20 * MB, 'shared_bytes': 50 * MB
+        })
+        self.assertEqual(plan['workspaces']['user/repo']['Editor']['missing_images'], ['org/missing:1'])
+        self.assertEqual(plan['shared_layers'], [
+            {'digest': 'base', 'size': 50 * MB, 'workspaces': ['user/repo/Desktop', 'user/repo/Editor']}
+        ])
+        self.assertEqual(plan['images_without_layers'], ['org/missing:1'])
+
+    def test_plan_is_deterministic(self):
+        """Test that the same inputs give a byte-identical plan (no run timestamp churning the manifest)"""
+        plan = json.dumps(build_prepull_plan(self.workspace_images, self.image_layers))
+        time.sleep(1.1)
+        self.assertEqual(json.dumps(build_prepull_plan(self.workspace_images, self.image_layers)), plan)
+
+
+class TestPrepullPlanCrawl(unittest.TestCase):
+    """Test the pre-pull plan of a crawl against a stub registry"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        shutil.copy(os.path.join(ROOT_DIR, 'profanity_whitelist.json'), self.tmpdir.name)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    @staticmethod
+    def _workspace(images):
+        workspace = copy.deepcopy(load_mock('workspace_new_format.json'))
+        del workspace['docker_registry']
+        workspace['compatibility'] = [{'version': f"1.1{index}.x", 'image': image, 'uncompressed_size_mb': 500}
+                                      for index, image in enumerate(images, 5)]
+        return workspace
+
+    def test_crawl_writes_prepull_plan(self):
+        """Test that probed manifests, including a multi-arch index, feed the plan"""
+        with StubRegistry() as registry:
+            host = registry.host
+            registry.add_image('org/desktop', '1', [('base', 50 * MB), ('desktop', 20 * MB)])
+            registry.add_index('org/editor', '1', {
+                ('linux', 'arm64'): [('base-arm', 48 * MB), ('editor-arm', 9 * MB)],
+                ('linux', 'amd64'): [('base', 50 * MB), ('editor', 10 * MB)],
+            })
+            registry.add_image('org/tool', '1', [('tool', 5 * MB)])
+            repos = {
+                'user1/kasm-registry': {'stars': 2, 'workspaces': {
+                    'Desktop': self._workspace([f"{host}/org/desktop:1"]),
+                    'Editor': self._workspace([f"{host}/org/editor:1", f"{host}/org/gone:1"]),
+                }},
+                'user2/kasm-registry': {'stars': 1, 'workspaces': {
+                    'Tool': self._workspace([f"{host}/org/tool:1"]),
+                }},
+            }
+            with MockGitHubAPI(repos) as api:
+                env = dict(os.environ, GH_PAT='test-token', DEBUG='false', GITHUB_API_URL=api.url,
+                           GITHUB_REQUEST_DELAY='0', PREPULL_PLAN='true',
+                           SKOPEO_BIN=os.path.join(MOCK_DATA_DIR, 'fake_skopeo.py'))
+                env.pop('CATALOG_DB', None)
+                result = subprocess.run([sys.executable, os.path.join(ROOT_DIR, 'search_github.py')],
+                                        cwd=self.tmpdir.name, env=env, capture_output=True, text=True, timeout=120)
+            self.assertEqual(result.returncode, 0, result.stdout + result.stderr)
+
+        with open(os.path.join(self.tmpdir.name, 'generated', 'prepull_plan.json')) as f:
+            plan = json.load(f)
+        self.assertEqual(plan['platform'], 'linux/amd64')
+        self.assertEqual(plan['summary']['bytes_to_pull'], 85 * MB)
+        self.assertEqual(plan['summary']['bytes_saved_by_sharing'], 50 * MB)
+        self.assertEqual([step['image'] for step in plan['steps']],
+                         [f"{host}/org/tool:1", f"{host}/org/editor:1", f"{host}/org/desktop:1"])
+        self.assertEqual(plan['shared_layers'][0]['digest'], layer_digest('base'))
+        editor = plan['workspaces']['user1/kasm-registry']['Editor']
+        self.assertEqual(editor['images'], [f"{host}/org/editor:1"])
+        self.assertEqual((editor['unique_bytes'], editor['shared_bytes']), (10 * MB, 50 * MB))
+        self.assertIn("Pre-pull plan: 3 images", result.stdout)
+        with open(os.path.join(self.tmpdir.name, 'generated', 'manifest.json')) as f:
+            self.assertIn('prepull_plan.json', json.load(f)['files'])
+
+
+if __name__ == '__main__':
+    unittest.main()
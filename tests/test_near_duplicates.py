@@ -0,0 +1,96 @@
+"""
+Unit tests for near-duplicate workspace detection.
+Tests MinHash signatures, densification and LSH grouping with canonical
+pointers.
+"""
+
+import unittest
+import copy
+import json
+import os
+import sys
+from unittest.mock import patch
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from near_duplicates import MinHasher, estimate_similarity, find_near_duplicates, workspace_tokens
+
+
+class TestNearDuplicates(unittest.TestCase):
+    """Test cases for near_duplicates"""
+
+    def setUp(self):
+        mock_data_dir = os.path.join(os.path.dirname(__file__), 'mock_data')
+        with open(os.path.join(mock_data_dir, 'workspace_new_format.json'), 'r') as f:
+            self.workspace = json.load(f)
+
+    def _variant(self, friendly_name, description, image):
+        workspace = copy.deepcopy(self.workspace)
+        workspace['friendly_name'] = friendly_name
+        workspace['description'] = description
+        for entry in workspace['compatibility']:
+            entry['image'] = f"{image}:{entry['version']}"
+        return workspace
+
+    def test_signature_similarity(self):
+        """Test that signature agreement tracks Jaccard similarity"""
+        hasher = MinHasher(256)
+        first = {f"token{i}" for i in range(100)}
+        second = {f"token{i}" for i in range(20, 120)}  # Jaccard 80/120
+        estimate = estimate_similarity(hasher.signature(first), hasher.signature(second))
+        self.assertAlmostEqual(estimate, 80 / 120, delta=0.12)
+        self.assertEqual(estimate_similarity(hasher.signature(first), hasher.signature(set(first))), 1.0)
+        self.assertIsNone(hasher.signature(set()))
+
+    def test_densification_fills_every_bin(self):
+        """Test that a token set smaller than the signature still fills every bin"""
+        signature = MinHasher(128).signature({'just', 'three', 'tokens'})
+        self.assertEqual(len(signature), 128)
+        self.assertNotIn(None, signature)
+
+    def test_tokens_include_images_and_categories(self):
+        """Test that image references and categories are part of the compared tokens"""
+        tokens = workspace_tokens(self.workspace)
+        image = self.workspace['compatibility'][0]['image']
+        self.assertIn(f"img:{image}", tokens)
+        self.assertIn(f"repo:{image.rsplit(':', 1)[0]}", tokens)
+        self.assertIn(f"cat:{self.workspace['categories'][0].lower()}", tokens)
+
+    def test_groups_with_canonical_pointer(self):
+        """Test that forks group under the most-starred copy and distinct workspaces do not"""
+        description = "A full featured office suite with word processing spreadsheets and presentations"
+        original = self._variant("Office Suite", description, "acme/office")
+        fork = self._variant("Office Suite", description + " maintained fork", "acme/office")
+        other = self._variant("Pixel Paint", "Draw sprites and pixel art for retro games", "retro/paint")
+        catalog = {
+            'small/fork': {'stars': 1, 'workspaces': [{'Office': copy.deepcopy(fork)}]},
+            'big/original': {'stars': 50, 'workspaces': [{'Office': original}, {'Paint': other}]},
+            'other/mirror': {'stars': 1, 'workspaces': [{'OfficeSuite': copy.deepcopy(original)}]},
+        }
+
+        result = find_near_duplicates(catalog, threshold=0.7)
+
+        self.assertEqual(result['groups'], {'big/original/Office': ['small/fork/Office', 'other/mirror/OfficeSuite']})
+        self.assertEqual(result['duplicate_of']['small/fork/Office'], 'big/original/Office')
+        self.assertNotIn('big/original/Paint', result['duplicate_of'])
+
+    def test_bucket_pairs_beyond_the_first_member(self):
+        """Test that two near-duplicates group even when the bucket's first member matches neither"""
+        # B and C differ in bins 2 and 3 only (10 of 12 agree); A also differs in bins 4 and 5
+        # (8 of 12), so every band B and C share holds A too, and A comes first
+        b = (1, 1, 2, 2, 1, 1, 1, 1, 1, 1, 1, 1)
+        signatures = {'a': b[:2] + (4, 4, 4, 4) + b[6:], 'b': b, 'c': b[:2] + (3, 3) + b[4:]}
+        catalog = {'owner/registry': {'workspaces': [{name.upper(): {'friendly_name': name}} for name in 'abc']}}
+        with patch('near_duplicates.MinHasher.signature', side_effect=lambda tokens: signatures[min(tokens)]):
+            result = find_near_duplicates(catalog, threshold=0.8, num_perm=12, bands=4)
+        self.assertEqual(result['groups'], {'owner/registry/B': ['owner/registry/C']})
+
+    def test_invalid_band_configuration(self):
+        """Test that num_perm must split evenly into bands"""
+        with self.assertRaises(ValueError):
+            find_near_duplicates({}, num_perm=100, bands=16)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,185 @@
+"""
+Unit tests for reading workspaces from a registry's published list.json.
+Tests match_listing_to_folders, is_listing_current, parse_repo's fast
+path and fallback against a mock GitHub API and Pages site, and the
+bounded download of the listing.
+"""
+
+import unittest
+import io
+import json
+import os
+import sys
+from unittest.mock import patch
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import search_github
+from compact_records import RepoStats, to_builtin
+from search_github import STATS, is_listing_current, match_listing_to_folders
+from tests.mock_github_api import MockGitHubAPI, load_mock
+
+REPO = 'user0/kasm-registry'
+
+
+class TestListingMatching(unittest.TestCase):
+    """Test cases for matching listing entries to workspaces/ folders"""
+
+    def test_matches_friendly_name_icon_and_image(self):
+        """Test that entries are matched on any of their names, in folder order"""
+        entries = [
+            {'friendly_name': 'Kasm Chrome', 'image_src': 'chrome.png', 'name': 'kasmweb/chrome:1.16.0'},
+            {'friendly_name': 'My Editor', 'image_src': 'vscode.png',
+             'compatibility': [{'image': 'ghcr.io/me/kasm-vscode:1.0'}]},
+            {'friendly_name': 'Games', 'image_src': 'https://example.com/icons/retroarch.svg'},
+        ]
+        matched = match_listing_to_folders(entries, ['chrome', 'RetroArch', 'vs-code'])
+        self.assertEqual([folder for folder, _ in matched], ['chrome', 'RetroArch', 'vs-code'])
+        self.assertIs(dict(matched)['vs-code'], entries[1])
+
+    def test_ambiguous_or_unknown_entries(self):
+        """Test that anything short of a one-to-one match gives None"""
+        chrome = {'friendly_name': 'Chrome', 'image_src': 'chrome.png'}
+        self.assertIsNone(match_listing_to_folders([chrome, dict(chrome)], ['Chrome']))
+        self.assertIsNone(match_listing_to_folders([chrome], ['Chrome', 'chrome']))
+        self.assertIsNone(match_listing_to_folders([{'friendly_name': 'Other'}], ['Chrome']))
+        self.assertIsNone(match_listing_to_folders(['Chrome'], ['Chrome']))
+
+    def test_listing_freshness(self):
+        """Test Last-Modified against pushed_at; unknown dates are stale"""
+        self.assertTrue(is_listing_current('Tue, 02 Jan 2024 00:00:00 GMT', '2024-01-01T00:00:00Z'))
+        self.assertTrue(is_listing_current('Mon, 01 Jan 2024 00:00:00 GMT', '2024-01-01T00:00:00Z'))
+        self.assertFalse(is_listing_current('Sun, 31 Dec 2023 23:59:59 GMT', '2024-01-01T00:00:00Z'))
+        self.assertFalse(is_listing_current(None, '2024-01-01T00:00:00Z'))
+        self.assertFalse(is_listing_current('Mon, 01 Jan 2024 00:00:00 GMT', 'Unknown'))
+
+
+class TestPagesFastPath(unittest.TestCase):
+    """Test cases for parse_repo with a published listing"""
+
+    def setUp(self):
+        workspace = load_mock('workspace_old_format.json')
+        self.repos = {REPO: {'stars': 1, 'pushed_at': '2024-01-01T00:00:00Z',
+                             'workspaces': {'TestWorkspaceOldFormat': workspace}}}
+        for key in ('pages_listing_repos', 'pages_listing_fallbacks', 'contents_requests_saved'):
+            STATS[key] = 0
+
+    def _parse(self, api):
+        with patch.object(search_github, 'GITHUB_API_URL', api.url), \
+                patch.object(search_github, 'REQUEST_DELAY', 0), \
+                patch.object(search_github, 'skopeo_inspect', return_value=True), \
+                patch.dict(search_github.REPO_STATS, {REPO: RepoStats(1, '2024-01-01T00:00:00Z')}):
+            pages_url = search_github.get_github_pages_url(REPO)
+            return json.dumps(search_github.parse_repo(REPO, pages_url), default=to_builtin)
+
+    def _parse_without_listing(self):
+        repos = {REPO: dict(self.repos[REPO], pages_listing=False)}
+        with MockGitHubAPI(repos) as api:
+            return self._parse(api)
+
+    def test_listing_replaces_contents_walk(self):
+        """Test that a current listing is used without a token and with no per-folder requests"""
+        with MockGitHubAPI(self.repos) as api:
+            published = self._parse(api)
+        self.assertFalse(any('/contents/workspaces/' in path or path.startswith('/raw/') for path in api.requests))
+        pages_request = api.requests.index(f'/sites/{REPO}/1.0/list.json')
+        self.assertNotIn('Authorization', api.request_headers[pages_request])
+        self.assertEqual(STATS['pages_listing_repos'], 1)
+        self.assertEqual(STATS['contents_requests_saved'], 2)
+        # Same catalog entries as walking workspaces/ (build fields like 'sha' are dropped)
+        self.assertIn('TestWorkspaceOldFormat', published)
+        self.assertNotIn('"sha"', published)
+        self.assertEqual(published, self._parse_without_listing())
+
+    def test_stale_or_missing_listing_falls_back(self):
+        """Test that the contents API walk runs when the listing is older than the push or absent"""
+        self.assertIn('TestWorkspaceOldFormat', self._parse_without_listing())
+        self.repos[REPO]['pages_built_at'] = '2023-12-31T00:00:00Z'
+        with MockGitHubAPI(self.repos) as api:
+            self.assertIn('TestWorkspaceOldFormat', self._parse(api))
+        self.assertIn(f'/raw/{REPO}/TestWorkspaceOldFormat', api.requests)
+        self.assertEqual(STATS['pages_listing_fallbacks'], 2)
+        self.assertEqual(STATS['pages_listing_repos'], 0)
+
+    def test_partial_listing_walks_unlisted_folders(self):
+        """Test that folders missing from the listing are walked instead of dropped"""
+        workspaces = self.repos[REPO]['workspaces']
+        for name in ('Firefox', 'Gimp'):
+            workspaces[name] = dict(workspaces['TestWorkspaceOldFormat'], friendly_name=name,
+                                    name=f"kasmweb/{name.lower()}")
+        expected = self._parse_without_listing()
+        self.repos[REPO]['pages_listing'] = ['TestWorkspaceOldFormat']
+        STATS['pages_listing_fallbacks'] = 0
+        with MockGitHubAPI(self.repos) as api:
+            published = self._parse(api)
+        self.assertEqual(published, expected)
+        self.assertEqual([path for path in api.requests if path.startswith('/raw/')],
+                         [f'/raw/{REPO}/Firefox', f'/raw/{REPO}/Gimp'])
+        self.assertEqual(STATS['pages_listing_repos'], 1)
+        self.assertEqual(STATS['contents_requests_saved'], 2)
+
+    def test_oversized_listing_falls_back(self):
+        """Test that a listing over the size limit is rejected on its Content-Length, before downloading it"""
+        with patch.object(search_github, 'MAX_PAGES_LISTING_BYTES', 100), \
+                patch('builtins.print') as mock_print:
+            self.assertIn('TestWorkspaceOldFormat', self._parse_without_listing())
+            with MockGitHubAPI(self.repos) as api:
+                self.assertIn('TestWorkspaceOldFormat', self._parse(api))
+        self.assertIn(f'/raw/{REPO}/TestWorkspaceOldFormat', api.requests)
+        self.assertEqual(STATS['pages_listing_fallbacks'], 2)
+        self.assertIn("listing larger than 100 bytes", str(mock_print.call_args_list))
+
+
+class CountingBody(io.BytesIO):
+    """A raw response body that remembers how much was read from it"""
+
+    bytes_read = 0
+
+    def read(self, size=-1):
+        data = super().read(size)
+        self.bytes_read += len(data)
+        return data
+
+
+class TestBoundedDownload(unittest.TestCase):
+    """Test cases for send_request with a body size limit"""
+
+    def _response(self, body, headers=None):
+        response = requests.Response()
+        response.status_code = 200
+        response.headers = CaseInsensitiveDict(headers or {})
+        response.raw = CountingBody(body)
+        return response
+
+    def test_reads_at_most_one_byte_over_the_limit(self):
+        """Test that a body without Content-Length is read only until it passes the limit"""
+        response = self._response(b'x' * 1024 * 1024)
+        with patch('search_github.requests.get', return_value=response) as mock_get:
+            result = search_github.send_request('https://example.com/1.0/list.json', None, {}, None, max_bytes=1000)
+        self.assertTrue(mock_get.call_args.kwargs['stream'])
+        self.assertEqual(len(result.content), 1001)
+        self.assertLess(response.raw.bytes_read, 1024 * 1024)
+        self.assertTrue(search_github.response_too_large(result, 1000))
+
+    def test_content_length_over_the_limit_is_not_downloaded(self):
+        """Test that a declared oversized body is not read at all"""
+        response = self._response(b'x' * 2000, {'Content-Length': '2000'})
+        with patch('search_github.requests.get', return_value=response):
+            result = search_github.send_request('https://example.com/1.0/list.json', None, {}, None, max_bytes=1000)
+        self.assertEqual((result.content, response.raw.bytes_read), (b'', 0))
+        self.assertTrue(search_github.response_too_large(result, 1000))
+
+    def test_small_body_is_read_whole(self):
+        """Test that a body under the limit is returned as is"""
+        response = self._response(b'{"workspaces": []}', {'Content-Length': '18'})
+        with patch('search_github.requests.get', return_value=response):
+            result = search_github.send_request('https://example.com/1.0/list.json', None, {}, None, max_bytes=1000)
+        self.assertEqual(result.json(), {'workspaces': []})
+        self.assertFalse(search_github.response_too_large(result, 1000))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,158 @@
+"""
+Unit tests for per-phase profiling.
+Tests phase switching and nesting in both modes, the pstats and collapsed
+stack files, stack reconstruction from cProfile data and a replayed crawl
+run with --profile.
+"""
+
+import unittest
+import os
+import pstats
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from phase_profiler import PHASES, PhaseProfiler, collapse_stats, top_functions
+from tests.mock_github_api import MOCK_DATA_DIR, ROOT_DIR, MockGitHubAPI, mock_repos
+
+
+def busy_outer(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def busy_inner(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def function_names(stats):
+    return {func[2] for func in stats}
+
+
+class TestPhaseProfiler(unittest.TestCase):
+    """Test cases for PhaseProfiler"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def run_phases(self, profiler):
+        profiler.start()
+        try:
+            with profiler.phase('parse'):
+                busy_outer(0.05)
+                with profiler.phase('probe'):
+                    busy_inner(0.05)
+        finally:
+            profiler.stop()
+
+    def test_disabled_is_a_no_op(self):
+        """Test that a disabled or unstarted profiler records nothing"""
+        for profiler in (PhaseProfiler(), PhaseProfiler('deterministic')):
+            with profiler.phase('parse'):
+                busy_outer(0.001)
+            self.assertEqual(profiler.phases(), [])
+        with self.assertRaises(ValueError):
+            PhaseProfiler('statistical')
+
+    def test_nested_phases_are_exclusive(self):
+        """Test that each mode credits a nested phase's work only to that phase"""
+        for mode in ('deterministic', 'sampling'):
+            profiler = PhaseProfiler(mode, interval=0.001)
+            self.run_phases(profiler)
+            self.assertEqual(profiler.phases(), ['parse', 'probe'])
+            self.assertIn('busy_outer', function_names(profiler.stats('parse')), mode)
+            self.assertNotIn('busy_inner', function_names(profiler.stats('parse')), mode)
+            self.assertIn('busy_inner', function_names(profiler.stats('probe')), mode)
+            report = profiler.report(limit=3)
+            self.assertLessEqual(len(report['probe']['top']), 3)
+            self.assertGreater(report['probe']['seconds'], 0, mode)
+
+    def test_write_profiles(self):
+        """Test that pstats files load with pstats and collapsed stacks have weights"""
+        profiler = PhaseProfiler('deterministic')
+        self.run_phases(profiler)
+        paths = profiler.write(os.path.join(self.tmpdir.name, 'profiles'))
+        self.assertEqual([os.path.basename(path) for path in paths],
+                         ['parse.pstats', 'parse.collapsed', 'probe.pstats', 'probe.collapsed'])
+        stats = pstats.Stats(paths[2])
+        self.assertIn('busy_inner', function_names(stats.stats))
+        with open(paths[3]) as f:
+            lines = f.read().splitlines()
+        stack, weight = max((line.rsplit(' ', 1) for line in lines), key=lambda pair: int(pair[1]))
+        self.assertTrue(stack.split(';')[-1].endswith('(busy_inner)'), stack)
+        self.assertGreater(int(weight), 10000)
+
+    def test_collapse_splits_time_over_callers(self):
+        """Test stack reconstruction from caller/callee pairs, including recursion"""
+        main, a, b, leaf = (('m.py', 1, 'main'), ('m.py', 5, 'a'), ('m.py', 9, 'b'), ('m.py', 13, 'leaf'))
+        stats = {
+            main: (1, 1, 0.0, 4.0, {}),
+            a: (1, 1, 1.0, 1.0, {main: (1, 1, 1.0, 1.0)}),
+            b: (1, 2, 0.0, 3.0, {main: (1, 1, 0.0, 3.0), b: (1, 1, 0.0, 1.0)}),
+            leaf: (2, 2, 3.0, 3.0, {b: (2, 2, 3.0, 3.0)}),
+        }
+        stacks = collapse_stats(stats)
+        self.assertEqual(stacks, {('m.py:1(main)', 'm.py:5(a)'): 1.0,
+                                  ('m.py:1(main)', 'm.py:9(b)', 'm.py:13(leaf)'): 3.0})
+        self.assertEqual([row[0] for row in top_functions(stats, 2)], ['m.py:13(leaf)', 'm.py:5(a)'])
+
+
+class TestProfiledCrawl(unittest.TestCase):
+    """Test --profile on a crawl replayed from a cassette"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _run(self, name, args, api_url, **env_vars):
+        workdir = os.path.join(self.tmpdir.name, name)
+        os.makedirs(workdir)
+        shutil.copy(os.path.join(ROOT_DIR, 'profanity_whitelist.json'), workdir)
+        env = dict(os.environ, GH_PAT='test-token', DEBUG='false', GITHUB_REQUEST_DELAY='0',
+                   GITHUB_API_URL=api_url, **env_vars)
+        env.pop('CATALOG_DB', None)
+        env.pop('GH_PATS', None)
+        result = subprocess.run([sys.executable, os.path.join(ROOT_DIR, 'search_github.py')] + args,
+                                cwd=workdir, env=env, capture_output=True, text=True, timeout=120)
+        self.assertEqual(result.returncode, 0, result.stdout + result.stderr)
+        return workdir, result.stdout
+
+    def test_replayed_crawl_profile(self):
+        """Test that an offline replay writes every phase's profile and prints the hottest functions"""
+        cassette = os.path.join(self.tmpdir.name, 'crawl.cassette.gz')
+        with MockGitHubAPI(mock_repos()) as api:
+            self._run('record', ['--record', cassette], api.url,
+                      SKOPEO_BIN=os.path.join(MOCK_DATA_DIR, 'fake_skopeo.py'))
+        workdir, output = self._run('replay', ['--replay', cassette, '--profile', '--profile-top', '3'], api.url,
+                                    SKOPEO_BIN='/nonexistent/skopeo')
+
+        profiles = os.path.join(workdir, 'generated', 'profiles')
+        self.assertEqual(sorted(os.listdir(profiles)),
+                         sorted(f"{phase}.{kind}" for phase in PHASES for kind in ('pstats', 'collapsed')))
+        functions = {phase: function_names(pstats.Stats(os.path.join(profiles, f"{phase}.pstats")).stats)
+                     for phase in PHASES}
+        self.assertIn('replay_probe', functions['probe'])
+        self.assertNotIn('check_image_pullability', functions['parse'])
+        self.assertIn('validate_workspace_schema', functions['validate'])
+        self.assertIn('publish_results', functions['output'])
+        summary = output[output.index('Hottest functions by own time per phase (deterministic profile'):]
+        for phase in PHASES:
+            self.assertIn(f"\n  {phase}: ", summary)
+        self.assertIn("Profiles written to generated/profiles/", output)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+"""
+Unit tests for precomputed ranking scores and orderings.
+Tests compute_rankings against a small hand-built catalog with a fixed
+reference time.
+"""
+
+import unittest
+import os
+import sys
+from datetime import datetime, timezone
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from ranking import compute_rankings, parse_timestamp, version_series
+
+
+NOW = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def workspace(name, versions, old_format=False):
+    if old_format:
+        return {'friendly_name': name, 'name': f"org/{name.lower()}:latest", 'compatibility': versions}
+    return {'friendly_name': name,
+            'compatibility': [{'version': v, 'image': f"org/{name.lower()}:{v}"} for v in versions]}
+
+
+class TestRanking(unittest.TestCase):
+    """Test cases for compute_rankings"""
+
+    def setUp(self):
+        self.catalog = {
+            'popular/registry': {
+                'stars': 100, 'last_commit': '2025-01-01T00:00:00Z',
+                'workspaces': [{'Old': workspace('Old', ['1.13.x', '1.14.x'], old_format=True)}]
+            },
+            'fresh/registry': {
+                'stars': 3, 'last_commit': '2026-01-01T00:00:00Z',
+                'workspaces': [{'New': workspace('New', ['1.17.x', '1.18.0'])},
+                               {'Broad': workspace('Broad', ['1.14.x', '1.15.x', '1.16.x', '1.17.x', '1.18.x'])}]
+            },
+            'quiet/registry': {
+                'stars': 3, 'last_commit': 'not a date',
+                'workspaces': [{'Alpha': workspace('Alpha', ['1.16.x'])}]
+            },
+        }
+        self.rankings = compute_rankings(self.catalog, now=NOW)
+
+    def test_version_series(self):
+        """Test that versions collapse to their release series"""
+        self.assertEqual(version_series('1.18.x'), (1, 18))
+        self.assertEqual(version_series('1.18.0'), (1, 18))
+        self.assertEqual(version_series('v1.15'), (1, 15))
+        self.assertIsNone(version_series('latest'))
+        self.assertEqual(parse_timestamp('garbage'), parse_timestamp('2024-01-01T00:00:00Z'))
+
+    def test_component_scores(self):
+        """Test popularity, freshness, breadth and image freshness"""
+        scores = self.rankings['scores']
+        self.assertEqual(scores['popular/registry/Old']['popularity'], 1.0)
+        self.assertEqual(scores['fresh/registry/New']['freshness'], 1.0)
+        self.assertAlmostEqual(scores['popular/registry/Old']['freshness'], 0.5 ** (365 / 180), places=4)
+        # Six release series in the catalog (1.13 .. 1.18)
+        self.assertAlmostEqual(scores['fresh/registry/Broad']['compatibility_breadth'], 5 / 6, places=4)
+        self.assertEqual(scores['fresh/registry/New']['image_freshness'], 1.0)
+        self.assertAlmostEqual(scores['popular/registry/Old']['image_freshness'], 1 / 5, places=4)
+
+    def test_orderings_match_explorer_sorts(self):
+        """Test that stars/updated orderings use the explorer's tie-breaks"""
+        orderings = self.rankings['orderings']
+        # Stars, then most recent commit, then name
+        self.assertEqual(orderings['stars'], ['popular/registry/Old', 'fresh/registry/Broad',
+                                              'fresh/registry/New', 'quiet/registry/Alpha'])
+        # Unparseable last_commit falls back to 2024-01-01
+        self.assertEqual(orderings['updated'], ['fresh/registry/Broad', 'fresh/registry/New',
+                                                'popular/registry/Old', 'quiet/registry/Alpha'])
+        self.assertEqual(orderings['compatibility'][0], 'fresh/registry/Broad')
+        self.assertEqual(orderings['image_freshness'][:2], ['fresh/registry/Broad', 'fresh/registry/New'])
+
+    def test_every_ordering_covers_every_workspace(self):
+        """Test that orderings are permutations of the workspace ids"""
+        ids = set(self.rankings['scores'])
+        self.assertEqual(len(ids), 4)
+        for name, ordering in self.rankings['orderings'].items():
+            self.assertEqual(sorted(ordering), sorted(ids), name)
+
+    def test_reference_time_comes_from_the_catalog(self):
+        """Test that without now, freshness is measured from the newest last_commit, not the clock"""
+        rankings = compute_rankings(self.catalog)
+        self.assertEqual(rankings['generated_at'], '2026-01-01T00:00:00Z')
+        self.assertEqual(rankings['scores']['fresh/registry/New']['freshness'], 1.0)
+        self.assertEqual(compute_rankings(self.catalog), rankings)
+        self.assertEqual(compute_rankings({})['generated_at'], '2024-01-01T00:00:00Z')
+
+    def test_empty_catalog(self):
+        """Test that an empty catalog yields empty orderings"""
+        rankings = compute_rankings({}, now=NOW)
+        self.assertEqual(rankings['scores'], {})
+        self.assertEqual(rankings['orderings']['score'], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,147 @@
+"""
+Unit tests for the aggregated registry export.
+Tests the registry layout, content addressing, incremental rebuilds and the
+crawler's --registry-export step.
+"""
+
+import unittest
+import copy
+import hashlib
+import json
+import os
+import sys
+import tempfile
+from unittest.mock import patch
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import search_github
+from catalog_utils import REGISTRY_LIST_FORMATS, workspace_format
+from compact_records import compact_catalog
+from registry_export import export_registry
+from tests.mock_github_api import load_mock
+
+
+def make_catalog():
+    old = load_mock('workspace_old_format.json')
+    new = load_mock('workspace_new_format.json')
+    # Forks only produce identical entries when the icon is not on their own Pages site
+    new['image_src'] = 'https://icons.example.com/test.png'
+    return {
+        'user1/kasm-registry': {'github_pages': 'https://user1.github.io/kasm-registry/', 'stars': 3,
+                                'workspaces': [{'OldApp': old}, {'NewApp': new}]},
+        # A fork publishing the same workspace
+        'user2/kasm-registry': {'github_pages': 'https://user2.github.io/kasm-registry/', 'stars': 1,
+                                'workspaces': [{'NewApp': copy.deepcopy(new)}]},
+    }
+
+
+class TestRegistryExport(unittest.TestCase):
+    """Test cases for export_registry"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.out = os.path.join(self.tmpdir.name, 'registry')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def read(self, *path):
+        with open(os.path.join(self.out, *path), 'rb') as f:
+            return f.read()
+
+    def test_layout(self):
+        """Test the list file, with every workspace in its original format, and rewritten icon URLs"""
+        paths, stats = export_registry(make_catalog(), self.out)
+        self.assertEqual([os.path.relpath(path, self.out) for path in paths],
+                         [os.path.join('1.0', 'list.json'), 'index.json'])
+        listing = json.loads(self.read('1.0', 'list.json'))
+        self.assertEqual(listing['schema_version'], '1.0')
+        self.assertEqual([ws['compatibility'] for ws in listing['workspaces']],
+                         [load_mock('workspace_old_format.json')['compatibility'],
+                          load_mock('workspace_new_format.json')['compatibility']])
+        self.assertEqual(listing['workspaces'][0]['image_src'], 'https://user1.github.io/kasm-registry/test.png')
+        self.assertEqual(listing['workspaces'][1]['image_src'], 'https://icons.example.com/test.png')
+        self.assertEqual(stats['registry_workspaces'], 2)
+
+    def test_list_layout_is_what_the_crawler_reads(self):
+        """Test that the export writes every workspace to the list the Pages fast path reads"""
+        # A template registry lists old and new format workspaces in 1.0/list.json
+        self.assertEqual(REGISTRY_LIST_FORMATS, {'1.0': ('old', 'new')})
+        self.assertEqual(search_github.PAGES_LISTING_PATH, '1.0/list.json')
+        export_registry(make_catalog(), self.out)
+        listing = json.loads(self.read(*search_github.PAGES_LISTING_PATH.split('/')))
+        self.assertEqual([workspace_format(ws) for ws in listing['workspaces']], ['old', 'new'])
+
+    def test_unpublished_list_is_removed(self):
+        """Test that a list an earlier export wrote for another list version is removed"""
+        export_registry(make_catalog(), self.out)
+        os.makedirs(os.path.join(self.out, '1.1'))
+        with open(os.path.join(self.out, '1.1', 'list.json'), 'w') as f:
+            f.write('{}')
+        with open(os.path.join(self.out, 'index.json')) as f:
+            index = json.load(f)
+        index['lists']['1.1'] = 'stale'
+        with open(os.path.join(self.out, 'index.json'), 'w') as f:
+            json.dump(index, f)
+
+        export_registry(make_catalog(), self.out)
+
+        self.assertFalse(os.path.exists(os.path.join(self.out, '1.1', 'list.json')))
+        self.assertEqual(list(json.loads(self.read('index.json'))['lists']), ['1.0'])
+
+    def test_entries_are_content_addressed(self):
+        """Test that every entry is named by its sha256 and forks share one entry"""
+        export_registry(make_catalog(), self.out)
+        index = json.loads(self.read('index.json'))
+        self.assertEqual(index['workspaces']['user1/kasm-registry/NewApp'],
+                         index['workspaces']['user2/kasm-registry/NewApp'])
+        for path in index['workspaces'].values():
+            self.assertEqual(f"workspaces/{hashlib.sha256(self.read(path)).hexdigest()}.json", path)
+        self.assertEqual(len(os.listdir(os.path.join(self.out, 'workspaces'))), 2)
+
+    def test_incremental_rebuild(self):
+        """Test that only changed workspaces and lists are rewritten"""
+        catalog = make_catalog()
+        export_registry(catalog, self.out)
+        list_mtime = os.stat(os.path.join(self.out, '1.0', 'list.json')).st_mtime_ns
+
+        _, stats = export_registry(catalog, self.out)
+        self.assertEqual((stats['registry_entries_written'], stats['registry_entries_unchanged'],
+                          stats['registry_entries_removed'], stats['registry_lists_written']), (0, 2, 0, 0))
+        self.assertEqual(os.stat(os.path.join(self.out, '1.0', 'list.json')).st_mtime_ns, list_mtime)
+
+        catalog['user1/kasm-registry']['workspaces'][1]['NewApp']['description'] = 'Changed'
+        _, stats = export_registry(catalog, self.out)
+        # The changed workspace is new; the fork's copy still uses the old entry
+        self.assertEqual((stats['registry_entries_written'], stats['registry_entries_unchanged'],
+                          stats['registry_entries_removed'], stats['registry_lists_written']), (1, 2, 0, 1))
+
+        del catalog['user2/kasm-registry']
+        _, stats = export_registry(catalog, self.out)
+        self.assertEqual(stats['registry_entries_removed'], 1)
+        self.assertEqual(len(os.listdir(os.path.join(self.out, 'workspaces'))), 2)
+
+    def test_publish_results_exports_registry(self):
+        """Test that the crawler writes the registry and lists it in the manifest"""
+        cwd = os.getcwd()
+        os.chdir(self.tmpdir.name)
+        try:
+            os.makedirs('generated')
+            catalog = compact_catalog(make_catalog())
+            with patch.object(search_github, 'REGISTRY_EXPORT', True), \
+                    patch.object(search_github, 'REGISTRY_EXPORT_DIR', 'generated/registry'), \
+                    patch.object(search_github, 'REGISTRY_EXPORT_STATS', {}), \
+                    patch('builtins.print'):
+                search_github.publish_results(list(catalog), catalog)
+            with open('generated/manifest.json') as f:
+                files = json.load(f)['files']
+        finally:
+            os.chdir(cwd)
+        self.assertIn('registry/1.0/list.json', files)
+        self.assertIn('registry/index.json', files)
+
+
+if __name__ == '__main__':
+    unittest.main()
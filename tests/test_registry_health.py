@@ -0,0 +1,152 @@
+"""
+Unit tests for per-registry probe timeouts and circuit breakers.
+Tests CircuitBreaker, RegistryHealth and how probe_reference /
+skopeo_inspect use them.
+"""
+
+import unittest
+import os
+import subprocess
+import sys
+from unittest.mock import patch
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import search_github
+from registry_health import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, RegistryHealth, is_unreachable_error
+from search_github import INSPECTED_IMAGES, STATS, UNVERIFIED_IMAGES
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    """Test cases for CircuitBreaker state transitions"""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker(failure_threshold=3, cooldown=60, clock=self.clock)
+
+    def test_opens_after_consecutive_failures(self):
+        """Test that only consecutive failures open the breaker"""
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertFalse(self.breaker.allow())
+
+    def test_half_open_trial(self):
+        """Test that after the cooldown a single trial probe decides the state"""
+        for _ in range(3):
+            self.breaker.record_failure()
+        self.clock.now = 60
+        self.assertTrue(self.breaker.allow())
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        # Only one trial at a time
+        self.assertFalse(self.breaker.allow())
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertFalse(self.breaker.allow())
+
+        self.clock.now = 120
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.assertEqual(self.breaker.times_opened, 2)
+
+
+class TestRegistryHealth(unittest.TestCase):
+    """Test cases for adaptive timeouts"""
+
+    def test_timeout_follows_latency_percentile(self):
+        """Test the default until enough samples, then a bounded multiple of p95"""
+        health = RegistryHealth(default_timeout=45, min_timeout=5, multiplier=4, min_samples=5)
+        for _ in range(4):
+            health.record('fast.example.com', 0.5, ok=True)
+        self.assertEqual(health.timeout('fast.example.com'), 45)
+        health.record('fast.example.com', 2.0, ok=True)
+        self.assertEqual(health.timeout('fast.example.com'), 8.0)
+
+        for _ in range(5):
+            health.record('slow.example.com', 0.1, ok=True)
+            health.record('glacial.example.com', 30, ok=True)
+        self.assertEqual(health.timeout('slow.example.com'), 5)
+        self.assertEqual(health.timeout('glacial.example.com'), 45)
+        self.assertEqual(health.timeout('unknown.example.com'), 45)
+
+    def test_unreachable_errors(self):
+        """Test that only failures to reach the registry count against it"""
+        self.assertTrue(is_unreachable_error('dial tcp: lookup dead.example.com: no such host'))
+        self.assertTrue(is_unreachable_error('received unexpected HTTP status: 503 Service Unavailable'))
+        self.assertFalse(is_unreachable_error('manifest unknown: manifest unknown'))
+        self.assertFalse(is_unreachable_error(None))
+
+
+class TestProbeCircuitBreaker(unittest.TestCase):
+    """Test cases for skopeo probes behind a registry's breaker"""
+
+    def setUp(self):
+        self.patches = [
+            patch.object(search_github, 'REGISTRY_HEALTH', RegistryHealth(failure_threshold=2, cooldown=60)),
+            patch.object(search_github, 'LAST_KNOWN_PULLABLE', {'dead.example.com/org/known:1'}),
+        ]
+        for p in self.patches:
+            p.start()
+        INSPECTED_IMAGES.clear()
+        UNVERIFIED_IMAGES.clear()
+        for key in ('skopeo_timeouts', 'circuit_breaker_skips', 'circuit_breaker_seconds_saved',
+                    'circuit_last_known_probes', 'circuit_skipped_probes'):
+            STATS[key] = 0
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        INSPECTED_IMAGES.clear()
+        UNVERIFIED_IMAGES.clear()
+
+    @patch('search_github.subprocess.run')
+    def test_dead_registry_fails_fast(self, mock_run):
+        """Test that a timing-out registry is skipped after the threshold, with last run's results used"""
+        mock_run.side_effect = subprocess.TimeoutExpired('skopeo', 45)
+
+        self.assertFalse(search_github.skopeo_inspect('dead.example.com/org/a:1'))
+        self.assertFalse(search_github.skopeo_inspect('dead.example.com/org/b:1'))
+        self.assertEqual(mock_run.call_count, 2)
+
+        # Breaker is open: skopeo is not run any more
+        self.assertTrue(search_github.skopeo_inspect('dead.example.com/org/known:1'))
+        self.assertFalse(search_github.skopeo_inspect('dead.example.com/org/new:1'))
+        self.assertEqual(mock_run.call_count, 2)
+
+        self.assertEqual(STATS['skopeo_timeouts'], 2)
+        self.assertEqual(STATS['circuit_breaker_skips'], 2)
+        self.assertEqual(STATS['circuit_breaker_seconds_saved'], 90)
+        self.assertEqual(STATS['circuit_last_known_probes'], 1)
+        self.assertEqual(STATS['circuit_skipped_probes'], 1)
+        self.assertEqual(UNVERIFIED_IMAGES, {'dead.example.com/org/known:1': 'last_known_pullable',
+                                             'dead.example.com/org/new:1': 'not_probed'})
+        # Skipped images are not cached, so they are probed again once the registry recovers
+        self.assertNotIn('dead.example.com/org/new:1', INSPECTED_IMAGES)
+
+    @patch('search_github.subprocess.run')
+    def test_missing_images_do_not_open_breaker(self, mock_run):
+        """Test that a registry answering 'manifest unknown' stays closed"""
+        mock_run.return_value = subprocess.CompletedProcess([], 1, '', 'manifest unknown')
+        for i in range(5):
+            self.assertFalse(search_github.skopeo_inspect(f'dead.example.com/org/missing:{i}'))
+        self.assertEqual(mock_run.call_count, 5)
+        self.assertEqual(search_github.REGISTRY_HEALTH.state('dead.example.com'), CLOSED)
+
+
+if __name__ == '__main__':
+    unittest.main()
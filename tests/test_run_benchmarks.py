@@ -0,0 +1,54 @@
+"""
+Unit tests for the microbenchmark runner.
+Tests measure, compare_to_baseline and the benchmark corpora.
+"""
+
+import unittest
+import os
+import sys
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from tests.run_benchmarks import BENCHMARKS, compare_to_baseline, load_fixtures, make_synthetic, measure
+
+
+class TestRunBenchmarks(unittest.TestCase):
+    """Test cases for run_benchmarks"""
+
+    def test_measure(self):
+        """Test that ops/sec and allocations are recorded"""
+        result = measure(lambda size: [0] * size, [(1000,), (10,)], min_time=0.01, repeat=2)
+        self.assertGreater(result['ops_per_sec'], 0)
+        self.assertGreater(result['alloc_bytes'], 1000 * 8 / 2)
+        self.assertEqual(result['calls'], 2)
+
+    def test_regressions_past_threshold(self):
+        """Test that only slowdowns or allocation growth past the threshold are reported"""
+        baseline = {
+            'a[fixtures]': {'ops_per_sec': 1000, 'alloc_bytes': 1000},
+            'b[fixtures]': {'ops_per_sec': 1000, 'alloc_bytes': 1000},
+            'c[fixtures]': {'ops_per_sec': 1000, 'alloc_bytes': 1000},
+        }
+        results = {
+            'a[fixtures]': {'ops_per_sec': 850, 'alloc_bytes': 1100},
+            'b[fixtures]': {'ops_per_sec': 700, 'alloc_bytes': 1000},
+            'c[fixtures]': {'ops_per_sec': 5000, 'alloc_bytes': 2000},
+            'new[fixtures]': {'ops_per_sec': 1, 'alloc_bytes': 1},
+        }
+        regressions = compare_to_baseline(results, baseline, threshold=0.2)
+        self.assertEqual(len(regressions), 2)
+        self.assertTrue(regressions[0].startswith('b[fixtures]: 700 ops/sec'))
+        self.assertTrue(regressions[1].startswith('c[fixtures]: 2,000 bytes'))
+
+    def test_every_benchmark_has_calls(self):
+        """Test that each benchmark finds inputs in both corpora"""
+        for corpus in (load_fixtures(), make_synthetic(20)):
+            for name, prepare in BENCHMARKS.items():
+                function, calls = prepare(corpus)
+                self.assertTrue(calls, name)
+                function(*calls[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
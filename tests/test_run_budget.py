@@ -0,0 +1,135 @@
+"""
+Unit tests for the run deadline.
+Tests RunBudget phase accounting and the crawler's fallbacks once the
+crawl budget is used up (skopeo_inspect, crawl_repos).
+"""
+
+import unittest
+import os
+import sys
+from unittest.mock import patch
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import search_github
+from run_budget import RunBudget
+from search_github import INSPECTED_IMAGES, STATS, UNVERIFIED_IMAGES
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestRunBudget(unittest.TestCase):
+    """Test cases for RunBudget"""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.budget = RunBudget(100, clock=self.clock)
+
+    def test_no_deadline_is_never_exhausted(self):
+        """Test that a budget without a deadline never limits anything"""
+        budget = RunBudget(0, clock=self.clock)
+        self.clock.now = 1e9
+        self.assertIsNone(budget.deadline)
+        self.assertFalse(budget.exhausted('crawl'))
+        self.assertEqual(budget.timeout(45, 'crawl'), 45)
+
+    def test_phase_accounting(self):
+        """Test that elapsed time is tracked per phase and the crawl share runs out"""
+        with self.budget.phase('search'):
+            self.clock.now = 5
+        self.budget.start_phase('crawl')
+        self.assertEqual(self.budget.remaining('crawl'), 80)
+        self.clock.now = 70
+        self.assertEqual(self.budget.timeout(45, 'crawl'), 15)
+        self.clock.now = 84
+        self.assertEqual(self.budget.timeout(45, 'crawl'), 1.0)
+        self.clock.now = 86
+        self.assertTrue(self.budget.exhausted('crawl'))
+        self.budget.end_phase()
+
+        report = self.budget.report()
+        self.assertEqual(report['phases']['search'], {'elapsed': 5, 'budget': 10})
+        self.assertEqual(report['phases']['crawl'], {'elapsed': 81, 'budget': 80})
+
+    def test_overrun_cannot_eat_publish_share(self):
+        """Test that a slow search leaves the publish share untouched"""
+        with self.budget.phase('search'):
+            self.clock.now = 60
+        self.budget.start_phase('crawl')
+        # 100 - 60 elapsed - 10 reserved for publishing
+        self.assertEqual(self.budget.remaining('crawl'), 30)
+        self.clock.now = 90
+        self.assertTrue(self.budget.exhausted('crawl'))
+        self.budget.start_phase('publish')
+        self.assertEqual(self.budget.remaining('publish'), 10)
+
+
+class TestDeadlineFallbacks(unittest.TestCase):
+    """Test cases for probing and crawling once the crawl budget is used up"""
+
+    def setUp(self):
+        clock = FakeClock()
+        budget = RunBudget(10, clock=clock)
+        budget.start_phase('crawl')
+        clock.now = 9
+        self.patches = [
+            patch.object(search_github, 'BUDGET', budget),
+            patch.object(search_github, 'LAST_KNOWN_PULLABLE', {'registry.example.com/known:1.0'}),
+            patch.object(search_github, 'PREVIOUS_CATALOG', {
+                'owner/old-registry': {
+                    'github_pages': 'https://owner.github.io/old-registry',
+                    'stars': 3,
+                    'last_commit': '2024-01-01T00:00:00Z',
+                    'workspaces': [{'App': {'docker_registry': 'https://index.docker.io/v1/',
+                                            'compatibility': [{'version': '1.15.x', 'image': 'owner/app:1.0'}]}}]
+                }
+            }),
+        ]
+        for p in self.patches:
+            p.start()
+        INSPECTED_IMAGES.clear()
+        UNVERIFIED_IMAGES.clear()
+        for key in ('budget_last_known_probes', 'budget_skipped_probes', 'budget_reused_repos'):
+            STATS[key] = 0
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        INSPECTED_IMAGES.clear()
+        UNVERIFIED_IMAGES.clear()
+
+    @patch('search_github.run_skopeo_probe')
+    def test_probe_falls_back_to_last_run(self, mock_probe):
+        """Test that known images stay pullable and new ones are skipped, without running skopeo"""
+        self.assertTrue(search_github.skopeo_inspect('known:1.0', 'registry.example.com'))
+        self.assertTrue(search_github.skopeo_inspect('known:1.0', 'registry.example.com'))
+        self.assertFalse(search_github.skopeo_inspect('brand-new:1.0', 'registry.example.com'))
+        mock_probe.assert_not_called()
+
+        self.assertEqual(UNVERIFIED_IMAGES, {'registry.example.com/known:1.0': 'last_known_pullable',
+                                             'registry.example.com/brand-new:1.0': 'not_probed'})
+        self.assertEqual(STATS['budget_last_known_probes'], 1)
+        self.assertEqual(STATS['budget_skipped_probes'], 1)
+        # Fallback answers are not cached as probe results
+        self.assertEqual(INSPECTED_IMAGES, {})
+
+    @patch('search_github.start_crawl_repo')
+    def test_crawl_reuses_previous_entries(self, mock_crawl_repo):
+        """Test that repos are not crawled and last run's entries are published instead"""
+        results = search_github.crawl_repos(['owner/old-registry', 'owner/new-registry'])
+
+        mock_crawl_repo.assert_not_called()
+        self.assertEqual(list(results), ['owner/old-registry'])
+        self.assertEqual(STATS['budget_reused_repos'], 1)
+        self.assertEqual(UNVERIFIED_IMAGES, {'index.docker.io/v1/owner/app:1.0': 'last_known_pullable'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+"""
+Unit tests for workspace.json schema validation.
+Tests validate_workspace_schema and that prevalidation rejects malformed
+files before any image is probed.
+"""
+
+import unittest
+import copy
+import json
+import os
+import sys
+from unittest.mock import patch
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import search_github
+from search_github import prevalidate_workspace, validate_workspace_schema
+
+
+class TestSchemaValidation(unittest.TestCase):
+    """Test cases for validate_workspace_schema"""
+
+    def setUp(self):
+        mock_data_dir = os.path.join(os.path.dirname(__file__), 'mock_data')
+        with open(os.path.join(mock_data_dir, 'workspace_new_format.json'), 'r') as f:
+            self.new_format = json.load(f)
+        with open(os.path.join(mock_data_dir, 'workspace_old_format.json'), 'r') as f:
+            self.old_format = json.load(f)
+
+    def _invalid(self, **changes):
+        workspace = copy.deepcopy(self.new_format)
+        for key, value in changes.items():
+            if value is None:
+                workspace.pop(key, None)
+            else:
+                workspace[key] = value
+        return validate_workspace_schema(workspace)
+
+    def test_valid_formats(self):
+        """Test that both workspace.json formats and the committed catalog are valid"""
+        self.assertIsNone(validate_workspace_schema(self.new_format))
+        self.assertIsNone(validate_workspace_schema(self.old_format))
+
+        with open(os.path.join(os.path.dirname(__file__), '..', 'generated', 'community_workspaces.json')) as f:
+            catalog = json.load(f)
+        for repo in catalog.values():
+            for workspace in repo['workspaces']:
+                for name, data in workspace.items():
+                    self.assertIsNone(validate_workspace_schema(data), name)
+
+    def test_types_and_required_fields(self):
+        """Test that wrong types and missing required fields are reported"""
+        self.assertIn("missing required field 'friendly_name'", self._invalid(friendly_name=None))
+        self.assertIn("'compatibility' has type dict", self._invalid(compatibility={'1.16.x': 'a'}))
+        self.assertIn("'categories' must be a list of strings", self._invalid(categories=['ok', 3]))
+        self.assertIn("'cores' has type bool", self._invalid(cores=True))
+        self.assertIn("top level is list", validate_workspace_schema([self.new_format]))
+
+    def test_compatibility_entries(self):
+        """Test that compatibility entries are checked before any probe"""
+        entries = copy.deepcopy(self.new_format['compatibility'])
+        self.assertIn("'compatibility' entry has type str", self._invalid(compatibility=entries + ['1.16.x']))
+        self.assertIn("'compatibility[].image'", self._invalid(compatibility=[{'version': '1.16.x'}]))
+        self.assertIn("'compatibility' is empty", self._invalid(compatibility=[]))
+
+        old_format = copy.deepcopy(self.old_format)
+        del old_format['name']
+        self.assertIn("has no 'name'", validate_workspace_schema(old_format))
+
+    def test_limits_and_urls(self):
+        """Test size limits and URL fields"""
+        long_text = 'x' * (search_github.MAX_TEXT_LENGTH + 1)
+        self.assertIn('longer than', self._invalid(description=long_text))
+        self.assertIn('more than', self._invalid(categories=['a'] * (search_github.MAX_LIST_ITEMS + 1)))
+
+        self.assertIsNone(self._invalid(docker_registry='ghcr.io'))
+        self.assertIsNone(self._invalid(image_src='https://cdn.example.com/icon.png'))
+        self.assertIn("'docker_registry'", self._invalid(docker_registry='ftp://registry.example.com'))
+        self.assertIn("'image_src'", self._invalid(image_src='javascript:alert(1)'))
+
+    @patch('search_github.skopeo_inspect')
+    def test_rejected_before_probing(self, mock_skopeo):
+        """Test that prevalidation rejects malformed and oversized files without probing"""
+        workspace = copy.deepcopy(self.new_format)
+        workspace['compatibility'].append(42)
+        status = prevalidate_workspace('Broken', json.dumps(workspace))[0]
+        self.assertEqual(status, 'invalid_schema')
+
+        oversized = json.dumps(self.new_format) + ' ' * search_github.MAX_WORKSPACE_JSON_BYTES
+        self.assertEqual(prevalidate_workspace('Huge', oversized)[0], 'invalid_schema')
+        mock_skopeo.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,224 @@
+"""
+Unit tests for the GitHub token pool.
+Tests token selection by remaining budget per resource, taking exhausted
+and revoked tokens out of rotation, make_request waiting for a reset and
+keeping non-API requests out of the pool, and a crawl spread over several
+tokens.
+"""
+
+import unittest
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from unittest.mock import patch
+
+from requests.structures import CaseInsensitiveDict
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import search_github
+from run_budget import RunBudget
+from token_pool import REVOKED, TokenPool, resource_for_url
+from tests.mock_github_api import MOCK_DATA_DIR, ROOT_DIR, MockGitHubAPI, mock_repos
+
+
+class FakeClock:
+    def __init__(self, now=1_000_000):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def rate_headers(remaining, reset, resource='core', limit=5000):
+    return {'X-RateLimit-Limit': str(limit), 'X-RateLimit-Remaining': str(remaining),
+            'X-RateLimit-Reset': str(reset), 'X-RateLimit-Resource': resource}
+
+
+class TestTokenPool(unittest.TestCase):
+    """Test cases for TokenPool"""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.pool = TokenPool(['token-aaaa', 'token-bbbb', ' ', 'token-aaaa'], clock=self.clock)
+
+    def test_resource_for_url(self):
+        """Test that search, code search and everything else count separately"""
+        self.assertEqual(resource_for_url('https://api.github.com/search/repositories'), 'search')
+        self.assertEqual(resource_for_url('https://api.github.com/search/code'), 'code_search')
+        self.assertEqual(resource_for_url('https://api.github.com/repos/o/r/contents/workspaces'), 'core')
+
+    def test_unused_tokens_share_requests(self):
+        """Test that requests alternate between fresh tokens and duplicates are dropped"""
+        self.assertEqual(len(self.pool), 2)
+        tokens = [self.pool.acquire('core')[0] for _ in range(4)]
+        self.assertEqual(tokens, ['token-aaaa', 'token-bbbb', 'token-aaaa', 'token-bbbb'])
+
+    def test_most_remaining_wins_per_resource(self):
+        """Test that the token with the most requests left for the resource is used"""
+        reset = self.clock.now + 600
+        self.pool.record('token-aaaa', 'core', 200, rate_headers(4000, reset))
+        self.pool.record('token-bbbb', 'core', 200, rate_headers(10, reset))
+        self.pool.record('token-aaaa', 'search', 200, rate_headers(0, reset, 'search', 30))
+        self.assertEqual(self.pool.acquire('core'), ('token-aaaa', 0))
+        self.assertEqual(self.pool.acquire('search'), ('token-bbbb', 0))
+
+    def test_revoked_token_leaves_rotation(self):
+        """Test that a 401 drops the token and asks for a retry"""
+        self.assertTrue(self.pool.record('token-aaaa', 'core', 401, {}))
+        self.assertEqual({self.pool.acquire('core')[0] for _ in range(3)}, {'token-bbbb'})
+        self.assertEqual(self.pool.report()['#1']['state'], REVOKED)
+        self.pool.record('token-bbbb', 'core', 401, {})
+        self.assertEqual(self.pool.acquire('core'), (None, 0))
+
+    def test_exhausted_pool_waits_for_earliest_reset(self):
+        """Test rate-limited answers, the wait until a reset and the refill after it"""
+        now = self.clock.now
+        # A 403 with requests left is not about the token (e.g. a forbidden resource)
+        self.assertFalse(self.pool.record('token-bbbb', 'core', 403, {'X-RateLimit-Remaining': '12'}))
+        self.assertTrue(self.pool.record('token-aaaa', 'core', 403, rate_headers(0, now + 300)))
+        self.assertFalse(self.pool.record('token-bbbb', 'core', 200, rate_headers(0, now + 120)))
+        self.assertEqual(self.pool.acquire('core'), ('token-bbbb', 120))
+
+        self.clock.now += 301
+        self.assertEqual(self.pool.acquire('core'), ('token-aaaa', 0))
+        self.assertEqual(self.pool.report()['#1']['rate_limited'], 1)
+
+    def test_default_limits_use_each_resource_window(self):
+        """Test that without headers search refills after a minute and core after an hour"""
+        pool = TokenPool(['token-aaaa'], clock=self.clock)
+        for resource, limit, window in (('search', 30, 60), ('code_search', 10, 60), ('core', 5000, 3600)):
+            for _ in range(limit):
+                self.assertEqual(pool.acquire(resource), ('token-aaaa', 0))
+            self.assertEqual(pool.acquire(resource), ('token-aaaa', window))
+
+        self.clock.now += 60
+        self.assertEqual(pool.acquire('search'), ('token-aaaa', 0))
+        self.assertEqual(pool.acquire('code_search'), ('token-aaaa', 0))
+        self.assertEqual(pool.acquire('core'), ('token-aaaa', 3540))
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = CaseInsensitiveDict(headers or {})
+        self.content = b'{}'
+
+
+class TestMakeRequestWithPool(unittest.TestCase):
+    """Test make_request's use of the pool"""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.pool = TokenPool(['token-aaaa', 'token-bbbb'], clock=self.clock)
+        self.sleeps = []
+        self.sent = []
+        self.responses = []
+        self.patches = [
+            patch.object(search_github, 'TOKEN_POOL', self.pool),
+            patch.object(search_github, 'BUDGET', RunBudget()),
+            patch.object(search_github, 'CASSETTE', None),
+            patch.object(search_github, 'HTTP_CACHE', None),
+            patch.object(search_github, 'REQUEST_DELAY', 0),
+            patch('search_github.time.sleep', side_effect=self._sleep),
+            patch('search_github.send_request', side_effect=self._send),
+            patch('builtins.print'),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    def _sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.clock.now += seconds
+
+    def _send(self, url, params, headers, cached, max_bytes=None):
+        self.sent.append(headers.get('Authorization'))
+        return self.responses.pop(0)
+
+    def test_waits_for_the_earliest_reset_when_every_token_is_limited(self):
+        """Test that a request is sent again after the earliest reset instead of returning a 403"""
+        now = self.clock.now
+        self.responses = [FakeResponse(403, rate_headers(0, now + 300)),
+                          FakeResponse(403, rate_headers(0, now + 120)),
+                          FakeResponse(200, rate_headers(4999, now + 3600))]
+        response = search_github.make_request(f"{search_github.GITHUB_API_URL}/repos/o/r")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([s for s in self.sleeps if s], [120])
+        self.assertEqual(self.sent, ['Bearer token-aaaa', 'Bearer token-bbbb', 'Bearer token-bbbb'])
+
+    def test_gives_up_when_the_reset_is_past_the_deadline(self):
+        """Test that the rate-limited answer is returned rather than waiting past the run budget"""
+        now = self.clock.now
+        self.responses = [FakeResponse(403, rate_headers(0, now + 300)),
+                          FakeResponse(403, rate_headers(0, now + 120))]
+        with patch.object(search_github, 'BUDGET', RunBudget(deadline=60)):
+            response = search_github.make_request(f"{search_github.GITHUB_API_URL}/repos/o/r")
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual([s for s in self.sleeps if s], [])
+
+    def test_other_hosts_do_not_use_the_pool(self):
+        """Test that raw downloads and Pages sites get no token and use no token's budget"""
+        self.responses = [FakeResponse(200), FakeResponse(200)]
+        search_github.make_request('https://raw.githubusercontent.com/o/r/main/workspaces/x/workspace.json')
+        search_github.make_request('https://o.github.io/r/1.0/list.json')
+        self.assertEqual(self.sent, [None, None])
+        self.assertEqual({label: usage['requests'] for label, usage in self.pool.report().items()},
+                         {'#1': {}, '#2': {}})
+
+
+class TestTokenPoolCrawl(unittest.TestCase):
+    """Test a crawl with GH_PATS against a rate-limited mock API"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _crawl(self, name, tokens, **env_vars):
+        workdir = os.path.join(self.tmpdir.name, name)
+        os.makedirs(workdir)
+        shutil.copy(os.path.join(ROOT_DIR, 'profanity_whitelist.json'), workdir)
+        with MockGitHubAPI(mock_repos(), tokens=tokens) as api:
+            env = dict(os.environ, DEBUG='false', GITHUB_API_URL=api.url, GITHUB_REQUEST_DELAY='0',
+                       SKOPEO_BIN=os.path.join(MOCK_DATA_DIR, 'fake_skopeo.py'), **env_vars)
+            env.pop('CATALOG_DB', None)
+            if 'GH_PATS' not in env_vars:
+                env.pop('GH_PATS', None)
+            result = subprocess.run([sys.executable, os.path.join(ROOT_DIR, 'search_github.py')],
+                                    cwd=workdir, env=env, capture_output=True, text=True, timeout=120)
+        self.assertEqual(result.returncode, 0, result.stdout + result.stderr)
+        with open(os.path.join(workdir, 'generated', 'community_workspaces.json')) as f:
+            # Each run has its own mock server port
+            return json.loads(f.read().replace(api.url, 'MOCK_API')), result.stdout, api
+
+    def test_pool_spreads_and_survives_bad_tokens(self):
+        """Test that a small and a revoked token do not change the catalog or add requests"""
+        expected, _, single = self._crawl('single', None, GH_PAT='test-token')
+        api_requests = sum(path.startswith(('/repos/', '/search/')) for path in single.requests)
+        catalog, output, api = self._crawl('pool', {'token-small': 3, 'token-large': 1000},
+                                           GH_PAT='unused', GH_PATS='token-small,token-large,token-revoked')
+        self.assertEqual(catalog, expected)
+        # The revoked token's one 401 is retried with another token
+        self.assertEqual(sum(api.token_requests.values()), api_requests)
+        self.assertGreater(api.token_requests[('token-small', 'core')], 0)
+        self.assertGreater(api.token_requests[('token-large', 'core')], api.token_requests[('token-small', 'core')])
+        self.assertIn("GitHub token #3 was rejected (401)", output)
+        self.assertIn("GitHub token #3 (revoked)", output)
+        # Tokens are named by position only
+        self.assertNotIn("token-", output)
+        # workspace.json downloads are not API requests and carry no token
+        raw = [headers for path, headers in zip(api.requests, api.request_headers) if path.startswith('/raw/')]
+        self.assertTrue(raw)
+        self.assertFalse(any('Authorization' in headers for headers in raw))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+"""
+Unit tests for the CPU-bound validation stages and their process pool.
+Tests prevalidate_workspace, prevalidate_workspaces and crawl_repos with
+repos validating in the pool while the next ones are fetched.
+"""
+
+import unittest
+import json
+import os
+import sys
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from unittest.mock import Mock, patch
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import search_github
+from compact_records import to_builtin
+from search_github import STATS, prevalidate_workspace, prevalidate_workspaces
+from tests.mock_github_api import MockGitHubAPI, mock_repos
+
+
+class TestValidationPool(unittest.TestCase):
+    """Test cases for prevalidate_workspace(s)"""
+
+    @classmethod
+    def setUpClass(cls):
+        """Load mock data once for all tests"""
+        cls.mock_data_dir = os.path.join(os.path.dirname(__file__), 'mock_data')
+        cls.raw_workspaces = []
+        for name in ('workspace_old_format.json', 'workspace_new_format.json',
+                     'workspace_profanity.json', 'workspace_blocked_image.json'):
+            with open(os.path.join(cls.mock_data_dir, name), 'rb') as f:
+                cls.raw_workspaces.append((name.replace('.json', ''), f.read()))
+        cls.raw_workspaces.append(('broken', b'{"friendly_name": '))
+        cls.raw_workspaces.append(('list', b'[1, 2, 3]'))
+
+    def setUp(self):
+        """Reset stats and pool state before each test"""
+        STATS['profanity_filtered_workspaces'] = 0
+        search_github.disable_validation_pool()
+
+    def tearDown(self):
+        search_github.disable_validation_pool()
+
+    def test_statuses(self):
+        """Test the status reported for each kind of payload"""
+        statuses = [result[0] for result in prevalidate_workspaces(self.raw_workspaces)]
+        self.assertEqual(statuses, ['ok', 'ok', 'profanity', 'ok', 'invalid_json', 'unrecognized'])
+        self.assertEqual(STATS['profanity_filtered_workspaces'], 1)
+
+    def test_old_format_is_normalized(self):
+        """Test that the normalized copy and the untouched original are both returned"""
+        status, ws_name, ws_data, original = prevalidate_workspace(*self.raw_workspaces[0])
+        self.assertEqual(status, 'ok')
+        self.assertEqual(ws_name, 'workspace_old_format')
+        self.assertIsInstance(ws_data['compatibility'][0], dict)
+        self.assertIsInstance(original['compatibility'][0], str)
+
+    def test_pool_matches_in_process_results_in_order(self):
+        """Test that pooled validation returns the same results, in order, and counts stats once"""
+        expected = prevalidate_workspaces(self.raw_workspaces * 5)
+        STATS['profanity_filtered_workspaces'] = 0
+
+        search_github.VALIDATION_WORKERS = 2
+        with patch.object(search_github, 'VALIDATION_BATCH_SIZE', 4):
+            results = prevalidate_workspaces(self.raw_workspaces * 5)
+
+        self.assertEqual(results, expected)
+        self.assertEqual(STATS['profanity_filtered_workspaces'], 5)
+
+    def test_broken_pool_falls_back_to_in_process(self):
+        """Test graceful fallback when the pool breaks on submit or while a batch runs"""
+        failed = Future()
+        failed.set_exception(BrokenProcessPool("worker died"))
+        for side_effect in (BrokenProcessPool("pool broken"), lambda *args: failed):
+            STATS['profanity_filtered_workspaces'] = 0
+            broken_pool = Mock()
+            broken_pool.submit.side_effect = side_effect
+            search_github.VALIDATION_POOL = broken_pool
+            search_github.VALIDATION_WORKERS = 2
+
+            results = prevalidate_workspaces(self.raw_workspaces)
+
+            self.assertEqual([result[0] for result in results],
+                             ['ok', 'ok', 'profanity', 'ok', 'invalid_json', 'unrecognized'])
+            self.assertEqual(STATS['profanity_filtered_workspaces'], 1)
+            self.assertIsNone(search_github.VALIDATION_POOL)
+            self.assertEqual(search_github.VALIDATION_WORKERS, 0)
+
+
+class TestPooledCrawl(unittest.TestCase):
+    """Test crawl_repos with repos validating in the pool while the next ones are fetched"""
+
+    def setUp(self):
+        search_github.disable_validation_pool()
+
+    def tearDown(self):
+        search_github.disable_validation_pool()
+
+    def _crawl(self, api, workers):
+        search_github.VALIDATION_WORKERS = workers
+        with patch.object(search_github, 'GITHUB_API_URL', api.url), \
+                patch.object(search_github, 'REQUEST_DELAY', 0), \
+                patch.object(search_github, 'skopeo_inspect', return_value=True), \
+                patch('builtins.print'):
+            catalog = search_github.crawl_repos(list(api.repos))
+        return json.dumps(catalog, default=to_builtin)
+
+    def test_pooled_crawl_matches_in_process_crawl(self):
+        """Test that the pipelined crawl publishes the same catalog, in search order"""
+        with MockGitHubAPI(mock_repos()) as api:
+            expected = self._crawl(api, 0)
+            with patch.object(search_github, 'VALIDATION_BATCH_SIZE', 1):
+                pooled = self._crawl(api, 2)
+        self.assertEqual(pooled, expected)
+        self.assertEqual(list(json.loads(pooled)), [repo for repo in mock_repos() if repo in json.loads(expected)])
+
+    def test_next_repo_is_fetched_before_the_previous_is_probed(self):
+        """Test that up to VALIDATION_WORKERS repos are in flight and finished in order"""
+        events = []
+        start = search_github.start_crawl_repo
+
+        def tracked_start(repo):
+            events.append(('start', repo))
+            finish = start(repo)
+            return lambda: events.append(('finish', repo)) or finish()
+
+        with MockGitHubAPI(mock_repos()) as api, patch.object(search_github, 'start_crawl_repo', tracked_start):
+            self._crawl(api, 2)
+        repos = list(mock_repos())
+        self.assertEqual(events[:4], [('start', repos[0]), ('start', repos[1]), ('start', repos[2]),
+                                      ('finish', repos[0])])
+        self.assertEqual([repo for event, repo in events if event == 'finish'], repos)
+
+
+if __name__ == '__main__':
+    unittest.main()
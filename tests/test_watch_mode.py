@@ -0,0 +1,265 @@
+"""
+Tests for watch mode: webhook handling, event coalescing and targeted
+re-crawls. The end-to-end test runs `search_github.py watch` in a separate
+process against a mock GitHub API.
+"""
+
+import unittest
+import hashlib
+import hmac
+import http.client
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from catalog_store import CatalogStore
+from webhook_server import RecrawlQueue, make_server
+from tests.mock_github_api import MOCK_DATA_DIR, ROOT_DIR, MockGitHubAPI, load_mock, mock_repos
+
+
+def post(url, payload, headers=None):
+    body = json.dumps(payload).encode('utf-8')
+    request = urllib.request.Request(url, data=body, headers=dict(headers or {}), method='POST')
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def get_json(url):
+    with urllib.request.urlopen(url, timeout=10) as response:
+        return json.loads(response.read())
+
+
+class TestRecrawlQueue(unittest.TestCase):
+    """Test cases for RecrawlQueue coalescing"""
+
+    def test_burst_is_coalesced(self):
+        """Test that a burst of events becomes one batch with each repo once"""
+        batches = []
+        done = threading.Event()
+
+        def recrawl(repos):
+            batches.append(repos)
+            done.set()
+
+        queue = RecrawlQueue(recrawl, debounce=0.2, max_delay=5).start()
+        try:
+            for repo in ['a/x', 'b/y', 'a/x', 'a/x', 'b/y']:
+                queue.submit(repo)
+            self.assertTrue(done.wait(5))
+            time.sleep(0.3)
+        finally:
+            queue.stop()
+        self.assertEqual(batches, [['a/x', 'b/y']])
+        self.assertEqual(queue.snapshot()['events'], 5)
+
+    def test_failed_batch_keeps_running(self):
+        """Test that an exception in a re-crawl does not stop the queue"""
+        calls = []
+
+        def recrawl(repos):
+            calls.append(repos)
+            if len(calls) == 1:
+                raise RuntimeError("registry down")
+
+        queue = RecrawlQueue(recrawl, debounce=0.05, max_delay=1).start()
+        try:
+            queue.submit('a/x')
+            time.sleep(0.3)
+            queue.submit('b/y')
+            time.sleep(0.3)
+        finally:
+            queue.stop()
+        self.assertEqual(calls, [['a/x'], ['b/y']])
+        self.assertEqual(queue.snapshot()['errors'], 1)
+
+
+class TestWebhookEndpoint(unittest.TestCase):
+    """Test cases for the webhook HTTP endpoint"""
+
+    def setUp(self):
+        self.submitted = []
+        queue = RecrawlQueue(lambda repos: None)
+        queue.submit = self.submitted.append
+        queue.snapshot = lambda: {'pending': []}
+        self.server = make_server(queue, port=0, secret='s3cret')
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _signed(self, payload, event='push', secret='s3cret'):
+        body = json.dumps(payload).encode('utf-8')
+        signature = hmac.new(secret.encode('utf-8'), body, hashlib.sha256).hexdigest()
+        return {'X-GitHub-Event': event, 'X-Hub-Signature-256': f"sha256={signature}",
+                'Content-Type': 'application/json'}
+
+    def test_push_and_ping(self):
+        """Test that signed pushes are queued and pings answered"""
+        push = {'repository': {'full_name': 'owner/registry'}}
+        self.assertEqual(post(f"{self.url}/webhook", push, self._signed(push))[0], 202)
+        self.assertEqual(post(f"{self.url}/webhook", {}, self._signed({}, event='ping')),
+                         (200, {'status': 'pong'}))
+        self.assertEqual(post(f"{self.url}/recrawl", {'repo': 'other/registry'},
+                              self._signed({'repo': 'other/registry'}))[0], 202)
+        self.assertEqual(self.submitted, ['owner/registry', 'other/registry'])
+
+    def test_rejects_bad_requests(self):
+        """Test that unsigned or malformed requests are rejected without queueing"""
+        push = {'repository': {'full_name': 'owner/registry'}}
+        self.assertEqual(post(f"{self.url}/webhook", push, {'X-GitHub-Event': 'push'})[0], 401)
+        self.assertEqual(post(f"{self.url}/webhook", push, self._signed(push, secret='wrong'))[0], 401)
+        bad_name = {'repository': {'full_name': '../../etc'}}
+        self.assertEqual(post(f"{self.url}/webhook", bad_name, self._signed(bad_name))[0], 400)
+        self.assertEqual(self.submitted, [])
+
+    def test_rejects_bad_content_length(self):
+        """Test that a missing, negative, non-numeric or oversized Content-Length is answered without reading"""
+        for length, expected in ((None, 411), ('-1', 400), ('abc', 400), ('', 400), (str(10 ** 12), 413)):
+            connection = http.client.HTTPConnection('127.0.0.1', self.server.server_address[1], timeout=10)
+            connection.putrequest('POST', '/webhook')
+            if length is not None:
+                connection.putheader('Content-Length', length)
+            connection.endheaders()
+            response = connection.getresponse()
+            self.assertEqual(response.status, expected, length)
+            self.assertIn('error', json.loads(response.read()))
+            connection.close()
+        self.assertEqual(self.submitted, [])
+
+    def test_rejects_json_that_is_not_an_object(self):
+        """Test that arrays, strings and numbers are answered with 400 instead of a dropped connection"""
+        for payload in ([], 'x', 1, None, {'repository': 'owner/registry'}):
+            for path in ('/webhook', '/recrawl'):
+                status, body = post(f"{self.url}{path}", payload, self._signed(payload))
+                self.assertEqual(status, 400, (path, payload))
+                self.assertIn('error', body)
+        self.assertEqual(self.submitted, [])
+
+
+class TestWatchMode(unittest.TestCase):
+    """End-to-end re-crawl of a pushed repo"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        shutil.copy(os.path.join(ROOT_DIR, 'profanity_whitelist.json'), self.tmpdir.name)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _catalog(self):
+        with open(os.path.join(self.tmpdir.name, 'generated', 'community_workspaces.json')) as f:
+            return json.load(f)
+
+    def _wait_for_batches(self, url, count):
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline:
+            if get_json(f"{url}/health")['batches'] >= count:
+                return
+            time.sleep(0.1)
+        self.fail(f"watch mode did not process {count} batches")
+
+    def _start_watch(self, api, catalog_db=None):
+        """Start `search_github.py watch` against api; return (process, base URL)."""
+        env = dict(os.environ, GH_PAT='test-token', DEBUG='false', GITHUB_API_URL=api.url,
+                   GITHUB_REQUEST_DELAY='0', PYTHONUNBUFFERED='1',
+                   SKOPEO_BIN=os.path.join(MOCK_DATA_DIR, 'fake_skopeo.py'))
+        env.pop('CATALOG_DB', None)
+        env.pop('WEBHOOK_SECRET', None)
+        if catalog_db:
+            env['CATALOG_DB'] = catalog_db
+        process = subprocess.Popen(
+            [sys.executable, os.path.join(ROOT_DIR, 'search_github.py'), 'watch',
+             '--port', '0', '--debounce', '0.2'],
+            cwd=self.tmpdir.name, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True
+        )
+        output = []
+        for line in process.stdout:
+            output.append(line)
+            if line.startswith('Watching for webhooks on '):
+                threading.Thread(target=process.stdout.read, daemon=True).start()
+                return process, line.split()[-1]
+        process.wait(timeout=10)
+        self.fail(''.join(output))
+
+    def test_push_recrawls_only_that_repo(self):
+        """Test that a push updates one repo's entry and reuses cached responses"""
+        repos = mock_repos()
+        with MockGitHubAPI(repos) as api:
+            process, url = self._start_watch(api)
+            try:
+                before = self._catalog()
+                self.assertEqual(len(before), 8)
+
+                # user2 adds a workspace and is pushed twice in a burst
+                repos['user2/kasm-registry']['workspaces']['NewApp'] = load_mock('workspace_new_format.json')
+                repos['user2/kasm-registry']['stars'] = 42
+                requests_before = len(api.requests)
+                push = {'repository': {'full_name': 'user2/kasm-registry'}}
+                post(f"{url}/webhook", push, {'X-GitHub-Event': 'push'})
+                post(f"{url}/webhook", push, {'X-GitHub-Event': 'push'})
+                self._wait_for_batches(url, 1)
+
+                after = self._catalog()
+                self.assertEqual(len(after['user2/kasm-registry']['workspaces']), 2)
+                self.assertEqual(after['user2/kasm-registry']['stars'], 42)
+                for repo in before:
+                    if repo != 'user2/kasm-registry':
+                        self.assertEqual(after[repo], before[repo])
+                self.assertEqual(list(after), list(before))
+                # Only user2's endpoints were fetched
+                touched = {path.split('/')[2] for path in api.requests[requests_before:] if path.startswith(('/repos/', '/raw/'))}
+                self.assertEqual(touched, {'user2'})
+
+                # A second, unchanged push is answered from the HTTP cache
+                not_modified = api.not_modified
+                post(f"{url}/recrawl", {'repo': 'user2/kasm-registry'})
+                self._wait_for_batches(url, 2)
+                self.assertGreater(api.not_modified, not_modified)
+                self.assertEqual(self._catalog(), after)
+            finally:
+                process.terminate()
+                process.wait(timeout=10)
+
+    def test_recrawl_updates_catalog_db(self):
+        """Test that re-crawled and deleted repos are written to CATALOG_DB"""
+        repos = mock_repos()
+        db_path = os.path.join(self.tmpdir.name, 'catalog.db')
+        with MockGitHubAPI(repos) as api:
+            process, url = self._start_watch(api, catalog_db=db_path)
+            try:
+                repos['user2/kasm-registry']['stars'] = 42
+                del repos['user4/kasm-registry']
+                post(f"{url}/recrawl", {'repo': 'user2/kasm-registry'})
+                post(f"{url}/recrawl", {'repo': 'user4/kasm-registry'})
+                self._wait_for_batches(url, 1)
+            finally:
+                process.terminate()
+                process.wait(timeout=10)
+
+        store = CatalogStore(db_path)
+        try:
+            stored = dict(store.iter_repo_entries())
+        finally:
+            store.close()
+        self.assertEqual(stored['user2/kasm-registry']['stars'], 42)
+        self.assertNotIn('user4/kasm-registry', stored)
+        self.assertEqual(stored, self._catalog())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,184 @@
+"""
+A pool of GitHub tokens sharing the crawl's API requests.
+
+Every GitHub token has its own rate limit per resource (5,000 core
+requests an hour, 30 searches and 10 code searches a minute for a personal
+access token), so with a single token the whole crawl is capped by one
+budget. TokenPool spreads requests over several tokens:
+
+- each request goes to the active token with the most requests left for
+  its resource, as reported by the X-RateLimit-* headers of that token's
+  last response (a token not used yet counts as having its full limit,
+  refilled after its resource's window until headers give the real reset)
+- a token that runs out (remaining 0, or a 403/429 rate-limit answer) is
+  left out for that resource until its reset time
+- a token GitHub rejects with 401 (revoked, expired) is dropped for the
+  rest of the run
+- when every token is out for a resource, the caller is told how long to
+  wait for the earliest reset
+
+Per-token usage is kept for the run summary.
+"""
+
+import threading
+import time
+
+
+# Resource -> (requests, seconds until the window resets) for a personal
+# access token, until X-RateLimit-* headers say otherwise
+DEFAULT_LIMITS = {'core': (5000, 3600), 'search': (30, 60), 'code_search': (10, 60)}
+ACTIVE = 'active'
+REVOKED = 'revoked'
+
+
+def resource_for_url(url):
+    """Return the GitHub rate-limit resource a request counts against."""
+    path = url.split('://', 1)[-1].partition('/')[2]
+    if path.startswith('search/code'):
+        return 'code_search'
+    if path.startswith('search/'):
+        return 'search'
+    return 'core'
+
+
+def token_label(index):
+    """Name a token in output by its position in GH_PATS, e.g. "#2"; no part of the token is shown."""
+    return f"#{index + 1}"
+
+
+class _TokenState:
+    __slots__ = ('token', 'label', 'state', 'remaining', 'limits', 'resets', 'requests', 'rate_limited')
+
+    def __init__(self, token, label):
+        self.token = token
+        self.label = label
+        self.state = ACTIVE
+        self.remaining = {}     # resource -> requests left
+        self.limits = {}        # resource -> requests per window
+        self.resets = {}        # resource -> epoch seconds when remaining refills
+        self.requests = {}      # resource -> requests sent
+        self.rate_limited = 0
+
+
+class TokenPool:
+    """
+    Choose a GitHub token for every request and track each token's budget.
+
+    Args:
+        tokens: Token strings; duplicates and empty strings are ignored
+        clock: Wall clock in epoch seconds (X-RateLimit-Reset is epoch based), overridable for tests
+    """
+
+    def __init__(self, tokens, clock=time.time):
+        tokens = list(dict.fromkeys(token.strip() for token in tokens if token and token.strip()))
+        if not tokens:
+            raise ValueError("TokenPool needs at least one token")
+        self.clock = clock
+        self.tokens = [_TokenState(token, token_label(index)) for index, token in enumerate(tokens)]
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.tokens)
+
+    def active_count(self):
+        with self._lock:
+            return sum(state.state == ACTIVE for state in self.tokens)
+
+    def _limit(self, state, resource):
+        return state.limits.get(resource, DEFAULT_LIMITS.get(resource, (0, 0))[0])
+
+    def _remaining(self, state, resource, now):
+        if resource in state.resets and now >= state.resets[resource]:
+            # The window has reset since the last response we saw
+            state.remaining[resource] = self._limit(state, resource)
+            del state.resets[resource]
+        return state.remaining.get(resource, self._limit(state, resource))
+
+    def acquire(self, resource):
+        """
+        Pick the token for the next request to resource.
+
+        Returns:
+            tuple: (token, seconds to wait first). The wait is 0 unless every active
+            token is out of requests for resource, in which case it is the time until
+            the earliest reset. (None, 0) if every token has been revoked.
+        """
+        with self._lock:
+            now = self.clock()
+            active = [state for state in self.tokens if state.state == ACTIVE]
+            if not active:
+                return None, 0
+            # Most requests left first; fewest sent breaks ties so unused tokens get their turn
+            best = max(active, key=lambda state: (self._remaining(state, resource, now),
+                                                  -state.requests.get(resource, 0)))
+            wait = 0
+            if self._remaining(best, resource, now) <= 0:
+                best = min(active, key=lambda state: state.resets.get(resource, now))
+                wait = max(0.0, best.resets.get(resource, now) - now)
+            # Count the request now, so back-to-back calls spread before responses arrive
+            best.remaining[resource] = self._remaining(best, resource, now) - 1
+            if resource not in best.resets and resource in DEFAULT_LIMITS:
+                # First request of a window: expect the reset one window from now
+                # until a response carries X-RateLimit-Reset
+                best.resets[resource] = now + DEFAULT_LIMITS[resource][1]
+            best.requests[resource] = best.requests.get(resource, 0) + 1
+            return best.token, wait
+
+    def record(self, token, resource, status_code, headers):
+        """
+        Update a token from the response to a request made with it.
+
+        Args:
+            token: The token the request was sent with
+            resource: Resource the request counted against
+            status_code: HTTP status of the response
+            headers: Response headers (case-insensitive mapping)
+
+        Returns:
+            bool: True if the request failed because of the token (revoked or rate
+            limited) and should be retried with another one
+        """
+        with self._lock:
+            state = next((state for state in self.tokens if state.token == token), None)
+            if state is None:
+                return False
+            resource = headers.get('X-RateLimit-Resource', resource)
+            try:
+                if 'X-RateLimit-Limit' in headers:
+                    state.limits[resource] = int(headers['X-RateLimit-Limit'])
+                if 'X-RateLimit-Remaining' in headers:
+                    state.remaining[resource] = int(headers['X-RateLimit-Remaining'])
+                if 'X-RateLimit-Reset' in headers:
+                    state.resets[resource] = int(headers['X-RateLimit-Reset'])
+            except ValueError:
+                pass
+
+            if status_code == 401:
+                state.state = REVOKED
+                print(f"GitHub token {state.label} was rejected (401); taking it out of rotation")
+                return True
+            if status_code in (403, 429) and (state.remaining.get(resource) == 0 or 'Retry-After' in headers):
+                # Primary limit used up, or a secondary limit asking us to back off
+                state.rate_limited += 1
+                state.remaining[resource] = 0
+                if 'Retry-After' in headers:
+                    try:
+                        state.resets[resource] = self.clock() + int(headers['Retry-After'])
+                    except ValueError:
+                        pass
+                print(f"GitHub token {state.label} is rate limited for {resource}")
+                return True
+            return False
+
+    def report(self):
+        """Return {label: {'state', 'requests', 'remaining', 'rate_limited'}} for every token."""
+        with self._lock:
+            return {
+                state.label: {
+                    'state': state.state,
+                    'requests': dict(sorted(state.requests.items())),
+                    'remaining': dict(sorted(state.remaining.items())),
+                    'rate_limited': state.rate_limited
+                }
+                for state in self.tokens
+            }
@@ -0,0 +1,191 @@
+"""
+Webhook endpoint and event coalescing for watch mode.
+
+`search_github.py watch` keeps one process running with its image-probe
+and HTTP caches warm, and re-crawls only the repos named by incoming
+events instead of waiting for the daily full crawl.
+
+Endpoints:
+    POST /webhook   GitHub webhook delivery (push events re-crawl the repo, ping is answered)
+    POST /recrawl   {"repo": "owner/name"} to re-crawl a repo by hand
+    GET  /health    Queue state and counters
+
+When a secret is configured every POST must carry a valid
+X-Hub-Signature-256 header (HMAC-SHA256 of the body, as GitHub sends it).
+"""
+
+import hashlib
+import hmac
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+
+DEFAULT_DEBOUNCE = 5.0
+DEFAULT_MAX_DELAY = 60.0
+MAX_PAYLOAD_BYTES = 1024 * 1024
+REPO_NAME_RE = re.compile(r'^[A-Za-z0-9_.-]+/[A-Za-z0-9_.-]+$')
+
+
+class RecrawlQueue:
+    """
+    Coalesce bursts of re-crawl requests into batches.
+
+    A batch is handed to recrawl once no new event has arrived for
+    `debounce` seconds, or `max_delay` seconds after its first event,
+    whichever comes first. Repos requested several times within a batch
+    are crawled once.
+
+    Args:
+        recrawl: Callable taking a sorted list of repo full names
+        debounce: Quiet period before a batch is processed
+        max_delay: Upper bound on how long an event can wait
+    """
+
+    def __init__(self, recrawl, debounce=DEFAULT_DEBOUNCE, max_delay=DEFAULT_MAX_DELAY):
+        self.recrawl = recrawl
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.pending = set()
+        self.first_event = None
+        self.last_event = None
+        self.stats = {'events': 0, 'batches': 0, 'repos_recrawled': 0, 'errors': 0}
+        self._condition = threading.Condition()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name='recrawl-queue', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        self._thread.join()
+
+    def submit(self, repo_full_name):
+        with self._condition:
+            now = time.monotonic()
+            if not self.pending:
+                self.first_event = now
+            self.pending.add(repo_full_name)
+            self.last_event = now
+            self.stats['events'] += 1
+            self._condition.notify_all()
+
+    def snapshot(self):
+        with self._condition:
+            return dict(self.stats, pending=sorted(self.pending))
+
+    def _next_batch(self):
+        with self._condition:
+            while not self._stopped:
+                if not self.pending:
+                    self._condition.wait()
+                    continue
+                now = time.monotonic()
+                due = min(self.last_event + self.debounce, self.first_event + self.max_delay)
+                if now >= due:
+                    batch = sorted(self.pending)
+                    self.pending.clear()
+                    return batch
+                self._condition.wait(due - now)
+            return None
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            try:
+                self.recrawl(batch)
+            except Exception as e:  # keep the daemon alive; the next event retries
+                print(f"Re-crawl of {', '.join(batch)} failed: {e}")
+                with self._condition:
+                    self.stats['errors'] += 1
+            with self._condition:
+                self.stats['batches'] += 1
+                self.stats['repos_recrawled'] += len(batch)
+
+
+def verify_signature(secret, body, signature_header):
+    """Check a GitHub X-Hub-Signature-256 header against the request body."""
+    if not signature_header or not signature_header.startswith('sha256='):
+        return False
+    expected = hmac.new(secret.encode('utf-8'), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature_header[len('sha256='):])
+
+
+def make_handler(queue, secret=None):
+    """Build a request handler class bound to a RecrawlQueue."""
+
+    class WebhookRequestHandler(BaseHTTPRequestHandler):
+        server_version = 'KasmCrawlerWatch/1.0'
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            if urlparse(self.path).path == '/health':
+                return self._send_json(200, dict(queue.snapshot(), status='ok'))
+            return self._send_json(404, {'error': 'not found'})
+
+        def do_POST(self):
+            path = urlparse(self.path).path
+            if path not in ('/webhook', '/recrawl'):
+                return self._send_json(404, {'error': 'not found'})
+            # Checked before reading: a negative length would read to EOF past the limit
+            length = self.headers.get('Content-Length')
+            if length is None:
+                return self._send_json(411, {'error': 'Content-Length required'})
+            length = length.strip()
+            if not (length.isascii() and length.isdigit()):
+                return self._send_json(400, {'error': 'invalid Content-Length'})
+            if int(length) > MAX_PAYLOAD_BYTES:
+                return self._send_json(413, {'error': 'payload too large'})
+            body = self.rfile.read(int(length))
+            if secret and not verify_signature(secret, body, self.headers.get('X-Hub-Signature-256')):
+                return self._send_json(401, {'error': 'invalid signature'})
+            try:
+                payload = json.loads(body or b'{}')
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                return self._send_json(400, {'error': 'invalid JSON'})
+            if not isinstance(payload, dict):
+                return self._send_json(400, {'error': 'expected a JSON object'})
+
+            if path == '/webhook':
+                event = self.headers.get('X-GitHub-Event', '')
+                if event == 'ping':
+                    return self._send_json(200, {'status': 'pong'})
+                if event != 'push':
+                    return self._send_json(202, {'status': 'ignored', 'event': event})
+                repository = payload.get('repository')
+                repo = repository.get('full_name') if isinstance(repository, dict) else None
+            else:
+                repo = payload.get('repo')
+
+            if not isinstance(repo, str) or not REPO_NAME_RE.match(repo):
+                return self._send_json(400, {'error': 'missing or invalid repository name'})
+            queue.submit(repo)
+            return self._send_json(202, {'status': 'queued', 'repo': repo})
+
+        def _send_json(self, status, payload):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return WebhookRequestHandler
+
+
+def make_server(queue, host='127.0.0.1', port=8090, secret=None):
+    """Create (but do not start) a ThreadingHTTPServer feeding queue."""
+    server = ThreadingHTTPServer((host, port), make_handler(queue, secret))
+    server.daemon_threads = True
+    return server